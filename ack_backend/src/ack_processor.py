@@ -4,6 +4,7 @@ import json
 from logging_decorators import ack_lambda_handler_logging_decorator
 from update_ack_file import update_ack_file
 from convert_message_to_ack_row import convert_message_to_ack_row
+from utils_for_ack_lambda import get_claim_checked_messages, delete_claim_checked_messages
 
 
 @ack_lambda_handler_logging_decorator
@@ -12,6 +13,7 @@ def lambda_handler(event, context):
     Ack lambda handler.
     For each record: each message in the array of messages is converted to an ack row,
     then all of the ack rows for that array of messages are uploaded to the ack file in one go.
+    A record may instead hold a claim check for an array of messages which the forwarder uploaded to S3.
     """
 
     if not event.get("Records"):
@@ -23,6 +25,7 @@ def lambda_handler(event, context):
     supplier_queue = None
 
     ack_data_rows = []
+    claim_checks = []
 
     for i, record in enumerate(event["Records"]):
 
@@ -31,6 +34,10 @@ def lambda_handler(event, context):
         except Exception as body_json_error:
             raise ValueError("Could not load incoming message body") from body_json_error
 
+        if isinstance(incoming_message_body, dict) and (claim_check := incoming_message_body.get("claim_check")):
+            incoming_message_body = get_claim_checked_messages(claim_check)
+            claim_checks.append(claim_check)
+
         if i == 0:
             # IMPORTANT NOTE: An assumption is made here that the file_key and created_at_formatted_string are the same
             # for all messages in the event. The use of FIFO SQS queues ensures that this is the case, provided that
@@ -46,6 +53,13 @@ def lambda_handler(event, context):
         for message in incoming_message_body:
             ack_data_rows.append(convert_message_to_ack_row(message, created_at_formatted_string))
 
-    update_ack_file(file_key, message_id, supplier_queue, created_at_formatted_string, ack_data_rows)
+    # The sequence number of the first message numbers the part of the ack file for this event, so that the parts are
+    # in the order of the messages, and a retried event replaces the part it wrote before
+    part_number = event["Records"][0].get("attributes", {}).get("SequenceNumber")
+    update_ack_file(file_key, message_id, supplier_queue, created_at_formatted_string, ack_data_rows, part_number)
+
+    # The claim checked messages are only deleted once in the ack file, so they remain available if the event is retried
+    for claim_check in claim_checks:
+        delete_claim_checked_messages(claim_check)
 
     return {"statusCode": 200, "body": json.dumps("Lambda function executed successfully!")}
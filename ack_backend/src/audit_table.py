@@ -1,41 +1,31 @@
 """Add the filename to the audit table and check for duplicates."""
 
+import math
+import time
+from collections import defaultdict
 from typing import Union
-from boto3.dynamodb.conditions import Key
-from clients import dynamodb_client, dynamodb_resource, logger
+from botocore.exceptions import ClientError
+from clients import dynamodb_client, logger
 from errors import UnhandledAuditTableError
-from constants import AUDIT_TABLE_NAME, AUDIT_TABLE_QUEUE_NAME_GSI, FileStatus, AuditTableKeys
+from constants import AUDIT_TABLE_NAME, FileStatus, AuditTableKeys
+from common.audit_table_client import update_audit_table_status
 
+# The rows processed are recorded in chunks of this many rows, as the rows of a large file won't fit in one item
+PROCESSED_ROWS_CHUNK_SIZE = 1000
+# The chunks are only needed while the file is being processed, so they expire from the audit table after this time
+PROCESSED_ROWS_CHUNK_TTL_SECONDS = 14 * 24 * 60 * 60
 
-def get_next_queued_file_details(queue_name: str) -> Union[dict, None]:
-    """
-    Checks for queued files.
-    Returns a dictionary containing the details of the oldest queued file, or returns None if no queued files are found.
-    """
-    queued_files_found_in_audit_table: dict = dynamodb_resource.Table(AUDIT_TABLE_NAME).query(
-        IndexName=AUDIT_TABLE_QUEUE_NAME_GSI,
-        KeyConditionExpression=Key(AuditTableKeys.QUEUE_NAME).eq(queue_name)
-        & Key(AuditTableKeys.STATUS).eq(FileStatus.QUEUED),
-    )
-
-    queued_files_details: list = queued_files_found_in_audit_table["Items"]
-
-    # Return the oldest queued file
-    return sorted(queued_files_details, key=lambda x: x["timestamp"])[0] if queued_files_details else None
+# The rows at which the shards of each file start, which don't change once the first row of the file has been sent
+shard_start_rows_by_message_id: dict[str, list[int]] = {}
+# The number of rows of each file, which doesn't change once it has been recorded
+expected_row_counts_by_message_id: dict[str, int] = {}
 
 
-def change_audit_table_status_to_processed(file_key: str, message_id: str) -> None:
+def change_audit_table_status_to_processed(file_key: str, message_id: str, created_at_formatted_string: str) -> None:
     """Updates the status in the audit table to 'Processed' and returns the queue name."""
     try:
         # Update the status in the audit table to "Processed"
-        dynamodb_client.update_item(
-            TableName=AUDIT_TABLE_NAME,
-            Key={AuditTableKeys.MESSAGE_ID: {"S": message_id}},
-            UpdateExpression="SET #status = :status",
-            ExpressionAttributeNames={"#status": "status"},
-            ExpressionAttributeValues={":status": {"S": FileStatus.PROCESSED}},
-            ConditionExpression="attribute_exists(message_id)",
-        )
+        update_audit_table_status(message_id, FileStatus.PROCESSED, created_at_formatted_string)
 
         logger.info(
             "The status of %s file, with message id %s, was successfully updated to %s in the audit table",
@@ -47,3 +37,179 @@ def change_audit_table_status_to_processed(file_key: str, message_id: str) -> No
     except Exception as error:  # pylint: disable = broad-exception-caught
         logger.error(error)
         raise UnhandledAuditTableError(error) from error
+
+
+def get_processed_rows_chunk_key(message_id: str, chunk_index: int) -> dict:
+    """
+    Returns the key of the item recording which rows of the chunk of the file have been processed. The item is kept in
+    the audit table, and isn't in either of its indexes.
+    """
+    return {AuditTableKeys.MESSAGE_ID: {"S": f"processed_rows#{message_id}#{chunk_index}"}}
+
+
+def add_rows_to_chunks(message_id: str, row_numbers: list[int]) -> dict[int, int]:
+    """
+    Adds the row numbers to the sets of processed rows of the chunks of the file which they are in. Returns the number
+    of rows of each of those chunks which have now been processed. Adding a row which is already in the set doesn't
+    change it, so each row is only counted once.
+    """
+    row_numbers_by_chunk_index = defaultdict(set)
+    for row_number in row_numbers:
+        # Row numbers count from 1
+        row_numbers_by_chunk_index[(row_number - 1) // PROCESSED_ROWS_CHUNK_SIZE].add(row_number)
+
+    processed_row_counts = {}
+    for chunk_index, chunk_row_numbers in row_numbers_by_chunk_index.items():
+        response = dynamodb_client.update_item(
+            TableName=AUDIT_TABLE_NAME,
+            Key=get_processed_rows_chunk_key(message_id, chunk_index),
+            UpdateExpression="ADD #processed_rows :row_numbers SET #expires_at = :expires_at",
+            ExpressionAttributeNames={
+                "#processed_rows": AuditTableKeys.PROCESSED_ROWS,
+                "#expires_at": AuditTableKeys.EXPIRES_AT,
+            },
+            ExpressionAttributeValues={
+                ":row_numbers": {"NS": [str(row_number) for row_number in sorted(chunk_row_numbers)]},
+                ":expires_at": {"N": str(int(time.time()) + PROCESSED_ROWS_CHUNK_TTL_SECONDS)},
+            },
+            ReturnValues="ALL_NEW",
+        )
+        processed_row_counts[chunk_index] = len(response["Attributes"][AuditTableKeys.PROCESSED_ROWS]["NS"])
+    return processed_row_counts
+
+
+def get_expected_row_count(message_id: str) -> Union[int, None]:
+    """Returns the number of rows of the file, or None if the recordprocessor hasn't recorded it yet"""
+    if message_id not in expected_row_counts_by_message_id:
+        audit_table_entry = dynamodb_client.get_item(
+            TableName=AUDIT_TABLE_NAME,
+            Key={AuditTableKeys.MESSAGE_ID: {"S": message_id}},
+            ProjectionExpression="#expected_row_count",
+            ExpressionAttributeNames={"#expected_row_count": AuditTableKeys.EXPECTED_ROW_COUNT},
+            ConsistentRead=True,
+        ).get("Item", {})
+        if AuditTableKeys.EXPECTED_ROW_COUNT not in audit_table_entry:
+            return None
+        expected_row_counts_by_message_id[message_id] = int(audit_table_entry[AuditTableKeys.EXPECTED_ROW_COUNT]["N"])
+
+    return expected_row_counts_by_message_id[message_id]
+
+
+def is_chunk_complete(chunk_index: int, processed_row_count: int, expected_row_count: Union[int, None]) -> bool:
+    """
+    Returns True if all of the rows of the chunk have been processed. Only the last chunk of the file has fewer rows
+    than the chunk size, which can't be known until the expected row count has been recorded.
+    """
+    if processed_row_count == PROCESSED_ROWS_CHUNK_SIZE:
+        return True
+    return (
+        expected_row_count is not None
+        and processed_row_count == expected_row_count - chunk_index * PROCESSED_ROWS_CHUNK_SIZE
+    )
+
+
+def add_processed_rows(file_key: str, message_id: str, row_numbers: list[int]) -> bool:
+    """
+    Records the rows as processed for the file in the audit table. Returns True if all of the rows of the file have
+    now been processed, i.e. the recordprocessor has recorded how many rows the file has, and each of them has been
+    processed.
+    Each row is only counted once, however many times it is received, as a message may be redelivered and rows are
+    sent again when processing is resumed from a checkpoint. Once all of the rows of a chunk have been processed, the
+    chunk is added to the set of processed chunks of the file.
+    Rows for a file which has already been processed are not counted, and False is returned.
+    """
+    try:
+        processed_row_counts = add_rows_to_chunks(message_id, row_numbers)
+        expected_row_count = (
+            get_expected_row_count(message_id)
+            if any(count < PROCESSED_ROWS_CHUNK_SIZE for count in processed_row_counts.values())
+            else None
+        )
+        completed_chunk_indexes = [
+            chunk_index
+            for chunk_index, processed_row_count in processed_row_counts.items()
+            if is_chunk_complete(chunk_index, processed_row_count, expected_row_count)
+        ]
+        # The file can only have been completed by the rows if they completed a chunk
+        if not completed_chunk_indexes:
+            return False
+
+        response = dynamodb_client.update_item(
+            TableName=AUDIT_TABLE_NAME,
+            Key={AuditTableKeys.MESSAGE_ID: {"S": message_id}},
+            UpdateExpression="ADD #processed_row_chunks :chunk_indexes",
+            ExpressionAttributeNames={
+                "#processed_row_chunks": AuditTableKeys.PROCESSED_ROW_CHUNKS,
+                "#status": AuditTableKeys.STATUS,
+            },
+            ExpressionAttributeValues={
+                ":chunk_indexes": {"NS": [str(chunk_index) for chunk_index in completed_chunk_indexes]},
+                ":processed": {"S": FileStatus.PROCESSED},
+            },
+            ConditionExpression="attribute_exists(message_id) AND #status <> :processed",
+            ReturnValues="ALL_NEW",
+        )
+
+    except ClientError as error:
+        if error.response["Error"]["Code"] == "ConditionalCheckFailedException":
+            logger.warning(
+                "Rows received for %s file, with message id %s, which is not being processed", file_key, message_id
+            )
+            return False
+        logger.error(error)
+        raise UnhandledAuditTableError(error) from error
+
+    except Exception as error:  # pylint: disable = broad-exception-caught
+        logger.error(error)
+        raise UnhandledAuditTableError(error) from error
+
+    audit_table_entry = response["Attributes"]
+    if AuditTableKeys.EXPECTED_ROW_COUNT not in audit_table_entry:
+        return False
+
+    processed_chunk_count = len(audit_table_entry[AuditTableKeys.PROCESSED_ROW_CHUNKS]["NS"])
+    expected_row_count = int(audit_table_entry[AuditTableKeys.EXPECTED_ROW_COUNT]["N"])
+    return processed_chunk_count == math.ceil(expected_row_count / PROCESSED_ROWS_CHUNK_SIZE)
+
+
+def is_file_processing(message_id: str) -> bool:
+    """Returns True if the file is in the audit table with a status of processing"""
+    try:
+        audit_table_entry = dynamodb_client.get_item(
+            TableName=AUDIT_TABLE_NAME,
+            Key={AuditTableKeys.MESSAGE_ID: {"S": message_id}},
+            ProjectionExpression="#status",
+            ExpressionAttributeNames={"#status": AuditTableKeys.STATUS},
+            ConsistentRead=True,
+        ).get("Item", {})
+
+    except Exception as error:  # pylint: disable = broad-exception-caught
+        logger.error(error)
+        raise UnhandledAuditTableError(error) from error
+
+    return audit_table_entry.get(AuditTableKeys.STATUS, {}).get("S") == FileStatus.PROCESSING
+
+
+def get_shard_start_rows(message_id: str) -> list[int]:
+    """
+    Returns the number of rows before each of the shards of the file, if the recordprocessor split the file into
+    shards, or returns an empty list if not.
+    """
+    if message_id not in shard_start_rows_by_message_id:
+        try:
+            audit_table_entry = dynamodb_client.get_item(
+                TableName=AUDIT_TABLE_NAME,
+                Key={AuditTableKeys.MESSAGE_ID: {"S": message_id}},
+                ProjectionExpression="#shard_start_rows",
+                ExpressionAttributeNames={"#shard_start_rows": AuditTableKeys.SHARD_START_ROWS},
+            ).get("Item", {})
+
+        except Exception as error:  # pylint: disable = broad-exception-caught
+            logger.error(error)
+            raise UnhandledAuditTableError(error) from error
+
+        shard_start_rows_by_message_id[message_id] = [
+            int(start_row["N"]) for start_row in audit_table_entry.get(AuditTableKeys.SHARD_START_ROWS, {}).get("L", [])
+        ]
+
+    return shard_start_rows_by_message_id[message_id]
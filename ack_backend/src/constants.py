@@ -6,7 +6,7 @@ SOURCE_BUCKET_NAME = f"immunisation-batch-{os.getenv('ENVIRONMENT')}-data-source
 ACK_BUCKET_NAME = os.getenv("ACK_BUCKET_NAME")
 AUDIT_TABLE_NAME = os.getenv("AUDIT_TABLE_NAME")
 AUDIT_TABLE_FILENAME_GSI = "filename_index"
-AUDIT_TABLE_QUEUE_NAME_GSI = "queue_name_index"
+AUDIT_TABLE_QUEUE_NAME_GSI = "queue_name_status_index"
 FILE_NAME_PROC_LAMBDA_NAME = os.getenv("FILE_NAME_PROC_LAMBDA_NAME")
 
 
@@ -26,7 +26,15 @@ class AuditTableKeys:
     MESSAGE_ID = "message_id"
     QUEUE_NAME = "queue_name"
     STATUS = "status"
+    STATUS_TIMESTAMP = "status_timestamp"
     TIMESTAMP = "timestamp"
+    LEASES = "leases"
+    LEASE_VERSION = "lease_version"
+    EXPECTED_ROW_COUNT = "expected_row_count"
+    PROCESSED_ROW_CHUNKS = "processed_row_chunks"
+    PROCESSED_ROWS = "processed_rows"
+    EXPIRES_AT = "expires_at"
+    SHARD_START_ROWS = "shard_start_rows"
 
 
 ACK_HEADERS = [
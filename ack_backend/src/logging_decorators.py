@@ -2,23 +2,80 @@
 
 import os
 import json
+import random
 import time
+from collections import Counter
 from datetime import datetime
 from functools import wraps
 from clients import firehose_client, logger
+from common.log_firehose import FirehoseLogger
 
 
 STREAM_NAME = os.getenv("SPLUNK_FIREHOSE_NAME", "immunisation-fhir-api-internal-dev-splunk-firehose")
 
+# The logs for every row are buffered, and sent in batches, rather than being sent one at a time
+firehose_logger = FirehoseLogger(STREAM_NAME, firehose_client)
+
+# In the aggregate mode, the outcome of each row is counted, and one summary log is sent for each file in the event.
+# The full log for a row is then only sent if the row failed, or if it is sampled (with the given probability).
+ACK_ROW_LOGGING_MODE = os.getenv("ACK_ROW_LOGGING_MODE", "per_row")
+ACK_ROW_LOG_SAMPLE_RATE = float(os.getenv("ACK_ROW_LOG_SAMPLE_RATE", 0))
+MAX_FAILURES_IN_SUMMARY = 100
+
+
+class AckRowLogSummary:
+    """Counts the outcomes of the rows of a file which have been converted to ack rows, for a single summary log"""
+
+    def __init__(self, file_key: str, vaccine_type: str, supplier: str):
+        self.file_key = file_key
+        self.vaccine_type = vaccine_type
+        self.supplier = supplier
+        self.row_count = 0
+        self.status_codes = Counter()
+        self.error_types = Counter()
+        self.failures = []
+        self.total_time_taken = 0.0
+        self.max_time_taken = 0.0
+
+    def add_row(self, row_log_data: dict, error_type: str, time_taken: float) -> None:
+        """Counts the outcome of a row, and adds it to the failures if it failed"""
+        self.row_count += 1
+        self.status_codes[str(row_log_data["statusCode"])] += 1
+        self.total_time_taken += time_taken
+        self.max_time_taken = max(self.max_time_taken, time_taken)
+        if row_log_data["status"] == "fail":
+            self.error_types[error_type] += 1
+            if len(self.failures) < MAX_FAILURES_IN_SUMMARY:
+                failure = {"message_id": row_log_data["message_id"], "statusCode": row_log_data["statusCode"]}
+                self.failures.append(failure)
+
+    def to_log_data(self) -> dict:
+        """Returns the summary log data. Only the first MAX_FAILURES_IN_SUMMARY failures are listed."""
+        failure_count = sum(self.error_types.values())
+        return {
+            "function_name": "ack_processor_convert_message_to_ack_row_summary",
+            "date_time": str(datetime.now()),
+            "file_key": self.file_key,
+            "vaccine_type": self.vaccine_type,
+            "supplier": self.supplier,
+            "row_count": self.row_count,
+            "success_count": self.row_count - failure_count,
+            "failure_count": failure_count,
+            "status_codes": dict(self.status_codes),
+            "error_types": dict(self.error_types),
+            "failures": self.failures,
+            "time_taken": f"{round(self.total_time_taken, 5)}s",
+            "max_time_taken": f"{round(self.max_time_taken, 5)}s",
+        }
+
+
+# The summaries of the rows converted in the current event, by file key
+ack_row_log_summaries: dict[str, AckRowLogSummary] = {}
+
 
 def send_log_to_firehose(log_data: dict) -> None:
-    """Sends the log_message to Firehose"""
-    try:
-        record = {"Data": json.dumps({"event": log_data}).encode("utf-8")}
-        firehose_client.put_record(DeliveryStreamName=STREAM_NAME, Record=record)
-        logger.info("Log sent to Firehose")
-    except Exception as error:  # pylint:disable = broad-exception-caught
-        logger.exception("Error sending log to Firehose: %s", error)
+    """Adds the log_message to the logs to be sent to Firehose"""
+    firehose_logger.send_log({"event": log_data})
 
 
 def generate_and_send_logs(
@@ -32,8 +89,21 @@ def generate_and_send_logs(
     send_log_to_firehose(log_data)
 
 
+def send_ack_row_log_summaries() -> None:
+    """Sends the summary log for each file with rows converted in the current event to Cloudwatch and Firehose"""
+    for summary in ack_row_log_summaries.values():
+        log_data = summary.to_log_data()
+        logger.info(json.dumps(log_data))
+        send_log_to_firehose(log_data)
+    ack_row_log_summaries.clear()
+
+
 def convert_messsage_to_ack_row_logging_decorator(func):
-    """This decorator logs the information on the conversion of a single message to an ack data row"""
+    """
+    This decorator logs the information on the conversion of a single message to an ack data row.
+    In the aggregate mode, the outcome is instead counted in the summary for the file, and the full log is only sent for
+    failed or sampled rows.
+    """
 
     @wraps(func)
     def wrapper(message, created_at_formatted_string):
@@ -57,6 +127,17 @@ def convert_messsage_to_ack_row_logging_decorator(func):
                 "operation_requested": message.get("operation_requested", "unknown"),
                 **process_diagnostics(diagnostics, file_key, message_id),
             }
+
+            if ACK_ROW_LOGGING_MODE == "aggregate":
+                if (summary := ack_row_log_summaries.get(file_key)) is None:
+                    summary = ack_row_log_summaries[file_key] = AckRowLogSummary(
+                        file_key, additional_log_data["vaccine_type"], additional_log_data["supplier"]
+                    )
+                error_type = diagnostics.get("error_type", "unknown") if isinstance(diagnostics, dict) else "unknown"
+                summary.add_row(additional_log_data, error_type, time.time() - start_time)
+                if additional_log_data["status"] == "success" and random.random() >= ACK_ROW_LOG_SAMPLE_RATE:
+                    return result
+
             generate_and_send_logs(start_time, base_log_data, additional_log_data)
 
             return result
@@ -78,18 +159,24 @@ def ack_lambda_handler_logging_decorator(func):
         base_log_data = {"function_name": f"ack_processor_{func.__name__}", "date_time": str(datetime.now())}
         start_time = time.time()
 
+        ack_row_log_summaries.clear()
         try:
             result = func(event, context, *args, **kwargs)
+            send_ack_row_log_summaries()
             message_for_logs = "Lambda function executed successfully!"
             additional_log_data = {"status": "success", "statusCode": 200, "message": message_for_logs}
             generate_and_send_logs(start_time, base_log_data, additional_log_data)
             return result
 
         except Exception as error:
+            send_ack_row_log_summaries()
             additional_log_data = {"status": "fail", "statusCode": 500, "diagnostics": str(error)}
             generate_and_send_logs(start_time, base_log_data, additional_log_data, is_error_log=True)
             raise
 
+        finally:
+            firehose_logger.flush()
+
     return wrapper
 
 
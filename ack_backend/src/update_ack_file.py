@@ -1,13 +1,26 @@
 """Functions for uploading the data to the ack file"""
 
 import json
+import time
+from bisect import bisect_left
+from collections import defaultdict
 from io import StringIO, BytesIO
 from typing import Union
-from botocore.exceptions import ClientError
 from constants import ACK_HEADERS, SOURCE_BUCKET_NAME, ACK_BUCKET_NAME, FILE_NAME_PROC_LAMBDA_NAME
-from audit_table import change_audit_table_status_to_processed, get_next_queued_file_details
+from audit_table import (
+    change_audit_table_status_to_processed,
+    add_processed_rows,
+    get_shard_start_rows,
+    is_file_processing,
+)
+from common.audit_table_client import get_next_queued_file_details, release_queue_lease, renew_queue_lease
 from clients import s3_client, logger, lambda_client
-from utils_for_ack_lambda import get_row_count
+
+# SQS FIFO sequence numbers are up to 128 bits, so have up to 39 digits, and times in nanoseconds have 19
+ACK_PART_NUMBER_DIGITS = 39
+# S3 multipart upload parts, other than the last, must be at least 5 MiB
+MULTIPART_UPLOAD_PART_SIZE = 8 * 1024 * 1024
+MAX_KEYS_PER_DELETE = 1000
 
 
 def create_ack_data(
@@ -45,57 +58,113 @@ def create_ack_data(
     }
 
 
-def obtain_current_ack_content(temp_ack_file_key: str) -> StringIO:
-    """Returns the current ack file content if the file exists, or else initialises the content with the ack headers."""
-    try:
-        # If ack file exists in S3 download the contents
-        existing_ack_file = s3_client.get_object(Bucket=ACK_BUCKET_NAME, Key=temp_ack_file_key)
-        existing_content = existing_ack_file["Body"].read().decode("utf-8")
-    except ClientError as error:
-        # If ack file does not exist in S3 create a new file containing the headers only
-        if error.response["Error"]["Code"] in ("404", "NoSuchKey"):
-            logger.info("No existing ack file found in S3 - creating new file")
-            existing_content = "|".join(ACK_HEADERS) + "\n"
-        else:
-            logger.error("error whilst obtaining current ack content: %s", error)
-            raise
-
-    accumulated_csv_content = StringIO()
-    accumulated_csv_content.write(existing_content)
-    return accumulated_csv_content
+def get_ack_file_part_key(temp_ack_file_prefix: str, part_number: Union[None, str]) -> str:
+    """
+    Returns the key for a part of the ack file. The parts sort in order of their part numbers.
+    If no part number is given (the SQS sequence number is only given for FIFO queues), then the current time is used.
+    """
+    part_number = part_number or str(time.time_ns())
+    return f"{temp_ack_file_prefix}{part_number.zfill(ACK_PART_NUMBER_DIGITS)}.csv"
 
 
-def upload_ack_file(
-    temp_ack_file_key: str,
-    message_id: str,
-    supplier_queue: str,
-    accumulated_csv_content: StringIO,
-    ack_data_rows: list,
-    archive_ack_file_key: str,
-    file_key: str,
-) -> None:
-    """Adds the data row to the uploaded ack file"""
+def upload_ack_file_part(temp_ack_file_prefix: str, part_number: Union[None, str], ack_data_rows: list) -> None:
+    """Uploads the ack data rows as a new part of the ack file"""
+    part_content = StringIO()
     for row in ack_data_rows:
         data_row_str = [str(item) for item in row.values()]
         cleaned_row = "|".join(data_row_str).replace(" |", "|").replace("| ", "|").strip()
-        accumulated_csv_content.write(cleaned_row + "\n")
-    csv_file_like_object = BytesIO(accumulated_csv_content.getvalue().encode("utf-8"))
-    s3_client.upload_fileobj(csv_file_like_object, ACK_BUCKET_NAME, temp_ack_file_key)
-
-    row_count_source = get_row_count(SOURCE_BUCKET_NAME, f"processing/{file_key}")
-    row_count_destination = get_row_count(ACK_BUCKET_NAME, temp_ack_file_key)
-    # TODO: Should we check for > and if so what handling is required
-    if row_count_destination == row_count_source:
-        move_file(ACK_BUCKET_NAME, temp_ack_file_key, archive_ack_file_key)
-        move_file(SOURCE_BUCKET_NAME, f"processing/{file_key}", f"archive/{file_key}")
+        part_content.write(cleaned_row + "\n")
+
+    part_key = get_ack_file_part_key(temp_ack_file_prefix, part_number)
+    s3_client.put_object(Bucket=ACK_BUCKET_NAME, Key=part_key, Body=part_content.getvalue().encode("utf-8"))
+
+
+def get_row_number(ack_data_row: dict) -> Union[None, int]:
+    """
+    Returns the number of the row of the source file which the ack data row is for. The row id is the message id
+    followed by the row number, which counts from 1.
+    """
+    row_number = str(ack_data_row["MESSAGE_HEADER_ID"]).rpartition("^")[2]
+    return int(row_number) if row_number.isdigit() else None
+
+
+def group_ack_data_rows_by_part_prefix(
+    temp_ack_file_prefix: str, message_id: str, ack_data_rows: list
+) -> dict[str, list]:
+    """
+    Returns the ack data rows grouped by the prefix of the part of the ack file which they are written to.
+    The rows of a file which was split into shards are processed in parallel, so the rows of the shards are mixed in the
+    messages received. The rows of each shard are written to parts with a prefix for the shard, in the order of the
+    shards, so that the ack file has the rows in the order of the source file.
+    """
+    shard_start_rows = get_shard_start_rows(message_id)
+    if not shard_start_rows:
+        return {temp_ack_file_prefix: ack_data_rows}
+
+    ack_data_rows_by_part_prefix = defaultdict(list)
+    for row in ack_data_rows:
+        row_number = get_row_number(row)
+        shard_index = max(bisect_left(shard_start_rows, row_number) - 1, 0) if row_number is not None else 0
+        ack_data_rows_by_part_prefix[f"{temp_ack_file_prefix}shard_{shard_index:05}/"].append(row)
+    return ack_data_rows_by_part_prefix
+
+
+def list_ack_file_part_keys(temp_ack_file_prefix: str) -> list[str]:
+    """Returns the keys of the parts of the ack file, in order"""
+    ack_file_part_keys = []
+    paginator = s3_client.get_paginator("list_objects_v2")
+    for page in paginator.paginate(Bucket=ACK_BUCKET_NAME, Prefix=temp_ack_file_prefix):
+        ack_file_part_keys.extend(obj["Key"] for obj in page.get("Contents", []))
+    return ack_file_part_keys
+
+
+def compose_ack_file(ack_file_part_keys: list[str], ack_file_key: str) -> None:
+    """
+    Writes the ack file, consisting of the ack headers followed by the content of each of the parts, and then deletes
+    the parts. Each part is read only once. If there is more than MULTIPART_UPLOAD_PART_SIZE bytes of content, then
+    it is uploaded as a multipart upload in parts of at least that size.
+    """
+    content = BytesIO()
+    content.write(("|".join(ACK_HEADERS) + "\n").encode("utf-8"))
+    upload_id = None
+    uploaded_parts = []
+
+    def upload_content_as_part() -> None:
+        part_number = len(uploaded_parts) + 1
+        response = s3_client.upload_part(
+            Bucket=ACK_BUCKET_NAME, Key=ack_file_key, UploadId=upload_id, PartNumber=part_number, Body=content.getvalue()
+        )
+        uploaded_parts.append({"ETag": response["ETag"], "PartNumber": part_number})
 
-        # Update the audit table and invoke the filename lambda with next file in the queue (if one exists)
-        change_audit_table_status_to_processed(file_key, message_id)
-        next_queued_file_details = get_next_queued_file_details(supplier_queue)
-        if next_queued_file_details:
-            invoke_filename_lambda(next_queued_file_details["filename"], next_queued_file_details["message_id"])
+    try:
+        for part_key in ack_file_part_keys:
+            content.write(s3_client.get_object(Bucket=ACK_BUCKET_NAME, Key=part_key)["Body"].read())
+            if content.tell() >= MULTIPART_UPLOAD_PART_SIZE:
+                if upload_id is None:
+                    upload_id = s3_client.create_multipart_upload(Bucket=ACK_BUCKET_NAME, Key=ack_file_key)["UploadId"]
+                upload_content_as_part()
+                content = BytesIO()
+
+        if upload_id is None:
+            s3_client.put_object(Bucket=ACK_BUCKET_NAME, Key=ack_file_key, Body=content.getvalue())
+        else:
+            if content.tell():
+                upload_content_as_part()
+            s3_client.complete_multipart_upload(
+                Bucket=ACK_BUCKET_NAME, Key=ack_file_key, UploadId=upload_id, MultipartUpload={"Parts": uploaded_parts}
+            )
 
-    logger.info("Ack file updated to %s: %s", ACK_BUCKET_NAME, archive_ack_file_key)
+    except Exception as error:
+        logger.error("Error composing ack file %s: %s", ack_file_key, error)
+        if upload_id is not None:
+            s3_client.abort_multipart_upload(Bucket=ACK_BUCKET_NAME, Key=ack_file_key, UploadId=upload_id)
+        raise
+
+    for i in range(0, len(ack_file_part_keys), MAX_KEYS_PER_DELETE):
+        s3_client.delete_objects(
+            Bucket=ACK_BUCKET_NAME,
+            Delete={"Objects": [{"Key": key} for key in ack_file_part_keys[i : i + MAX_KEYS_PER_DELETE]]},
+        )
 
 
 def update_ack_file(
@@ -104,21 +173,52 @@ def update_ack_file(
     supplier_queue: str,
     created_at_formatted_string: str,
     ack_data_rows: list,
+    part_number: str = None,
 ) -> None:
-    """Updates the ack file with the new data row based on the given arguments"""
+    """
+    Adds the ack data rows to the ack file, as a new part of the temporary ack file, and counts them as processed in
+    the audit table. Once all of the rows of the source file have been processed, the parts are composed into the
+    archived ack file, the source file is archived and the file's lease of the queue is released. Until then, each
+    update renews the lease. A file is failed in the same way if any of the rows has no row number.
+    """
     ack_filename = f"{file_key.replace('.csv', f'_BusAck_{created_at_formatted_string}.csv')}"
-    temp_ack_file_key = f"TempAck/{ack_filename}"
+    temp_ack_file_prefix = f"TempAck/{ack_filename}/"
     archive_ack_file_key = f"forwardedFile/{ack_filename}"
-    accumulated_csv_content = obtain_current_ack_content(temp_ack_file_key)
-    upload_ack_file(
-        temp_ack_file_key,
-        message_id,
-        supplier_queue,
-        accumulated_csv_content,
-        ack_data_rows,
-        archive_ack_file_key,
-        file_key,
-    )
+    for ack_file_part_prefix, rows in group_ack_data_rows_by_part_prefix(
+        temp_ack_file_prefix, message_id, ack_data_rows
+    ).items():
+        upload_ack_file_part(ack_file_part_prefix, part_number, rows)
+
+    # The rows are only counted once their part has been uploaded, so all of the parts exist once the file is complete
+    row_numbers = [get_row_number(row) for row in ack_data_rows]
+    if None in row_numbers:
+        # The rows are counted by their row numbers, so a file with a row which has none could never be completed.
+        # Instead the file is failed, and its ack file is composed from the rows received so far
+        logger.error(
+            "Rows without a row number received for %s file, with message id %s, so the file is failed",
+            file_key,
+            message_id,
+        )
+        is_file_complete = is_file_processing(message_id)
+    else:
+        is_file_complete = add_processed_rows(file_key, message_id, row_numbers)
+
+    if is_file_complete:
+        compose_ack_file(list_ack_file_part_keys(temp_ack_file_prefix), archive_ack_file_key)
+        move_file(SOURCE_BUCKET_NAME, f"processing/{file_key}", f"archive/{file_key}")
+
+        # Update the audit table, free the file's lease, and invoke the filename lambda with next file in the queue
+        # (if one exists)
+        change_audit_table_status_to_processed(file_key, message_id, created_at_formatted_string)
+        release_queue_lease(supplier_queue, message_id)
+        next_queued_file_details = get_next_queued_file_details(supplier_queue)
+        if next_queued_file_details:
+            invoke_filename_lambda(next_queued_file_details["filename"], next_queued_file_details["message_id"])
+    else:
+        # The file is still being processed, so its lease is renewed
+        renew_queue_lease(supplier_queue, message_id)
+
+    logger.info("Ack file updated to %s: %s", ACK_BUCKET_NAME, archive_ack_file_key)
 
 
 def move_file(bucket_name: str, source_file_key: str, destination_file_key: str) -> None:
@@ -1,12 +1,16 @@
 """Utils for ack lambda"""
 
+import json
+
 from clients import s3_client
 
 
-def get_row_count(bucket_name: str, file_key: str) -> int:
-    """
-    Looks in the given bucket and returns the count of the number of lines in the given file.
-    NOTE: Blank lines are not included in the count.
-    """
-    response = s3_client.get_object(Bucket=bucket_name, Key=file_key)
-    return sum(1 for line in response["Body"].iter_lines() if line.strip())
+def get_claim_checked_messages(claim_check: dict) -> list[dict]:
+    """Returns the array of messages which the forwarder uploaded to S3 in place of sending them to SQS"""
+    response = s3_client.get_object(Bucket=claim_check["bucket"], Key=claim_check["key"])
+    return json.loads(response["Body"].read())
+
+
+def delete_claim_checked_messages(claim_check: dict) -> None:
+    """Deletes the array of messages which the forwarder uploaded to S3, once they have been added to the ack file"""
+    s3_client.delete_object(Bucket=claim_check["bucket"], Key=claim_check["key"])
@@ -2,3 +2,4 @@ import os
 import sys
 
 sys.path.append(f"{os.path.dirname(os.path.abspath(__file__))}/../src")
+sys.path.append(f"{os.path.dirname(os.path.abspath(__file__))}/../../lambdas/shared/src")
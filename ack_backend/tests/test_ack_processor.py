@@ -4,15 +4,17 @@ import unittest
 import os
 import json
 from unittest.mock import patch
-from io import StringIO
 from boto3 import client as boto3_client
-from moto import mock_s3, mock_firehose
+from moto import mock_s3, mock_firehose, mock_dynamodb
 
 from tests.utils_for_ack_backend_tests.mock_environment_variables import MOCK_ENVIRONMENT_DICT, BucketNames, REGION_NAME
 from tests.utils_for_ack_backend_tests.generic_setup_and_teardown_for_ack_backend import GenericSetUp, GenericTearDown
 from tests.utils_for_ack_backend_tests.utils_for_ack_backend_tests import (
     setup_existing_ack_file,
+    add_audit_table_entry,
     validate_ack_file_content,
+    delete_ack_file_parts,
+    list_ack_file_part_keys,
 )
 from tests.utils_for_ack_backend_tests.values_for_ack_backend_tests import (
     DiagnosticsDictionaries,
@@ -26,6 +28,7 @@ with patch.dict("os.environ", MOCK_ENVIRONMENT_DICT):
 
 s3_client = boto3_client("s3", region_name=REGION_NAME)
 firehose_client = boto3_client("firehose", region_name=REGION_NAME)
+dynamodb_client = boto3_client("dynamodb", region_name=REGION_NAME)
 
 BASE_SUCCESS_MESSAGE = MOCK_MESSAGE_DETAILS.success_message
 BASE_FAILURE_MESSAGE = {
@@ -36,24 +39,18 @@ BASE_FAILURE_MESSAGE = {
 
 @patch.dict(os.environ, MOCK_ENVIRONMENT_DICT)
 @mock_s3
+@mock_dynamodb
 @mock_firehose
 class TestAckProcessor(unittest.TestCase):
     """Tests for the ack processor lambda handler."""
 
     def setUp(self) -> None:
-        GenericSetUp(s3_client, firehose_client)
-
-        # MOCK SOURCE FILE WITH 100 ROWS TO SIMULATE THE SCENARIO WHERE THE ACK FILE IS NO FULL.
-        # TODO: Test all other scenarios.
-        mock_source_file_with_100_rows = StringIO("\n".join(f"Row {i}" for i in range(1, 101)))
-        s3_client.put_object(
-            Bucket=BucketNames.SOURCE,
-            Key=f"processing/{MOCK_MESSAGE_DETAILS.file_key}",
-            Body=mock_source_file_with_100_rows.getvalue(),
-        )
+        GenericSetUp(s3_client, firehose_client, dynamodb_client)
+        # The file, whose message id the lambda takes from the row id, has no expected row count yet, so is not complete
+        add_audit_table_entry(message_id=MOCK_MESSAGE_DETAILS.row_id.split("^")[0])
 
     def tearDown(self) -> None:
-        GenericTearDown(s3_client, firehose_client)
+        GenericTearDown(s3_client, firehose_client, dynamodb_client)
 
     @staticmethod
     def generate_event(test_messages: list[dict]) -> dict:
@@ -116,6 +113,25 @@ class TestAckProcessor(unittest.TestCase):
             existing_file_content=ValidValues.ack_headers,
         )
 
+    def test_lambda_handler_claim_check(self):
+        """Test lambda handler with a record holding a claim check for messages uploaded to S3 by the forwarder."""
+        array_of_success_messages = [
+            {**BASE_SUCCESS_MESSAGE, "row_id": f"row^{i}", "imms_id": f"imms_{i}", "local_id": f"local^{i}"}
+            for i in range(1, 4)
+        ]
+        claim_check = {"bucket": BucketNames.DESTINATION, "key": "forwarder_claim_checks/test/claim_check.json"}
+        s3_client.put_object(
+            Bucket=claim_check["bucket"], Key=claim_check["key"], Body=json.dumps(array_of_success_messages)
+        )
+        event = {"Records": [{"body": json.dumps({"claim_check": claim_check})}]}
+
+        response = lambda_handler(event=event, context={})
+
+        self.assertEqual(response, EXPECTED_ACK_LAMBDA_RESPONSE_FOR_SUCCESS)
+        validate_ack_file_content(array_of_success_messages, existing_file_content=ValidValues.ack_headers)
+        with self.assertRaises(s3_client.exceptions.NoSuchKey):
+            s3_client.get_object(Bucket=claim_check["bucket"], Key=claim_check["key"])
+
     def test_lambda_handler_main(self):
         """Test lambda handler with consitent ack_file_name and message_template."""
         test_cases = [
@@ -161,7 +177,7 @@ class TestAckProcessor(unittest.TestCase):
                 self.assertEqual(response, EXPECTED_ACK_LAMBDA_RESPONSE_FOR_SUCCESS)
                 validate_ack_file_content(test_case["messages"])
 
-                s3_client.delete_object(Bucket=BucketNames.DESTINATION, Key=MOCK_MESSAGE_DETAILS.temp_ack_file_key)
+                delete_ack_file_parts()
 
             # Test scenario where there is an existing ack file
             # TODO: None of the test cases have any existing ack file content?
@@ -170,9 +186,29 @@ class TestAckProcessor(unittest.TestCase):
                 setup_existing_ack_file(MOCK_MESSAGE_DETAILS.temp_ack_file_key, existing_ack_file_content)
                 response = lambda_handler(event=self.generate_event(test_case["messages"]), context={})
                 self.assertEqual(response, EXPECTED_ACK_LAMBDA_RESPONSE_FOR_SUCCESS)
-                validate_ack_file_content(test_case["messages"], existing_ack_file_content)
+                validate_ack_file_content(test_case["messages"], ValidValues.ack_headers + existing_ack_file_content)
 
-                s3_client.delete_object(Bucket=BucketNames.DESTINATION, Key=MOCK_MESSAGE_DETAILS.temp_ack_file_key)
+                delete_ack_file_parts()
+
+    def test_lambda_handler_part_number(self):
+        """Test that the ack file part is numbered by the sequence number of the first message in the event."""
+        messages = [{**BASE_SUCCESS_MESSAGE, "row_id": f"row^{i}"} for i in range(1, 3)]
+        event = {
+            "Records": [
+                {"body": json.dumps(messages[:1]), "attributes": {"SequenceNumber": "18849496460467696128"}},
+                {"body": json.dumps(messages[1:]), "attributes": {"SequenceNumber": "18849496460467696129"}},
+            ]
+        }
+
+        lambda_handler(event=event, context={})
+        # A retried event replaces the part which it wrote before
+        lambda_handler(event=event, context={})
+
+        self.assertEqual(
+            list_ack_file_part_keys(),
+            [f"{MOCK_MESSAGE_DETAILS.temp_ack_file_key}/{'18849496460467696128'.zfill(39)}.csv"],
+        )
+        validate_ack_file_content(messages)
 
     def test_lambda_handler_error_scenarios(self):
         """Test that the lambda handler raises appropriate exceptions for malformed event data."""
@@ -16,6 +16,7 @@ from tests.utils_for_ack_backend_tests.values_for_ack_backend_tests import (
 
 with patch.dict("os.environ", MOCK_ENVIRONMENT_DICT):
     from convert_message_to_ack_row import convert_message_to_ack_row, get_error_message_for_ack_file
+    from logging_decorators import firehose_logger
 
 s3_client = boto3_client("s3", region_name=REGION_NAME)
 firehose_client = boto3_client("firehose", region_name=REGION_NAME)
@@ -30,6 +31,8 @@ class TestAckProcessor(unittest.TestCase):
         GenericSetUp(s3_client, firehose_client)
 
     def tearDown(self) -> None:
+        # The logs are only sent at the end of the lambda handler, so are sent here while Firehose is mocked
+        firehose_logger.flush()
         GenericTearDown(s3_client, firehose_client)
 
     def test_get_error_message_for_ack_file(self):
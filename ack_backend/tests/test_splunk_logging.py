@@ -3,9 +3,8 @@
 import unittest
 from unittest.mock import patch, call
 import json
-from io import StringIO
 from contextlib import ExitStack
-from moto import mock_s3
+from moto import mock_s3, mock_dynamodb
 from boto3 import client as boto3_client
 
 from tests.utils_for_ack_backend_tests.values_for_ack_backend_tests import (
@@ -13,36 +12,33 @@ from tests.utils_for_ack_backend_tests.values_for_ack_backend_tests import (
     InvalidValues,
     DiagnosticsDictionaries,
     EXPECTED_ACK_LAMBDA_RESPONSE_FOR_SUCCESS,
+    MOCK_MESSAGE_DETAILS,
 )
-from tests.utils_for_ack_backend_tests.mock_environment_variables import MOCK_ENVIRONMENT_DICT, BucketNames
+from tests.utils_for_ack_backend_tests.mock_environment_variables import MOCK_ENVIRONMENT_DICT
 from tests.utils_for_ack_backend_tests.generic_setup_and_teardown_for_ack_backend import GenericSetUp, GenericTearDown
-from tests.utils_for_ack_backend_tests.utils_for_ack_backend_tests import generate_event
+from tests.utils_for_ack_backend_tests.utils_for_ack_backend_tests import generate_event, add_audit_table_entry
 
 with patch.dict("os.environ", MOCK_ENVIRONMENT_DICT):
     from ack_processor import lambda_handler
 
 s3_client = boto3_client("s3")
+dynamodb_client = boto3_client("dynamodb")
 
 
 @patch.dict("os.environ", MOCK_ENVIRONMENT_DICT)
 @mock_s3
+@mock_dynamodb
 class TestLoggingDecorators(unittest.TestCase):
     """Tests for the ack lambda logging decorators"""
 
     def setUp(self):
-        GenericSetUp(s3_client)
-
-        # MOCK SOURCE FILE WITH 100 ROWS TO SIMULATE THE SCENARIO WHERE THE ACK FILE IS NO FULL.
-        # TODO: Test all other scenarios.
-        mock_source_file_with_100_rows = StringIO("\n".join(f"Row {i}" for i in range(1, 101)))
-        s3_client.put_object(
-            Bucket=BucketNames.SOURCE,
-            Key=f"processing/{ValidValues.mock_message_expected_log_value.get('file_key')}",
-            Body=mock_source_file_with_100_rows.getvalue(),
-        )
+        GenericSetUp(s3_client, dynamodb_client=dynamodb_client)
+
+        # The file, whose message id the lambda takes from the row id, has no expected row count yet, so is not complete
+        add_audit_table_entry(message_id=MOCK_MESSAGE_DETAILS.row_id.split("^")[0])
 
     def tearDown(self):
-        GenericTearDown(s3_client)
+        GenericTearDown(s3_client, dynamodb_client=dynamodb_client)
 
     def run(self, result=None):
         """
@@ -58,6 +54,11 @@ class TestLoggingDecorators(unittest.TestCase):
             # The logging_decorator.logger is patched individually in each test to allow for assertions to be made.
             # Any uses of the logger in other files will confound the tests and should be patched here.
             patch("update_ack_file.logger"),
+            patch("audit_table.logger"),
+            # Renewing the queue lease gives the expiry time using time.time, so it is also patched here
+            patch("update_ack_file.renew_queue_lease"),
+            # Recording the processed rows gives their expiry time using time.time, so it is also patched here
+            patch("audit_table.time", **{"time.return_value": 0.0}),
             # Time is incremented by 1.0 for each call to time.time for ease of testing.
             # Range is set to a large number (100) due to many calls being made to time.time for some tests.
             patch("logging_decorators.time.time", side_effect=[0.0 + i for i in range(100)]),
@@ -125,6 +126,87 @@ class TestLoggingDecorators(unittest.TestCase):
                 [call(expected_first_logger_info_data), call(expected_second_logger_info_data)]
             )
 
+    def test_splunk_logging_sent_in_one_batch(self):
+        """Tests that the logs for every row, and for the lambda handler, are sent to Firehose in a single batch"""
+        with (
+            patch("logging_decorators.firehose_logger.firehose_client") as mock_firehose_client,
+            patch("logging_decorators.logger"),
+        ):
+            mock_firehose_client.put_record_batch.return_value = {"FailedPutCount": 0}
+            lambda_handler(event=generate_event([{"row_id": f"row^{i}"} for i in range(1, 4)]), context={})
+
+        mock_firehose_client.put_record_batch.assert_called_once()
+        sent_logs = [
+            json.loads(record["Data"])["event"]
+            for record in mock_firehose_client.put_record_batch.call_args.kwargs["Records"]
+        ]
+        self.assertEqual(
+            [log["function_name"] for log in sent_logs],
+            ["ack_processor_convert_message_to_ack_row"] * 3 + ["ack_processor_lambda_handler"],
+        )
+
+    @patch("logging_decorators.ACK_ROW_LOGGING_MODE", "aggregate")
+    def test_splunk_logging_aggregate_mode(self):
+        """Tests that in the aggregate mode only the failed rows are logged in full, along with a summary of the rows"""
+        messages = [
+            {"row_id": "test1"},
+            {"row_id": "test2", "diagnostics": DiagnosticsDictionaries.RESOURCE_FOUND_ERROR},
+            {"row_id": "test3"},
+        ]
+
+        with (
+            patch("logging_decorators.send_log_to_firehose") as mock_send_log_to_firehose,
+            patch("logging_decorators.logger"),
+        ):
+            result = lambda_handler(generate_event(messages), context={})
+
+        self.assertEqual(result, EXPECTED_ACK_LAMBDA_RESPONSE_FOR_SUCCESS)
+
+        sent_logs = [args[0] for args, _ in mock_send_log_to_firehose.call_args_list]
+        self.assertEqual(
+            [log["function_name"] for log in sent_logs],
+            [
+                "ack_processor_convert_message_to_ack_row",
+                "ack_processor_convert_message_to_ack_row_summary",
+                "ack_processor_lambda_handler",
+            ],
+        )
+        self.assertEqual(sent_logs[0]["message_id"], "test2")
+        self.assertEqual(
+            sent_logs[1],
+            {
+                "function_name": "ack_processor_convert_message_to_ack_row_summary",
+                "date_time": ValidValues.fixed_datetime.strftime("%Y-%m-%d %H:%M:%S"),
+                "file_key": MOCK_MESSAGE_DETAILS.file_key,
+                "vaccine_type": MOCK_MESSAGE_DETAILS.vaccine_type,
+                "supplier": MOCK_MESSAGE_DETAILS.supplier,
+                "row_count": 3,
+                "success_count": 2,
+                "failure_count": 1,
+                "status_codes": {"200": 2, "409": 1},
+                "error_types": {"ResourceFoundError": 1},
+                "failures": [{"message_id": "test2", "statusCode": 409}],
+                # Mocking of timings is such that each row takes 1 second to be counted
+                "time_taken": "3.0s",
+                "max_time_taken": "1.0s",
+            },
+        )
+
+    @patch("logging_decorators.ACK_ROW_LOGGING_MODE", "aggregate")
+    @patch("logging_decorators.ACK_ROW_LOG_SAMPLE_RATE", 1)
+    def test_splunk_logging_aggregate_mode_sampled(self):
+        """Tests that in the aggregate mode the sampled successful rows are logged in full"""
+        with (
+            patch("logging_decorators.send_log_to_firehose") as mock_send_log_to_firehose,
+            patch("logging_decorators.logger"),
+        ):
+            lambda_handler(generate_event([{"row_id": "test1"}, {"row_id": "test2"}]), context={})
+
+        sent_logs = [args[0] for args, _ in mock_send_log_to_firehose.call_args_list]
+        self.assertEqual([log.get("message_id") for log in sent_logs[:2]], ["test1", "test2"])
+        self.assertEqual(sent_logs[2]["row_count"], 2)
+        self.assertEqual(sent_logs[3]["function_name"], "ack_processor_lambda_handler")
+
     def test_splunk_logging_missing_data(self):
         """Tests missing key values in the body of the event"""
 
@@ -3,48 +3,62 @@
 import unittest
 import os
 from unittest.mock import patch
-from io import StringIO
 from boto3 import client as boto3_client
-from moto import mock_s3
+from botocore.config import Config
+from moto import mock_s3, mock_dynamodb
 
 from tests.utils_for_ack_backend_tests.values_for_ack_backend_tests import ValidValues, DefaultValues
 from tests.utils_for_ack_backend_tests.mock_environment_variables import MOCK_ENVIRONMENT_DICT, BucketNames, REGION_NAME
 from tests.utils_for_ack_backend_tests.generic_setup_and_teardown_for_ack_backend import GenericSetUp, GenericTearDown
 from tests.utils_for_ack_backend_tests.utils_for_ack_backend_tests import (
     setup_existing_ack_file,
+    add_audit_table_entry,
     obtain_current_ack_file_content,
+    list_ack_file_part_keys,
+    delete_ack_file_parts,
     generate_expected_ack_file_row,
     generate_sample_existing_ack_content,
     generate_expected_ack_content,
+    get_processed_row_numbers,
     MOCK_MESSAGE_DETAILS,
 )
 
 with patch.dict("os.environ", MOCK_ENVIRONMENT_DICT):
-    from update_ack_file import obtain_current_ack_content, create_ack_data, update_ack_file
+    from update_ack_file import create_ack_data, update_ack_file, compose_ack_file
+    from constants import AUDIT_TABLE_NAME, AuditTableKeys, FileStatus
+    from audit_table import get_processed_rows_chunk_key
 
 s3_client = boto3_client("s3", region_name=REGION_NAME)
 firehose_client = boto3_client("firehose", region_name=REGION_NAME)
+dynamodb_client = boto3_client("dynamodb", region_name=REGION_NAME)
+# moto does not decode the aws-chunked bodies which botocore sends for large uploads by default
+unchunked_s3_client = boto3_client(
+    "s3", region_name=REGION_NAME, config=Config(request_checksum_calculation="when_required")
+)
+
+
+def make_ack_data_rows(*row_numbers: int) -> list[dict]:
+    """Returns a successful ack data row for each of the given rows of the file"""
+    return [
+        {**ValidValues.ack_data_success_dict, "MESSAGE_HEADER_ID": f"test_file_id^{row_number}"}
+        for row_number in row_numbers
+    ]
 
 
+@patch.dict("audit_table.expected_row_counts_by_message_id", clear=True)
 @patch.dict(os.environ, MOCK_ENVIRONMENT_DICT)
 @mock_s3
+@mock_dynamodb
 class TestUpdateAckFile(unittest.TestCase):
     """Tests for the functions in the update_ack_file module."""
 
     def setUp(self) -> None:
-        GenericSetUp(s3_client)
-
-        # MOCK SOURCE FILE WITH 100 ROWS TO SIMULATE THE SCENARIO WHERE THE ACK FILE IS NOT FULL.
-        # TODO: Test all other scenarios.
-        mock_source_file_with_100_rows = StringIO("\n".join(f"Row {i}" for i in range(1, 101)))
-        s3_client.put_object(
-            Bucket=BucketNames.SOURCE,
-            Key=f"processing/{MOCK_MESSAGE_DETAILS.file_key}",
-            Body=mock_source_file_with_100_rows.getvalue(),
-        )
+        GenericSetUp(s3_client, dynamodb_client=dynamodb_client)
+        # The file has no expected row count yet, so is not complete
+        add_audit_table_entry()
 
     def tearDown(self) -> None:
-        GenericTearDown(s3_client)
+        GenericTearDown(s3_client, dynamodb_client=dynamodb_client)
 
     def validate_ack_file_content(
         self, incoming_messages: list[dict], existing_file_content: str = ValidValues.ack_headers
@@ -112,7 +126,7 @@ class TestUpdateAckFile(unittest.TestCase):
                 expected_ack_file_content = ValidValues.ack_headers + "\n".join(test_case["expected_rows"]) + "\n"
                 self.assertEqual(expected_ack_file_content, actual_ack_file_content)
 
-                s3_client.delete_object(Bucket=BucketNames.DESTINATION, Key=MOCK_MESSAGE_DETAILS.temp_ack_file_key)
+                delete_ack_file_parts()
 
     def test_update_ack_file_existing(self):
         """Test that update_ack_file correctly updates the ack file when there was an existing ack file"""
@@ -191,17 +205,270 @@ class TestUpdateAckFile(unittest.TestCase):
                 )
                 self.assertEqual(result, test_case["expected_result"])
 
-    def test_obtain_current_ack_content_file_no_existing(self):
-        """Test that when the ack file does not yet exist, obtain_current_ack_content returns the ack headers only."""
-        result = obtain_current_ack_content(MOCK_MESSAGE_DETAILS.temp_ack_file_key)
-        self.assertEqual(result.getvalue(), ValidValues.ack_headers)
+    def get_audit_table_entry(self) -> dict:
+        """Returns the audit table entry for the file"""
+        return dynamodb_client.get_item(
+            TableName=AUDIT_TABLE_NAME, Key={AuditTableKeys.MESSAGE_ID: {"S": MOCK_MESSAGE_DETAILS.message_id}}
+        )["Item"]
 
-    def test_obtain_current_ack_content_file_exists(self):
-        """Test that the existing ack file content is retrieved and new rows are added."""
-        existing_content = generate_sample_existing_ack_content()
+    def test_update_ack_file_parts(self):
+        """
+        Test that each update adds a part to the ack file, numbered by the given part number, and records its rows as
+        processed in the audit table
+        """
+        # SQS FIFO sequence numbers may have more than 20 digits
+        long_part_number = "1" + "0" * 25
+        for part_number, ack_data_rows in [
+            ("2", make_ack_data_rows(1)),
+            ("10", make_ack_data_rows(2, 3)),
+            (long_part_number, make_ack_data_rows(4)),
+        ]:
+            update_ack_file(
+                file_key=MOCK_MESSAGE_DETAILS.file_key,
+                message_id=MOCK_MESSAGE_DETAILS.message_id,
+                supplier_queue=MOCK_MESSAGE_DETAILS.queue_name,
+                created_at_formatted_string=MOCK_MESSAGE_DETAILS.created_at_formatted_string,
+                ack_data_rows=ack_data_rows,
+                part_number=part_number,
+            )
+
+        temp_ack_file_key = MOCK_MESSAGE_DETAILS.temp_ack_file_key
+        self.assertEqual(
+            list_ack_file_part_keys(),
+            [
+                f"{temp_ack_file_key}/{'2'.zfill(39)}.csv",
+                f"{temp_ack_file_key}/{'10'.zfill(39)}.csv",
+                f"{temp_ack_file_key}/{long_part_number.zfill(39)}.csv",
+            ],
+        )
+        self.assertEqual(get_processed_row_numbers(), {1, 2, 3, 4})
+
+    @patch.dict("audit_table.shard_start_rows_by_message_id", clear=True)
+    def test_update_ack_file_shards(self):
+        """
+        Test that the rows of a file which was split into shards are written to parts for their shards, so that the ack
+        file has the rows in the order of the source file
+        """
+        dynamodb_client.update_item(
+            TableName=AUDIT_TABLE_NAME,
+            Key={AuditTableKeys.MESSAGE_ID: {"S": MOCK_MESSAGE_DETAILS.message_id}},
+            UpdateExpression="SET #shard_start_rows = :shard_start_rows",
+            ExpressionAttributeNames={"#shard_start_rows": AuditTableKeys.SHARD_START_ROWS},
+            ExpressionAttributeValues={":shard_start_rows": {"L": [{"N": "0"}, {"N": "2"}]}},
+        )
+        rows = {
+            row_number: {**ValidValues.ack_data_success_dict, "MESSAGE_HEADER_ID": f"test_file_id^{row_number}"}
+            for row_number in range(1, 5)
+        }
+
+        # The shards are processed in parallel, so each message has rows from both shards
+        for part_number, ack_data_rows in [("1", [rows[1], rows[3]]), ("2", [rows[4], rows[2]])]:
+            update_ack_file(
+                file_key=MOCK_MESSAGE_DETAILS.file_key,
+                message_id=MOCK_MESSAGE_DETAILS.message_id,
+                supplier_queue=MOCK_MESSAGE_DETAILS.queue_name,
+                created_at_formatted_string=MOCK_MESSAGE_DETAILS.created_at_formatted_string,
+                ack_data_rows=ack_data_rows,
+                part_number=part_number,
+            )
+
+        temp_ack_file_key = MOCK_MESSAGE_DETAILS.temp_ack_file_key
+        self.assertEqual(
+            list_ack_file_part_keys(),
+            [
+                f"{temp_ack_file_key}/shard_00000/{'1'.zfill(39)}.csv",
+                f"{temp_ack_file_key}/shard_00000/{'2'.zfill(39)}.csv",
+                f"{temp_ack_file_key}/shard_00001/{'1'.zfill(39)}.csv",
+                f"{temp_ack_file_key}/shard_00001/{'2'.zfill(39)}.csv",
+            ],
+        )
+        row_ids = [row.split("|")[0] for row in obtain_current_ack_file_content().splitlines()[1:]]
+        self.assertEqual(row_ids, [f"test_file_id^{row_number}" for row_number in range(1, 5)])
+        self.assertEqual(get_processed_row_numbers(), {1, 2, 3, 4})
+
+    def test_update_ack_file_incomplete(self):
+        """Test that the ack file is not composed until all of the rows of the file have been processed"""
+        add_audit_table_entry(expected_row_count=4, processed_row_numbers=[1])
+
+        update_ack_file(
+            file_key=MOCK_MESSAGE_DETAILS.file_key,
+            message_id=MOCK_MESSAGE_DETAILS.message_id,
+            supplier_queue=MOCK_MESSAGE_DETAILS.queue_name,
+            created_at_formatted_string=MOCK_MESSAGE_DETAILS.created_at_formatted_string,
+            ack_data_rows=make_ack_data_rows(2, 3),
+        )
+
+        self.assertEqual(len(list_ack_file_part_keys()), 1)
+        self.assertNotIn("Contents", s3_client.list_objects_v2(Bucket=BucketNames.DESTINATION, Prefix="forwardedFile/"))
+        self.assertEqual(get_processed_row_numbers(), {1, 2, 3})
+        self.assertEqual(self.get_audit_table_entry()[AuditTableKeys.STATUS], {"S": FileStatus.PROCESSING})
+
+    def test_update_ack_file_complete(self):
+        """Test that the ack file is composed from its parts, and the source file archived, once it is complete"""
+        s3_client.put_object(
+            Bucket=BucketNames.SOURCE,
+            Key=f"processing/{MOCK_MESSAGE_DETAILS.file_key}",
+            Body="HEADERS\nRow 1\nRow 2\nRow 3",
+        )
+        existing_content = generate_sample_existing_ack_content() + "\n"
         setup_existing_ack_file(MOCK_MESSAGE_DETAILS.temp_ack_file_key, existing_content)
-        result = obtain_current_ack_content(MOCK_MESSAGE_DETAILS.temp_ack_file_key)
-        self.assertEqual(result.getvalue(), existing_content)
+        add_audit_table_entry(expected_row_count=3, processed_row_numbers=[1])
+
+        ack_data_rows = [
+            {**ValidValues.ack_data_success_dict, "MESSAGE_HEADER_ID": "test_file_id^2"},
+            {**ValidValues.ack_data_failure_dict, "MESSAGE_HEADER_ID": "test_file_id^3"},
+        ]
+        update_ack_file(
+            file_key=MOCK_MESSAGE_DETAILS.file_key,
+            message_id=MOCK_MESSAGE_DETAILS.message_id,
+            supplier_queue=MOCK_MESSAGE_DETAILS.queue_name,
+            created_at_formatted_string=MOCK_MESSAGE_DETAILS.created_at_formatted_string,
+            ack_data_rows=ack_data_rows,
+        )
+
+        archived_ack_file = s3_client.get_object(
+            Bucket=BucketNames.DESTINATION, Key=MOCK_MESSAGE_DETAILS.archive_ack_file_key
+        )
+        expected_rows = [
+            generate_expected_ack_file_row(success=True, imms_id=DefaultValues.imms_id, row_id="test_file_id^2"),
+            generate_expected_ack_file_row(
+                success=False, imms_id="", diagnostics="DIAGNOSTICS", row_id="test_file_id^3"
+            ),
+        ]
+        self.assertEqual(
+            archived_ack_file["Body"].read().decode("utf-8"), existing_content + "\n".join(expected_rows) + "\n"
+        )
+        self.assertEqual(list_ack_file_part_keys(), [])
+        s3_client.head_object(Bucket=BucketNames.SOURCE, Key=f"archive/{MOCK_MESSAGE_DETAILS.file_key}")
+        audit_table_entry = self.get_audit_table_entry()
+        self.assertEqual(audit_table_entry[AuditTableKeys.STATUS], {"S": FileStatus.PROCESSED})
+        self.assertEqual(
+            audit_table_entry[AuditTableKeys.STATUS_TIMESTAMP],
+            {"S": f"{FileStatus.PROCESSED}#{MOCK_MESSAGE_DETAILS.created_at_formatted_string}"},
+        )
+
+    def test_update_ack_file_already_processed(self):
+        """Test that rows received for a file which has already been processed don't complete it again"""
+        add_audit_table_entry(expected_row_count=1, processed_row_numbers=[1])
+        dynamodb_client.update_item(
+            TableName=AUDIT_TABLE_NAME,
+            Key={AuditTableKeys.MESSAGE_ID: {"S": MOCK_MESSAGE_DETAILS.message_id}},
+            UpdateExpression="SET #status = :status",
+            ExpressionAttributeNames={"#status": AuditTableKeys.STATUS},
+            ExpressionAttributeValues={":status": {"S": FileStatus.PROCESSED}},
+        )
+
+        update_ack_file(
+            file_key=MOCK_MESSAGE_DETAILS.file_key,
+            message_id=MOCK_MESSAGE_DETAILS.message_id,
+            supplier_queue=MOCK_MESSAGE_DETAILS.queue_name,
+            created_at_formatted_string=MOCK_MESSAGE_DETAILS.created_at_formatted_string,
+            ack_data_rows=make_ack_data_rows(1),
+        )
+
+        self.assertNotIn(AuditTableKeys.PROCESSED_ROW_CHUNKS, self.get_audit_table_entry())
+        self.assertNotIn("Contents", s3_client.list_objects_v2(Bucket=BucketNames.DESTINATION, Prefix="forwardedFile/"))
+
+    def test_update_ack_file_row_without_row_number(self):
+        """
+        Test that a file is failed if one of its rows has no row number, as it could never be counted, so that the
+        file doesn't stay processing. The ack file is composed from the rows received so far.
+        """
+        s3_client.put_object(Bucket=BucketNames.SOURCE, Key=f"processing/{MOCK_MESSAGE_DETAILS.file_key}", Body="")
+        add_audit_table_entry(expected_row_count=3)
+
+        update_ack_file(
+            file_key=MOCK_MESSAGE_DETAILS.file_key,
+            message_id=MOCK_MESSAGE_DETAILS.message_id,
+            supplier_queue=MOCK_MESSAGE_DETAILS.queue_name,
+            created_at_formatted_string=MOCK_MESSAGE_DETAILS.created_at_formatted_string,
+            ack_data_rows=[*make_ack_data_rows(1), {**ValidValues.ack_data_success_dict, "MESSAGE_HEADER_ID": None}],
+        )
+
+        archived_ack_file = s3_client.get_object(
+            Bucket=BucketNames.DESTINATION, Key=MOCK_MESSAGE_DETAILS.archive_ack_file_key
+        )
+        self.assertEqual(len(archived_ack_file["Body"].read().decode("utf-8").splitlines()), 3)
+        s3_client.head_object(Bucket=BucketNames.SOURCE, Key=f"archive/{MOCK_MESSAGE_DETAILS.file_key}")
+        self.assertEqual(self.get_audit_table_entry()[AuditTableKeys.STATUS], {"S": FileStatus.PROCESSED})
+
+    def test_update_ack_file_rows_received_again(self):
+        """
+        Test that rows which are received again, as a message was redelivered or the rows were sent again when the file
+        was resumed from a checkpoint, are only counted once, so the file isn't completed before all of its rows are
+        """
+        add_audit_table_entry(expected_row_count=3)
+
+        for part_number, row_numbers in [("1", [1, 2]), ("1", [1, 2]), ("2", [2])]:
+            update_ack_file(
+                file_key=MOCK_MESSAGE_DETAILS.file_key,
+                message_id=MOCK_MESSAGE_DETAILS.message_id,
+                supplier_queue=MOCK_MESSAGE_DETAILS.queue_name,
+                created_at_formatted_string=MOCK_MESSAGE_DETAILS.created_at_formatted_string,
+                ack_data_rows=make_ack_data_rows(*row_numbers),
+                part_number=part_number,
+            )
+
+        self.assertEqual(get_processed_row_numbers(), {1, 2})
+        self.assertEqual(self.get_audit_table_entry()[AuditTableKeys.STATUS], {"S": FileStatus.PROCESSING})
+        self.assertNotIn("Contents", s3_client.list_objects_v2(Bucket=BucketNames.DESTINATION, Prefix="forwardedFile/"))
+
+    @patch("audit_table.PROCESSED_ROWS_CHUNK_SIZE", 2)
+    def test_update_ack_file_chunks(self):
+        """
+        Test that the processed rows are recorded in chunks of the file, and that each chunk is recorded as processed
+        once all of its rows are, so that the file is complete once all of its chunks are
+        """
+        s3_client.put_object(Bucket=BucketNames.SOURCE, Key=f"processing/{MOCK_MESSAGE_DETAILS.file_key}", Body="")
+        add_audit_table_entry(expected_row_count=5)
+
+        for part_number, row_numbers in [("1", [1, 5]), ("2", [2, 3]), ("3", [4])]:
+            update_ack_file(
+                file_key=MOCK_MESSAGE_DETAILS.file_key,
+                message_id=MOCK_MESSAGE_DETAILS.message_id,
+                supplier_queue=MOCK_MESSAGE_DETAILS.queue_name,
+                created_at_formatted_string=MOCK_MESSAGE_DETAILS.created_at_formatted_string,
+                ack_data_rows=make_ack_data_rows(*row_numbers),
+                part_number=part_number,
+            )
+            if part_number == "2":
+                # The first and last chunks are complete, but the second isn't
+                audit_table_entry = self.get_audit_table_entry()
+                self.assertEqual(sorted(audit_table_entry[AuditTableKeys.PROCESSED_ROW_CHUNKS]["NS"]), ["0", "2"])
+                self.assertEqual(audit_table_entry[AuditTableKeys.STATUS], {"S": FileStatus.PROCESSING})
+
+        self.assertEqual([get_processed_row_numbers(chunk_index=index) for index in range(3)], [{1, 2}, {3, 4}, {5}])
+        self.assertIn(
+            AuditTableKeys.EXPIRES_AT,
+            dynamodb_client.get_item(
+                TableName=AUDIT_TABLE_NAME, Key=get_processed_rows_chunk_key(MOCK_MESSAGE_DETAILS.message_id, 0)
+            )["Item"],
+        )
+        self.assertEqual(self.get_audit_table_entry()[AuditTableKeys.STATUS], {"S": FileStatus.PROCESSED})
+
+    @patch("update_ack_file.MULTIPART_UPLOAD_PART_SIZE", 5 * 1024 * 1024)
+    @patch("update_ack_file.s3_client", unchunked_s3_client)
+    def test_compose_ack_file_multipart(self):
+        """Test that an ack file with more than one upload part's worth of content is uploaded in parts"""
+        s3_client = unchunked_s3_client
+        part_keys = []
+        for i in range(3):
+            part_key = f"{MOCK_MESSAGE_DETAILS.temp_ack_file_key}/{i}.csv"
+            s3_client.put_object(Bucket=BucketNames.DESTINATION, Key=part_key, Body=f"{i}".encode() * 3 * 1024 * 1024)
+            part_keys.append(part_key)
+
+        compose_ack_file(part_keys, MOCK_MESSAGE_DETAILS.archive_ack_file_key)
+
+        archived_ack_file = s3_client.get_object(
+            Bucket=BucketNames.DESTINATION, Key=MOCK_MESSAGE_DETAILS.archive_ack_file_key
+        )
+        # The ETag of an object uploaded in parts ends with the number of parts
+        self.assertTrue(archived_ack_file["ETag"].strip('"').endswith("-2"))
+        self.assertEqual(
+            archived_ack_file["Body"].read(),
+            ValidValues.ack_headers.encode() + b"".join(f"{i}".encode() * 3 * 1024 * 1024 for i in range(3)),
+        )
+        self.assertEqual(list_ack_file_part_keys(), [])
 
 
 if __name__ == "__main__":
@@ -1,6 +1,16 @@
 """Generic setup and teardown for ACK backend tests"""
 
-from tests.utils_for_ack_backend_tests.mock_environment_variables import BucketNames, Firehose, REGION_NAME
+from unittest.mock import patch
+from tests.utils_for_ack_backend_tests.mock_environment_variables import (
+    BucketNames,
+    Firehose,
+    REGION_NAME,
+    MOCK_ENVIRONMENT_DICT,
+)
+
+# Ensure environment variables are mocked before importing from src files
+with patch.dict("os.environ", MOCK_ENVIRONMENT_DICT):
+    from constants import AuditTableKeys, AUDIT_TABLE_QUEUE_NAME_GSI, AUDIT_TABLE_NAME
 
 
 class GenericSetUp:
@@ -9,9 +19,10 @@ class GenericSetUp:
     * If s3_client is provided, creates source, destination and firehose buckets (firehose bucket is used for testing
         only)
     * If firehose_client is provided, creates a firehose delivery stream
+    * If dynamodb_client is provided, creates the audit table
     """
 
-    def __init__(self, s3_client=None, firehose_client=None):
+    def __init__(self, s3_client=None, firehose_client=None, dynamodb_client=None):
 
         if s3_client:
             for bucket_name in [BucketNames.SOURCE, BucketNames.DESTINATION, BucketNames.MOCK_FIREHOSE]:
@@ -30,11 +41,34 @@ class GenericSetUp:
                 },
             )
 
+        if dynamodb_client:
+            dynamodb_client.create_table(
+                TableName=AUDIT_TABLE_NAME,
+                KeySchema=[{"AttributeName": AuditTableKeys.MESSAGE_ID, "KeyType": "HASH"}],
+                AttributeDefinitions=[
+                    {"AttributeName": AuditTableKeys.MESSAGE_ID, "AttributeType": "S"},
+                    {"AttributeName": AuditTableKeys.QUEUE_NAME, "AttributeType": "S"},
+                    {"AttributeName": AuditTableKeys.STATUS_TIMESTAMP, "AttributeType": "S"},
+                ],
+                ProvisionedThroughput={"ReadCapacityUnits": 5, "WriteCapacityUnits": 5},
+                GlobalSecondaryIndexes=[
+                    {
+                        "IndexName": AUDIT_TABLE_QUEUE_NAME_GSI,
+                        "KeySchema": [
+                            {"AttributeName": AuditTableKeys.QUEUE_NAME, "KeyType": "HASH"},
+                            {"AttributeName": AuditTableKeys.STATUS_TIMESTAMP, "KeyType": "RANGE"},
+                        ],
+                        "Projection": {"ProjectionType": "ALL"},
+                        "ProvisionedThroughput": {"ReadCapacityUnits": 5, "WriteCapacityUnits": 5},
+                    },
+                ],
+            )
+
 
 class GenericTearDown:
     """Performs generic tear down of mock resources"""
 
-    def __init__(self, s3_client=None, firehose_client=None):
+    def __init__(self, s3_client=None, firehose_client=None, dynamodb_client=None):
 
         if s3_client:
             for bucket_name in [BucketNames.SOURCE, BucketNames.DESTINATION, BucketNames.MOCK_FIREHOSE]:
@@ -44,3 +78,6 @@ class GenericTearDown:
 
         if firehose_client:
             firehose_client.delete_delivery_stream(DeliveryStreamName=Firehose.STREAM_NAME)
+
+        if dynamodb_client:
+            dynamodb_client.delete_table(TableName=AUDIT_TABLE_NAME)
@@ -1,12 +1,21 @@
 """Utils functions for the ack backend tests"""
 
 import json
+from unittest.mock import patch
 from boto3 import client as boto3_client
 from tests.utils_for_ack_backend_tests.values_for_ack_backend_tests import ValidValues, MOCK_MESSAGE_DETAILS
-from tests.utils_for_ack_backend_tests.mock_environment_variables import REGION_NAME, BucketNames
+from tests.utils_for_ack_backend_tests.mock_environment_variables import (
+    REGION_NAME,
+    BucketNames,
+    MOCK_ENVIRONMENT_DICT,
+)
+
+with patch.dict("os.environ", MOCK_ENVIRONMENT_DICT):
+    from constants import AUDIT_TABLE_NAME, AuditTableKeys, FileStatus
 
 s3_client = boto3_client("s3", region_name=REGION_NAME)
 firehose_client = boto3_client("firehose", region_name=REGION_NAME)
+dynamodb_client = boto3_client("dynamodb", region_name=REGION_NAME)
 
 
 def generate_event(test_messages: list[dict]) -> dict:
@@ -26,14 +35,69 @@ def generate_event(test_messages: list[dict]) -> dict:
 
 
 def setup_existing_ack_file(file_key, file_content):
-    """Uploads an existing file with the given content."""
-    s3_client.put_object(Bucket=BucketNames.DESTINATION, Key=file_key, Body=file_content)
+    """Uploads the given content, excluding the ack headers, as the first part of an existing ack file."""
+    rows_content = file_content.removeprefix(ValidValues.ack_headers)
+    s3_client.put_object(Bucket=BucketNames.DESTINATION, Key=f"{file_key}/{'0' * 39}.csv", Body=rows_content)
+
+
+def add_audit_table_entry(
+    message_id: str = MOCK_MESSAGE_DETAILS.message_id,
+    expected_row_count: int = None,
+    processed_row_numbers: list[int] = None,
+) -> None:
+    """
+    Adds an audit table entry for a file which is being processed, with the given expected row count, and records the
+    given rows (which must be in the first chunk of rows) as processed.
+    """
+    item = {
+        AuditTableKeys.MESSAGE_ID: {"S": message_id},
+        AuditTableKeys.FILENAME: {"S": MOCK_MESSAGE_DETAILS.file_key},
+        AuditTableKeys.QUEUE_NAME: {"S": MOCK_MESSAGE_DETAILS.queue_name},
+        AuditTableKeys.STATUS: {"S": FileStatus.PROCESSING},
+        AuditTableKeys.STATUS_TIMESTAMP: {
+            "S": f"{FileStatus.PROCESSING}#{MOCK_MESSAGE_DETAILS.created_at_formatted_string}"
+        },
+    }
+    if expected_row_count is not None:
+        item[AuditTableKeys.EXPECTED_ROW_COUNT] = {"N": str(expected_row_count)}
+    dynamodb_client.put_item(TableName=AUDIT_TABLE_NAME, Item=item)
+
+    if processed_row_numbers:
+        dynamodb_client.put_item(
+            TableName=AUDIT_TABLE_NAME,
+            Item={
+                AuditTableKeys.MESSAGE_ID: {"S": f"processed_rows#{message_id}#0"},
+                AuditTableKeys.PROCESSED_ROWS: {"NS": [str(row_number) for row_number in processed_row_numbers]},
+            },
+        )
+
+
+def get_processed_row_numbers(message_id: str = MOCK_MESSAGE_DETAILS.message_id, chunk_index: int = 0) -> set[int]:
+    """Returns the numbers of the rows of the chunk of the file which have been recorded as processed."""
+    chunk_item = dynamodb_client.get_item(
+        TableName=AUDIT_TABLE_NAME, Key={AuditTableKeys.MESSAGE_ID: {"S": f"processed_rows#{message_id}#{chunk_index}"}}
+    ).get("Item", {})
+    return {int(row_number) for row_number in chunk_item.get(AuditTableKeys.PROCESSED_ROWS, {}).get("NS", [])}
+
+
+def list_ack_file_part_keys(temp_ack_file_key: str = MOCK_MESSAGE_DETAILS.temp_ack_file_key) -> list[str]:
+    """Returns the keys of the parts of the ack file in the destination bucket, in order."""
+    response = s3_client.list_objects_v2(Bucket=BucketNames.DESTINATION, Prefix=f"{temp_ack_file_key}/")
+    return [obj["Key"] for obj in response.get("Contents", [])]
 
 
 def obtain_current_ack_file_content(temp_ack_file_key: str = MOCK_MESSAGE_DETAILS.temp_ack_file_key) -> str:
-    """Obtains the ack file content from the destination bucket."""
-    retrieved_object = s3_client.get_object(Bucket=BucketNames.DESTINATION, Key=temp_ack_file_key)
-    return retrieved_object["Body"].read().decode("utf-8")
+    """Obtains the ack file content, as it will be once composed, from the parts in the destination bucket."""
+    content = ValidValues.ack_headers
+    for part_key in list_ack_file_part_keys(temp_ack_file_key):
+        content += s3_client.get_object(Bucket=BucketNames.DESTINATION, Key=part_key)["Body"].read().decode("utf-8")
+    return content
+
+
+def delete_ack_file_parts(temp_ack_file_key: str = MOCK_MESSAGE_DETAILS.temp_ack_file_key) -> None:
+    """Deletes the parts of the ack file from the destination bucket."""
+    for part_key in list_ack_file_part_keys(temp_ack_file_key):
+        s3_client.delete_object(Bucket=BucketNames.DESTINATION, Key=part_key)
 
 
 def generate_expected_ack_file_row(
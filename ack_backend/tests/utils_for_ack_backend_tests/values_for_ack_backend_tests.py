@@ -8,7 +8,7 @@ class DefaultValues:
     """Class to hold default values for tests"""
 
     message_id = "test_file_id"
-    row_id = "test_file_id#1"
+    row_id = "test_file_id^1"
     local_id = "test_system_uri^testabc"
     imms_id = "test_imms_id"
     operation_requested = "CREATE"
@@ -0,0 +1,46 @@
+"""Writes the identifier sentinel for each Immunization which was created before identifier sentinels existed"""
+
+import argparse
+import logging
+
+import botocore.exceptions
+from boto3.dynamodb.conditions import Attr
+
+from fhir_repository import create_table, _make_identifier_pk
+
+logging.basicConfig(level="INFO")
+logger = logging.getLogger()
+
+
+def backfill_identifier_sentinels(table) -> int:
+    """
+    Scans the table for Immunizations and reserves each one's identifier, unless it is already reserved.
+    Returns the number of sentinels written. This is safe to re-run.
+    """
+    sentinels_written = 0
+    scan_kwargs = {"FilterExpression": Attr("IdentifierPK").exists(), "ProjectionExpression": "PK, IdentifierPK"}
+    while True:
+        response = table.scan(**scan_kwargs)
+        for item in response["Items"]:
+            try:
+                table.put_item(
+                    Item={"PK": _make_identifier_pk(item["IdentifierPK"]), "ImmunizationPK": item["PK"]},
+                    ConditionExpression=Attr("PK").not_exists(),
+                )
+                sentinels_written += 1
+            except botocore.exceptions.ClientError as error:
+                if error.response["Error"]["Code"] != "ConditionalCheckFailedException":
+                    raise
+
+        if "LastEvaluatedKey" not in response:
+            return sentinels_written
+        scan_kwargs["ExclusiveStartKey"] = response["LastEvaluatedKey"]
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser("backfill_identifier_sentinels")
+    parser.add_argument("table_name", help="Name of the Immunization events table.", type=str)
+    args = parser.parse_args()
+
+    count = backfill_identifier_sentinels(create_table(table_name=args.table_name))
+    logger.info("Wrote %d identifier sentinels", count)
@@ -5,6 +5,9 @@ import os
 import logging
 import redis
 
+from models.constants import Constants
+from redis_read_cache import RedisReadCache
+
 REGION_NAME = os.getenv("AWS_REGION", "eu-west-2")
 
 s3_client = boto3_client("s3", region_name=REGION_NAME)
@@ -15,10 +18,20 @@ sqs_client = boto3_client("sqs", region_name=REGION_NAME)
 
 REDIS_HOST = os.getenv("REDIS_HOST", "")
 REDIS_PORT = int(os.getenv("REDIS_PORT", 6379))
+REDIS_CACHE_TTL_SECONDS = float(os.getenv("REDIS_CACHE_TTL_SECONDS", 300))
+REDIS_CACHE_MAX_ENTRIES = int(os.getenv("REDIS_CACHE_MAX_ENTRIES", 1024))
+REDIS_CACHE_VERSION_CHECK_SECONDS = float(os.getenv("REDIS_CACHE_VERSION_CHECK_SECONDS", 10))
 
 
 logging.basicConfig(level="INFO")
 logger = logging.getLogger()
 logger.info(f"Connecting to Redis at {REDIS_HOST}:{REDIS_PORT}")
 
-redis_client = redis.StrictRedis(host=REDIS_HOST, port=REDIS_PORT, decode_responses=True)
+# Config reads are cached in-process in front of Redis, see RedisReadCache
+redis_client = RedisReadCache(
+    redis.StrictRedis(host=REDIS_HOST, port=REDIS_PORT, decode_responses=True),
+    version_key=Constants.CONFIG_VERSION_KEY,
+    ttl_seconds=REDIS_CACHE_TTL_SECONDS,
+    max_entries=REDIS_CACHE_MAX_ENTRIES,
+    version_check_interval_seconds=REDIS_CACHE_VERSION_CHECK_SECONDS,
+)
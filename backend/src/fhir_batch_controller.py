@@ -1,7 +1,9 @@
 """Function to send the request directly to lambda (or return appropriate diagnostics if this is not possible)"""
 
+from concurrent.futures import ThreadPoolExecutor
+
 from fhir_batch_service import ImmunizationBatchService
-from fhir_batch_repository import ImmunizationBatchRepository
+from fhir_batch_repository import ImmunizationBatchRepository, MAX_FORWARDER_WORKERS
 
 
 def make_batch_controller():
@@ -10,6 +12,14 @@ def make_batch_controller():
     return ImmunizationBatchController(immunization_repo=immunization_repo, fhir_service=fhir_service)
 
 
+def _get_identifier(fhir_json: dict) -> str:
+    return f"{fhir_json['identifier'][0]['system']}#{fhir_json['identifier'][0]['value']}"
+
+
+def _is_create(message_body: dict) -> bool:
+    return message_body.get("operation_requested") == "CREATE"
+
+
 class ImmunizationBatchController:
     def __init__(
         self,
@@ -35,3 +45,132 @@ class ImmunizationBatchController:
         return function_map[operation_requested](
             immunization=fhir_json, supplier_system=supplier, vax_type=vax_type, table=table, is_present=is_present
         )
+
+    def send_requests_to_dynamo(self, message_bodies: list[dict], table: any) -> list:
+        """
+        Sends a batch of requests to the Imms API. Returns the imms id, or the error raised, for each request.
+        Requests are sent in rounds, each with at most one request per identifier, so that requests for the same
+        identifier are applied in order while requests for different identifiers are sent concurrently.
+        """
+        outcomes = [None] * len(message_bodies)
+        rounds = []
+        identifier_counts = {}
+        for index, body in enumerate(message_bodies):
+            try:
+                identifier = _get_identifier(body.get("fhir_json"))
+            except Exception as error:  # pylint: disable = broad-exception-caught
+                outcomes[index] = error
+                continue
+            identifier_counts[identifier] = identifier_counts.get(identifier, 0) + 1
+            if len(rounds) < identifier_counts[identifier]:
+                rounds.append([])
+            rounds[identifier_counts[identifier] - 1].append((index, identifier))
+
+        # The Immunization for each identifier in existing_records is the batch's current view of it, which is
+        # updated by each write, so a request which follows another for the same identifier doesn't re-read it
+        existing_records = {}
+        known_identifiers = set()
+        # The worker threads write through the table's client, which is thread-safe, and whose connection pool is
+        # sized to the number of workers
+        with ThreadPoolExecutor(max_workers=MAX_FORWARDER_WORKERS) as executor:
+            for requests in rounds:
+                self._send_round(
+                    message_bodies,
+                    requests,
+                    table,
+                    existing_records,
+                    known_identifiers,
+                    outcomes,
+                    executor,
+                )
+        return outcomes
+
+    def _send_round(
+        self,
+        message_bodies: list[dict],
+        requests: list[tuple[int, str]],
+        table: any,
+        existing_records: dict,
+        known_identifiers: set,
+        outcomes: list,
+        executor: ThreadPoolExecutor,
+    ):
+        """
+        Sends one request for each of several identifiers, setting their outcomes. The CREATEs, and each UPDATE and
+        DELETE, are sent concurrently. As each identifier is only in one of them, they don't share any state.
+        The identifiers are looked up on this thread, and the requests are sent on the worker threads.
+        """
+        creates = [(index, identifier) for index, identifier in requests if _is_create(message_bodies[index])]
+        others = [(index, identifier) for index, identifier in requests if not _is_create(message_bodies[index])]
+
+        if unknown_identifiers := [identifier for _, identifier in others if identifier not in known_identifiers]:
+            try:
+                existing_records.update(
+                    self.immunization_repo.get_immunizations_by_identifiers(unknown_identifiers, table)
+                )
+                known_identifiers.update(unknown_identifiers)
+            except Exception as error:  # pylint: disable = broad-exception-caught
+                for index, identifier in others:
+                    self._set_outcome(index, identifier, error, existing_records, known_identifiers, outcomes)
+                others = []
+
+        created_future = None
+        if creates:
+            created_future = executor.submit(
+                lambda immunizations: self.fhir_service.create_immunizations(
+                    immunizations, table, existing_records
+                ),
+                [
+                    (body.get("fhir_json"), body.get("supplier"), body.get("vax_type"))
+                    for body in (message_bodies[index] for index, _ in creates)
+                ],
+            )
+        other_futures = [
+            executor.submit(
+                lambda message_body: self._send_update_or_delete(message_body, table, existing_records),
+                message_bodies[index],
+            )
+            for index, _ in others
+        ]
+
+        try:
+            created = created_future.result() if created_future else []
+        except Exception as error:  # pylint: disable = broad-exception-caught
+            created = [error] * len(creates)
+        for (index, identifier), outcome in zip(creates, created):
+            self._set_outcome(index, identifier, outcome, existing_records, known_identifiers, outcomes)
+        for (index, identifier), future in zip(others, other_futures):
+            self._set_outcome(index, identifier, future.result(), existing_records, known_identifiers, outcomes)
+
+    def _send_update_or_delete(self, message_body: dict, table: any, existing_records: dict):
+        """Sends an UPDATE or DELETE request. Returns the imms id, or the error raised."""
+        function_map = {
+            "UPDATE": self.fhir_service.update_immunization,
+            "DELETE": self.fhir_service.delete_immunization,
+        }
+        try:
+            return function_map[message_body.get("operation_requested")](
+                immunization=message_body.get("fhir_json"),
+                supplier_system=message_body.get("supplier"),
+                vax_type=message_body.get("vax_type"),
+                table=table,
+                is_present=False,
+                existing_records=existing_records,
+            )
+        except Exception as error:  # pylint: disable = broad-exception-caught
+            return error
+
+    @staticmethod
+    def _set_outcome(
+        index: int, identifier: str, outcome: any, existing_records: dict, known_identifiers: set, outcomes: list
+    ):
+        """
+        Sets the outcome of a request. The batch's view of an identifier is only kept after a successful write,
+        otherwise it is read again for the identifier's next request.
+        """
+        outcomes[index] = outcome
+        if isinstance(outcome, Exception):
+            known_identifiers.discard(identifier)
+            existing_records.pop(identifier, None)
+        else:
+            known_identifiers.add(identifier)
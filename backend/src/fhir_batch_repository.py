@@ -4,14 +4,30 @@ import boto3
 import time
 import simplejson as json
 from dataclasses import dataclass
+from typing import Optional
 import botocore.exceptions
+from botocore.config import Config
 from boto3.dynamodb.conditions import Key, Attr
 from models.errors import UnhandledResponseError, IdentifierDuplicationError, ResourceNotFoundError, ResourceFoundError
 
+# Creates written per TransactWriteItems call. Each create is two transact items, the sentinel and the Immunization,
+# and a transaction is limited to 100 items.
+CREATE_TRANSACTION_SIZE = 25
+# Keys read per BatchGetItem call, which is DynamoDB's limit
+BATCH_GET_SIZE = 100
+# Attempts at a transaction or batch read which is cancelled or throttled before giving up, and the delay before the
+# first retry, which doubles for each retry
+MAX_DYNAMODB_ATTEMPTS = 5
+RETRY_BASE_DELAY_SECONDS = 0.05
+
+# Rows forwarded concurrently by the batch controller. The DynamoDB connection pool is sized to match.
+MAX_FORWARDER_WORKERS = int(os.getenv("MAX_FORWARDER_WORKERS", 10))
+
 
 def create_table(region_name="eu-west-2"):
     table_name = os.environ["DYNAMODB_TABLE_NAME"]
-    dynamodb = boto3.resource("dynamodb", region_name=region_name)
+    config = Config(max_pool_connections=MAX_FORWARDER_WORKERS)
+    dynamodb = boto3.resource("dynamodb", region_name=region_name, config=config)
     return dynamodb.Table(table_name)
 
 
@@ -23,29 +39,80 @@ def _make_patient_pk(_id: str):
     return f"Patient#{_id}"
 
 
-def _query_identifier(table, index, pk, identifier, is_present):
-    retries = 0
-    delay_milliseconds = 60
-    if is_present:
-        while retries < 30:
-            queryresponse = table.query(IndexName=index, KeyConditionExpression=Key(pk).eq(identifier), Limit=1)
-
-            if queryresponse.get("Count", 0) > 0:
-                return queryresponse
-
-            if retries > 6:
-                print(f"{identifier}: Crossed {retries} retries")
-
-            retries += 1
-            # Delay time in milliseconds
-            time.sleep(delay_milliseconds / 1000)
-
-        return None
-    else:
-        queryresponse = table.query(IndexName=index, KeyConditionExpression=Key(pk).eq(identifier), Limit=1)
-
-        if queryresponse.get("Count", 0) > 0:
-            return queryresponse
+def _make_identifier_pk(identifier: str):
+    return f"Identifier#{identifier}"
+
+
+def _put_identifier_sentinel(table_name: str, identifier: str, immunization_pk: str) -> dict:
+    """
+    Returns the TransactWriteItems Put for the sentinel item which reserves an identifier for an Immunization. The Put
+    fails if the identifier is already reserved, so writing it in the same transaction as the Immunization gives a
+    strongly consistent duplicate check, unlike querying IdentifierGSI.
+    """
+    return {
+        "Put": {
+            "TableName": table_name,
+            "Item": {"PK": _make_identifier_pk(identifier), "ImmunizationPK": immunization_pk},
+            "ConditionExpression": "attribute_not_exists(PK)",
+        }
+    }
+
+
+def _is_condition_check_failure(error: botocore.exceptions.ClientError, transact_item_index: int) -> bool:
+    """Returns True if the error is a transaction cancelled by the condition on the given transact item failing"""
+    if error.response["Error"]["Code"] != "TransactionCanceledException":
+        return False
+    reasons = error.response.get("CancellationReasons", [])
+    return len(reasons) > transact_item_index and reasons[transact_item_index]["Code"] == "ConditionalCheckFailed"
+
+
+def _query_identifier_gsi(table, identifier):
+    queryresponse = table.query(
+        IndexName="IdentifierGSI", KeyConditionExpression=Key("IdentifierPK").eq(identifier), Limit=1
+    )
+    if queryresponse.get("Count", 0) > 0:
+        return queryresponse
+
+
+def _query_identifier(table, identifier):
+    """
+    Returns the Immunization with the given identifier, in the form of an IdentifierGSI query response, or None.
+    The Immunization is found via its identifier sentinel using strongly consistent reads, so an Immunization created
+    earlier in the same batch is always found. Immunizations without a sentinel are looked up in IdentifierGSI.
+    """
+    sentinel = table.get_item(Key={"PK": _make_identifier_pk(identifier)}, ConsistentRead=True).get("Item")
+    if sentinel is None:
+        return _query_identifier_gsi(table, identifier)
+
+    item = table.get_item(Key={"PK": sentinel["ImmunizationPK"]}, ConsistentRead=True).get("Item")
+    if item is not None:
+        return {"Items": [item], "Count": 1}
+
+
+def _retry_delay(attempt: int):
+    time.sleep(RETRY_BASE_DELAY_SECONDS * 2 ** (attempt - 1))
+
+
+def _batch_get_items(table, pks: list[str]) -> dict[str, dict]:
+    """Returns the items with the given PKs which exist, keyed by PK, using strongly consistent BatchGetItem reads"""
+    pks = list(dict.fromkeys(pks))
+    items = {}
+    for start in range(0, len(pks), BATCH_GET_SIZE):
+        request_items = {
+            table.name: {"Keys": [{"PK": pk} for pk in pks[start : start + BATCH_GET_SIZE]], "ConsistentRead": True}
+        }
+        attempt = 0
+        while request_items:
+            response = table.meta.client.batch_get_item(RequestItems=request_items)
+            for item in response.get("Responses", {}).get(table.name, []):
+                items[item["PK"]] = item
+
+            if request_items := response.get("UnprocessedKeys"):
+                attempt += 1
+                if attempt >= MAX_DYNAMODB_ATTEMPTS:
+                    raise UnhandledResponseError(message="Unprocessed keys from dynamodb", response=response)
+                _retry_delay(attempt)
+    return items
 
 
 def get_nhs_number(imms):
@@ -96,25 +163,8 @@ class ImmunizationBatchRepository:
         immunization["id"] = new_id
         attr = RecordAttributes(immunization, vax_type, supplier_system, 0)
 
-        query_response = _query_identifier(table, "IdentifierGSI", "IdentifierPK", attr.identifier, is_present)
-
-        if query_response is not None:
-            raise IdentifierDuplicationError(identifier=attr.identifier)
-
         try:
-            response = table.put_item(
-                Item={
-                    "PK": attr.pk,
-                    "PatientPK": attr.patient_pk,
-                    "PatientSK": attr.patient_sk,
-                    "Resource": json.dumps(attr.resource, use_decimal=True),
-                    "IdentifierPK": attr.identifier,
-                    "Operation": "CREATE",
-                    "Version": attr.version,
-                    "SupplierSystem": attr.supplier,
-                },
-                ConditionExpression=Attr("PK").ne(attr.pk),
-            )
+            response = table.meta.client.transact_write_items(TransactItems=self._create_transact_items(table, attr))
 
             if response["ResponseMetadata"]["HTTPStatusCode"] == 200:
                 return attr.pk
@@ -122,18 +172,149 @@ class ImmunizationBatchRepository:
                 raise UnhandledResponseError(message="Non-200 response from dynamodb", response=response)
 
         except botocore.exceptions.ClientError as error:
-            if error.response["Error"]["Code"] == "ConditionalCheckFailedException":
+            if _is_condition_check_failure(error, transact_item_index=0):
+                raise IdentifierDuplicationError(identifier=attr.identifier)
+            if _is_condition_check_failure(error, transact_item_index=1):
                 raise ResourceFoundError(resource_type="Immunization", resource_id=attr.pk)
             raise UnhandledResponseError(
                 message=f"Unhandled error from dynamodb: {error.response['Error']['Code']}",
                 response=error.response,
             )
 
+    def create_immunizations(
+        self, immunizations: list[tuple[any, str, str]], table: any, existing_records: Optional[dict] = None
+    ) -> list:
+        """
+        Creates each of the given (immunization, supplier_system, vax_type), which must have distinct identifiers.
+        They are written CREATE_TRANSACTION_SIZE at a time, in transactions which also reserve their identifiers.
+        Returns the PK, or the error raised, for each Immunization. The created Immunizations are added to
+        existing_records, if given.
+        """
+        outcomes = [None] * len(immunizations)
+        pending = []
+        for index, (immunization, supplier_system, vax_type) in enumerate(immunizations):
+            immunization["id"] = str(uuid.uuid4())
+            try:
+                pending.append((index, RecordAttributes(immunization, vax_type, supplier_system, 0)))
+            except Exception as error:  # pylint: disable = broad-exception-caught
+                outcomes[index] = error
+
+        for start in range(0, len(pending), CREATE_TRANSACTION_SIZE):
+            self._create_in_transaction(
+                pending[start : start + CREATE_TRANSACTION_SIZE], table, outcomes, existing_records
+            )
+        return outcomes
+
+    def _create_in_transaction(
+        self,
+        pending: list[tuple[int, RecordAttributes]],
+        table: any,
+        outcomes: list,
+        existing_records: Optional[dict],
+    ):
+        """
+        Writes the pending creates in one transaction, setting their outcomes. When the transaction is cancelled, the
+        creates whose conditions failed are given their error and the transaction is retried without them.
+        """
+        transact_items = {index: self._create_transact_items(table, attr) for index, attr in pending}
+        attempt = 0
+        while pending:
+            try:
+                response = table.meta.client.transact_write_items(
+                    TransactItems=[item for index, _ in pending for item in transact_items[index]]
+                )
+            except botocore.exceptions.ClientError as error:
+                if error.response["Error"]["Code"] != "TransactionCanceledException":
+                    self._set_unhandled_error(pending, error.response, outcomes)
+                    return
+
+                still_pending = []
+                for position, (index, attr) in enumerate(pending):
+                    if _is_condition_check_failure(error, transact_item_index=2 * position):
+                        outcomes[index] = IdentifierDuplicationError(identifier=attr.identifier)
+                    elif _is_condition_check_failure(error, transact_item_index=2 * position + 1):
+                        outcomes[index] = ResourceFoundError(resource_type="Immunization", resource_id=attr.pk)
+                    else:
+                        still_pending.append((index, attr))
+
+                if len(still_pending) == len(pending):
+                    # Cancelled by a conflicting transaction or throttling, rather than by a failed condition
+                    attempt += 1
+                    if attempt >= MAX_DYNAMODB_ATTEMPTS:
+                        self._set_unhandled_error(pending, error.response, outcomes)
+                        return
+                    _retry_delay(attempt)
+                pending = still_pending
+                continue
+
+            for index, attr in pending:
+                if response["ResponseMetadata"]["HTTPStatusCode"] == 200:
+                    outcomes[index] = attr.pk
+                    if existing_records is not None:
+                        existing_records[attr.identifier] = transact_items[index][1]["Put"]["Item"]
+                else:
+                    outcomes[index] = UnhandledResponseError(message="Non-200 response from dynamodb", response=response)
+            return
+
+    @staticmethod
+    def _set_unhandled_error(pending: list[tuple[int, RecordAttributes]], error_response: dict, outcomes: list):
+        unhandled_error = UnhandledResponseError(
+            message=f"Unhandled error from dynamodb: {error_response['Error']['Code']}", response=error_response
+        )
+        for index, _ in pending:
+            outcomes[index] = unhandled_error
+
+    @staticmethod
+    def _create_transact_items(table: any, attr: RecordAttributes) -> list[dict]:
+        """Returns the transact items which reserve the Immunization's identifier and create the Immunization"""
+        return [
+            _put_identifier_sentinel(table.name, attr.identifier, attr.pk),
+            {
+                "Put": {
+                    "TableName": table.name,
+                    "Item": {
+                        "PK": attr.pk,
+                        "PatientPK": attr.patient_pk,
+                        "PatientSK": attr.patient_sk,
+                        "Resource": json.dumps(attr.resource, use_decimal=True),
+                        "IdentifierPK": attr.identifier,
+                        "Operation": "CREATE",
+                        "Version": attr.version,
+                        "SupplierSystem": attr.supplier,
+                    },
+                    "ConditionExpression": "attribute_not_exists(PK)",
+                }
+            },
+        ]
+
+    def get_immunizations_by_identifiers(self, identifiers: list[str], table: any) -> dict[str, dict]:
+        """
+        Returns the stored Immunization for each of the identifiers which has one, keyed by identifier. The identifier
+        sentinels and then the Immunizations are each read with batched, strongly consistent reads.
+        """
+        sentinels = _batch_get_items(table, [_make_identifier_pk(identifier) for identifier in identifiers])
+        items = _batch_get_items(table, [sentinel["ImmunizationPK"] for sentinel in sentinels.values()])
+
+        immunizations = {}
+        for identifier in identifiers:
+            if (sentinel := sentinels.get(_make_identifier_pk(identifier))) is None:
+                if query_response := _query_identifier_gsi(table, identifier):
+                    immunizations[identifier] = query_response["Items"][0]
+            elif (item := items.get(sentinel["ImmunizationPK"])) is not None:
+                immunizations[identifier] = item
+        return immunizations
+
     def update_immunization(
-        self, immunization: any, supplier_system: str, vax_type: str, table: any, is_present: bool
+        self,
+        immunization: any,
+        supplier_system: str,
+        vax_type: str,
+        table: any,
+        is_present: bool,
+        existing_records: Optional[dict] = None,
     ) -> dict:
         identifier = self._identifier_response(immunization)
-        query_response = _query_identifier(table, "IdentifierGSI", "IdentifierPK", identifier, is_present)
+        query_response = self._find_by_identifier(table, identifier, existing_records)
         if query_response is None:
             raise ResourceNotFoundError(resource_type="Immunization", resource_id=identifier)
         old_id, version = self._get_id_version(query_response)
@@ -145,20 +326,34 @@ class ImmunizationBatchRepository:
         update_exp = self._build_update_expression(is_reinstate=is_reinstate)
 
         return self._perform_dynamo_update(
-            update_exp, attr, deleted_at_required=deleted_at_required, update_reinstated=update_reinstated, table=table
+            update_exp,
+            attr,
+            deleted_at_required=deleted_at_required,
+            update_reinstated=update_reinstated,
+            table=table,
+            existing_records=existing_records,
         )
 
     def delete_immunization(
-        self, immunization: any, supplier_system: str, vax_type: str, table: any, is_present: bool
+        self,
+        immunization: any,
+        supplier_system: str,
+        vax_type: str,
+        table: any,
+        is_present: bool,
+        existing_records: Optional[dict] = None,
     ) -> dict:
         identifier = self._identifier_response(immunization)
-        query_response = _query_identifier(table, "IdentifierGSI", "IdentifierPK", identifier, is_present)
+        query_response = self._find_by_identifier(table, identifier, existing_records)
         if query_response is None:
             raise ResourceNotFoundError(resource_type="Immunization", resource_id=identifier)
         try:
             now_timestamp = int(time.time())
             imms_id = self._get_pk(query_response)
-            response = table.update_item(
+            # Deletes are sent on the batch controller's worker threads, so are made with the table's client, which is
+            # thread-safe, rather than with the table resource, which is not
+            response = table.meta.client.update_item(
+                TableName=table.name,
                 Key={"PK": imms_id},
                 UpdateExpression="SET DeletedAt = :timestamp, Operation = :operation, SupplierSystem = :supplier_system",
                 ExpressionAttributeValues={
@@ -170,7 +365,7 @@ class ImmunizationBatchRepository:
                 ConditionExpression=Attr("PK").eq(imms_id)
                 & (Attr("DeletedAt").not_exists() | Attr("DeletedAt").eq("reinstated")),
             )
-            return self._handle_dynamo_response(response, imms_id)
+            return self._handle_dynamo_response(response, imms_id, existing_records)
 
         except botocore.exceptions.ClientError as error:
             # Either resource didn't exist or it has already been deleted. See ConditionExpression in the request
@@ -183,8 +378,24 @@ class ImmunizationBatchRepository:
                 )
 
     @staticmethod
-    def _handle_dynamo_response(response, imms_id):
+    def _find_by_identifier(table: any, identifier: str, existing_records: Optional[dict]) -> Optional[dict]:
+        """
+        Returns the Immunization with the given identifier, in the form of an IdentifierGSI query response, or None.
+        existing_records, if given, are the Immunizations already known in this batch, keyed by identifier, and are
+        used instead of reading the table.
+        """
+        if existing_records is None:
+            return _query_identifier(table, identifier)
+        if (item := existing_records.get(identifier)) is not None:
+            return {"Items": [item], "Count": 1}
+        return None
+
+    @staticmethod
+    def _handle_dynamo_response(response, imms_id, existing_records: Optional[dict] = None):
         if response["ResponseMetadata"]["HTTPStatusCode"] == 200:
+            # Keep the batch's view of the Immunization up to date for any later requests for the same identifier
+            if existing_records is not None and "Attributes" in response:
+                existing_records[response["Attributes"]["IdentifierPK"]] = response["Attributes"]
             return imms_id
         else:
             raise UnhandledResponseError(message="Non-200 response from dynamodb", response=response)
@@ -243,6 +454,7 @@ class ImmunizationBatchRepository:
         deleted_at_required: bool,
         update_reinstated: bool,
         table: any,
+        existing_records: Optional[dict] = None,
     ) -> dict:
         try:
             condition_expression = Attr("PK").eq(attr.pk) & (
@@ -272,7 +484,10 @@ class ImmunizationBatchRepository:
                     ":supplier_system": attr.supplier,
                 }
 
-            response = table.update_item(
+            # Updates are sent on the batch controller's worker threads, so are made with the table's client, which is
+            # thread-safe, rather than with the table resource, which is not
+            response = table.meta.client.update_item(
+                TableName=table.name,
                 Key={"PK": attr.pk},
                 UpdateExpression=update_exp,
                 ExpressionAttributeNames={
@@ -282,7 +497,7 @@ class ImmunizationBatchRepository:
                 ReturnValues="ALL_NEW",
                 ConditionExpression=condition_expression,
             )
-            return self._handle_dynamo_response(response, attr.pk)
+            return self._handle_dynamo_response(response, attr.pk, existing_records)
         except botocore.exceptions.ClientError as error:
             # Either resource didn't exist or it has already been deleted. See ConditionExpression in the request
             if error.response["Error"]["Code"] == "ConditionalCheckFailedException":
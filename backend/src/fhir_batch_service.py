@@ -1,3 +1,5 @@
+from typing import Optional
+
 from pydantic import ValidationError
 from fhir_batch_repository import ImmunizationBatchRepository
 from models.errors import CustomValidationError
@@ -31,8 +33,39 @@ class ImmunizationBatchService:
             immunization, supplier_system, vax_type, table, is_present
         )
 
+    def create_immunizations(
+        self, immunizations: list[tuple[any, str, str]], table: any, existing_records: Optional[dict] = None
+    ) -> list:
+        """
+        Creates each of the given (immunization, supplier_system, vax_type), which must have distinct identifiers,
+        in batches. Returns the ID, or the error raised, for each Immunization.
+        """
+        outcomes = [None] * len(immunizations)
+        valid_indexes = []
+        for index, (immunization, _, _) in enumerate(immunizations):
+            try:
+                self.validator.validate(immunization)
+                valid_indexes.append(index)
+            except (ValidationError, ValueError, MandatoryError) as error:
+                outcomes[index] = CustomValidationError(message=str(error))
+            except Exception as error:  # pylint: disable = broad-exception-caught
+                outcomes[index] = error
+
+        created = self.immunization_repo.create_immunizations(
+            [immunizations[i] for i in valid_indexes], table, existing_records
+        )
+        for index, outcome in zip(valid_indexes, created):
+            outcomes[index] = outcome
+        return outcomes
+
     def update_immunization(
-        self, immunization: any, supplier_system: str, vax_type: str, table: any, is_present: bool
+        self,
+        immunization: any,
+        supplier_system: str,
+        vax_type: str,
+        table: any,
+        is_present: bool,
+        existing_records: Optional[dict] = None,
     ):
         """
         Updates an Immunization if it exists and return the ID back if successful.
@@ -45,11 +78,17 @@ class ImmunizationBatchService:
             raise CustomValidationError(message=str(error)) from error
 
         return self.immunization_repo.update_immunization(
-            immunization, supplier_system, vax_type, table, is_present
+            immunization, supplier_system, vax_type, table, is_present, existing_records
         )
 
     def delete_immunization(
-        self, immunization: any, supplier_system: str, vax_type: str, table: any, is_present: bool
+        self,
+        immunization: any,
+        supplier_system: str,
+        vax_type: str,
+        table: any,
+        is_present: bool,
+        existing_records: Optional[dict] = None,
     ):
         """
         Delete an Immunization if it exists and return the ID back if successful.
@@ -57,5 +96,5 @@ class ImmunizationBatchService:
         the record in the database.
         """
         return self.immunization_repo.delete_immunization(
-            immunization, supplier_system, vax_type, table, is_present
+            immunization, supplier_system, vax_type, table, is_present, existing_records
         )
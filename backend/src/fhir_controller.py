@@ -3,6 +3,7 @@ import boto3
 import json
 import os
 import re
+import simplejson
 import uuid
 from decimal import Decimal
 from typing import Optional
@@ -28,10 +29,12 @@ from models.errors import (
     UnauthorizedVaxError,
     UnauthorizedVaxOnRecordError,
     UnauthorizedSystemError,
+    ResourceVersionConflictError,
+    ResourceStateConflictError,
 )
 from models.utils.generic_utils import check_keys_in_sources
 from models.utils.permissions import get_supplier_permissions
-from models.utils.permission_checker import ApiOperationCode, validate_permissions, _expand_permissions
+from models.utils.permission_checker import ApiOperationCode, validate_permissions, compile_permissions
 from parameter_parser import process_params, process_search_params, create_query_string
 import urllib.parse
 
@@ -46,7 +49,9 @@ def make_controller(
     imms_repo = ImmunizationRepository(create_table(endpoint_url=endpoint_url))
 
     authorizer = Authorization()
-    service = FhirService(imms_repo=imms_repo)
+    service = FhirService(
+        imms_repo=imms_repo, strict_search_validation=os.getenv("STRICT_SEARCH_VALIDATION", "false") == "true"
+    )
 
     return FhirController(authorizer=authorizer, fhir_service=service)
 
@@ -354,6 +359,12 @@ class FhirController:
             return self.create_response(400, error.to_operation_outcome())
         except IdentifierDuplicationError as duplicate:
             return self.create_response(422, duplicate.to_operation_outcome())
+        except ResourceNotFoundError as not_found:
+            return self.create_response(404, not_found.to_operation_outcome())
+        except ResourceStateConflictError as conflict:
+            return self.create_response(409, conflict.to_operation_outcome())
+        except ResourceVersionConflictError as conflict:
+            return self.create_response(412, conflict.to_operation_outcome())
         except UnauthorizedVaxError as unauthorized:
             return self.create_response(403, unauthorized.to_operation_outcome())
 
@@ -416,12 +427,9 @@ class FhirController:
             return self.create_response(403, unauthorized.to_operation_outcome())
         # Check vaxx type permissions on the existing record - start
         try:
-            expanded_permissions = _expand_permissions(imms_vax_type_perms)
-            vax_type_perm = [
-                vaccine_type
-                for vaccine_type in search_params.immunization_targets
-                if ApiOperationCode.SEARCH in expanded_permissions.get(vaccine_type.lower(), [])
-            ]
+            vax_type_perm = compile_permissions(imms_vax_type_perms).permitted_vaccine_types(
+                ApiOperationCode.SEARCH, search_params.immunization_targets
+            )
             if not vax_type_perm:
                 raise UnauthorizedVaxError
         except UnauthorizedVaxError as unauthorized:
@@ -434,6 +442,8 @@ class FhirController:
             create_query_string(search_params),
             search_params.date_from,
             search_params.date_to,
+            search_params.count,
+            search_params.page_start_keys,
         )
 
         if "diagnostics" in result:
@@ -444,30 +454,15 @@ class FhirController:
                 diagnostics=result["diagnostics"],
             )
             return self.create_response(400, json.dumps(exp_error))
-        # Workaround for fhir.resources JSON removing the empty "entry" list.
-        result_json_dict: dict = json.loads(result.json())
-        if "entry" in result_json_dict:
-            result_json_dict["entry"] = [
-                entry
-                for entry in result_json_dict["entry"]
-                if entry["resource"].get("status") not in ("not-done", "entered-in-error")
-            ]
-            total_count = sum(
-                1 for entry in result_json_dict["entry"] if entry.get("search", {}).get("mode") == "match"
+        if result["entry"] and sorted(search_params.immunization_targets) != sorted(vax_type_perm):
+            exp_error = create_operation_outcome(
+                resource_id=str(uuid.uuid4()),
+                severity=Severity.warning,
+                code=Code.unauthorized,
+                diagnostics="Your search contains details that you are not authorised to request",
             )
-            result_json_dict["total"] = total_count
-            if sorted(search_params.immunization_targets) != sorted(vax_type_perm):
-                exp_error = create_operation_outcome(
-                    resource_id=str(uuid.uuid4()),
-                    severity=Severity.warning,
-                    code=Code.unauthorized,
-                    diagnostics="Your search contains details that you are not authorised to request",
-                )
-                result_json_dict["entry"].append({"resource": exp_error})
-        if "entry" not in result_json_dict:
-            result_json_dict["entry"] = []
-            result_json_dict["total"] = 0
-        return self.create_response(200, json.dumps(result_json_dict))
+            result["entry"].append({"resource": exp_error})
+        return self.create_response(200, simplejson.dumps(result, use_decimal=True))
 
     def _validate_id(self, _id: str) -> Optional[dict]:
         if not re.match(self.immunization_id_pattern, _id):
@@ -2,12 +2,14 @@ import simplejson as json
 import os
 import time
 import uuid
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from dataclasses import dataclass
 from typing import Optional, Tuple
 
 import boto3
 import botocore.exceptions
 from boto3.dynamodb.conditions import Attr, Key
+from boto3.dynamodb.types import TypeDeserializer
 from models.utils.permission_checker import ApiOperationCode, validate_permissions
 from botocore.config import Config
 from models.errors import (
@@ -15,11 +17,18 @@ from models.errors import (
     UnhandledResponseError,
     IdentifierDuplicationError,
     UnauthorizedVaxError,
+    ResourceVersionConflictError,
+    ResourceStateConflictError,
 )
 from mypy_boto3_dynamodb.service_resource import DynamoDBServiceResource, Table
 
 from models.utils.validation_utils import get_vaccine_type, check_identifier_system_value
 
+# Upper bound on concurrent PatientGSI queries issued by a single search
+MAX_SEARCH_WORKERS = 10
+
+_type_deserializer = TypeDeserializer()
+
 
 def create_table(table_name=None, endpoint_url=None, region_name="eu-west-2"):
     if not table_name:
@@ -39,10 +48,31 @@ def _make_patient_pk(_id: str):
     return f"Patient#{_id}"
 
 
-def _query_identifier(table, index, pk, identifier):
-    queryresponse = table.query(IndexName=index, KeyConditionExpression=Key(pk).eq(identifier), Limit=1)
-    if queryresponse.get("Count", 0) > 0:
-        return queryresponse
+def _make_identifier_pk(identifier: str):
+    return f"Identifier#{identifier}"
+
+
+def _put_identifier_sentinel(table_name: str, identifier: str, immunization_pk: str) -> dict:
+    """
+    Returns the TransactWriteItems Put for the sentinel item which reserves an identifier for an Immunization. The Put
+    fails if the identifier is already reserved, so writing it in the same transaction as the Immunization gives a
+    strongly consistent duplicate check, unlike querying IdentifierGSI.
+    """
+    return {
+        "Put": {
+            "TableName": table_name,
+            "Item": {"PK": _make_identifier_pk(identifier), "ImmunizationPK": immunization_pk},
+            "ConditionExpression": "attribute_not_exists(PK)",
+        }
+    }
+
+
+def _is_condition_check_failure(error: botocore.exceptions.ClientError, transact_item_index: int) -> bool:
+    """Returns True if the error is a transaction cancelled by the condition on the given transact item failing"""
+    if error.response["Error"]["Code"] != "TransactionCanceledException":
+        return False
+    reasons = error.response.get("CancellationReasons", [])
+    return len(reasons) > transact_item_index and reasons[transact_item_index]["Code"] == "ConditionalCheckFailed"
 
 
 def get_nhs_number(imms):
@@ -165,23 +195,34 @@ class ImmunizationRepository:
         attr = RecordAttributes(immunization, patient)
         if not validate_permissions(imms_vax_type_perms,ApiOperationCode.CREATE, [attr.vaccine_type]):
             raise UnauthorizedVaxError()
-        query_response = _query_identifier(self.table, "IdentifierGSI", "IdentifierPK", attr.identifier)
-
-        if query_response is not None:
-            raise IdentifierDuplicationError(identifier=attr.identifier)
-
-        response = self.table.put_item(
-            Item={
-                "PK": attr.pk,
-                "PatientPK": attr.patient_pk,
-                "PatientSK": attr.patient_sk,
-                "Resource": json.dumps(attr.resource, use_decimal=True),
-                "IdentifierPK": attr.identifier,
-                "Operation": "CREATE",
-                "Version": 1,
-                "SupplierSystem": supplier_system,
-            }
-        )
+        try:
+            response = self.table.meta.client.transact_write_items(
+                TransactItems=[
+                    _put_identifier_sentinel(self.table.name, attr.identifier, attr.pk),
+                    {
+                        "Put": {
+                            "TableName": self.table.name,
+                            "Item": {
+                                "PK": attr.pk,
+                                "PatientPK": attr.patient_pk,
+                                "PatientSK": attr.patient_sk,
+                                "Resource": json.dumps(attr.resource, use_decimal=True),
+                                "IdentifierPK": attr.identifier,
+                                "Operation": "CREATE",
+                                "Version": 1,
+                                "SupplierSystem": supplier_system,
+                            },
+                        }
+                    },
+                ]
+            )
+        except botocore.exceptions.ClientError as error:
+            if _is_condition_check_failure(error, transact_item_index=0):
+                raise IdentifierDuplicationError(identifier=attr.identifier)
+            raise UnhandledResponseError(
+                message=f"Unhandled error from dynamodb: {error.response['Error']['Code']}",
+                response=error.response,
+            )
 
         if response["ResponseMetadata"]["HTTPStatusCode"] == 200:
             return immunization
@@ -201,8 +242,6 @@ class ImmunizationRepository:
         self._handle_permissions(imms_vax_type_perms, attr)
         update_exp = self._build_update_expression(is_reinstate=False)
 
-        self._check_duplicate_identifier(attr)
-
         return self._perform_dynamo_update(
             imms_id,
             update_exp,
@@ -227,8 +266,6 @@ class ImmunizationRepository:
         self._handle_permissions(imms_vax_type_perms, attr)
         update_exp = self._build_update_expression(is_reinstate=True)
 
-        self._check_duplicate_identifier(attr)
-
         return self._perform_dynamo_update(
             imms_id,
             update_exp,
@@ -252,8 +289,6 @@ class ImmunizationRepository:
         self._handle_permissions(imms_vax_type_perms, attr)
         update_exp = self._build_update_expression(is_reinstate=False)
 
-        self._check_duplicate_identifier(attr)
-
         return self._perform_dynamo_update(
             imms_id,
             update_exp,
@@ -281,15 +316,6 @@ class ImmunizationRepository:
                 "Operation = :operation, Version = :version, SupplierSystem = :supplier_system "
             )
 
-    def _check_duplicate_identifier(self, attr: RecordAttributes) -> dict:
-        queryresponse = _query_identifier(self.table, "IdentifierGSI", "IdentifierPK", attr.identifier)
-        if queryresponse is not None:
-            items = queryresponse.get("Items", [])
-            resource_dict = json.loads(items[0]["Resource"])
-            if resource_dict["id"] != attr.resource["id"]:
-                raise IdentifierDuplicationError(identifier=attr.identifier)
-        return queryresponse
-
     def _perform_dynamo_update(
         self,
         imms_id: str,
@@ -302,10 +328,11 @@ class ImmunizationRepository:
     ) -> Tuple[dict, int]:
         try:
             updated_version = existing_resource_version + 1
-            condition_expression = Attr("PK").eq(attr.pk) & (
-                Attr("DeletedAt").exists()
-                if deleted_at_required
-                else Attr("PK").eq(attr.pk) & Attr("DeletedAt").not_exists()
+            condition_expression = (
+                Attr("PK").eq(attr.pk)
+                & Attr("Version").eq(existing_resource_version)
+                & Attr("IdentifierPK").eq(attr.identifier)
+                & self._deletion_state_condition(deleted_at_required, update_reinstated)
             )
             if deleted_at_required and update_reinstated == False:
                 ExpressionAttributeValues = {
@@ -338,18 +365,49 @@ class ImmunizationRepository:
                 ExpressionAttributeValues=ExpressionAttributeValues,
                 ReturnValues="ALL_NEW",
                 ConditionExpression=condition_expression,
+                ReturnValuesOnConditionCheckFailure="ALL_OLD",
             )
             return self._handle_dynamo_response(response), updated_version
         except botocore.exceptions.ClientError as error:
-            # Either resource didn't exist or it has already been deleted. See ConditionExpression in the request
             if error.response["Error"]["Code"] == "ConditionalCheckFailedException":
-                raise ResourceNotFoundError(resource_type="Immunization", resource_id=imms_id)
+                raise self._failed_update_error(imms_id, attr, existing_resource_version, error.response)
             else:
                 raise UnhandledResponseError(
                     message=f"Unhandled error from dynamodb: {error.response['Error']['Code']}",
                     response=error.response,
                 )
 
+    @staticmethod
+    def _deletion_state_condition(deleted_at_required: bool, update_reinstated: bool):
+        """Condition on the stored record's DeletedAt attribute for the type of update being performed"""
+        if not deleted_at_required:
+            return Attr("DeletedAt").not_exists()
+        if update_reinstated:
+            return Attr("DeletedAt").eq("reinstated")
+        return Attr("DeletedAt").exists() & Attr("DeletedAt").ne("reinstated")
+
+    @staticmethod
+    def _failed_update_error(
+        imms_id: str,
+        attr: RecordAttributes,
+        existing_resource_version: int,
+        error_response: dict,
+    ) -> RuntimeError:
+        """
+        Returns the error explaining which part of the update's ConditionExpression failed, using the stored record
+        returned by ReturnValuesOnConditionCheckFailure
+        """
+        if not (old_item := error_response.get("Item")):
+            return ResourceNotFoundError(resource_type="Immunization", resource_id=imms_id)
+
+        item = {key: _type_deserializer.deserialize(value) for key, value in old_item.items()}
+        if int(item["Version"]) != existing_resource_version:
+            return ResourceVersionConflictError(resource_type="Immunization", resource_id=imms_id)
+        if item.get("IdentifierPK") != attr.identifier:
+            return IdentifierDuplicationError(identifier=attr.identifier)
+        # Otherwise the record has been deleted or reinstated since it was read
+        return ResourceStateConflictError(resource_type="Immunization", resource_id=imms_id)
+
     def delete_immunization(
             self, imms_id: str, imms_vax_type_perms: str, supplier_system: str) -> dict:
         now_timestamp = int(time.time())
@@ -394,23 +452,116 @@ class ImmunizationRepository:
 
     def find_immunizations(self, patient_identifier: str, vaccine_types: list):
         """it should find all of the specified patient's Immunization events for all of the specified vaccine_types"""
-        condition = Key("PatientPK").eq(_make_patient_pk(patient_identifier))
-        is_not_deleted = Attr("DeletedAt").not_exists() | Attr("DeletedAt").eq("reinstated")
-
-        response = self.table.query(
-            IndexName="PatientGSI",
-            KeyConditionExpression=condition,
-            FilterExpression=is_not_deleted,
+        # Sorted to match the PatientSK ordering of the GSI, so results come back in the same order as a single query
+        requested_vaccine_types = sorted(set(vaccine_types))
+        results = self._query_vaccine_types(_make_patient_pk(patient_identifier), requested_vaccine_types)
+        items = [item for vaccine_type in requested_vaccine_types for item in results[vaccine_type][0]]
+
+        # Return a list of the FHIR immunization resource JSON items
+        return [json.loads(item["Resource"]) for item in items]
+
+    def find_immunizations_page(
+        self, patient_identifier: str, vaccine_types: list, count: int, page_start_keys: Optional[dict] = None
+    ) -> tuple[list[dict], dict]:
+        """
+        Finds at most `count` of the specified patient's Immunization events for the specified vaccine_types, starting
+        from `page_start_keys` (the ExclusiveStartKey of each vaccine type not yet fully read, or None to start reading
+        that vaccine type from the beginning). Returns the resources and the start keys for the next page, which are
+        empty once every vaccine type has been fully read.
+        """
+        if page_start_keys is None:
+            page_start_keys = {vaccine_type: None for vaccine_type in vaccine_types}
+        outstanding_vaccine_types = sorted(set(page_start_keys.keys()) & set(vaccine_types))
+
+        results = self._query_vaccine_types(
+            _make_patient_pk(patient_identifier), outstanding_vaccine_types, count, page_start_keys
         )
 
-        if "Items" in response:
-            # Filter the response to contain only the requested vaccine types
-            items = [x for x in response["Items"] if x["PatientSK"].split("#")[0] in vaccine_types]
+        page_items = []
+        next_page_start_keys = {}
+        for vaccine_type in outstanding_vaccine_types:
+            items, has_more = results[vaccine_type]
+            items_for_page = items[: count - len(page_items)]
+            page_items.extend(items_for_page)
+            if has_more or len(items_for_page) < len(items):
+                next_page_start_keys[vaccine_type] = (
+                    {key: items_for_page[-1][key] for key in ("PK", "PatientPK", "PatientSK")}
+                    if items_for_page
+                    else page_start_keys[vaccine_type]
+                )
 
-            # Return a list of the FHIR immunization resource JSON items
-            return [json.loads(item["Resource"]) for item in items]
-        else:
-            raise UnhandledResponseError(message=f"Unhandled error. Query failed", response=response)
+        return [json.loads(item["Resource"]) for item in page_items], next_page_start_keys
+
+    def _query_vaccine_types(
+        self,
+        patient_pk: str,
+        vaccine_types: list[str],
+        limit: Optional[int] = None,
+        start_keys: Optional[dict] = None,
+    ) -> dict[str, tuple[list[dict], bool]]:
+        """Runs one PatientGSI query per vaccine type, concurrently if there is more than one"""
+        start_keys = start_keys or {}
+
+        if len(vaccine_types) <= 1:
+            return {
+                vaccine_type: self._query_patient_vaccine_type(
+                    patient_pk, vaccine_type, limit, start_keys.get(vaccine_type)
+                )
+                for vaccine_type in vaccine_types
+            }
+
+        # One key-condition query per vaccine type, merged as each one completes
+        results = {}
+        with ThreadPoolExecutor(max_workers=min(len(vaccine_types), MAX_SEARCH_WORKERS)) as executor:
+            futures = {
+                executor.submit(
+                    self._query_patient_vaccine_type, patient_pk, vaccine_type, limit, start_keys.get(vaccine_type)
+                ): vaccine_type
+                for vaccine_type in vaccine_types
+            }
+            for future in as_completed(futures):
+                results[futures[future]] = future.result()
+        return results
+
+    def _query_patient_vaccine_type(
+        self,
+        patient_pk: str,
+        vaccine_type: str,
+        limit: Optional[int] = None,
+        exclusive_start_key: Optional[dict] = None,
+    ) -> tuple[list[dict], bool]:
+        """
+        Query PatientGSI for the non-deleted items of a single vaccine type, following pagination until `limit` items
+        have been found or the end is reached. Returns at most `limit` items and whether any more items may remain.
+        """
+        condition = Key("PatientPK").eq(patient_pk) & Key("PatientSK").begins_with(f"{vaccine_type}#")
+        is_not_deleted = Attr("DeletedAt").not_exists() | Attr("DeletedAt").eq("reinstated")
+        query_kwargs = {
+            "TableName": self.table.name,
+            "IndexName": "PatientGSI",
+            "KeyConditionExpression": condition,
+            "FilterExpression": is_not_deleted,
+        }
+        if limit is not None:
+            query_kwargs["Limit"] = limit
+        if exclusive_start_key is not None:
+            query_kwargs["ExclusiveStartKey"] = exclusive_start_key
+
+        items = []
+        while True:
+            # The vaccine types may be queried on concurrent threads, so the query is made with the table's client,
+            # which is thread-safe, rather than with the table resource, which is not
+            response = self.table.meta.client.query(**query_kwargs)
+            if "Items" not in response:
+                raise UnhandledResponseError(message=f"Unhandled error. Query failed", response=response)
+
+            items.extend(response["Items"])
+
+            if "LastEvaluatedKey" not in response:
+                return items, False
+            if limit is not None and len(items) >= limit:
+                return items[:limit], True
+            query_kwargs["ExclusiveStartKey"] = response["LastEvaluatedKey"]
 
     @staticmethod
     def _handle_dynamo_response(response):
@@ -5,12 +5,7 @@ import os
 from enum import Enum
 from typing import Optional, Union
 
-from fhir.resources.R4B.bundle import (
-    Bundle as FhirBundle,
-    BundleEntry,
-    BundleLink,
-    BundleEntrySearch,
-)
+from fhir.resources.R4B.bundle import Bundle as FhirBundle
 from fhir.resources.R4B.immunization import Immunization
 from pydantic import ValidationError
 
@@ -49,13 +44,17 @@ class UpdateOutcome(Enum):
 
 
 class FhirService:
+    statuses_excluded_from_search = ("not-done", "entered-in-error")
+
     def __init__(
         self,
         imms_repo: ImmunizationRepository,
         validator: ImmunizationValidator = ImmunizationValidator(),
+        strict_search_validation: bool = False,
     ):
         self.immunization_repo = imms_repo
         self.validator = validator
+        self.strict_search_validation = strict_search_validation
 
     def get_immunization_by_identifier(
         self, identifier_pk: str, imms_vax_type_perms: list[str], identifier: str, element: str
@@ -276,6 +275,28 @@ class FhirService:
 
         return f"{base_url}?{parameters}"
 
+    @staticmethod
+    def create_url_for_next_bundle_link(params, vaccine_types, next_page_start_keys):
+        """
+        Returns the url for the next page of a paged search bundle. Unlike the self link, the search parameters keep the
+        names they were requested with so that the url can be used to search again, with the immunization.target
+        parameter restricted to the given vaccine types and the page token replaced by one for the given start keys.
+        """
+        base_url = f"{get_service_url()}/Immunization"
+
+        replaced_keys = (parameter_parser.immunization_target_key, parameter_parser.page_token_key)
+        parameters = "&".join(
+            sorted(
+                [x for x in params.split("&") if x and x.split("=")[0] not in replaced_keys]
+                + [
+                    f"{parameter_parser.immunization_target_key}={','.join(vaccine_types)}",
+                    f"{parameter_parser.page_token_key}={parameter_parser.encode_page_token(next_page_start_keys)}",
+                ]
+            )
+        )
+
+        return f"{base_url}?{parameters}"
+
     def search_immunizations(
         self,
         nhs_number: str,
@@ -283,20 +304,32 @@ class FhirService:
         params: str,
         date_from: datetime.date = parameter_parser.date_from_default,
         date_to: datetime.date = parameter_parser.date_to_default,
-    ) -> FhirBundle:
+        count: Optional[int] = None,
+        page_start_keys: Optional[dict] = None,
+    ) -> dict:
         """
         Finds all instances of Immunization(s) for a specified patient which are for the specified vaccine type(s).
-        Bundles the resources with the relevant patient resource and returns the bundle.
+        Bundles the resources with the relevant patient resource and returns the bundle as a FHIR Bundle JSON dict.
+        If a count is given, only one page of at most that many instances is bundled, starting from the given page
+        start keys, and a next link is added to the bundle if there are more pages to read.
         """
         # TODO: is disease type a mandatory field? (I assumed it is)
         #  i.e. Should we provide a search option for getting Patient's entire imms history?
         if not nhs_number_mod11_check(nhs_number):
             return create_diagnostics()
 
-        # Obtain all resources which are for the requested nhs number and vaccine type(s) and within the date range
+        # Obtain all resources (or one page of resources if paging) which are for the requested nhs number and vaccine
+        # type(s), and keep those within the date range
+        next_page_start_keys = None
+        if count is None:
+            found_resources = self.immunization_repo.find_immunizations(nhs_number, vaccine_types)
+        else:
+            found_resources, next_page_start_keys = self.immunization_repo.find_immunizations_page(
+                nhs_number, vaccine_types, count, page_start_keys
+            )
         resources = [
             r
-            for r in self.immunization_repo.find_immunizations(nhs_number, vaccine_types)
+            for r in found_resources
             if self.is_valid_date_from(r, date_from) and self.is_valid_date_to(r, date_to)
         ]
 
@@ -309,34 +342,53 @@ class FhirService:
 
         imms_patient_record = get_contained_patient(resources[-1]) if resources else None
 
-        # Filter and amend the immunization resources for the SEARCH response
-        resources_filtered_for_search = [Filter.search(imms, patient_full_url) for imms in resources]
-
-        # Add bundle entries for each of the immunization resources
-        entries = [
-            BundleEntry(
-                resource=Immunization.parse_obj(imms),
-                search=BundleEntrySearch(mode="match"),
-                fullUrl=f"https://api.service.nhs.uk/immunisation-fhir-api/Immunization/{imms['id']}",
+        # Filter and amend the immunization resources for the SEARCH response, excluding those which are not to be
+        # returned, and add a bundle entry for each of them
+        entries = []
+        for imms in resources:
+            if imms.get("status") in self.statuses_excluded_from_search:
+                continue
+            imms_filtered_for_search = Filter.search(imms, patient_full_url)
+            entries.append(
+                {
+                    "fullUrl": f"https://api.service.nhs.uk/immunisation-fhir-api/Immunization/{imms['id']}",
+                    "resource": imms_filtered_for_search,
+                    "search": {"mode": "match"},
+                }
             )
-            for imms in resources_filtered_for_search
-        ]
+        total = len(entries)
 
         # Add patient resource if there is at least one immunization resource
         if len(resources) > 0:
             entries.append(
-                BundleEntry(
-                    resource=self.process_patient_for_bundle(imms_patient_record),
-                    search=BundleEntrySearch(mode="include"),
-                    fullUrl=patient_full_url,
-                )
+                {
+                    "fullUrl": patient_full_url,
+                    "resource": self.process_patient_for_bundle(imms_patient_record),
+                    "search": {"mode": "include"},
+                }
             )
 
         # Create the bundle
-        fhir_bundle = FhirBundle(resourceType="Bundle", type="searchset", entry=entries)
-        fhir_bundle.link = [BundleLink(relation="self", url=self.create_url_for_bundle_link(params, vaccine_types))]
+        links = [{"relation": "self", "url": self.create_url_for_bundle_link(params, vaccine_types)}]
+        if next_page_start_keys:
+            links.append(
+                {
+                    "relation": "next",
+                    "url": self.create_url_for_next_bundle_link(params, vaccine_types, next_page_start_keys),
+                }
+            )
+        bundle = {"resourceType": "Bundle", "type": "searchset", "link": links, "entry": entries}
+
+        # The total number of matches is only known if every match is in this bundle, i.e. it isn't paged, or is the only
+        # page of a paged search. The last page, reached through a page token, only has the matches of that page.
+        if not next_page_start_keys and page_start_keys is None:
+            bundle["total"] = total
+
+        # The resources were validated when they were stored, so the bundle is only validated in strict mode
+        if self.strict_search_validation:
+            FhirBundle.parse_obj(bundle)
 
-        return fhir_bundle
+        return bundle
 
     @timed
     def _validate_patient(self, imms: dict) -> dict:
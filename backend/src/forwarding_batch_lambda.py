@@ -3,11 +3,12 @@
 import os
 import simplejson as json
 import base64
-import time
 import logging
+import uuid
 from fhir_batch_repository import create_table
 from fhir_batch_controller import ImmunizationBatchController, make_batch_controller
-from clients import sqs_client
+from clients import sqs_client, s3_client
+from common.compact_encoding import decode_message
 from models.errors import (
     MessageNotSuccessfulError,
     RecordProcessorError,
@@ -22,6 +23,12 @@ logging.basicConfig(level="INFO")
 logger = logging.getLogger()
 
 QUEUE_URL = os.getenv("SQS_QUEUE_URL")
+ACK_BUCKET_NAME = os.getenv("ACK_BUCKET_NAME")
+
+SQS_MAX_MESSAGE_BYTES = 256 * 1024
+# Results larger than this are uploaded to the ack bucket, and only a claim check for them is sent to SQS
+CLAIM_CHECK_THRESHOLD_BYTES = int(os.getenv("CLAIM_CHECK_THRESHOLD_BYTES", 1024 * 1024))
+CLAIM_CHECK_PREFIX = "forwarder_claim_checks"
 
 
 def create_diagnostics_dictionary(error: Exception) -> dict:
@@ -46,13 +53,62 @@ def create_diagnostics_dictionary(error: Exception) -> dict:
     }
 
 
-def forward_request_to_dynamo(
-    message_body: any, table: any, is_present: bool, batchcontroller: ImmunizationBatchController
-):
-    """Forwards the request to the Imms API (where possible) and updates the ack file with the outcome"""
-    row_id = message_body.get("row_id")
-    logger.info("FORWARDED MESSAGE: ID %s", row_id)
-    return batchcontroller.send_request_to_dynamo(message_body, table, is_present)
+def forward_requests_to_dynamo(message_bodies: list, table: any, batchcontroller: ImmunizationBatchController) -> list:
+    """
+    Forwards the requests to the Imms API together. Requests for the same identifier are applied in the given order.
+    Returns the imms id, or the error raised, for each request.
+    """
+    for message_body in message_bodies:
+        logger.info("FORWARDED MESSAGE: ID %s", message_body.get("row_id"))
+    return batchcontroller.send_requests_to_dynamo(message_bodies, table)
+
+
+def _dumps(messages: any) -> str:
+    return json.dumps(messages, separators=(",", ":"))
+
+
+def split_into_sqs_message_bodies(array_of_messages: list) -> list[str]:
+    """Splits the messages, in order, into as few JSON arrays as fit within the SQS message size limit"""
+    message_bodies = []
+    chunk = []
+    chunk_size = 2  # The enclosing brackets
+    for message in array_of_messages:
+        message_size = len(_dumps(message).encode("utf-8")) + 1  # The separating comma
+        if chunk and chunk_size + message_size > SQS_MAX_MESSAGE_BYTES:
+            message_bodies.append(_dumps(chunk))
+            chunk = []
+            chunk_size = 2
+        chunk.append(message)
+        chunk_size += message_size
+    if chunk:
+        message_bodies.append(_dumps(chunk))
+    return message_bodies
+
+
+def send_to_ack_queue(array_of_messages: list, message_group_id: str):
+    """
+    Sends the results to the ack queue, as one or more FIFO messages in row order. Results too large for SQS are split
+    across several messages, or, above CLAIM_CHECK_THRESHOLD_BYTES, uploaded to the ack bucket with only a claim check
+    for them sent to SQS.
+    """
+    sqs_message_body = _dumps(array_of_messages)
+    message_len = len(sqs_message_body.encode("utf-8"))
+    logger.info(f"total message length:{message_len}")
+
+    if message_len <= SQS_MAX_MESSAGE_BYTES:
+        message_bodies = [sqs_message_body]
+    elif message_len > CLAIM_CHECK_THRESHOLD_BYTES:
+        claim_check_key = f"{CLAIM_CHECK_PREFIX}/{message_group_id}/{uuid.uuid4()}.json"
+        s3_client.put_object(Bucket=ACK_BUCKET_NAME, Key=claim_check_key, Body=sqs_message_body)
+        logger.info("Results uploaded to claim check %s", claim_check_key)
+        message_bodies = [_dumps({"claim_check": {"bucket": ACK_BUCKET_NAME, "key": claim_check_key}})]
+    else:
+        message_bodies = split_into_sqs_message_bodies(array_of_messages)
+        logger.info("Results split into %d messages", len(message_bodies))
+
+    # Sent one at a time, in order, as the messages are each close to the size limit of a whole SendMessageBatch
+    for message_body in message_bodies:
+        sqs_client.send_message(QueueUrl=QUEUE_URL, MessageBody=message_body, MessageGroupId=message_group_id)
 
 
 def forward_lambda_handler(event, _):
@@ -60,13 +116,15 @@ def forward_lambda_handler(event, _):
     logger.info("Processing started")
     table = create_table()
     array_of_messages = []
-    array_of_identifiers = []
     controller = make_batch_controller()
-    for record in event["Records"]:
+
+    # Rows are parsed first, so that they can be forwarded as a batch
+    outcomes = []
+    forwardable_rows = []
+    for record_index, record in enumerate(event["Records"]):
         try:
             kinesis_payload = record["kinesis"]["data"]
-            decoded_payload = base64.b64decode(kinesis_payload).decode("utf-8")
-            incoming_message_body = json.loads(decoded_payload, use_decimal=True)
+            incoming_message_body = decode_message(base64.b64decode(kinesis_payload))
 
             file_key = incoming_message_body.get("file_key")
             created_at_formatted_string = incoming_message_body.get("created_at_formatted_string")
@@ -80,43 +138,43 @@ def forward_lambda_handler(event, _):
                 "vaccine_type": incoming_message_body.get("vax_type"),
             }
             # TODO: Move section above here into own try-except block
+            array_of_messages.append(base_outgoing_message_body)
+            outcomes.append(None)
 
             if incoming_diagnostics := incoming_message_body.get("diagnostics"):
                 raise RecordProcessorError(incoming_diagnostics)
 
-            if not (fhir_json := incoming_message_body.get("fhir_json")):
+            if not incoming_message_body.get("fhir_json"):
                 raise MessageNotSuccessfulError("Server error - FHIR JSON not correctly sent to forwarder")
 
-            # Check if the identifier is already present in the array
-            identifier_already_present = False
-            identifier_system = fhir_json["identifier"][0]["system"]
-            identifier_value = fhir_json["identifier"][0]["value"]
-            identifier = f"{identifier_system}#{identifier_value}"
-            if identifier in array_of_identifiers:
-                identifier_already_present = True
-                delay_milliseconds = 30  # Delay time in milliseconds
-                time.sleep(delay_milliseconds / 1000)  # TODO: What is the purpose of this delay?
-            else:
-                array_of_identifiers.append(identifier)
-
-            imms_id = forward_request_to_dynamo(incoming_message_body, table, identifier_already_present, controller)
-            array_of_messages.append({**base_outgoing_message_body, "imms_id": imms_id})
+            forwardable_rows.append((len(array_of_messages) - 1, incoming_message_body))
 
         except Exception as error:  # pylint: disable = broad-exception-caught
-            array_of_messages.append(
-                {**base_outgoing_message_body, "diagnostics": create_diagnostics_dictionary(error)}
-            )
-            logger.error("Error processing message: %s", error)
-
-    # Send to SQS
-    sqs_message_body = json.dumps(array_of_messages)
-    message_len = len(sqs_message_body)
-    logger.info(f"total message length:{message_len}")
-    message_group_id = f"{file_key}_{created_at_formatted_string}"
-    if message_len < 256 * 1024:
-        sqs_client.send_message(QueueUrl=QUEUE_URL, MessageBody=sqs_message_body, MessageGroupId=message_group_id)
-    else:
-        logger.info("Message size exceeds 256 KB limit.Sending to sqs failed")
+            if len(array_of_messages) == record_index:
+                array_of_messages.append(base_outgoing_message_body)
+                outcomes.append(None)
+            outcomes[record_index] = error
+
+    try:
+        forwarded_outcomes = forward_requests_to_dynamo(
+            [message_body for _, message_body in forwardable_rows], table, controller
+        )
+    except Exception as error:  # pylint: disable = broad-exception-caught
+        forwarded_outcomes = [error] * len(forwardable_rows)
+    for (index, _), outcome in zip(forwardable_rows, forwarded_outcomes):
+        outcomes[index] = outcome
+
+    for index, outcome in enumerate(outcomes):
+        if isinstance(outcome, Exception):
+            array_of_messages[index] = {
+                **array_of_messages[index],
+                "diagnostics": create_diagnostics_dictionary(outcome),
+            }
+            logger.error("Error processing message: %s", outcome)
+        else:
+            array_of_messages[index] = {**array_of_messages[index], "imms_id": outcome}
+
+    send_to_ack_queue(array_of_messages, message_group_id=f"{file_key}_{created_at_formatted_string}")
 
 
 if __name__ == "__main__":
@@ -1,17 +1,23 @@
 import json
 import logging
+import os
 import time
 from datetime import datetime
 from functools import wraps
 
-from log_firehose import FirehoseLogger
+import boto3
+from botocore.config import Config
+
+from common.log_firehose import FirehoseLogger
 
 logging.basicConfig()
 logger = logging.getLogger()
 logger.setLevel("INFO")
 
 
-firehose_logger = FirehoseLogger()
+firehose_logger = FirehoseLogger(
+    os.getenv("SPLUNK_FIREHOSE_NAME"), boto3.client("firehose", config=Config(region_name="eu-west-2"))
+)
 
 
 def function_info(func):
@@ -82,5 +88,8 @@ def function_info(func):
             firehose_log["event"] = log_data
             firehose_logger.send_log(firehose_log)
             raise
+        finally:
+            # The logs are sent in batches, so any remaining logs must be sent before the lambda is frozen
+            firehose_logger.flush()
 
     return wrapper
@@ -17,6 +17,7 @@ class Code(str, Enum):
     invariant = "invariant"
     not_supported = "not-supported"
     duplicate = "duplicate"
+    conflict = "conflict"
     # Added an unauthorized code its used when returning a response for an unauthorized vaccine type search.
     unauthorized = "unauthorized"
 
@@ -98,6 +99,47 @@ class ResourceFoundError(RuntimeError):
         )
 
 
+@dataclass
+class ResourceVersionConflictError(RuntimeError):
+    """Return this error when the stored FHIR resource's version changed before it could be updated"""
+
+    resource_type: str
+    resource_id: str
+
+    def __str__(self):
+        return f"The requested {self.resource_type} resource {self.resource_id} has changed since the last retrieve."
+
+    def to_operation_outcome(self) -> dict:
+        return create_operation_outcome(
+            resource_id=str(uuid.uuid4()),
+            severity=Severity.error,
+            code=Code.conflict,
+            diagnostics=self.__str__(),
+        )
+
+
+@dataclass
+class ResourceStateConflictError(RuntimeError):
+    """Return this error when the stored FHIR resource was deleted or reinstated before it could be updated"""
+
+    resource_type: str
+    resource_id: str
+
+    def __str__(self):
+        return (
+            f"The requested {self.resource_type} resource {self.resource_id} has been deleted or reinstated since "
+            "the last retrieve."
+        )
+
+    def to_operation_outcome(self) -> dict:
+        return create_operation_outcome(
+            resource_id=str(uuid.uuid4()),
+            severity=Severity.error,
+            code=Code.conflict,
+            diagnostics=self.__str__(),
+        )
+
+
 @dataclass
 class UnhandledResponseError(RuntimeError):
     """Use this error when the response from an external service (ex: dynamodb) can't be handled"""
@@ -1,4 +1,9 @@
+import logging
 from enum import StrEnum
+from functools import lru_cache
+
+logger = logging.getLogger()
+
 
 class ApiOperationCode(StrEnum):
     CREATE = "c"
@@ -7,23 +12,51 @@ class ApiOperationCode(StrEnum):
     DELETE = "d"
     SEARCH = "s"
 
-def _expand_permissions(permissions: list[str]) -> dict[str, list[ApiOperationCode]]:
-    expanded_permissions = {}
-    for permission in permissions:
-        vaccine_type, operation_codes_str = permission.split(".", maxsplit=1)
-        vaccine_type = vaccine_type.lower()
-        operation_codes = [
-            operation_code
-            for operation_code in operation_codes_str.lower()
-            if operation_code in list(ApiOperationCode)
-        ]
-        expanded_permissions[vaccine_type] = operation_codes
-    return expanded_permissions
+
+_OPERATION_CODE_BITS = {operation_code: 1 << i for i, operation_code in enumerate(ApiOperationCode)}
+
+
+class CompiledPermissions:
+    """
+    A supplier's permissions, e.g. ["COVID19.CRUDS", "FLU.CR"], compiled into a map of lower case vaccine type to a
+    bitmask of the permitted operation codes, so that checks don't need to re-parse the permission strings.
+    """
+
+    def __init__(self, permissions: tuple[str, ...]):
+        self.operation_masks: dict[str, int] = {}
+        for permission in permissions:
+            vaccine_type, operation_codes_str = permission.split(".", maxsplit=1)
+            self.operation_masks[vaccine_type.lower()] = sum(
+                _OPERATION_CODE_BITS[operation_code]
+                for operation_code in set(operation_codes_str.lower())
+                if operation_code in _OPERATION_CODE_BITS
+            )
+
+    def allows(self, operation: ApiOperationCode, vaccine_type: str) -> bool:
+        return bool(self.operation_masks.get(vaccine_type.lower(), 0) & _OPERATION_CODE_BITS[operation])
+
+    def permitted_vaccine_types(self, operation: ApiOperationCode, vaccine_types: list[str]) -> list[str]:
+        """Returns the given vaccine types for which the operation is permitted"""
+        return [vaccine_type for vaccine_type in vaccine_types if self.allows(operation, vaccine_type)]
+
+
+@lru_cache(maxsize=256)
+def _compile_permissions(permissions: tuple[str, ...]) -> CompiledPermissions:
+    return CompiledPermissions(permissions)
+
+
+def compile_permissions(permissions: list[str]) -> CompiledPermissions:
+    """Returns the compiled permissions, which are only compiled once for each distinct list of permissions"""
+    return _compile_permissions(tuple(permissions))
+
 
 def validate_permissions(permissions: list[str], operation: ApiOperationCode, vaccine_types: list[str]):
-    expanded_permissions = _expand_permissions(permissions)
-    print(f"operation: {operation}, expanded_permissions: {expanded_permissions}, vaccine_types: {vaccine_types}")
-    return all(
-        operation in expanded_permissions.get(vaccine_type.lower(), [])
-        for vaccine_type in vaccine_types
-    )
+    compiled_permissions = compile_permissions(permissions)
+    if logger.isEnabledFor(logging.DEBUG):
+        logger.debug(
+            "operation: %s, permissions: %s, vaccine_types: %s",
+            operation,
+            compiled_permissions.operation_masks,
+            vaccine_types,
+        )
+    return all(compiled_permissions.allows(operation, vaccine_type) for vaccine_type in vaccine_types)
@@ -1,5 +1,7 @@
 import base64
+import binascii
 import datetime
+import json
 from dataclasses import dataclass
 
 from aws_lambda_typing.events import APIGatewayProxyEventV1
@@ -22,6 +24,9 @@ date_from_default = datetime.date(1900, 1, 1)
 date_to_key = "-date.to"
 date_to_default = datetime.date(9999, 12, 31)
 include_key = "_include"
+count_key = "_count"
+page_token_key = "-page.token"
+page_token_key_attributes = {"PK", "PatientPK", "PatientSK"}
 
 
 @dataclass
@@ -31,6 +36,8 @@ class SearchParams:
     date_from: Optional[datetime.date]
     date_to: Optional[datetime.date]
     include: Optional[str]
+    count: Optional[int] = None
+    page_start_keys: Optional[dict] = None
 
     def __repr__(self):
         return str(self.__dict__)
@@ -145,7 +152,73 @@ def process_search_params(params: ParamContainer) -> SearchParams:
     includes = params.get(include_key, [])
     include = includes[0] if len(includes) > 0 else None
 
-    return SearchParams(patient_identifier, vaccine_types, date_from, date_to, include)
+    # _count
+    counts = params.get(count_key, [])
+
+    if len(counts) > 1:
+        raise ParameterException(f"Search parameter {count_key} may have one value at most.")
+
+    try:
+        count = int(counts[0]) if len(counts) == 1 else None
+    except ValueError:
+        count = 0
+    if count is not None and count < 1:
+        raise ParameterException(f"Search parameter {count_key} must be a positive integer.")
+
+    # page token
+    page_tokens = params.get(page_token_key, [])
+
+    if len(page_tokens) > 1:
+        raise ParameterException(f"Search parameter {page_token_key} may have one value at most.")
+
+    page_start_keys = None
+    if len(page_tokens) == 1:
+        if count is None:
+            raise ParameterException(f"Search parameter {page_token_key} must be used with {count_key}")
+        page_start_keys = decode_page_token(page_tokens[0])
+        if not _is_valid_page_start_keys(page_start_keys, patient_identifier, vaccine_types):
+            raise ParameterException(f"Search parameter {page_token_key} is invalid.")
+
+    return SearchParams(patient_identifier, vaccine_types, date_from, date_to, include, count, page_start_keys)
+
+
+def encode_page_token(page_start_keys: dict) -> str:
+    """Encodes the DynamoDB ExclusiveStartKey of each outstanding vaccine type as an opaque, URL safe token"""
+    token_json = json.dumps(page_start_keys, sort_keys=True, separators=(",", ":"))
+    return base64.urlsafe_b64encode(token_json.encode("utf-8")).decode("utf-8").rstrip("=")
+
+
+def decode_page_token(page_token: str) -> dict:
+    """Decodes a token created by encode_page_token.
+
+    :raises ParameterException:
+    """
+    try:
+        padding = "=" * (-len(page_token) % 4)
+        page_start_keys = json.loads(base64.urlsafe_b64decode(page_token + padding).decode("utf-8"))
+    except (binascii.Error, UnicodeDecodeError, ValueError):
+        raise ParameterException(f"Search parameter {page_token_key} is invalid.")
+
+    if not isinstance(page_start_keys, dict):
+        raise ParameterException(f"Search parameter {page_token_key} is invalid.")
+
+    return page_start_keys
+
+
+def _is_valid_page_start_keys(page_start_keys: dict, patient_identifier: str, vaccine_types: list[str]) -> bool:
+    """Checks that each start key belongs to this search, i.e. to the same patient and a requested vaccine type"""
+    for vaccine_type, start_key in page_start_keys.items():
+        if vaccine_type not in vaccine_types:
+            return False
+        if start_key is None:
+            continue
+        if not isinstance(start_key, dict) or set(start_key.keys()) != page_token_key_attributes:
+            return False
+        if start_key["PatientPK"] != f"Patient#{patient_identifier}":
+            return False
+        if not str(start_key["PatientSK"]).startswith(f"{vaccine_type}#"):
+            return False
+    return True
 
 
 def create_query_string(search_params: SearchParams) -> str:
@@ -159,6 +232,10 @@ def create_query_string(search_params: SearchParams) -> str:
           if search_params.date_to and search_params.date_to != date_to_default else []),
         *([(include_key, search_params.include)]
           if search_params.include else []),
+        *([(count_key, str(search_params.count))]
+          if search_params.count else []),
+        *([(page_token_key, encode_page_token(search_params.page_start_keys))]
+          if search_params.page_start_keys else []),
     ]
     search_params_qs = urlencode(sorted(params, key=lambda x: x[0]), safe=",")
     return search_params_qs
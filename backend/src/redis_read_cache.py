@@ -0,0 +1,82 @@
+"""Process-local read-through cache for Redis hash reads"""
+
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Optional
+
+
+class RedisReadCache:
+    """
+    Read-through cache in front of a Redis client, so that warm Lambda containers don't make a network round-trip for
+    every lookup of the (rarely changing) config held in Redis.
+
+    Cached reads are keyed by command, hash name and field. Entries expire after `ttl_seconds`, and the least recently
+    used entry is evicted once there are `max_entries`. The whole cache is also cleared whenever the version stored at
+    `version_key` (which redis_sync increments each time it uploads config) changes. The version is checked at most
+    once every `version_check_interval_seconds`. Any other attribute is passed through to the Redis client uncached.
+    """
+
+    def __init__(
+        self,
+        redis_client,
+        version_key: str,
+        ttl_seconds: float = 300,
+        max_entries: int = 1024,
+        version_check_interval_seconds: float = 10,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        self.redis_client = redis_client
+        self.version_key = version_key
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self.version_check_interval_seconds = version_check_interval_seconds
+        self.clock = clock
+        self._entries: OrderedDict[tuple, tuple[Any, float]] = OrderedDict()
+        self._version: Optional[str] = None
+        self._version_checked_at: Optional[float] = None
+        self._lock = threading.Lock()
+
+    def hget(self, name: str, key: str) -> Optional[str]:
+        return self._get(("hget", name, key), lambda: self.redis_client.hget(name, key))
+
+    def hkeys(self, name: str) -> list[str]:
+        return self._get(("hkeys", name), lambda: self.redis_client.hkeys(name))
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def __getattr__(self, name):
+        return getattr(self.redis_client, name)
+
+    def _get(self, cache_key: tuple, read_from_redis: Callable[[], Any]) -> Any:
+        now = self.clock()
+        self._check_version(now)
+
+        with self._lock:
+            if (entry := self._entries.get(cache_key)) is not None and entry[1] > now:
+                self._entries.move_to_end(cache_key)
+                return entry[0]
+
+        value = read_from_redis()
+
+        with self._lock:
+            self._entries[cache_key] = (value, now + self.ttl_seconds)
+            self._entries.move_to_end(cache_key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+        return value
+
+    def _check_version(self, now: float):
+        """Clears the cache if the config version in Redis has changed since it was last checked"""
+        if self._version_checked_at is not None and now - self._version_checked_at < self.version_check_interval_seconds:
+            return
+
+        version = self.redis_client.get(self.version_key)
+        with self._lock:
+            if version != self._version:
+                self._entries.clear()
+            self._version = version
+            self._version_checked_at = now
@@ -0,0 +1,39 @@
+import unittest
+
+import boto3
+from moto import mock_aws
+
+from backfill_identifier_sentinels import backfill_identifier_sentinels
+
+
+@mock_aws
+class TestBackfillIdentifierSentinels(unittest.TestCase):
+    def setUp(self):
+        dynamodb = boto3.resource("dynamodb", region_name="eu-west-2")
+        self.table = dynamodb.create_table(
+            TableName="test-immunization-table",
+            KeySchema=[{"AttributeName": "PK", "KeyType": "HASH"}],
+            AttributeDefinitions=[{"AttributeName": "PK", "AttributeType": "S"}],
+            BillingMode="PAY_PER_REQUEST",
+        )
+
+    def test_backfill_writes_missing_sentinels(self):
+        """it should reserve the identifier of each Immunization which doesn't already have a sentinel"""
+        self.table.put_item(Item={"PK": "Immunization#id-1", "IdentifierPK": "system#value-1", "Version": 1})
+        self.table.put_item(Item={"PK": "Immunization#id-2", "IdentifierPK": "system#value-2", "Version": 1})
+        self.table.put_item(Item={"PK": "Identifier#system#value-2", "ImmunizationPK": "Immunization#id-2"})
+
+        sentinels_written = backfill_identifier_sentinels(self.table)
+
+        self.assertEqual(sentinels_written, 1)
+        self.assertEqual(
+            self.table.get_item(Key={"PK": "Identifier#system#value-1"})["Item"],
+            {"PK": "Identifier#system#value-1", "ImmunizationPK": "Immunization#id-1"},
+        )
+
+    def test_backfill_is_idempotent(self):
+        """it should not write any sentinels when it is re-run"""
+        self.table.put_item(Item={"PK": "Immunization#id-1", "IdentifierPK": "system#value-1", "Version": 1})
+        backfill_identifier_sentinels(self.table)
+
+        self.assertEqual(backfill_identifier_sentinels(self.table), 0)
@@ -1,6 +1,7 @@
+import threading
 import unittest
 import uuid
-from unittest.mock import Mock, create_autospec
+from unittest.mock import ANY, Mock, create_autospec
 from tests.utils.immunization_utils import create_covid_19_immunization
 from fhir_batch_service import ImmunizationBatchService
 from fhir_batch_repository import ImmunizationBatchRepository
@@ -356,7 +357,126 @@ class TestDeleteImmunizationBatchController(unittest.TestCase):
             table=self.mock_table,
             is_present=True
         )
-    
+
+
+class TestSendRequestsImmunizationBatchController(unittest.TestCase):
+
+    def setUp(self):
+        self.mock_repo = create_autospec(ImmunizationBatchRepository)
+        self.mock_service = create_autospec(ImmunizationBatchService)
+        self.mock_table = Mock()
+        self.controller = ImmunizationBatchController(
+            immunization_repo=self.mock_repo,
+            fhir_service=self.mock_service
+        )
+
+    def test_send_requests_to_dynamo(self):
+        """it should create together, look up the updates and deletes together, and return outcomes in order"""
+
+        create_imms = create_covid_19_immunization(str(uuid.uuid4())).dict()
+        update_imms = create_covid_19_immunization(str(uuid.uuid4())).dict()
+        update_imms["identifier"][0]["value"] = "update-value"
+        delete_imms = create_covid_19_immunization(str(uuid.uuid4())).dict()
+        delete_imms["identifier"][0]["value"] = "delete-value"
+        message_bodies = [
+            {"supplier": "test_supplier", "fhir_json": update_imms, "vax_type": "test_vax", "operation_requested": "UPDATE"},
+            {"supplier": "test_supplier", "fhir_json": create_imms, "vax_type": "test_vax", "operation_requested": "CREATE"},
+            {"supplier": "test_supplier", "fhir_json": delete_imms, "vax_type": "test_vax", "operation_requested": "DELETE"},
+        ]
+        system = update_imms["identifier"][0]["system"]
+        update_record = {"PK": "Immunization#update-id", "IdentifierPK": f"{system}#update-value", "Version": 1}
+        not_found = ResourceNotFoundError(resource_type="Immunization", resource_id="delete-value")
+        self.mock_service.create_immunizations.return_value = ["create-id"]
+        self.mock_repo.get_immunizations_by_identifiers.return_value = {f"{system}#update-value": update_record}
+        self.mock_service.update_immunization.return_value = "update-id"
+        self.mock_service.delete_immunization.side_effect = not_found
+
+        outcomes = self.controller.send_requests_to_dynamo(message_bodies, self.mock_table)
+
+        self.assertEqual(outcomes, ["update-id", "create-id", not_found])
+        self.mock_service.create_immunizations.assert_called_once_with(
+            [(create_imms, "test_supplier", "test_vax")], self.mock_table, ANY
+        )
+        self.mock_repo.get_immunizations_by_identifiers.assert_called_once_with(
+            [f"{system}#update-value", f"{system}#delete-value"], self.mock_table
+        )
+        self.mock_service.update_immunization.assert_called_once_with(
+            immunization=update_imms,
+            supplier_system="test_supplier",
+            vax_type="test_vax",
+            table=self.mock_table,
+            is_present=False,
+            existing_records={f"{system}#update-value": update_record},
+        )
+
+    def test_send_requests_to_dynamo_same_identifier_in_order(self):
+        """it should apply requests for the same identifier in order, using the batch's view of the Immunization"""
+
+        imms = create_covid_19_immunization(str(uuid.uuid4())).dict()
+        identifier = f"{imms['identifier'][0]['system']}#{imms['identifier'][0]['value']}"
+        message_bodies = [
+            {"supplier": "test_supplier", "fhir_json": imms, "vax_type": "test_vax", "operation_requested": operation}
+            for operation in ["CREATE", "UPDATE", "DELETE"]
+        ]
+        created_record = {"PK": "Immunization#created-id", "IdentifierPK": identifier, "Version": 1}
+
+        def create_immunizations(_immunizations, _table, existing_records):
+            existing_records[identifier] = created_record
+            return ["Immunization#created-id"]
+
+        self.mock_service.create_immunizations.side_effect = create_immunizations
+        self.mock_service.update_immunization.return_value = "Immunization#created-id"
+        self.mock_service.delete_immunization.return_value = "Immunization#created-id"
+
+        outcomes = self.controller.send_requests_to_dynamo(message_bodies, self.mock_table)
+
+        self.assertEqual(outcomes, ["Immunization#created-id"] * 3)
+        self.mock_repo.get_immunizations_by_identifiers.assert_not_called()
+        for service_method in [self.mock_service.update_immunization, self.mock_service.delete_immunization]:
+            self.assertEqual(service_method.call_args.kwargs["existing_records"], {identifier: created_record})
+
+    def test_send_requests_to_dynamo_rereads_after_failed_write(self):
+        """it should read an identifier's Immunization again after a failed write for that identifier"""
+
+        imms = create_covid_19_immunization(str(uuid.uuid4())).dict()
+        message_bodies = [
+            {"supplier": "test_supplier", "fhir_json": imms, "vax_type": "test_vax", "operation_requested": operation}
+            for operation in ["CREATE", "UPDATE"]
+        ]
+        duplicate = IdentifierDuplicationError(identifier="duplicate")
+        self.mock_service.create_immunizations.return_value = [duplicate]
+        self.mock_repo.get_immunizations_by_identifiers.return_value = {}
+        self.mock_service.update_immunization.return_value = "update-id"
+
+        outcomes = self.controller.send_requests_to_dynamo(message_bodies, self.mock_table)
+
+        self.assertEqual(outcomes, [duplicate, "update-id"])
+        self.mock_repo.get_immunizations_by_identifiers.assert_called_once()
+
+    def test_send_requests_to_dynamo_sends_round_concurrently(self):
+        """it should send the requests in a round concurrently, returning their outcomes in the original order"""
+
+        barrier = threading.Barrier(3, timeout=5)
+
+        def update_immunization(immunization, **_):
+            barrier.wait()
+            return immunization["identifier"][0]["value"]
+
+        message_bodies = []
+        for value in ["value-1", "value-2", "value-3"]:
+            imms = create_covid_19_immunization(str(uuid.uuid4())).dict()
+            imms["identifier"][0]["value"] = value
+            message_bodies.append(
+                {"supplier": "test_supplier", "fhir_json": imms, "vax_type": "test_vax", "operation_requested": "UPDATE"}
+            )
+        self.mock_repo.get_immunizations_by_identifiers.return_value = {}
+        self.mock_service.update_immunization.side_effect = update_immunization
+
+        outcomes = self.controller.send_requests_to_dynamo(message_bodies, self.mock_table)
+
+        self.assertEqual(outcomes, ["value-1", "value-2", "value-3"])
+        self.mock_service.create_immunizations.assert_not_called()
+
 
 if __name__ == '__main__':
-    unittest.main()
\ No newline at end of file
+    unittest.main()
@@ -25,10 +25,13 @@ class TestImmunizationBatchRepository(unittest.TestCase):
         self.table = MagicMock()
         self.table.wait_until_exists()
         self.repository = ImmunizationBatchRepository()
-        self.table.put_item = MagicMock(return_value={"ResponseMetadata": {"HTTPStatusCode": 200}})
+        self.table.meta.client.transact_write_items = MagicMock(
+            return_value={"ResponseMetadata": {"HTTPStatusCode": 200}}
+        )
+        self.table.get_item = MagicMock(return_value={})
         self.table.query = MagicMock(return_value={})
         self.immunization = create_covid_19_immunization_dict(imms_id)
-        self.table.update_item = MagicMock(return_value = {"ResponseMetadata": {"HTTPStatusCode": 200}})
+        self.table.meta.client.update_item = MagicMock(return_value = {"ResponseMetadata": {"HTTPStatusCode": 200}})
         self.redis_patcher = patch("models.utils.validation_utils.redis_client")
         self.mock_redis_client = self.redis_patcher.start()
 
@@ -54,22 +57,32 @@ class TestCreateImmunization(TestImmunizationBatchRepository):
         self.repository.create_immunization(
             self.immunization, "supplier", "vax-type", self.table, is_present
         )
-        item = self.table.put_item.call_args.kwargs["Item"]
-
-        self.table.put_item.assert_called_with(
-            Item={
-                "PK": ANY,
-                "PatientPK": ANY,
-                "PatientSK": ANY,
-                "Resource": json.dumps(self.immunization, use_decimal=True),
-                "IdentifierPK": ANY,
-                "Operation": "CREATE",
-                "Version": 1,
-                "SupplierSystem": "supplier",
+        transact_items = self.table.meta.client.transact_write_items.call_args.kwargs["TransactItems"]
+        item = transact_items[1]["Put"]["Item"]
+
+        self.assertEqual(
+            transact_items[1]["Put"],
+            {
+                "TableName": self.table.name,
+                "Item": {
+                    "PK": ANY,
+                    "PatientPK": ANY,
+                    "PatientSK": ANY,
+                    "Resource": json.dumps(self.immunization, use_decimal=True),
+                    "IdentifierPK": ANY,
+                    "Operation": "CREATE",
+                    "Version": 1,
+                    "SupplierSystem": "supplier",
+                },
+                "ConditionExpression": "attribute_not_exists(PK)",
             },
-            ConditionExpression=ANY
         )
         self.assertEqual(item["PK"], f'Immunization#{self.immunization["id"]}')
+        self.assertEqual(
+            transact_items[0]["Put"]["Item"],
+            {"PK": f"Identifier#{item['IdentifierPK']}", "ImmunizationPK": item["PK"]},
+        )
+        self.table.query.assert_not_called()
 
     def test_create_immunization_with_nhs_number(self):
         """Test creating Immunization with NHS number."""
@@ -82,23 +95,23 @@ class TestCreateImmunization(TestImmunizationBatchRepository):
 
 
     def test_create_immunization_duplicate(self):
-        """it should not create Immunization since the request is duplicate"""
-        self.table.query = MagicMock(return_value={
-            "id": imms_id,
-            "identifier": [{"system": "test-system", "value": "12345"}],
-            "contained": [{"resourceType": "Patient", "identifier": [{"value": "98765"}]}],
-            "Count": 1
-        })
+        """it should not create Immunization since the identifier is already reserved"""
+        self.table.meta.client.transact_write_items.side_effect = botocore.exceptions.ClientError(
+            {
+                "Error": {"Code": "TransactionCanceledException"},
+                "CancellationReasons": [{"Code": "ConditionalCheckFailed"}, {"Code": "None"}],
+            },
+            "TransactWriteItems",
+        )
         with self.assertRaises(IdentifierDuplicationError):
             self.repository.create_immunization(self.immunization, "supplier", "vax-type", self.table, False)
-        self.table.put_item.assert_not_called()  
 
     def test_create_should_catch_dynamo_error(self):
         """it should throw UnhandledResponse when the response from dynamodb can't be handled"""
 
         bad_request = 400
         response = {"ResponseMetadata": {"HTTPStatusCode": bad_request}}
-        self.table.put_item = MagicMock(return_value=response)
+        self.table.meta.client.transact_write_items = MagicMock(return_value=response)
         with self.assertRaises(UnhandledResponseError) as e:
             self.repository.create_immunization(self.immunization, "supplier", "vax-type", self.table, False)
         self.assertDictEqual(e.exception.response, response)  
@@ -108,15 +121,22 @@ class TestCreateImmunization(TestImmunizationBatchRepository):
         """it should throw UnhandledResponse when the response from dynamodb can't be handled"""
 
         response = {'Error': {'Code': 'InternalServerError'}}
-        with unittest.mock.patch.object(self.table, 'put_item', side_effect=botocore.exceptions.ClientError({"Error": {"Code": "InternalServerError"}}, "PutItem")):
+        with unittest.mock.patch.object(self.table.meta.client, 'transact_write_items', side_effect=botocore.exceptions.ClientError({"Error": {"Code": "InternalServerError"}}, "TransactWriteItems")):
             with self.assertRaises(UnhandledResponseError) as e:
                 self.repository.create_immunization(self.immunization, "supplier", "vax-type", self.table, False)
         self.assertDictEqual(e.exception.response, response)
 
     def test_create_immunization_conditionalcheckfailedexception_error(self):
-        """it should throw UnhandledResponse when the response from dynamodb can't be handled"""
+        """it should throw ResourceFoundError when the Immunization already exists"""
 
-        with unittest.mock.patch.object(self.table, 'put_item', side_effect=botocore.exceptions.ClientError({"Error": {"Code": "ConditionalCheckFailedException"}}, "PutItem")):
+        error = botocore.exceptions.ClientError(
+            {
+                "Error": {"Code": "TransactionCanceledException"},
+                "CancellationReasons": [{"Code": "None"}, {"Code": "ConditionalCheckFailed"}],
+            },
+            "TransactWriteItems",
+        )
+        with unittest.mock.patch.object(self.table.meta.client, 'transact_write_items', side_effect=error):
             with self.assertRaises(ResourceFoundError):
                 self.repository.create_immunization(self.immunization, "supplier", "vax-type", self.table, False)              
         
@@ -183,7 +203,8 @@ class TestUpdateImmunization(TestImmunizationBatchRepository):
                     }
                     expected_values.update(case["expected_extra_values"])
                     
-                    self.table.update_item.assert_called_with(
+                    self.table.meta.client.update_item.assert_called_with(
+                        TableName=self.table.name,
                         Key={"PK": _make_immunization_pk(imms_id)},
                         UpdateExpression=ANY,
                         ExpressionAttributeNames={"#imms_resource": "Resource"},
@@ -193,19 +214,53 @@ class TestUpdateImmunization(TestImmunizationBatchRepository):
                     )
                     self.assertEqual(response, f'Immunization#{self.immunization["id"]}')
     
+    def test_update_immunization_found_by_identifier_sentinel(self):
+        """it should find the Immunization from its identifier sentinel with consistent reads, without querying"""
+        identifier = f"{self.immunization['identifier'][0]['system']}#{self.immunization['identifier'][0]['value']}"
+        sentinel = {"PK": f"Identifier#{identifier}", "ImmunizationPK": _make_immunization_pk(imms_id)}
+        record = {"PK": _make_immunization_pk(imms_id), "Resource": json.dumps(self.immunization), "Version": 1}
+        self.table.get_item = MagicMock(side_effect=[{"Item": sentinel}, {"Item": record}])
+
+        response = self.repository.update_immunization(self.immunization, "supplier", "vax-type", self.table, True)
+
+        self.assertEqual(response, _make_immunization_pk(imms_id))
+        self.table.get_item.assert_any_call(Key={"PK": f"Identifier#{identifier}"}, ConsistentRead=True)
+        self.table.get_item.assert_any_call(Key={"PK": _make_immunization_pk(imms_id)}, ConsistentRead=True)
+        self.table.query.assert_not_called()
+        self.assertEqual(self.table.meta.client.update_item.call_args.kwargs["ExpressionAttributeValues"][":version"], 2)
+
+    def test_update_immunization_uses_and_updates_existing_records(self):
+        """it should update the Immunization known in the batch without reading the table, then record its new state"""
+        identifier = f"{self.immunization['identifier'][0]['system']}#{self.immunization['identifier'][0]['value']}"
+        record = {"PK": _make_immunization_pk(imms_id), "IdentifierPK": identifier, "Version": 1}
+        updated_record = {**record, "Version": 2}
+        self.table.meta.client.update_item = MagicMock(
+            return_value={"ResponseMetadata": {"HTTPStatusCode": 200}, "Attributes": updated_record}
+        )
+        existing_records = {identifier: record}
+
+        response = self.repository.update_immunization(
+            self.immunization, "supplier", "vax-type", self.table, False, existing_records
+        )
+
+        self.assertEqual(response, _make_immunization_pk(imms_id))
+        self.table.get_item.assert_not_called()
+        self.table.query.assert_not_called()
+        self.assertEqual(existing_records, {identifier: updated_record})
+
     def test_update_immunization_not_found(self):
         """it should not update Immunization since the imms id not found"""
 
         with self.assertRaises(ResourceNotFoundError):
             self.repository.update_immunization(self.immunization, "supplier", "vax-type", self.table, False)
-        self.table.update_item.assert_not_called()
+        self.table.meta.client.update_item.assert_not_called()
 
     def test_update_should_catch_dynamo_error(self):
         """it should throw UnhandledResponse when the response from dynamodb can't be handled"""
 
         bad_request = 400
         response = {"ResponseMetadata": {"HTTPStatusCode": bad_request}}
-        self.table.update_item = MagicMock(return_value=response)
+        self.table.meta.client.update_item = MagicMock(return_value=response)
         self.table.query = MagicMock(return_value={
                     "Count": 1,
                     "Items": [{
@@ -223,7 +278,7 @@ class TestUpdateImmunization(TestImmunizationBatchRepository):
         """it should throw UnhandledResponse when the response from dynamodb can't be handled"""
 
         response = {'Error': {'Code': 'InternalServerError'}}
-        with unittest.mock.patch.object(self.table, 'update_item', side_effect=botocore.exceptions.ClientError({"Error": {"Code": "InternalServerError"}}, "UpdateItem")):
+        with unittest.mock.patch.object(self.table.meta.client, 'update_item', side_effect=botocore.exceptions.ClientError({"Error": {"Code": "InternalServerError"}}, "UpdateItem")):
             with self.assertRaises(UnhandledResponseError) as e:
                 self.table.query = MagicMock(return_value={
                     "Count": 1,
@@ -240,7 +295,7 @@ class TestUpdateImmunization(TestImmunizationBatchRepository):
     def test_update_immunization_conditionalcheckfailedexception_error(self):
         """it should throw UnhandledResponse when the response from dynamodb can't be handled"""
 
-        with unittest.mock.patch.object(self.table, 'update_item', side_effect=botocore.exceptions.ClientError({"Error": {"Code": "ConditionalCheckFailedException"}}, "UpdateItem")):
+        with unittest.mock.patch.object(self.table.meta.client, 'update_item', side_effect=botocore.exceptions.ClientError({"Error": {"Code": "ConditionalCheckFailedException"}}, "UpdateItem")):
             with self.assertRaises(ResourceNotFoundError) as e:
                 self.table.query = MagicMock(return_value={
                     "Count": 1,
@@ -268,7 +323,8 @@ class TestDeleteImmunization(TestImmunizationBatchRepository):
             )
         for is_present in [True, False]:
             response = self.repository.delete_immunization(self.immunization, "supplier", "vax-type", self.table, is_present)
-            self.table.update_item.assert_called_with(
+            self.table.meta.client.update_item.assert_called_with(
+                TableName=self.table.name,
                 Key={"PK": _make_immunization_pk(imms_id)},
                 UpdateExpression="SET DeletedAt = :timestamp, Operation = :operation, SupplierSystem = :supplier_system",
                 ExpressionAttributeValues={":timestamp": ANY, ":operation": "DELETE", ":supplier_system": "supplier"},
@@ -282,14 +338,14 @@ class TestDeleteImmunization(TestImmunizationBatchRepository):
 
         with self.assertRaises(ResourceNotFoundError):
             self.repository.delete_immunization(self.immunization, "supplier", "vax-type", self.table, False)
-        self.table.update_item.assert_not_called()
+        self.table.meta.client.update_item.assert_not_called()
 
     def test_delete_should_catch_dynamo_error(self):
         """it should throw UnhandledResponse when the response from dynamodb can't be handled"""
 
         bad_request = 400
         response = {"ResponseMetadata": {"HTTPStatusCode": bad_request}}
-        self.table.update_item = MagicMock(return_value=response)
+        self.table.meta.client.update_item = MagicMock(return_value=response)
         self.table.query = MagicMock(return_value={
                     "Count": 1,
                     "Items": [{
@@ -307,7 +363,7 @@ class TestDeleteImmunization(TestImmunizationBatchRepository):
         """it should throw UnhandledResponse when the response from dynamodb can't be handled"""
 
         response = {'Error': {'Code': 'InternalServerError'}}
-        with unittest.mock.patch.object(self.table, 'update_item', side_effect=botocore.exceptions.ClientError({"Error": {"Code": "InternalServerError"}}, "UpdateItem")):
+        with unittest.mock.patch.object(self.table.meta.client, 'update_item', side_effect=botocore.exceptions.ClientError({"Error": {"Code": "InternalServerError"}}, "UpdateItem")):
             with self.assertRaises(UnhandledResponseError) as e:
                 self.table.query = MagicMock(return_value={
                     "Count": 1,
@@ -324,7 +380,7 @@ class TestDeleteImmunization(TestImmunizationBatchRepository):
     def test_delete_immunization_conditionalcheckfailedexception_error(self):
         """it should throw UnhandledResponse when the response from dynamodb can't be handled"""
 
-        with unittest.mock.patch.object(self.table, 'update_item', side_effect=botocore.exceptions.ClientError({"Error": {"Code": "ConditionalCheckFailedException"}}, "UpdateItem")):
+        with unittest.mock.patch.object(self.table.meta.client, 'update_item', side_effect=botocore.exceptions.ClientError({"Error": {"Code": "ConditionalCheckFailedException"}}, "UpdateItem")):
             with self.assertRaises(ResourceNotFoundError) as e:
                 self.table.query = MagicMock(return_value={
                     "Count": 1,
@@ -337,6 +393,123 @@ class TestDeleteImmunization(TestImmunizationBatchRepository):
             )
                 self.repository.delete_immunization(self.immunization, "supplier", "vax-type", self.table, False)
 
+
+class TestCreateImmunizations(TestImmunizationBatchRepository):
+    def make_immunizations(self, count):
+        immunizations = []
+        for i in range(count):
+            immunization = create_covid_19_immunization_dict(str(uuid4()))
+            immunization["identifier"][0]["value"] = f"value-{i}"
+            immunizations.append((immunization, "supplier", "COVID19"))
+        return immunizations
+
+    def test_create_immunizations_in_chunked_transactions(self):
+        """it should create the Immunizations in transactions of up to 25 Immunizations, returning each PK in order"""
+        immunizations = self.make_immunizations(30)
+
+        outcomes = self.repository.create_immunizations(immunizations, self.table)
+
+        calls = self.table.meta.client.transact_write_items.call_args_list
+        self.assertEqual([len(call.kwargs["TransactItems"]) for call in calls], [50, 10])
+        self.assertEqual(outcomes, [f"Immunization#{immunization['id']}" for immunization, _, _ in immunizations])
+
+    def test_create_immunizations_retries_transaction_without_duplicates(self):
+        """it should give a duplicate its error and retry the transaction with the other Immunizations"""
+        immunizations = self.make_immunizations(3)
+        self.table.meta.client.transact_write_items.side_effect = [
+            botocore.exceptions.ClientError(
+                {
+                    "Error": {"Code": "TransactionCanceledException"},
+                    "CancellationReasons": [{"Code": "None"}, {"Code": "None"}, {"Code": "ConditionalCheckFailed"}]
+                    + [{"Code": "None"}] * 3,
+                },
+                "TransactWriteItems",
+            ),
+            {"ResponseMetadata": {"HTTPStatusCode": 200}},
+        ]
+
+        outcomes = self.repository.create_immunizations(immunizations, self.table)
+
+        retried_items = self.table.meta.client.transact_write_items.call_args_list[1].kwargs["TransactItems"]
+        self.assertEqual(len(retried_items), 4)
+        self.assertEqual(outcomes[0], f"Immunization#{immunizations[0][0]['id']}")
+        self.assertIsInstance(outcomes[1], IdentifierDuplicationError)
+        self.assertEqual(outcomes[2], f"Immunization#{immunizations[2][0]['id']}")
+
+    def test_create_immunizations_records_created_immunizations(self):
+        """it should add the created Immunizations to existing_records, keyed by identifier"""
+        immunizations = self.make_immunizations(2)
+        existing_records = {}
+
+        self.repository.create_immunizations(immunizations, self.table, existing_records)
+
+        identifiers = [
+            f"{imms['identifier'][0]['system']}#{imms['identifier'][0]['value']}" for imms, _, _ in immunizations
+        ]
+        self.assertEqual(list(existing_records), identifiers)
+        self.assertEqual(existing_records[identifiers[0]]["PK"], f"Immunization#{immunizations[0][0]['id']}")
+        self.assertEqual(existing_records[identifiers[0]]["Version"], 1)
+
+    def test_create_immunizations_unhandled_error(self):
+        """it should give each Immunization in the transaction an UnhandledResponseError"""
+        immunizations = self.make_immunizations(2)
+        self.table.meta.client.transact_write_items.side_effect = botocore.exceptions.ClientError(
+            {"Error": {"Code": "InternalServerError"}}, "TransactWriteItems"
+        )
+
+        outcomes = self.repository.create_immunizations(immunizations, self.table)
+
+        self.assertEqual(len(outcomes), 2)
+        for outcome in outcomes:
+            self.assertIsInstance(outcome, UnhandledResponseError)
+
+
+class TestGetImmunizationsByIdentifiers(TestImmunizationBatchRepository):
+    def test_get_immunizations_by_identifiers(self):
+        """it should find the Immunizations via their identifier sentinels, falling back to IdentifierGSI"""
+        self.table.name = "test-immunization-table"
+        sentinel = {"PK": "Identifier#system#value-1", "ImmunizationPK": "Immunization#id-1"}
+        item = {"PK": "Immunization#id-1", "IdentifierPK": "system#value-1", "Version": 1}
+        legacy_item = {"PK": "Immunization#id-2", "IdentifierPK": "system#value-2", "Version": 1}
+        self.table.meta.client.batch_get_item = MagicMock(
+            side_effect=[
+                {"Responses": {"test-immunization-table": [sentinel]}},
+                {"Responses": {"test-immunization-table": [item]}},
+            ]
+        )
+        self.table.query = MagicMock(side_effect=[{"Items": [legacy_item], "Count": 1}, {"Items": [], "Count": 0}])
+
+        immunizations = self.repository.get_immunizations_by_identifiers(
+            ["system#value-1", "system#value-2", "system#value-3"], self.table
+        )
+
+        self.assertEqual(immunizations, {"system#value-1": item, "system#value-2": legacy_item})
+        sentinel_request = self.table.meta.client.batch_get_item.call_args_list[0].kwargs["RequestItems"]
+        self.assertTrue(sentinel_request["test-immunization-table"]["ConsistentRead"])
+
+    @patch("fhir_batch_repository._retry_delay")
+    def test_get_immunizations_by_identifiers_retries_unprocessed_keys(self, _):
+        """it should retry the keys which dynamodb didn't process"""
+        self.table.name = "test-immunization-table"
+        sentinel = {"PK": "Identifier#system#value-1", "ImmunizationPK": "Immunization#id-1"}
+        item = {"PK": "Immunization#id-1", "IdentifierPK": "system#value-1", "Version": 1}
+        unprocessed = {"test-immunization-table": {"Keys": [{"PK": "Identifier#system#value-1"}]}}
+        self.table.meta.client.batch_get_item = MagicMock(
+            side_effect=[
+                {"Responses": {}, "UnprocessedKeys": unprocessed},
+                {"Responses": {"test-immunization-table": [sentinel]}},
+                {"Responses": {"test-immunization-table": [item]}},
+            ]
+        )
+
+        immunizations = self.repository.get_immunizations_by_identifiers(["system#value-1"], self.table)
+
+        self.assertEqual(immunizations, {"system#value-1": item})
+        self.assertEqual(
+            self.table.meta.client.batch_get_item.call_args_list[1].kwargs["RequestItems"], unprocessed
+        )
+
+
 @mock_aws
 @patch.dict(os.environ, {"DYNAMODB_TABLE_NAME": "TestTable"})
 class TestCreateTable(TestImmunizationBatchRepository):
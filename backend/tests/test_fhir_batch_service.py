@@ -96,6 +96,25 @@ class TestCreateImmunizationBatchService(TestFhirBatchServiceBase):
         self.mock_repo.create_immunization.assert_not_called() 
 
 
+    def test_create_immunizations_validation_error(self):
+        """it should create the valid Immunizations together, returning the validation error for the others"""
+
+        valid_imms = create_covid_19_immunization_dict_no_id()
+        invalid_imms = create_covid_19_immunization_dict_no_id()
+        invalid_imms["status"] = "not-completed"
+        self.mock_repo.create_immunizations.return_value = ["Immunization#id-1"]
+
+        outcomes = self.pre_validate_fhir_service.create_immunizations(
+            [(invalid_imms, "test_supplier", "test_vax"), (valid_imms, "test_supplier", "test_vax")], self.mock_table
+        )
+
+        self.assertIsInstance(outcomes[0], CustomValidationError)
+        self.assertEqual(outcomes[1], "Immunization#id-1")
+        self.mock_repo.create_immunizations.assert_called_once_with(
+            [(valid_imms, "test_supplier", "test_vax")], self.mock_table, None
+        )
+
+
 class TestUpdateImmunizationBatchService(TestFhirBatchServiceBase):
 
     def setUp(self):
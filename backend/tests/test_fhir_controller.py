@@ -6,7 +6,6 @@ import unittest
 import uuid
 
 from unittest.mock import patch
-from fhir.resources.R4B.bundle import Bundle
 from fhir.resources.R4B.immunization import Immunization
 from unittest.mock import create_autospec, ANY, patch, Mock
 from urllib.parse import urlencode
@@ -26,6 +25,8 @@ from models.errors import (
     UnauthorizedVaxError,
     UnauthorizedError,
     IdentifierDuplicationError,
+    ResourceVersionConflictError,
+    ResourceStateConflictError,
 )
 from tests.utils.immunization_utils import create_covid_19_immunization
 from parameter_parser import patient_identifier_system, process_search_params
@@ -1123,6 +1124,37 @@ class TestUpdateImmunization(unittest.TestCase):
         response = self.controller.update_immunization(aws_event)
         self.assertEqual(response["statusCode"], 422)
 
+    @patch("fhir_controller.get_supplier_permissions")
+    def test_update_immunization_conditional_write_failures(self, mock_get_supplier_permissions):
+        """it should map each reason for a failed conditional update to its status code"""
+        mock_get_supplier_permissions.return_value = ["COVID19.U"]
+        imms_id = "valid-id"
+        aws_event = {
+            "headers": {"E-Tag": 1, "SupplierSystem": "Test", "operation_requested": "update"},
+            "body": json.dumps({"id": imms_id}),
+            "pathParameters": {"id": imms_id},
+        }
+        self.service.get_immunization_by_id_all.return_value = {
+            "resource": "new_value",
+            "Version": 1,
+            "DeletedAt": False,
+            "Reinstated": False,
+            "VaccineType": "COVID19",
+        }
+        cases = [
+            (ResourceNotFoundError(resource_type="Immunization", resource_id=imms_id), 404),
+            (ResourceStateConflictError(resource_type="Immunization", resource_id=imms_id), 409),
+            (ResourceVersionConflictError(resource_type="Immunization", resource_id=imms_id), 412),
+        ]
+        for error, expected_status_code in cases:
+            with self.subTest(error=error):
+                self.service.update_immunization.side_effect = error
+
+                response = self.controller.update_immunization(aws_event)
+
+                self.assertEqual(response["statusCode"], expected_status_code)
+                self.assertEqual(json.loads(response["body"])["issue"][0]["diagnostics"], str(error))
+
     @patch("fhir_controller.get_supplier_permissions")
     def test_update_immunization_UnauthorizedVaxError(self, mock_get_supplier_permissions):
         """it should not update the Immunization record"""
@@ -1690,7 +1722,7 @@ class TestSearchImmunizations(TestFhirControllerBase):
     def test_get_search_immunizations(self, mock_get_supplier_permissions):
         """it should search based on patient_identifier and immunization_target"""
         mock_get_supplier_permissions.return_value = ["COVID19.S"]
-        search_result = Bundle.construct()
+        search_result = {"resourceType": "Bundle", "type": "searchset", "entry": [], "total": 0}
         self.service.search_immunizations.return_value = search_result
 
         vaccine_type = "COVID19"
@@ -1714,7 +1746,7 @@ class TestSearchImmunizations(TestFhirControllerBase):
         # Then
         mock_get_supplier_permissions.assert_called_once_with("test")
         self.service.search_immunizations.assert_called_once_with(
-            self.nhs_number_valid_value, [vaccine_type], params, ANY, ANY
+            self.nhs_number_valid_value, [vaccine_type], params, ANY, ANY, None, None
         )
         self.assertEqual(response["statusCode"], 200)
         body = json.loads(response["body"])
@@ -1724,7 +1756,7 @@ class TestSearchImmunizations(TestFhirControllerBase):
     def test_get_search_immunizations_vax_permission_check(self, mock_get_supplier_permissions):
         """it should search based on patient_identifier and immunization_target"""
         mock_get_supplier_permissions.return_value = []
-        search_result = Bundle.construct()
+        search_result = {"resourceType": "Bundle", "type": "searchset", "entry": [], "total": 0}
         self.service.search_immunizations.return_value = search_result
 
         vaccine_type = "COVID19"
@@ -1747,8 +1779,7 @@ class TestSearchImmunizations(TestFhirControllerBase):
         """it should return 200 and contains warning operation outcome as the user is not having authorization for one of the vaccine type"""
         search_result = load_json_data("sample_immunization_response _for _not_done_event.json")
         mock_get_supplier_permissions.return_value = ["covid19.S"]
-        bundle = Bundle.parse_obj(search_result)
-        self.service.search_immunizations.return_value = bundle
+        self.service.search_immunizations.return_value = search_result
 
         vaccine_type = ["COVID19", "FLU"]
         vaccine_type = ",".join(vaccine_type)
@@ -1777,8 +1808,7 @@ class TestSearchImmunizations(TestFhirControllerBase):
         """it should return 400 as the the request is having invalid vaccine type"""
         search_result = load_json_data("sample_immunization_response _for _not_done_event.json")
         mock_get_supplier_permissions.return_value = ["covid19.S"]
-        bundle = Bundle.parse_obj(search_result)
-        self.service.search_immunizations.return_value = bundle
+        self.service.search_immunizations.return_value = search_result
 
         vaccine_type = "FLUE"
 
@@ -1800,9 +1830,8 @@ class TestSearchImmunizations(TestFhirControllerBase):
     def test_get_search_immunizations_for_unauthorized_vaccine_type_search_403(self, mock_get_supplier_permissions):
         """it should return 403 as the user doesnt have vaccinetype permission"""
         search_result = load_json_data("sample_immunization_response _for _not_done_event.json")
-        bundle = Bundle.parse_obj(search_result)
         mock_get_supplier_permissions.return_value = []
-        self.service.search_immunizations.return_value = bundle
+        self.service.search_immunizations.return_value = search_result
 
         vaccine_type = "COVID19,FLU"
         lambda_event = {
@@ -1823,7 +1852,7 @@ class TestSearchImmunizations(TestFhirControllerBase):
     @patch("fhir_controller.get_supplier_permissions")
     def test_get_search_immunizations_unauthorized(self, mock_get_supplier_permissions):
         """it should search based on patient_identifier and immunization_target"""
-        search_result = Bundle.construct()
+        search_result = {"resourceType": "Bundle", "type": "searchset", "entry": [], "total": 0}
         mock_get_supplier_permissions.return_value = []
         self.service.search_immunizations.return_value = search_result
 
@@ -1848,7 +1877,7 @@ class TestSearchImmunizations(TestFhirControllerBase):
     def test_post_search_immunizations(self,mock_get_supplier_permissions):
         """it should search based on patient_identifier and immunization_target"""
         mock_get_supplier_permissions.return_value = ["covid19.s"]
-        search_result = Bundle.construct()
+        search_result = {"resourceType": "Bundle", "type": "searchset", "entry": [], "total": 0}
         self.service.search_immunizations.return_value = search_result
 
         vaccine_type = "COVID19"
@@ -1874,7 +1903,7 @@ class TestSearchImmunizations(TestFhirControllerBase):
         response = self.controller.search_immunizations(lambda_event)
         # Then
         self.service.search_immunizations.assert_called_once_with(
-            self.nhs_number_valid_value, [vaccine_type], params, ANY, ANY
+            self.nhs_number_valid_value, [vaccine_type], params, ANY, ANY, None, None
         )
         self.assertEqual(response["statusCode"], 200)
         mock_get_supplier_permissions.assert_called_once_with("Test")
@@ -1885,8 +1914,7 @@ class TestSearchImmunizations(TestFhirControllerBase):
     def test_post_search_immunizations_for_unauthorized_vaccine_type_search(self,mock_get_supplier_permissions):
         """it should return 200 and contains warning operation outcome as the user is not having authorization for one of the vaccine type"""
         search_result = load_json_data("sample_immunization_response _for _not_done_event.json")
-        bundle = Bundle.parse_obj(search_result)
-        self.service.search_immunizations.return_value = bundle
+        self.service.search_immunizations.return_value = search_result
         mock_get_supplier_permissions.return_value = ["covid19.s"]
 
         vaccine_type = "COVID19", "FLU"
@@ -1920,8 +1948,7 @@ class TestSearchImmunizations(TestFhirControllerBase):
     def test_post_search_immunizations_for_unauthorized_vaccine_type_search_400(self):
         """it should return 400 as the the request is having invalid vaccine type"""
         search_result = load_json_data("sample_immunization_response _for _not_done_event.json")
-        bundle = Bundle.parse_obj(search_result)
-        self.service.search_immunizations.return_value = bundle
+        self.service.search_immunizations.return_value = search_result
 
         vaccine_type = "FLUE"
 
@@ -1950,9 +1977,8 @@ class TestSearchImmunizations(TestFhirControllerBase):
     def test_post_search_immunizations_for_unauthorized_vaccine_type_search_403(self, mock_get_supplier_permissions):
         """it should return 403 as the user doesnt have vaccinetype permission"""
         search_result = load_json_data("sample_immunization_response _for _not_done_event.json")
-        bundle = Bundle.parse_obj(search_result)
         mock_get_supplier_permissions.return_value = []
-        self.service.search_immunizations.return_value = bundle
+        self.service.search_immunizations.return_value = search_result
 
         vaccine_type = ["COVID19", "FLU"]
         vaccine_type = ",".join(vaccine_type)
@@ -2045,36 +2071,9 @@ class TestSearchImmunizations(TestFhirControllerBase):
         body = json.loads(response["body"])
         self.assertEqual(body["resourceType"], "OperationOutcome")
 
-    @patch("fhir_controller.get_supplier_permissions")
-    def test_search_immunizations_returns_200_remove_vaccine_not_done(self, mock_get_supplier_permissions):
-        "This method should return 200 but remove the data which has status as not done."
-        search_result = load_json_data("sample_immunization_response _for _not_done_event.json")
-        bundle = Bundle.parse_obj(search_result)
-        mock_get_supplier_permissions.return_value = ["COVID19.CRUDS"]
-        self.service.search_immunizations.return_value = bundle
-        vaccine_type = "COVID19"
-        lambda_event = {
-            "headers": {
-                "Content-Type": "application/x-www-form-urlencoded",
-                "SupplierSystem": "Test",
-            },
-            "multiValueQueryStringParameters": {
-                self.immunization_target_key: [vaccine_type],
-                self.patient_identifier_key: [self.patient_identifier_valid_value],
-            },
-        }
-
-        # When
-        response = self.controller.search_immunizations(lambda_event)
-
-        self.assertEqual(response["statusCode"], 200)
-        body = json.loads(response["body"])
-        for entry in body.get("entry", []):
-            self.assertNotEqual(entry.get("resource", {}).get("status"), "not-done", "entered-in-error")
-
     @patch("fhir_controller.get_supplier_permissions")
     def test_self_link_excludes_extraneous_params(self, mock_get_supplier_permissions):
-        search_result = Bundle.construct()
+        search_result = {"resourceType": "Bundle", "type": "searchset", "entry": [], "total": 0}
         self.service.search_immunizations.return_value = search_result
         vaccine_type = "COVID19"
         mock_get_supplier_permissions.return_value = ["covid19.CUDS"]
@@ -2100,5 +2099,5 @@ class TestSearchImmunizations(TestFhirControllerBase):
         self.controller.search_immunizations(lambda_event)
 
         self.service.search_immunizations.assert_called_once_with(
-            self.nhs_number_valid_value, [vaccine_type], params, ANY, ANY
+            self.nhs_number_valid_value, [vaccine_type], params, ANY, ANY, None, None
         )
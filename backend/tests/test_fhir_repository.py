@@ -12,7 +12,9 @@ from models.errors import (
     ResourceNotFoundError,
     UnhandledResponseError,
     IdentifierDuplicationError,
-    UnauthorizedVaxError
+    UnauthorizedVaxError,
+    ResourceVersionConflictError,
+    ResourceStateConflictError,
 )
 from tests.utils.generic_utils import update_target_disease_code
 from tests.utils.immunization_utils import create_covid_19_immunization_dict
@@ -24,6 +26,12 @@ def _make_immunization_pk(_id):
 def _make_patient_pk(_id):
     return f"Patient#{_id}"
 
+
+def _created_item(table) -> dict:
+    """Returns the Immunization item written by create_immunization's transaction"""
+    transact_items = table.meta.client.transact_write_items.call_args.kwargs["TransactItems"]
+    return transact_items[1]["Put"]["Item"]
+
 class TestFhirRepositoryBase(unittest.TestCase):
     """Base class for all tests to set up common fixtures"""
 
@@ -177,14 +185,15 @@ class TestCreateImmunizationMainIndex(TestFhirRepositoryBase):
         self.mock_redis_client.hget.return_value = "COVID19"
         imms = create_covid_19_immunization_dict(imms_id="an-id")
 
-        self.table.put_item = MagicMock(return_value={"ResponseMetadata": {"HTTPStatusCode": 200}})
+        self.table.meta.client.transact_write_items.return_value = {"ResponseMetadata": {"HTTPStatusCode": 200}}
         self.table.query = MagicMock(return_value={})
 
         res_imms = self.repository.create_immunization(imms, self.patient, ["COVID19.CRUD"], "Test")
 
         self.assertDictEqual(res_imms, imms)
-        self.table.put_item.assert_called_once_with(
-            Item={
+        self.assertEqual(
+            _created_item(self.table),
+            {
                 "PK": ANY,
                 "PatientPK": ANY,
                 "PatientSK": ANY,
@@ -202,14 +211,15 @@ class TestCreateImmunizationMainIndex(TestFhirRepositoryBase):
         self.mock_redis_client.hget.return_value = "COVID19"
         imms = create_covid_19_immunization_dict(imms_id="an-id")
 
-        self.table.put_item = MagicMock(return_value={"ResponseMetadata": {"HTTPStatusCode": 200}})
+        self.table.meta.client.transact_write_items.return_value = {"ResponseMetadata": {"HTTPStatusCode": 200}}
         self.table.query = MagicMock(return_value={})
 
         res_imms = self.repository.create_immunization(imms, None, ["COVID19.CRUD"], "Test")
 
         self.assertDictEqual(res_imms, imms)
-        self.table.put_item.assert_called_once_with(
-            Item={
+        self.assertEqual(
+            _created_item(self.table),
+            {
                 "PK": ANY,
                 "PatientPK": ANY,
                 "PatientSK": ANY,
@@ -226,14 +236,15 @@ class TestCreateImmunizationMainIndex(TestFhirRepositoryBase):
 
         self.mock_redis_client.hget.return_value = "COVID19"
         imms = create_covid_19_immunization_dict("an-id")
-        self.table.put_item = MagicMock(return_value={"ResponseMetadata": {"HTTPStatusCode": 200}})
+        self.table.meta.client.transact_write_items.return_value = {"ResponseMetadata": {"HTTPStatusCode": 200}}
         self.table.query = MagicMock(return_value={})
 
         res_imms = self.repository.create_immunization(imms, self.patient, ["COVID19.CRUD"], "Test")
 
         self.assertDictEqual(res_imms, imms)
-        self.table.put_item.assert_called_once_with(
-            Item={
+        self.assertEqual(
+            _created_item(self.table),
+            {
                 "PK": ANY,
                 "PatientPK": ANY,
                 "PatientSK": ANY,
@@ -251,12 +262,12 @@ class TestCreateImmunizationMainIndex(TestFhirRepositoryBase):
 
         self.mock_redis_client.hget.return_value = "COVID19"
         imms = create_covid_19_immunization_dict(imms_id)
-        self.table.put_item = MagicMock(return_value={"ResponseMetadata": {"HTTPStatusCode": 200}})
+        self.table.meta.client.transact_write_items.return_value = {"ResponseMetadata": {"HTTPStatusCode": 200}}
         self.table.query = MagicMock(return_value={})
 
         _ = self.repository.create_immunization(imms, self.patient, ["COVID19.CRUD"], "Test")
 
-        item = self.table.put_item.call_args.kwargs["Item"]
+        item = _created_item(self.table)
         self.assertTrue(item["PK"].startswith("Immunization#"))
         self.assertNotEqual(item["PK"], "Immunization#original-id-from-request")
 
@@ -266,7 +277,7 @@ class TestCreateImmunizationMainIndex(TestFhirRepositoryBase):
         self.mock_redis_client.hget.return_value = "COVID19"
         imms_id = "original-id-from-request"
         imms = create_covid_19_immunization_dict(imms_id)
-        self.table.put_item = MagicMock(return_value={"ResponseMetadata": {"HTTPStatusCode": 200}})
+        self.table.meta.client.transact_write_items.return_value = {"ResponseMetadata": {"HTTPStatusCode": 200}}
         self.table.query = MagicMock(return_value={})
 
         response = self.repository.create_immunization(imms, self.patient, ["COVID19.CRUD"], "Test")
@@ -279,7 +290,7 @@ class TestCreateImmunizationMainIndex(TestFhirRepositoryBase):
         self.mock_redis_client.hget.return_value = "COVID19"
         bad_request = 400
         response = {"ResponseMetadata": {"HTTPStatusCode": bad_request}}
-        self.table.put_item = MagicMock(return_value=response)
+        self.table.meta.client.transact_write_items.return_value = response
         self.table.query = MagicMock(return_value={})
 
         with self.assertRaises(UnhandledResponseError) as e:
@@ -291,15 +302,46 @@ class TestCreateImmunizationMainIndex(TestFhirRepositoryBase):
         # Then
         self.assertDictEqual(e.exception.response, response)
 
+    def test_create_reserves_identifier_in_same_transaction(self):
+        """it should write the identifier sentinel and the Immunization in one transaction, without querying first"""
+
+        self.mock_redis_client.hget.return_value = "COVID19"
+        imms = create_covid_19_immunization_dict("an-id")
+        self.table.name = "imms-events"
+        self.table.meta.client.transact_write_items.return_value = {"ResponseMetadata": {"HTTPStatusCode": 200}}
+
+        self.repository.create_immunization(imms, self.patient, ["COVID19.CRUD"], "Test")
+
+        identifier = f"{imms['identifier'][0]['system']}#{imms['identifier'][0]['value']}"
+        transact_items = self.table.meta.client.transact_write_items.call_args.kwargs["TransactItems"]
+        self.assertEqual(
+            transact_items[0],
+            {
+                "Put": {
+                    "TableName": "imms-events",
+                    "Item": {"PK": f"Identifier#{identifier}", "ImmunizationPK": f"Immunization#{imms['id']}"},
+                    "ConditionExpression": "attribute_not_exists(PK)",
+                }
+            },
+        )
+        self.assertEqual(transact_items[1]["Put"]["TableName"], "imms-events")
+        self.table.query.assert_not_called()
+
     def test_create_throws_error_when_identifier_already_in_dynamodb(self):
-        """it should throw UnhandledResponse when trying to update an immunization with an identfier that is already stored"""
+        """it should throw IdentifierDuplicationError when the identifier is already reserved by another Immunization"""
 
         self.mock_redis_client.hget.return_value = "COVID19"
         imms_id = "an-id"
         imms = create_covid_19_immunization_dict(imms_id)
         imms["patient"] = self.patient
 
-        self.table.query = MagicMock(return_value={"Items": [{"Resource": '{"id": "different-id"}'}], "Count": 1})
+        self.table.meta.client.transact_write_items.side_effect = botocore.exceptions.ClientError(
+            {
+                "Error": {"Code": "TransactionCanceledException"},
+                "CancellationReasons": [{"Code": "ConditionalCheckFailed"}, {"Code": "None"}],
+            },
+            "TransactWriteItems",
+        )
         identifier = f"{imms['identifier'][0]['system']}#{imms['identifier'][0]['value']}"
         with self.assertRaises(IdentifierDuplicationError) as e:
             # When
@@ -327,14 +369,14 @@ class TestCreateImmunizationPatientIndex(TestFhirRepositoryBase):
         nhs_number = "1234567890"
         imms["contained"][1]["identifier"][0]["value"] = nhs_number
 
-        self.table.put_item = MagicMock(return_value={"ResponseMetadata": {"HTTPStatusCode": 200}})
+        self.table.meta.client.transact_write_items.return_value = {"ResponseMetadata": {"HTTPStatusCode": 200}}
         self.table.query = MagicMock(return_value={})
 
         # When
         _ = self.repository.create_immunization(imms, self.patient, ["COVID19.CRUD"], "Test")
 
         # Then
-        item = self.table.put_item.call_args.kwargs["Item"]
+        item = _created_item(self.table)
         self.assertEqual(item["PatientPK"], f"Patient#{nhs_number}")
 
     def test_create_patient_with_vaccine_type(self):
@@ -346,13 +388,13 @@ class TestCreateImmunizationPatientIndex(TestFhirRepositoryBase):
         vaccine_type = get_vaccine_type(imms)
 
         self.table.query = MagicMock(return_value={"Count": 0})
-        self.table.put_item = MagicMock(return_value={"ResponseMetadata": {"HTTPStatusCode": 200}})
+        self.table.meta.client.transact_write_items.return_value = {"ResponseMetadata": {"HTTPStatusCode": 200}}
 
         # When
         _ = self.repository.create_immunization(imms, self.patient, ["FLU.CRUD"], "Test")
 
         # Then
-        item = self.table.put_item.call_args.kwargs["Item"]
+        item = _created_item(self.table)
         self.assertTrue(item["PatientSK"].startswith(f"{vaccine_type}#"))
 
     def test_create_patient_with_unauthorised_vaccine_type_permissions(self):
@@ -364,7 +406,7 @@ class TestCreateImmunizationPatientIndex(TestFhirRepositoryBase):
             "Items": []
         }
 
-        self.repository.table.put_item.return_value = {
+        self.repository.table.meta.client.transact_write_items.return_value = {
             "ResponseMetadata": {
                 "HTTPStatusCode": 200
             }
@@ -437,6 +479,7 @@ class TestUpdateImmunization(TestFhirRepositoryBase):
             },
             ReturnValues=ANY,
             ConditionExpression=ANY,
+            ReturnValuesOnConditionCheckFailure="ALL_OLD",
         )
 
     def test_update_throws_error_when_response_can_not_be_handled(self):
@@ -460,23 +503,102 @@ class TestUpdateImmunization(TestFhirRepositoryBase):
         # Then
         self.assertDictEqual(e.exception.response, response)
 
-    def test_update_throws_error_when_identifier_already_in_dynamodb(self):
-        """it should throw IdentifierDuplicationError when trying to update an immunization with an identfier that is already stored"""
+    def test_update_is_conditional_on_version_identifier_and_deletion_state(self):
+        """it should make the update conditional on the stored version, identifier and deletion state"""
+        self.mock_redis_client.hget.return_value = "COVID19"
+        imms_id = "an-id"
+        imms = create_covid_19_immunization_dict(imms_id)
+        identifier = f"{imms['identifier'][0]['system']}#{imms['identifier'][0]['value']}"
+        self.table.update_item.return_value = {
+            "ResponseMetadata": {"HTTPStatusCode": 200},
+            "Attributes": {"Resource": json.dumps(imms)},
+        }
 
+        self.repository.update_immunization(imms_id, imms, self.patient, 3, ["COVID19.CRUD"], "Test")
+
+        self.table.query.assert_not_called()
+        self.assertEqual(
+            self.table.update_item.call_args.kwargs["ConditionExpression"],
+            Attr("PK").eq(_make_immunization_pk(imms_id))
+            & Attr("Version").eq(3)
+            & Attr("IdentifierPK").eq(identifier)
+            & Attr("DeletedAt").not_exists(),
+        )
+
+    def test_reinstate_and_update_reinstated_conditions_on_deletion_state(self):
+        """it should only reinstate a deleted record, and only update a reinstated record as reinstated"""
         self.mock_redis_client.hget.return_value = "COVID19"
         imms_id = "an-id"
         imms = create_covid_19_immunization_dict(imms_id)
-        imms["patient"] = self.patient
+        self.table.update_item.return_value = {
+            "ResponseMetadata": {"HTTPStatusCode": 200},
+            "Attributes": {"Resource": json.dumps(imms)},
+        }
+
+        self.repository.reinstate_immunization(imms_id, imms, self.patient, 1, ["COVID19.CRUD"], "Test")
+        reinstate_condition = self.table.update_item.call_args.kwargs["ConditionExpression"]
+        self.repository.update_reinstated_immunization(imms_id, imms, self.patient, 1, ["COVID19.CRUD"], "Test")
+        update_reinstated_condition = self.table.update_item.call_args.kwargs["ConditionExpression"]
+
+        self.assertEqual(
+            reinstate_condition.get_expression()["values"][1],
+            Attr("DeletedAt").exists() & Attr("DeletedAt").ne("reinstated"),
+        )
+        self.assertEqual(update_reinstated_condition.get_expression()["values"][1], Attr("DeletedAt").eq("reinstated"))
+
+    def _update_with_failed_condition(self, old_item, existing_resource_version=1):
+        """Runs update_immunization against a ConditionalCheckFailedException returning old_item"""
+        imms_id = "an-id"
+        imms = create_covid_19_immunization_dict(imms_id)
+        error_response = {"Error": {"Code": "ConditionalCheckFailedException"}}
+        if old_item is not None:
+            error_response["Item"] = old_item
+        self.table.update_item.side_effect = botocore.exceptions.ClientError(
+            error_response=error_response, operation_name="UpdateItem"
+        )
+        self.repository.update_immunization(
+            imms_id, imms, self.patient, existing_resource_version, ["COVID19.CRUD"], "Test"
+        )
+
+    @staticmethod
+    def _old_item(version="1", **attributes):
+        """Returns a stored record, in the attribute value format used by ReturnValuesOnConditionCheckFailure"""
+        imms = create_covid_19_immunization_dict("an-id")
         identifier = f"{imms['identifier'][0]['system']}#{imms['identifier'][0]['value']}"
-        self.table.query = MagicMock(return_value={"Items": [{"Resource": '{"id": "different-id"}'}], "Count": 1})
+        item = {"PK": {"S": "Immunization#an-id"}, "Version": {"N": version}, "IdentifierPK": {"S": identifier}}
+        item.update({key: {"S": value} for key, value in attributes.items()})
+        return item
 
-        with self.assertRaises(IdentifierDuplicationError) as e:
-            # When
+    def test_update_throws_not_found_when_record_does_not_exist(self):
+        """it should throw ResourceNotFoundError when no record was returned by the failed condition check"""
+        self.mock_redis_client.hget.return_value = "COVID19"
 
-            self.repository.update_immunization(imms_id, imms, self.patient, 1, ["COVID19.CRUD"], "Test")
+        with self.assertRaises(ResourceNotFoundError):
+            self._update_with_failed_condition(old_item=None)
+
+    def test_update_throws_version_conflict_when_version_changed(self):
+        """it should throw ResourceVersionConflictError when the stored version has changed"""
+        self.mock_redis_client.hget.return_value = "COVID19"
+
+        with self.assertRaises(ResourceVersionConflictError):
+            self._update_with_failed_condition(old_item=self._old_item(version="2"))
+
+    def test_update_throws_error_when_identifier_belongs_to_another_record(self):
+        """it should throw IdentifierDuplicationError when the stored record doesn't own the identifier"""
+        self.mock_redis_client.hget.return_value = "COVID19"
+        old_item = self._old_item()
+        old_item["IdentifierPK"] = {"S": "https://different-system#different-value"}
+
+        with self.assertRaises(IdentifierDuplicationError):
+            self._update_with_failed_condition(old_item=old_item)
+
+    def test_update_throws_state_conflict_when_record_deleted(self):
+        """it should throw ResourceStateConflictError when the record has been deleted since it was read"""
+        self.mock_redis_client.hget.return_value = "COVID19"
+
+        with self.assertRaises(ResourceStateConflictError):
+            self._update_with_failed_condition(old_item=self._old_item(DeletedAt="1700000000"))
 
-        self.assertEqual(str(e.exception), f"The provided identifier: {identifier} is duplicated")
-    
     def test_reinstate_immunization_success(self):
         """it should reinstate an immunization successfully"""
         self.mock_redis_client.hget.return_value = "COVID19"
@@ -690,24 +812,84 @@ class TestFindImmunizations(unittest.TestCase):
         """it should find events with patient_identifier"""
         nhs_number = "a-patient-id"
         dynamo_response = {"ResponseMetadata": {"HTTPStatusCode": 200}, "Items": []}
-        self.table.query = MagicMock(return_value=dynamo_response)
+        self.table.meta.client.query = MagicMock(return_value=dynamo_response)
 
-        condition = Key("PatientPK").eq(_make_patient_pk(nhs_number))
+        condition = Key("PatientPK").eq(_make_patient_pk(nhs_number)) & Key("PatientSK").begins_with("COVID19#")
 
         # When
         _ = self.repository.find_immunizations(nhs_number, vaccine_types=["COVID19"])
 
         # Then
-        self.table.query.assert_called_once_with(
+        self.table.meta.client.query.assert_called_once_with(
+            TableName=self.table.name,
             IndexName="PatientGSI",
             KeyConditionExpression=condition,
             FilterExpression=ANY,
         )
 
+    def test_find_immunizations_queries_each_vaccine_type(self):
+        """it should issue one key-condition query per requested vaccine type"""
+        nhs_number = "a-patient-id"
+        dynamo_response = {"ResponseMetadata": {"HTTPStatusCode": 200}, "Items": []}
+        self.table.meta.client.query = MagicMock(return_value=dynamo_response)
+
+        # When
+        _ = self.repository.find_immunizations(nhs_number, vaccine_types=["FLU", "COVID19", "FLU"])
+
+        # Then
+        self.assertEqual(self.table.meta.client.query.call_count, 2)
+        key_conditions = [call.kwargs["KeyConditionExpression"] for call in self.table.meta.client.query.call_args_list]
+        for vaccine_type in ["COVID19", "FLU"]:
+            self.assertIn(
+                Key("PatientPK").eq(_make_patient_pk(nhs_number)) & Key("PatientSK").begins_with(f"{vaccine_type}#"),
+                key_conditions,
+            )
+
+    def test_find_immunizations_follows_pagination(self):
+        """it should follow LastEvaluatedKey until all pages have been read"""
+        last_evaluated_key = {"PK": "Immunization#1", "PatientPK": "Patient#an-id", "PatientSK": "COVID19#1"}
+        first_page = {
+            "Items": [{"Resource": json.dumps({"id": 1}), "PatientSK": "COVID19#1"}],
+            "LastEvaluatedKey": last_evaluated_key,
+        }
+        second_page = {"Items": [{"Resource": json.dumps({"id": 2}), "PatientSK": "COVID19#2"}]}
+        self.table.meta.client.query = MagicMock(side_effect=[first_page, second_page])
+
+        # When
+        results = self.repository.find_immunizations("an-id", ["COVID19"])
+
+        # Then
+        self.assertListEqual(results, [{"id": 1}, {"id": 2}])
+        self.assertEqual(self.table.meta.client.query.call_count, 2)
+        self.assertNotIn("ExclusiveStartKey", self.table.meta.client.query.call_args_list[0].kwargs)
+        self.assertEqual(self.table.meta.client.query.call_args_list[1].kwargs["ExclusiveStartKey"], last_evaluated_key)
+
+    def test_find_immunizations_merges_results_in_vaccine_type_order(self):
+        """it should merge the results of concurrent queries in PatientSK order regardless of completion order"""
+
+        def query(**kwargs):
+            vaccine_type = next(
+                x
+                for x in ["COVID19", "FLU", "RSV"]
+                if kwargs["KeyConditionExpression"]
+                == Key("PatientPK").eq("Patient#an-id") & Key("PatientSK").begins_with(f"{x}#")
+            )
+            if vaccine_type == "COVID19":
+                time.sleep(0.05)
+            return {"Items": [{"Resource": json.dumps({"id": vaccine_type}), "PatientSK": f"{vaccine_type}#1"}]}
+
+        self.table.meta.client.query = MagicMock(side_effect=query)
+
+        # When
+        results = self.repository.find_immunizations("an-id", ["RSV", "COVID19", "FLU"])
+
+        # Then
+        self.assertListEqual(results, [{"id": "COVID19"}, {"id": "FLU"}, {"id": "RSV"}])
+
     def test_exclude_deleted(self):
         """it should exclude records with DeletedAt attribute"""
         dynamo_response = {"ResponseMetadata": {"HTTPStatusCode": 200}, "Items": []}
-        self.table.query = MagicMock(return_value=dynamo_response)
+        self.table.meta.client.query = MagicMock(return_value=dynamo_response)
 
         is_ = Attr("DeletedAt").not_exists() | Attr("DeletedAt").eq("reinstated")
 
@@ -715,7 +897,8 @@ class TestFindImmunizations(unittest.TestCase):
         _ = self.repository.find_immunizations("an-id", ["COVID19"])
 
         # Then
-        self.table.query.assert_called_once_with(
+        self.table.meta.client.query.assert_called_once_with(
+            TableName=self.table.name,
             IndexName="PatientGSI", KeyConditionExpression=ANY, FilterExpression=is_
         )
 
@@ -735,7 +918,7 @@ class TestFindImmunizations(unittest.TestCase):
         ]
 
         dynamo_response = {"ResponseMetadata": {"HTTPStatusCode": 200}, "Items": items}
-        self.table.query = MagicMock(return_value=dynamo_response)
+        self.table.meta.client.query = MagicMock(return_value=dynamo_response)
 
         # When
         results = self.repository.find_immunizations("an-id", ["COVID19"])
@@ -747,7 +930,7 @@ class TestFindImmunizations(unittest.TestCase):
         """it should throw UnhandledResponse when the response from dynamodb can't be handled"""
         bad_request = 400
         response = {"ResponseMetadata": {"HTTPStatusCode": bad_request}}
-        self.table.query = MagicMock(return_value=response)
+        self.table.meta.client.query = MagicMock(return_value=response)
 
         with self.assertRaises(UnhandledResponseError) as e:
             # When
@@ -757,6 +940,79 @@ class TestFindImmunizations(unittest.TestCase):
         self.assertDictEqual(e.exception.response, response)
 
 
+class TestFindImmunizationsPage(unittest.TestCase):
+    def setUp(self):
+        self.table = MagicMock()
+        self.repository = ImmunizationRepository(table=self.table)
+
+    @staticmethod
+    def _item(vaccine_type, imms_id):
+        return {
+            "PK": f"Immunization#{imms_id}",
+            "PatientPK": "Patient#an-id",
+            "PatientSK": f"{vaccine_type}#{imms_id}",
+            "Resource": json.dumps({"id": imms_id}),
+        }
+
+    def test_first_page_limits_query_and_returns_next_start_key(self):
+        """it should query with the page size as Limit and return the key of the last item on the page"""
+        self.table.meta.client.query = MagicMock(
+            return_value={
+                "Items": [self._item("COVID19", "1"), self._item("COVID19", "2")],
+                "LastEvaluatedKey": {"PK": "Immunization#2", "PatientPK": "Patient#an-id", "PatientSK": "COVID19#2"},
+            }
+        )
+
+        # When
+        results, next_page_start_keys = self.repository.find_immunizations_page("an-id", ["COVID19"], 2)
+
+        # Then
+        self.assertListEqual(results, [{"id": "1"}, {"id": "2"}])
+        self.assertDictEqual(
+            next_page_start_keys,
+            {"COVID19": {"PK": "Immunization#2", "PatientPK": "Patient#an-id", "PatientSK": "COVID19#2"}},
+        )
+        self.assertEqual(self.table.meta.client.query.call_args.kwargs["Limit"], 2)
+        self.assertNotIn("ExclusiveStartKey", self.table.meta.client.query.call_args.kwargs)
+
+    def test_page_continues_from_start_key(self):
+        """it should resume each vaccine type from its start key and finish once every vaccine type is read"""
+        start_key = {"PK": "Immunization#2", "PatientPK": "Patient#an-id", "PatientSK": "COVID19#2"}
+        self.table.meta.client.query = MagicMock(return_value={"Items": [self._item("COVID19", "3")]})
+
+        # When
+        results, next_page_start_keys = self.repository.find_immunizations_page(
+            "an-id", ["COVID19"], 2, {"COVID19": start_key}
+        )
+
+        # Then
+        self.assertListEqual(results, [{"id": "3"}])
+        self.assertDictEqual(next_page_start_keys, {})
+        self.assertEqual(self.table.meta.client.query.call_args.kwargs["ExclusiveStartKey"], start_key)
+
+    def test_page_spanning_vaccine_types(self):
+        """it should fill the page in vaccine type order and keep the unread vaccine types for the next page"""
+
+        def query(**kwargs):
+            if kwargs["KeyConditionExpression"] == Key("PatientPK").eq("Patient#an-id") & Key(
+                "PatientSK"
+            ).begins_with("COVID19#"):
+                return {"Items": [self._item("COVID19", "1")]}
+            return {"Items": [self._item("FLU", "2"), self._item("FLU", "3")]}
+
+        self.table.meta.client.query = MagicMock(side_effect=query)
+
+        # When
+        results, next_page_start_keys = self.repository.find_immunizations_page("an-id", ["FLU", "COVID19"], 2)
+
+        # Then
+        self.assertListEqual(results, [{"id": "1"}, {"id": "2"}])
+        self.assertDictEqual(
+            next_page_start_keys,
+            {"FLU": {"PK": "Immunization#2", "PatientPK": "Patient#an-id", "PatientSK": "FLU#2"}},
+        )
+
+
 class TestImmunizationDecimals(TestFhirRepositoryBase):
     """It should create a record and keep decimal precision"""
 
@@ -774,7 +1030,7 @@ class TestImmunizationDecimals(TestFhirRepositoryBase):
         imms = create_covid_19_immunization_dict(imms_id="an-id")
         imms["doseQuantity"] = 0.7477
 
-        self.table.put_item = MagicMock(return_value={"ResponseMetadata": {"HTTPStatusCode": 200}})
+        self.table.meta.client.transact_write_items.return_value = {"ResponseMetadata": {"HTTPStatusCode": 200}}
         self.table.query = MagicMock(return_value={})
 
         res_imms = self.repository.create_immunization(imms, self.patient, ["COVID19.CRUD"], "Test")
@@ -782,7 +1038,7 @@ class TestImmunizationDecimals(TestFhirRepositoryBase):
         self.assertEqual(res_imms["doseQuantity"], imms["doseQuantity"])
         self.assertDictEqual(res_imms, imms)
 
-        self.table.put_item.assert_called_once()
+        self.table.meta.client.transact_write_items.assert_called_once()
 
         expected_item = {
             "PK": ANY,
@@ -795,8 +1051,8 @@ class TestImmunizationDecimals(TestFhirRepositoryBase):
             "SupplierSystem": "Test",
         }
 
-        # Assert that put_item was called with the expected data
-        item_passed_to_put_item = self.table.put_item.call_args.kwargs["Item"]
+        # Assert that the Immunization was written with the expected data
+        item_passed_to_put_item = _created_item(self.table)
         self.assertTrue(all(item in expected_item.items() for item in item_passed_to_put_item.items()))
 
         resource_from_item = json.loads(item_passed_to_put_item["Resource"])
@@ -805,7 +1061,7 @@ class TestImmunizationDecimals(TestFhirRepositoryBase):
             0.7477,
         )
 
-        self.table.put_item.assert_called_once()
+        self.table.meta.client.transact_write_items.assert_called_once()
 
     def run_update_immunization_test(self, imms_id, imms, resource, updated_dose_quantity=None):
         dynamo_response = {
@@ -848,6 +1104,7 @@ class TestImmunizationDecimals(TestFhirRepositoryBase):
             },
             ReturnValues=ANY,
             ConditionExpression=ANY,
+            ReturnValuesOnConditionCheckFailure="ALL_OLD",
         )
 
         if updated_dose_quantity is not None:
@@ -3,6 +3,7 @@ import os
 import uuid
 import datetime
 import unittest
+import urllib.parse
 from unittest.mock import MagicMock
 from copy import deepcopy
 from unittest.mock import create_autospec, patch
@@ -10,13 +11,14 @@ from unittest import skip
 from unittest.mock import create_autospec, patch
 from decimal import Decimal
 
-from fhir.resources.R4B.bundle import Bundle as FhirBundle, BundleEntry
+from fhir.resources.R4B.bundle import Bundle as FhirBundle
 from fhir.resources.R4B.immunization import Immunization
 from fhir_repository import ImmunizationRepository
 from fhir_service import FhirService, UpdateOutcome, get_service_url
 from models.errors import InvalidPatientId, CustomValidationError
 from models.fhir_immunization import ImmunizationValidator
 from models.utils.generic_utils import get_contained_patient
+from parameter_parser import decode_page_token
 from pydantic import ValidationError
 from pydantic.error_wrappers import ErrorWrapper
 from tests.utils.immunization_utils import (
@@ -649,6 +651,80 @@ class TestSearchImmunizations(unittest.TestCase):
         # Then
         self.imms_repo.find_immunizations.assert_called_once_with(nhs_number, [vaccine_type])
 
+    def test_paged_vaccine_type_search(self):
+        """It should search for one page of the correct vaccine type when a count is given"""
+        nhs_number = VALID_NHS_NUMBER
+        vaccine_type = "COVID19"
+        params = f"{self.nhs_search_param}={nhs_number}&{self.vaccine_type_search_param}={vaccine_type}"
+        page_start_keys = {vaccine_type: None}
+        self.imms_repo.find_immunizations_page.return_value = ([], {})
+
+        # When
+        _ = self.fhir_service.search_immunizations(
+            nhs_number, [vaccine_type], params, count=10, page_start_keys=page_start_keys
+        )
+
+        # Then
+        self.imms_repo.find_immunizations_page.assert_called_once_with(nhs_number, [vaccine_type], 10, page_start_keys)
+        self.imms_repo.find_immunizations.assert_not_called()
+
+    def test_paged_search_adds_next_link(self):
+        """It should add a next link containing a page token when there are more pages to read"""
+        imms_list = [create_covid_19_immunization_dict("imms-1")]
+        next_page_start_keys = {
+            "COVID19": {"PK": "Immunization#imms-1", "PatientPK": "Patient#1", "PatientSK": "COVID19#imms-1"}
+        }
+        self.imms_repo.find_immunizations_page.return_value = (deepcopy(imms_list), next_page_start_keys)
+        nhs_number = NHS_NUMBER_USED_IN_SAMPLE_DATA
+        params = f"-immunization.target=COVID19&_count=1&{self.nhs_search_param}={nhs_number}"
+
+        # When
+        result = self.fhir_service.search_immunizations(nhs_number, ["COVID19"], params, count=1)
+
+        # Then
+        self.assertEqual([link["relation"] for link in result["link"]], ["self", "next"])
+        next_params = urllib.parse.parse_qs(urllib.parse.urlparse(result["link"][1]["url"]).query)
+        self.assertEqual(next_params["-immunization.target"], ["COVID19"])
+        self.assertEqual(next_params["_count"], ["1"])
+        self.assertEqual(decode_page_token(next_params["-page.token"][0]), next_page_start_keys)
+
+    def test_paged_search_on_last_page_has_no_next_link(self):
+        """It should not add a next link once every vaccine type has been fully read"""
+        imms_list = [create_covid_19_immunization_dict("imms-1")]
+        self.imms_repo.find_immunizations_page.return_value = (deepcopy(imms_list), {})
+        nhs_number = NHS_NUMBER_USED_IN_SAMPLE_DATA
+
+        # When
+        result = self.fhir_service.search_immunizations(nhs_number, ["COVID19"], "", count=1)
+
+        # Then
+        self.assertEqual([link["relation"] for link in result["link"]], ["self"])
+
+    def test_paged_search_total_is_only_given_when_every_match_is_in_the_bundle(self):
+        """It should not give the total of a paged search on the first or last of several pages"""
+        imms_list = [create_covid_19_immunization_dict(imms_id) for imms_id in ["imms-1", "imms-2", "imms-3"]]
+        next_page_start_keys = {
+            "COVID19": {"PK": "Immunization#imms-2", "PatientPK": "Patient#1", "PatientSK": "COVID19#imms-2"}
+        }
+        nhs_number = NHS_NUMBER_USED_IN_SAMPLE_DATA
+        params = f"-immunization.target=COVID19&_count=2&{self.nhs_search_param}={nhs_number}"
+
+        # When
+        self.imms_repo.find_immunizations_page.return_value = (deepcopy(imms_list[:2]), next_page_start_keys)
+        first_page = self.fhir_service.search_immunizations(nhs_number, ["COVID19"], params, count=2)
+        self.imms_repo.find_immunizations_page.return_value = (deepcopy(imms_list[2:]), {})
+        last_page = self.fhir_service.search_immunizations(
+            nhs_number, ["COVID19"], params, count=2, page_start_keys=next_page_start_keys
+        )
+        self.imms_repo.find_immunizations_page.return_value = (deepcopy(imms_list[:2]), {})
+        only_page = self.fhir_service.search_immunizations(nhs_number, ["COVID19"], params, count=2)
+
+        # Then
+        self.assertNotIn("total", first_page)
+        self.assertEqual([link["relation"] for link in last_page["link"]], ["self"])
+        self.assertNotIn("total", last_page)
+        self.assertEqual(only_page["total"], 2)
+
     def test_make_fhir_bundle_from_search_result(self):
         """It should return a FHIR Bundle resource"""
         imms_ids = ["imms-1", "imms-2"]
@@ -659,19 +735,66 @@ class TestSearchImmunizations(unittest.TestCase):
         params = f"{self.nhs_search_param}={nhs_number}&{self.vaccine_type_search_param}={vaccine_types}"
         # When
         result = self.fhir_service.search_immunizations(nhs_number, vaccine_types, params)
-        searched_imms = [entry for entry in result.entry if entry.resource.resource_type == "Immunization"]
+        searched_imms = [entry for entry in result["entry"] if entry["resource"]["resourceType"] == "Immunization"]
         # Then
-        self.assertIsInstance(result, FhirBundle)
-        self.assertEqual(result.type, "searchset")
+        self.assertEqual(result["resourceType"], "Bundle")
+        self.assertEqual(result["type"], "searchset")
+        self.assertEqual(result["total"], len(imms_ids))
         self.assertEqual(len(imms_ids), len(searched_imms))
         # Assert each entry in the bundle
         for i, entry in enumerate(searched_imms):
-            self.assertIsInstance(entry, BundleEntry)
-            self.assertEqual(entry.resource.resource_type, "Immunization")
-            self.assertEqual(entry.resource.id, imms_ids[i])
+            self.assertEqual(entry["search"], {"mode": "match"})
+            self.assertEqual(entry["resource"]["resourceType"], "Immunization")
+            self.assertEqual(entry["resource"]["id"], imms_ids[i])
         # Assert self link
-        self.assertEqual(len(result.link), 1)
-        self.assertEqual(result.link[0].relation, "self")
+        self.assertEqual(len(result["link"]), 1)
+        self.assertEqual(result["link"][0]["relation"], "self")
+        # Assert the bundle is valid FHIR
+        FhirBundle.parse_obj(result)
+
+    def test_not_done_and_entered_in_error_are_excluded(self):
+        """It should exclude not-done and entered-in-error Immunizations from the matches and the total"""
+        imms_list = [create_covid_19_immunization_dict(imms_id) for imms_id in ["imms-1", "imms-2", "imms-3"]]
+        imms_list[0]["status"] = "not-done"
+        imms_list[2]["status"] = "entered-in-error"
+        self.imms_repo.find_immunizations.return_value = imms_list
+        nhs_number = NHS_NUMBER_USED_IN_SAMPLE_DATA
+
+        # When
+        result = self.fhir_service.search_immunizations(nhs_number, ["COVID19"], "")
+        searched_imms = [entry for entry in result["entry"] if entry["resource"]["resourceType"] == "Immunization"]
+
+        # Then
+        self.assertEqual([entry["resource"]["id"] for entry in searched_imms], ["imms-2"])
+        self.assertEqual(result["total"], 1)
+        self.assertTrue(any(entry["resource"]["resourceType"] == "Patient" for entry in result["entry"]))
+
+    def test_no_results_gives_empty_bundle(self):
+        """It should return a bundle with no entries and a total of zero when nothing is found"""
+        self.imms_repo.find_immunizations.return_value = []
+
+        # When
+        result = self.fhir_service.search_immunizations(NHS_NUMBER_USED_IN_SAMPLE_DATA, ["COVID19"], "")
+
+        # Then
+        self.assertEqual(result["entry"], [])
+        self.assertEqual(result["total"], 0)
+
+    def test_strict_search_validation_validates_bundle(self):
+        """It should only validate the bundle with fhir.resources in strict mode"""
+        invalid_imms = create_covid_19_immunization_dict("imms-1")
+        del invalid_imms["occurrenceDateTime"]
+        strict_fhir_service = FhirService(self.imms_repo, self.validator, strict_search_validation=True)
+
+        # CASE: Not strict
+        self.imms_repo.find_immunizations.return_value = [deepcopy(invalid_imms)]
+        result = self.fhir_service.search_immunizations(NHS_NUMBER_USED_IN_SAMPLE_DATA, ["COVID19"], "")
+        self.assertEqual(result["total"], 1)
+
+        # CASE: Strict
+        self.imms_repo.find_immunizations.return_value = [deepcopy(invalid_imms)]
+        with self.assertRaises(ValidationError):
+            strict_fhir_service.search_immunizations(NHS_NUMBER_USED_IN_SAMPLE_DATA, ["COVID19"], "")
 
     def test_date_from_is_used_to_filter(self):
         """It should return only Immunizations after date_from"""
@@ -692,24 +815,24 @@ class TestSearchImmunizations(unittest.TestCase):
         result = self.fhir_service.search_immunizations(
             nhs_number, vaccine_types, "", date_from=datetime.date(2021, 2, 6)
         )
-        searched_imms = [entry for entry in result.entry if entry.resource.resource_type == "Immunization"]
+        searched_imms = [entry for entry in result["entry"] if entry["resource"]["resourceType"] == "Immunization"]
 
         # Then
         self.assertEqual(2, len(searched_imms))
         for i, entry in enumerate(searched_imms):
-            self.assertEqual(imms_ids[i], entry.resource.id)
+            self.assertEqual(imms_ids[i], entry["resource"]["id"])
 
         # CASE:Day of first, inclusive search.
         self.imms_repo.find_immunizations.return_value = deepcopy(imms_list)
 
         # When
         result = self.fhir_service.search_immunizations(nhs_number, vaccine_types, "", date_from=datetime.date(2021, 2, 7))
-        searched_imms = [entry for entry in result.entry if entry.resource.resource_type == "Immunization"]
+        searched_imms = [entry for entry in result["entry"] if entry["resource"]["resourceType"] == "Immunization"]
 
         # Then
         self.assertEqual(2, len(searched_imms))
         for i, entry in enumerate(searched_imms):
-            self.assertEqual(imms_ids[i], entry.resource.id)
+            self.assertEqual(imms_ids[i], entry["resource"]["id"])
 
         # CASE: Day of second, inclusive search.
         self.imms_repo.find_immunizations.return_value = deepcopy(imms_list)
@@ -718,11 +841,11 @@ class TestSearchImmunizations(unittest.TestCase):
         result = self.fhir_service.search_immunizations(
             nhs_number, vaccine_types, "", date_from=datetime.date(2021, 2, 8)
         )
-        searched_imms = [entry for entry in result.entry if entry.resource.resource_type == "Immunization"]
+        searched_imms = [entry for entry in result["entry"] if entry["resource"]["resourceType"] == "Immunization"]
 
         # Then
         self.assertEqual(1, len(searched_imms))
-        self.assertEqual(imms_ids[1], searched_imms[0].resource.id)
+        self.assertEqual(imms_ids[1], searched_imms[0]["resource"]["id"])
 
         # CASE: Day after.
         self.imms_repo.find_immunizations.return_value = deepcopy(imms_list)
@@ -731,7 +854,7 @@ class TestSearchImmunizations(unittest.TestCase):
         result = self.fhir_service.search_immunizations(
             nhs_number, vaccine_types, "", date_from=datetime.date(2021, 2, 9)
         )
-        searched_imms = [entry for entry in result.entry if entry.resource.resource_type == "Immunization"]
+        searched_imms = [entry for entry in result["entry"] if entry["resource"]["resourceType"] == "Immunization"]
 
         # Then
         self.assertEqual(0, len(searched_imms))
@@ -749,11 +872,11 @@ class TestSearchImmunizations(unittest.TestCase):
 
         # When
         result = self.fhir_service.search_immunizations(nhs_number, vaccine_types, "")
-        searched_imms = [entry for entry in result.entry if entry.resource.resource_type == "Immunization"]
+        searched_imms = [entry for entry in result["entry"] if entry["resource"]["resourceType"] == "Immunization"]
 
         # Then
         for i, entry in enumerate(searched_imms):
-            self.assertEqual(entry.resource.id, imms_ids[i])
+            self.assertEqual(entry["resource"]["id"], imms_ids[i])
 
         # CASE: With date_from
         self.imms_repo.find_immunizations.return_value = deepcopy(imms_list)
@@ -762,11 +885,11 @@ class TestSearchImmunizations(unittest.TestCase):
         result = self.fhir_service.search_immunizations(
             nhs_number, vaccine_types, "", date_from=datetime.date(2021, 3, 6)
         )
-        searched_imms = [entry for entry in result.entry if entry.resource.resource_type == "Immunization"]
+        searched_imms = [entry for entry in result["entry"] if entry["resource"]["resourceType"] == "Immunization"]
 
         # Then
         for i, entry in enumerate(searched_imms):
-            self.assertEqual(entry.resource.id, imms_ids[i])
+            self.assertEqual(entry["resource"]["id"], imms_ids[i])
 
     def test_date_to_is_used_to_filter(self):
         """It should return only Immunizations before date_to"""
@@ -787,12 +910,12 @@ class TestSearchImmunizations(unittest.TestCase):
         result = self.fhir_service.search_immunizations(
             nhs_number, vaccine_types, "", date_to=datetime.date(2021, 2, 9)
         )
-        searched_imms = [entry for entry in result.entry if entry.resource.resource_type == "Immunization"]
+        searched_imms = [entry for entry in result["entry"] if entry["resource"]["resourceType"] == "Immunization"]
 
         # Then
         self.assertEqual(len(searched_imms), 2)
         for i, entry in enumerate(searched_imms):
-            self.assertEqual(entry.resource.id, imms_ids[i])
+            self.assertEqual(entry["resource"]["id"], imms_ids[i])
 
         # CASE: Day of second, inclusive search.
         self.imms_repo.find_immunizations.return_value = deepcopy(imms_list)
@@ -801,12 +924,12 @@ class TestSearchImmunizations(unittest.TestCase):
         result = self.fhir_service.search_immunizations(
             nhs_number, vaccine_types, "", date_to=datetime.date(2021, 2, 8)
         )
-        searched_imms = [entry for entry in result.entry if entry.resource.resource_type == "Immunization"]
+        searched_imms = [entry for entry in result["entry"] if entry["resource"]["resourceType"] == "Immunization"]
 
         # Then
         self.assertEqual(len(searched_imms), 2)
         for i, entry in enumerate(searched_imms):
-            self.assertEqual(entry.resource.id, imms_ids[i])
+            self.assertEqual(entry["resource"]["id"], imms_ids[i])
 
         # CASE: Day of first, inclusive search.
         self.imms_repo.find_immunizations.return_value = deepcopy(imms_list)
@@ -815,11 +938,11 @@ class TestSearchImmunizations(unittest.TestCase):
         result = self.fhir_service.search_immunizations(
             nhs_number, vaccine_types, "", date_to=datetime.date(2021, 2, 7)
         )
-        searched_imms = [entry for entry in result.entry if entry.resource.resource_type == "Immunization"]
+        searched_imms = [entry for entry in result["entry"] if entry["resource"]["resourceType"] == "Immunization"]
 
         # Then
         self.assertEqual(len(searched_imms), 1)
-        self.assertEqual(searched_imms[0].resource.id, imms_ids[0])
+        self.assertEqual(searched_imms[0]["resource"]["id"], imms_ids[0])
 
         # CASE: Day before.
         self.imms_repo.find_immunizations.return_value = deepcopy(imms_list)
@@ -828,7 +951,7 @@ class TestSearchImmunizations(unittest.TestCase):
         result = self.fhir_service.search_immunizations(
             nhs_number, vaccine_types, "", date_to=datetime.date(2021, 2, 6)
         )
-        searched_imms = [entry for entry in result.entry if entry.resource.resource_type == "Immunization"]
+        searched_imms = [entry for entry in result["entry"] if entry["resource"]["resourceType"] == "Immunization"]
 
         # Then
         self.assertEqual(len(searched_imms), 0)
@@ -846,11 +969,11 @@ class TestSearchImmunizations(unittest.TestCase):
 
         # When
         result = self.fhir_service.search_immunizations(nhs_number, vaccine_types, "")
-        searched_imms = [entry for entry in result.entry if entry.resource.resource_type == "Immunization"]
+        searched_imms = [entry for entry in result["entry"] if entry["resource"]["resourceType"] == "Immunization"]
 
         # Then
         for i, entry in enumerate(searched_imms):
-            self.assertEqual(entry.resource.id, imms_ids[i])
+            self.assertEqual(entry["resource"]["id"], imms_ids[i])
 
         # CASE 2: With date_to argument
         self.imms_repo.find_immunizations.return_value = deepcopy(imms_list)
@@ -859,11 +982,11 @@ class TestSearchImmunizations(unittest.TestCase):
         result = self.fhir_service.search_immunizations(
             nhs_number, vaccine_types, "", date_to=datetime.date(2021, 3, 8)
         )
-        searched_imms = [entry for entry in result.entry if entry.resource.resource_type == "Immunization"]
+        searched_imms = [entry for entry in result["entry"] if entry["resource"]["resourceType"] == "Immunization"]
 
         # Then
         for i, entry in enumerate(searched_imms):
-            self.assertEqual(entry.resource.id, imms_ids[i])
+            self.assertEqual(entry["resource"]["id"], imms_ids[i])
 
     def test_immunization_resources_are_filtered_for_search(self):
         """
@@ -885,14 +1008,14 @@ class TestSearchImmunizations(unittest.TestCase):
             NHS_NUMBER_USED_IN_SAMPLE_DATA, vaccine_types, ""
         )
         searched_imms = [
-            json.loads(entry.json(), parse_float=Decimal)
-            for entry in result.entry
-            if entry.resource.resource_type == "Immunization"
+            entry
+            for entry in result["entry"]
+            if entry["resource"]["resourceType"] == "Immunization"
         ]
         searched_patient = [
-            json.loads(entry.json())
-            for entry in result.entry
-            if entry.resource.resource_type == "Patient"
+            entry
+            for entry in result["entry"]
+            if entry["resource"]["resourceType"] == "Patient"
         ][0]
 
         # Then
@@ -911,7 +1034,7 @@ class TestSearchImmunizations(unittest.TestCase):
 
     def test_matches_contain_fullUrl(self):
         """All matches must have a fullUrl consisting of their id.
-        See http://hl7.org/fhir/R4B/bundle-definitions.html#Bundle.entry.fullUrl.
+        See http://hl7.org/fhir/R4B/bundle-definitions.html#Bundle.entry["fullUrl"].
         Tested because fhir.resources validation doesn't check this as mandatory."""
 
         imms_ids = ["imms-1", "imms-2"]
@@ -922,18 +1045,18 @@ class TestSearchImmunizations(unittest.TestCase):
 
         # When
         result = self.fhir_service.search_immunizations(nhs_number, vaccine_types, "")
-        entries = [entry for entry in result.entry if entry.resource.resource_type == "Immunization"]
+        entries = [entry for entry in result["entry"] if entry["resource"]["resourceType"] == "Immunization"]
 
         # Then
         for i, entry in enumerate(entries):
             self.assertEqual(
-                entry.fullUrl,
+                entry["fullUrl"],
                 f"https://api.service.nhs.uk/immunisation-fhir-api/Immunization/{imms_ids[i]}",
             )
 
     def test_patient_contains_fullUrl(self):
         """Patient must have a fullUrl consisting of its id.
-        See http://hl7.org/fhir/R4B/bundle-definitions.html#Bundle.entry.fullUrl.
+        See http://hl7.org/fhir/R4B/bundle-definitions.html#Bundle.entry["fullUrl"].
         Tested because fhir.resources validation doesn't check this as mandatory."""
 
         imms_ids = ["imms-1", "imms-2"]
@@ -946,8 +1069,8 @@ class TestSearchImmunizations(unittest.TestCase):
         result = self.fhir_service.search_immunizations(nhs_number, vaccine_types, "")
 
         # Then
-        patient_entry = next((entry for entry in result.entry if entry.resource.resource_type == "Patient"), None)
-        patient_full_url = patient_entry.fullUrl
+        patient_entry = next((entry for entry in result["entry"] if entry["resource"]["resourceType"] == "Patient"), None)
+        patient_full_url = patient_entry["fullUrl"]
         self.assertTrue(patient_full_url.startswith("urn:uuid:"))
 
         # Check that final part of fullUrl is a uuid
@@ -968,7 +1091,7 @@ class TestSearchImmunizations(unittest.TestCase):
         result = self.fhir_service.search_immunizations(nhs_number, vaccine_types, "")
 
         # Then
-        patient_entry = next((entry for entry in result.entry if entry.resource.resource_type == "Patient"))
+        patient_entry = next((entry for entry in result["entry"] if entry["resource"]["resourceType"] == "Patient"))
         self.assertIsNotNone(patient_entry)
 
     def test_patient_is_stripped(self):
@@ -985,15 +1108,9 @@ class TestSearchImmunizations(unittest.TestCase):
         result = self.fhir_service.search_immunizations(nhs_number, vaccine_types, "")
 
         # Then
-        patient_entry = next((entry for entry in result.entry if entry.resource.resource_type == "Patient"))
-        patient_entry_resource = patient_entry.resource
-        fields_to_keep = ["id", "resource_type", "identifier"]
-        # self.assertListEqual(sorted(vars(patient_entry.resource).keys()), sorted(fields_to_keep))
-        # self.assertGreater(len(patient), len(fields_to_keep))
+        patient_entry = next((entry for entry in result["entry"] if entry["resource"]["resourceType"] == "Patient"))
+        patient_entry_resource = patient_entry["resource"]
+        fields_to_keep = ["id", "resourceType", "identifier"]
+        self.assertListEqual(sorted(patient_entry_resource.keys()), sorted(fields_to_keep))
         for field in fields_to_keep:
-            self.assertTrue(hasattr(patient_entry_resource, field), f"{field} in Patient")
-            self.assertIsNotNone(getattr(patient_entry_resource, field))
-
-        for k, v in vars(patient_entry_resource).items():
-            if k not in fields_to_keep:
-                self.assertIsNone(v)
+            self.assertIsNotNone(patient_entry_resource[field])
@@ -1,7 +1,7 @@
 import unittest
 import os
 from unittest import TestCase
-from unittest.mock import patch, MagicMock
+from unittest.mock import patch, MagicMock, ANY
 from boto3 import resource as boto3_resource
 from moto import mock_aws
 from models.errors import (
@@ -19,7 +19,7 @@ import json
 from utils.test_utils_for_batch import ForwarderValues, MockFhirImmsResources
 
 with patch.dict("os.environ", ForwarderValues.MOCK_ENVIRONMENT_DICT):
-    from forwarding_batch_lambda import forward_lambda_handler, create_diagnostics_dictionary, forward_request_to_dynamo
+    from forwarding_batch_lambda import forward_lambda_handler, create_diagnostics_dictionary, send_to_ack_queue
 @mock_aws
 @patch.dict(os.environ, ForwarderValues.MOCK_ENVIRONMENT_DICT)
 class TestForwardLambdaHandler(TestCase):
@@ -392,6 +392,12 @@ class TestForwardLambdaHandler(TestCase):
                 "Version": 1,
             }
         )
+        self.table.put_item(
+            Item={
+                "PK": "Identifier#https://www.ravs.england.nhs.uk/#RSV_002",
+                "ImmunizationPK": "Immunization#4d2ac1eb-080f-4e54-9598-f2d53334681c",
+            }
+        )
         mock_send_message.reset_mock()
         event = self.generate_event(test_cases)
 
@@ -573,11 +579,11 @@ class TestForwardLambdaHandler(TestCase):
                 self.assertEqual(result, case["expected_output"])
 
     @patch("forwarding_batch_lambda.sqs_client.send_message")
-    @patch("forwarding_batch_lambda.forward_request_to_dynamo")
+    @patch("forwarding_batch_lambda.forward_requests_to_dynamo")
     @patch("forwarding_batch_lambda.create_table")
     @patch("forwarding_batch_lambda.make_batch_controller")
     def test_forward_request_to_dyanamo(
-        self, mock_make_controller, mock_create_table, mock_forward_request_to_dynamo, mock_send_message
+        self, mock_make_controller, mock_create_table, mock_forward_requests_to_dynamo, mock_send_message
     ):
         """Test forward lambda handler to assert dynamo db is called,
         and diagnostics handling.
@@ -588,9 +594,7 @@ class TestForwardLambdaHandler(TestCase):
         """
         mock_create_table.return_value = {}
         mock_make_controller.return_value = mock_controller = MagicMock()
-        mock_forward_request_to_dynamo.side_effect = [
-            "IMMS123",
-        ]
+        mock_forward_requests_to_dynamo.return_value = ["IMMS123"]
 
         test_case = [
             {
@@ -613,8 +617,8 @@ class TestForwardLambdaHandler(TestCase):
 
         forward_lambda_handler(event, {})
 
-        call = mock_forward_request_to_dynamo.call_args_list
-        call_data = call[0][0][0]
+        call = mock_forward_requests_to_dynamo.call_args_list
+        call_data = call[0][0][0][0]
         expected_values = test_case[0]["expected_values"]
         assert expected_values.items() <= call_data.items()
 
@@ -634,5 +638,58 @@ class TestForwardLambdaHandler(TestCase):
         self.dynamodb_resource = None
 
 
+@patch("forwarding_batch_lambda.s3_client")
+@patch("forwarding_batch_lambda.sqs_client")
+class TestSendToAckQueue(TestCase):
+
+    def make_messages(self, count):
+        return [{"row_id": f"row-{i}", "imms_id": f"imms-{i}", "file_key": "test_file_key"} for i in range(count)]
+
+    def sent_message_bodies(self, mock_sqs_client):
+        return [call.kwargs["MessageBody"] for call in mock_sqs_client.send_message.call_args_list]
+
+    def test_send_to_ack_queue_single_message(self, mock_sqs_client, mock_s3_client):
+        """it should send results within the SQS size limit as a single message"""
+        messages = self.make_messages(3)
+
+        send_to_ack_queue(messages, "test_file_key_2025")
+
+        self.assertEqual([json.loads(body) for body in self.sent_message_bodies(mock_sqs_client)], [messages])
+        mock_sqs_client.send_message.assert_called_once_with(
+            QueueUrl=ANY, MessageBody=ANY, MessageGroupId="test_file_key_2025"
+        )
+        mock_s3_client.put_object.assert_not_called()
+
+    @patch("forwarding_batch_lambda.SQS_MAX_MESSAGE_BYTES", 200)
+    def test_send_to_ack_queue_splits_large_results(self, mock_sqs_client, mock_s3_client):
+        """it should split results over the SQS size limit into several messages, keeping the row order"""
+        messages = self.make_messages(10)
+
+        send_to_ack_queue(messages, "test_file_key_2025")
+
+        message_bodies = self.sent_message_bodies(mock_sqs_client)
+        self.assertGreater(len(message_bodies), 1)
+        for body in message_bodies:
+            self.assertLessEqual(len(body.encode("utf-8")), 200)
+        self.assertEqual([message for body in message_bodies for message in json.loads(body)], messages)
+        mock_s3_client.put_object.assert_not_called()
+
+    @patch("forwarding_batch_lambda.CLAIM_CHECK_THRESHOLD_BYTES", 400)
+    @patch("forwarding_batch_lambda.SQS_MAX_MESSAGE_BYTES", 200)
+    def test_send_to_ack_queue_claim_check(self, mock_sqs_client, mock_s3_client):
+        """it should upload results over the claim check threshold to S3 and send only the claim check"""
+        messages = self.make_messages(10)
+
+        send_to_ack_queue(messages, "test_file_key_2025")
+
+        uploaded = mock_s3_client.put_object.call_args.kwargs
+        self.assertEqual(json.loads(uploaded["Body"]), messages)
+        self.assertTrue(uploaded["Key"].startswith("forwarder_claim_checks/test_file_key_2025/"))
+        self.assertEqual(
+            [json.loads(body) for body in self.sent_message_bodies(mock_sqs_client)],
+            [{"claim_check": {"bucket": uploaded["Bucket"], "key": uploaded["Key"]}}],
+        )
+
+
 if __name__ == "__main__":
     unittest.main()
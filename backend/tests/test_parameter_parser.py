@@ -12,6 +12,7 @@ from parameter_parser import (
     process_params,
     process_search_params,
     create_query_string,
+    encode_page_token,
     SearchParams,
 )
 
@@ -212,3 +213,69 @@ class TestParameterParser(unittest.TestCase):
         expected = "-immunization.target=b,c&patient.identifier=https%3A%2F%2Ffhir.nhs.uk%2FId%2Fnhs-number%7Ca"
 
         self.assertEqual(expected, query_string)
+
+    def test_create_query_string_with_paging_params(self):
+        page_start_keys = {"b": {"PK": "Immunization#1", "PatientPK": "Patient#a", "PatientSK": "b#1"}}
+        search_params = SearchParams("a", ["b"], None, None, None, 10, page_start_keys)
+        query_string = create_query_string(search_params)
+        expected = (
+            f"-immunization.target=b&-page.token={encode_page_token(page_start_keys)}&_count=10"
+            "&patient.identifier=https%3A%2F%2Ffhir.nhs.uk%2FId%2Fnhs-number%7Ca"
+        )
+
+        self.assertEqual(expected, query_string)
+
+    def test_process_search_params_count_and_page_token(self):
+        self.mock_redis_client.hkeys.return_value = ["COVID19", "FLU"]
+        page_start_keys = {
+            "COVID19": {"PK": "Immunization#1", "PatientPK": "Patient#9000000009", "PatientSK": "COVID19#1"},
+            "FLU": None,
+        }
+
+        params = process_search_params(
+            {
+                self.patient_identifier_key: ["https://fhir.nhs.uk/Id/nhs-number|9000000009"],
+                self.immunization_target_key: ["COVID19", "FLU"],
+                "_count": ["10"],
+                "-page.token": [encode_page_token(page_start_keys)],
+            }
+        )
+
+        self.assertEqual(params.count, 10)
+        self.assertEqual(params.page_start_keys, page_start_keys)
+
+    def test_process_search_params_count_must_be_positive_integer(self):
+        self.mock_redis_client.hkeys.return_value = ["COVID19"]
+
+        for count in ["0", "-1", "abc"]:
+            with self.subTest(count=count):
+                with self.assertRaises(ParameterException) as e:
+                    process_search_params(
+                        {
+                            self.patient_identifier_key: ["https://fhir.nhs.uk/Id/nhs-number|9000000009"],
+                            self.immunization_target_key: ["COVID19"],
+                            "_count": [count],
+                        }
+                    )
+                self.assertEqual(str(e.exception), "Search parameter _count must be a positive integer.")
+
+    def test_process_search_params_rejects_invalid_page_token(self):
+        self.mock_redis_client.hkeys.return_value = ["COVID19", "FLU"]
+        other_patient_keys = {
+            "COVID19": {"PK": "Immunization#1", "PatientPK": "Patient#9000000017", "PatientSK": "COVID19#1"}
+        }
+        unrequested_vaccine_type_keys = {"FLU": None}
+
+        for page_token in ["not-a-token", encode_page_token(other_patient_keys),
+                           encode_page_token(unrequested_vaccine_type_keys)]:
+            with self.subTest(page_token=page_token):
+                with self.assertRaises(ParameterException) as e:
+                    process_search_params(
+                        {
+                            self.patient_identifier_key: ["https://fhir.nhs.uk/Id/nhs-number|9000000009"],
+                            self.immunization_target_key: ["COVID19"],
+                            "_count": ["10"],
+                            "-page.token": [page_token],
+                        }
+                    )
+                self.assertEqual(str(e.exception), "Search parameter -page.token is invalid.")
@@ -0,0 +1,61 @@
+import unittest
+
+from models.utils.permission_checker import (
+    ApiOperationCode,
+    CompiledPermissions,
+    compile_permissions,
+    validate_permissions,
+)
+
+
+class TestPermissionChecker(unittest.TestCase):
+    def test_compiled_permissions_allow_listed_operations(self):
+        """it should allow only the listed operations for each vaccine type, ignoring case"""
+        compiled_permissions = CompiledPermissions(("COVID19.CRUDS", "flu.r"))
+
+        for operation in ApiOperationCode:
+            self.assertTrue(compiled_permissions.allows(operation, "covid19"))
+        self.assertTrue(compiled_permissions.allows(ApiOperationCode.READ, "FLU"))
+        self.assertFalse(compiled_permissions.allows(ApiOperationCode.CREATE, "FLU"))
+        self.assertFalse(compiled_permissions.allows(ApiOperationCode.READ, "RSV"))
+
+    def test_unknown_operation_codes_are_ignored(self):
+        """it should ignore characters which are not operation codes"""
+        compiled_permissions = CompiledPermissions(("COVID19.cx",))
+
+        self.assertEqual(compiled_permissions.operation_masks.keys(), {"covid19"})
+        self.assertTrue(compiled_permissions.allows(ApiOperationCode.CREATE, "COVID19"))
+        self.assertFalse(compiled_permissions.allows(ApiOperationCode.READ, "COVID19"))
+
+    def test_later_permission_for_same_vaccine_type_takes_precedence(self):
+        """it should use the last permission given for a vaccine type"""
+        compiled_permissions = CompiledPermissions(("COVID19.CRUDS", "COVID19.R"))
+
+        self.assertTrue(compiled_permissions.allows(ApiOperationCode.READ, "COVID19"))
+        self.assertFalse(compiled_permissions.allows(ApiOperationCode.CREATE, "COVID19"))
+
+    def test_compile_permissions_is_memoized(self):
+        """it should only compile each distinct list of permissions once"""
+        first = compile_permissions(["COVID19.CRUDS", "FLU.R"])
+        second = compile_permissions(["COVID19.CRUDS", "FLU.R"])
+        other = compile_permissions(["COVID19.R"])
+
+        self.assertIs(first, second)
+        self.assertIsNot(first, other)
+
+    def test_permitted_vaccine_types(self):
+        """it should return the requested vaccine types which permit the operation, in the requested order"""
+        compiled_permissions = compile_permissions(["COVID19.S", "FLU.R", "RSV.CRUDS"])
+
+        self.assertEqual(
+            compiled_permissions.permitted_vaccine_types(ApiOperationCode.SEARCH, ["RSV", "FLU", "COVID19"]),
+            ["RSV", "COVID19"],
+        )
+
+    def test_validate_permissions(self):
+        """it should only validate if the operation is permitted for all of the vaccine types"""
+        permissions = ["COVID19.CRUDS", "FLU.R"]
+
+        self.assertTrue(validate_permissions(permissions, ApiOperationCode.READ, ["COVID19", "FLU"]))
+        self.assertFalse(validate_permissions(permissions, ApiOperationCode.CREATE, ["COVID19", "FLU"]))
+        self.assertFalse(validate_permissions([], ApiOperationCode.READ, ["COVID19"]))
@@ -0,0 +1,120 @@
+import unittest
+from unittest.mock import MagicMock
+
+from redis_read_cache import RedisReadCache
+
+
+class TestRedisReadCache(unittest.TestCase):
+    def setUp(self):
+        self.now = 1000.0
+        self.mock_redis_client = MagicMock()
+        self.mock_redis_client.get.return_value = "1"
+        self.cache = RedisReadCache(
+            self.mock_redis_client,
+            version_key="config_version",
+            ttl_seconds=300,
+            max_entries=2,
+            version_check_interval_seconds=10,
+            clock=lambda: self.now,
+        )
+
+    def test_hget_is_read_through(self):
+        """it should read from redis once and then serve repeated reads from the cache"""
+        self.mock_redis_client.hget.return_value = '["COVID19.CRUDS"]'
+
+        # When
+        first = self.cache.hget("supplier_permissions", "TEST")
+        second = self.cache.hget("supplier_permissions", "TEST")
+
+        # Then
+        self.assertEqual(first, '["COVID19.CRUDS"]')
+        self.assertEqual(second, '["COVID19.CRUDS"]')
+        self.mock_redis_client.hget.assert_called_once_with("supplier_permissions", "TEST")
+
+    def test_cache_is_keyed_by_hash_and_field(self):
+        """it should cache each hash and field separately"""
+        self.mock_redis_client.hget.side_effect = lambda name, key: f"{name}:{key}"
+
+        # When
+        self.cache.hget("hash_a", "field")
+        self.cache.hget("hash_b", "field")
+        result = self.cache.hget("hash_a", "field")
+
+        # Then
+        self.assertEqual(result, "hash_a:field")
+        self.assertEqual(self.mock_redis_client.hget.call_count, 2)
+
+    def test_missing_values_are_cached(self):
+        """it should cache a missing field so that unknown keys don't hit redis on every request"""
+        self.mock_redis_client.hget.return_value = None
+
+        # When
+        self.cache.hget("supplier_permissions", "UNKNOWN")
+        result = self.cache.hget("supplier_permissions", "UNKNOWN")
+
+        # Then
+        self.assertIsNone(result)
+        self.mock_redis_client.hget.assert_called_once()
+
+    def test_hkeys_is_read_through(self):
+        """it should cache hkeys by hash name"""
+        self.mock_redis_client.hkeys.return_value = ["COVID19", "FLU"]
+
+        # When
+        self.cache.hkeys("vacc_to_diseases")
+        result = self.cache.hkeys("vacc_to_diseases")
+
+        # Then
+        self.assertEqual(result, ["COVID19", "FLU"])
+        self.mock_redis_client.hkeys.assert_called_once_with("vacc_to_diseases")
+
+    def test_entries_expire_after_ttl(self):
+        """it should read from redis again once an entry has expired"""
+        self.mock_redis_client.hget.side_effect = ["old", "new"]
+        self.cache.hget("hash", "field")
+
+        # When
+        self.now += 301
+        result = self.cache.hget("hash", "field")
+
+        # Then
+        self.assertEqual(result, "new")
+        self.assertEqual(self.mock_redis_client.hget.call_count, 2)
+
+    def test_least_recently_used_entry_is_evicted(self):
+        """it should evict the least recently used entry once max_entries is exceeded"""
+        self.mock_redis_client.hget.side_effect = lambda name, key: key
+        self.cache.hget("hash", "a")
+        self.cache.hget("hash", "b")
+        self.cache.hget("hash", "a")
+
+        # When
+        self.cache.hget("hash", "c")
+        self.mock_redis_client.hget.reset_mock()
+        self.cache.hget("hash", "a")
+        self.cache.hget("hash", "b")
+
+        # Then
+        self.mock_redis_client.hget.assert_called_once_with("hash", "b")
+
+    def test_cache_is_cleared_when_version_changes(self):
+        """it should clear the cache when the config version changes, checking at most once per interval"""
+        self.mock_redis_client.hget.side_effect = ["old", "new"]
+        self.cache.hget("hash", "field")
+        self.mock_redis_client.get.return_value = "2"
+
+        # CASE: Within the version check interval
+        self.now += 5
+        self.assertEqual(self.cache.hget("hash", "field"), "old")
+
+        # CASE: After the version check interval
+        self.now += 5
+        self.assertEqual(self.cache.hget("hash", "field"), "new")
+        self.assertEqual(self.mock_redis_client.get.call_count, 2)
+        self.mock_redis_client.get.assert_called_with("config_version")
+
+    def test_other_commands_are_passed_through(self):
+        """it should pass uncached commands through to the redis client"""
+        self.mock_redis_client.hgetall.return_value = {"a": "b"}
+
+        self.assertEqual(self.cache.hgetall("hash"), {"a": "b"})
@@ -12,16 +12,17 @@ from botocore.exceptions import ClientError
 
 from common.mappings import ActionFlag, Operation, EventName
 from converter import Converter
-from log_firehose import FirehoseLogger
+from common.log_firehose import FirehoseLogger
 
 failure_queue_url = os.environ["AWS_SQS_QUEUE_URL"]
 delta_table_name = os.environ["DELTA_TABLE_NAME"]
 delta_source = os.environ["SOURCE"]
 region_name = "eu-west-2"
+IDENTIFIER_SENTINEL_PK_PREFIX = "Identifier#"
 logging.basicConfig()
 logger = logging.getLogger()
 logger.setLevel("INFO")
-firehose_logger = FirehoseLogger()
+firehose_logger = FirehoseLogger(os.getenv("SPLUNK_FIREHOSE_NAME"), boto3.client("firehose", region_name=region_name))
 
 delta_table = None
 def get_delta_table():
@@ -182,8 +183,17 @@ def process_create_update_delete(record):
         operation_outcome.update(extra_log_fields)
         return success, operation_outcome
 
+def is_identifier_sentinel(record) -> bool:
+    """Identifier sentinel items only reserve an identifier for an Immunization, so have no delta"""
+    image = record["dynamodb"].get("NewImage") or record["dynamodb"]["Keys"]
+    return image["PK"]["S"].startswith(IDENTIFIER_SENTINEL_PK_PREFIX)
+
 def process_record(record):
     try:
+        if is_identifier_sentinel(record):
+            logger.info("Identifier sentinel skipped")
+            return True, {"statusCode": "200", "statusDesc": "Identifier sentinel skipped"}
+
         if record["eventName"] == EventName.DELETE_PHYSICAL:
             return process_remove(record)
 
@@ -226,4 +236,6 @@ def handler(event, _context):
     if not overall_success:
         send_message(event)
 
+    # The logs are sent in batches, so any remaining logs must be sent before the lambda is frozen
+    firehose_logger.flush()
     return overall_success
@@ -2,4 +2,5 @@ import os
 import sys
 
 sys.path.append(f"{os.path.dirname(os.path.abspath(__file__))}/../src")
+sys.path.append(f"{os.path.dirname(os.path.abspath(__file__))}/../../lambdas/shared/src")
 sys.path.append(os.path.abspath(os.path.dirname(__file__)))
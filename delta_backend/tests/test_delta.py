@@ -207,6 +207,31 @@ class DeltaHandlerTestCase(unittest.TestCase):
         self.mock_firehose_logger.send_log.assert_called()
         self.mock_sqs_client.send_message.assert_not_called()
 
+    @patch("delta.logger.info")
+    def test_identifier_sentinel_skipped(self, mock_logger_info):
+        for event_name in (EventName.CREATE, EventName.DELETE_PHYSICAL):
+            with self.subTest(event_name=event_name):
+                record = {
+                    "eventID": "an-event-id",
+                    "eventName": event_name,
+                    "dynamodb": {
+                        "ApproximateCreationDateTime": 1690896000,
+                        "Keys": {"PK": {"S": "Identifier#https://supplierABC/identifiers/vacc#ACME-vacc123456"}},
+                    },
+                }
+                if event_name == EventName.CREATE:
+                    record["dynamodb"]["NewImage"] = {
+                        "PK": {"S": "Identifier#https://supplierABC/identifiers/vacc#ACME-vacc123456"},
+                        "ImmunizationPK": {"S": "Immunization#an-imms-id"},
+                    }
+
+                response = handler({"Records": [record]}, None)
+
+                self.assertTrue(response)
+                mock_logger_info.assert_called_with("Identifier sentinel skipped")
+                self.mock_delta_table.put_item.assert_not_called()
+                self.mock_sqs_client.send_message.assert_not_called()
+
     @patch("delta.Converter")
     def test_partial_success_with_errors(self, mock_converter):
         mock_converter_instance = MagicMock()
@@ -1,7 +1,7 @@
 import unittest
 from unittest.mock import patch, MagicMock
 import json
-from log_firehose import FirehoseLogger
+from common.log_firehose import FirehoseLogger
 
 
 class TestFirehoseLogger(unittest.TestCase):
@@ -15,57 +15,50 @@ class TestFirehoseLogger(unittest.TestCase):
     def tearDown(self):
         self.logger_info_patcher.stop()
 
-    @patch("boto3.client")
-    def test_send_log(self, mock_boto_client):
-        """it should send log message to Firehose"""
+    def test_send_log(self):
+        """it should send the log message to Firehose once flushed"""
 
         # Arrange
-        mock_response = {
-            "RecordId": "shardId-000000000000000000000001",
-            "ResponseMetadata": {
-            "RequestId": "12345abcde67890fghijk",
-            "HTTPStatusCode": 200, 
-            "RetryAttempts": 0
-            }
-        }        
         mock_firehose_client = MagicMock()
-        mock_boto_client.return_value = mock_firehose_client
-        mock_firehose_client.put_record.return_value = mock_response
-        
+        mock_firehose_client.put_record_batch.return_value = {"FailedPutCount": 0}
+
         stream_name = "stream_name"
-        firehose_logger = FirehoseLogger(boto_client=mock_firehose_client, stream_name=stream_name)    
+        firehose_logger = FirehoseLogger(boto_client=mock_firehose_client, stream_name=stream_name)
         log_message = {"text": "Test log message"}
 
         # Act
         firehose_logger.send_log(log_message)
+        firehose_logger.flush()
 
         # Assert
-        mock_firehose_client.put_record.assert_called_once()
-        self.assertEqual(mock_firehose_client.put_record.return_value, mock_response)
+        mock_firehose_client.put_record_batch.assert_called_once_with(
+            DeliveryStreamName=stream_name,
+            Records=[{"Data": json.dumps(log_message).encode("utf-8")}],
+        )
 
-    @patch("boto3.client")
-    def test_send_log_failure(self, mock_boto_client):
-        """Test that send_log logs an exception when put_record fails."""
+    def test_send_log_failure(self):
+        """Test that flush logs an exception when put_record_batch fails."""
 
         # Arrange
         mock_firehose_client = MagicMock()
-        mock_boto_client.return_value = mock_firehose_client
-        mock_firehose_client.put_record.side_effect = Exception("Test exception")
+        test_exception = Exception("Test exception")
+        mock_firehose_client.put_record_batch.side_effect = test_exception
 
         stream_name = "test-stream"
         firehose_logger = FirehoseLogger(boto_client=mock_firehose_client, stream_name=stream_name)
         log_message = {"key": "value"}
 
-        with patch("log_firehose.logger.exception") as mock_logger_exception:
+        with patch("common.log_firehose.logger.exception") as mock_logger_exception:
             # Act
             firehose_logger.send_log(log_message)
+            firehose_logger.flush()
 
             # Assert
-            mock_firehose_client.put_record.assert_called_once_with(
+            mock_firehose_client.put_record_batch.assert_called_once_with(
                 DeliveryStreamName="test-stream",
-                Record={"Data": json.dumps(log_message).encode("utf-8")},
+                Records=[{"Data": json.dumps(log_message).encode("utf-8")}],
             )
-            mock_logger_exception.assert_called_once_with("Error sending log to Firehose: Test exception")
+            mock_logger_exception.assert_called_once_with("Error sending %s logs to Firehose: %s", 1, test_exception)
 
 if __name__ == "__main__":
     unittest.main()
\ No newline at end of file
@@ -1,27 +1,17 @@
 """Add the filename to the audit table and check for duplicates."""
 
-from typing import Union
 from boto3.dynamodb.conditions import Key
+from botocore.exceptions import ClientError
 from clients import dynamodb_client, dynamodb_resource, logger
 from errors import DuplicateFileError, UnhandledAuditTableError
-from constants import AUDIT_TABLE_NAME, AUDIT_TABLE_QUEUE_NAME_GSI, AUDIT_TABLE_FILENAME_GSI, AuditTableKeys, FileStatus
-
-
-def get_next_queued_file_details(queue_name: str) -> Union[dict, None]:
-    """
-    Checks for queued files.
-    Returns a dictionary containing the details of the oldest queued file, or returns None if no queued files are found.
-    """
-    queued_files_found_in_audit_table: dict = dynamodb_resource.Table(AUDIT_TABLE_NAME).query(
-        IndexName=AUDIT_TABLE_QUEUE_NAME_GSI,
-        KeyConditionExpression=Key(AuditTableKeys.QUEUE_NAME).eq(queue_name)
-        & Key(AuditTableKeys.STATUS).eq(FileStatus.QUEUED),
-    )
-
-    queued_files_details: list = queued_files_found_in_audit_table["Items"]
-
-    # Return the oldest queued file
-    return sorted(queued_files_details, key=lambda x: x["timestamp"])[0] if queued_files_details else None
+from constants import AUDIT_TABLE_NAME, AUDIT_TABLE_FILENAME_GSI, AuditTableKeys, FileStatus
+from common.audit_table_client import (
+    acquire_queue_lease,
+    get_oldest_file_in_queue,
+    get_status_timestamp,
+    release_queue_lease,
+    update_audit_table_status,
+)
 
 
 def ensure_file_is_not_a_duplicate(file_key: str, created_at_formatted_string: str) -> None:
@@ -36,6 +26,17 @@ def ensure_file_is_not_a_duplicate(file_key: str, created_at_formatted_string: s
         raise DuplicateFileError(f"Duplicate file: {file_key} added at {created_at_formatted_string}")
 
 
+def get_file_created_at_formatted_string(message_id: str) -> str:
+    """
+    Returns the created_at_formatted_string recorded for the file when it was added to the audit table. A file which is
+    resumed has already been moved out of the root of the source bucket, so this can't be read from the file.
+    """
+    audit_table_entry = dynamodb_client.get_item(
+        TableName=AUDIT_TABLE_NAME, Key={AuditTableKeys.MESSAGE_ID: {"S": message_id}}, ConsistentRead=True
+    )["Item"]
+    return audit_table_entry[AuditTableKeys.TIMESTAMP]["S"]
+
+
 def upsert_audit_table(
     message_id: str,
     file_key: str,
@@ -46,37 +47,24 @@ def upsert_audit_table(
 ) -> bool:
     """
     Updates the audit table with the file details. Returns a bool indicating whether the file status is queued
-    (i.e. if the file has passed initial validation and there are no other files in the queue, then the file is status
-    will be 'processing' and the file is ready to be sent for row level processing.)
+    (i.e. if the file has passed initial validation and it is the next file in the queue, and it has acquired one of
+    the queue's leases, then the file status will be 'processing' and the file is ready to be sent for row level
+    processing.)
+    A valid new file is added to the audit table as queued, so that the files in the queue are started in order.
     """
     try:
         # If the file is not new, then the lambda has been invoked by the next file in the queue for processing
         if is_existing_file:
-            dynamodb_client.update_item(
-                TableName=AUDIT_TABLE_NAME,
-                Key={AuditTableKeys.MESSAGE_ID: {"S": message_id}},
-                UpdateExpression="SET #status = :status",
-                ExpressionAttributeNames={"#status": "status"},
-                ExpressionAttributeValues={":status": {"S": file_status}},
-                ConditionExpression="attribute_exists(message_id)",
-            )
-            logger.info("%s file set for processing, and the status successfully updated in audit table", file_key)
-            return False
+            if file_status in (FileStatus.PROCESSED, FileStatus.DUPLICATE):
+                update_audit_table_status(message_id, file_status, created_at_formatted_str)
+                logger.info("%s file status successfully updated in audit table", file_key)
+                return False
+            return not start_processing_queued_file(message_id, file_key, created_at_formatted_str, queue_name)
 
-        # If the file is not already processed, check whether there is a file ahead in the queue already processing
-        if file_status not in (FileStatus.PROCESSED, FileStatus.DUPLICATE):
-            files_in_processing = dynamodb_resource.Table(AUDIT_TABLE_NAME).query(
-                IndexName=AUDIT_TABLE_QUEUE_NAME_GSI,
-                KeyConditionExpression=Key(AuditTableKeys.QUEUE_NAME).eq(queue_name)
-                & Key(AuditTableKeys.STATUS).eq(FileStatus.PROCESSING),
-            )
-            # TODO: There is a short time lag between a file being marked as processed, and the next queued file being
-            # marked as processing. If a third file is added to the queue during this time this could result in
-            # two files processing simultanously. This is a known issue which needs to be addressed in a future
-            # iteration.
-            if files_in_processing["Items"]:
-                file_status = FileStatus.QUEUED
-                logger.info("%s file queued for processing", file_key)
+        # If the file is not already processed, it joins the queue and is only processed once it has a lease
+        is_valid_file = file_status not in (FileStatus.PROCESSED, FileStatus.DUPLICATE)
+        if is_valid_file:
+            file_status = FileStatus.QUEUED
 
         # Add to the audit table (regardless of whether it is a duplicate)
         dynamodb_client.put_item(
@@ -86,15 +74,67 @@ def upsert_audit_table(
                 AuditTableKeys.FILENAME: {"S": file_key},
                 AuditTableKeys.QUEUE_NAME: {"S": queue_name},
                 AuditTableKeys.STATUS: {"S": file_status},
+                AuditTableKeys.STATUS_TIMESTAMP: {"S": get_status_timestamp(file_status, created_at_formatted_str)},
                 AuditTableKeys.TIMESTAMP: {"S": created_at_formatted_str},
             },
             ConditionExpression="attribute_not_exists(message_id)",  # Prevents accidental overwrites
         )
         logger.info("%s file, with message id %s, successfully added to audit table", file_key, message_id)
 
-        # Return a bool indicating whether the file status is queued
-        return True if file_status == FileStatus.QUEUED else False
+        if not is_valid_file:
+            return False
+
+        # Whether the file starts straight away is decided by the lease, which is written consistently. The queue name
+        # index is eventually consistent, so it is only read to give way to an older queued file. A file which is not
+        # yet in the index still starts, rather than waiting in the queue with no file to start it.
+        if not acquire_queue_lease(queue_name, message_id):
+            logger.info("%s file remains queued, as all of the leases for queue %s are held", file_key, queue_name)
+            return True
+
+        oldest_queued_file = get_oldest_file_in_queue(queue_name, FileStatus.QUEUED)
+        if oldest_queued_file and oldest_queued_file[AuditTableKeys.STATUS_TIMESTAMP] < get_status_timestamp(
+            FileStatus.QUEUED, created_at_formatted_str
+        ):
+            # The lease is freed for the older file, which is started by the caller
+            release_queue_lease(queue_name, message_id)
+        elif set_queued_file_to_processing(message_id, file_key, created_at_formatted_str):
+            return False
+
+        logger.info("%s file queued for processing", file_key)
+        return True
 
     except Exception as error:  # pylint: disable = broad-exception-caught
         logger.error(error)
         raise UnhandledAuditTableError(error) from error
+
+
+def start_processing_queued_file(
+    message_id: str, file_key: str, created_at_formatted_str: str, queue_name: str
+) -> bool:
+    """
+    Acquires a lease for the queued file and updates its status to processing. Returns a bool indicating whether the
+    file is ready to be sent for row level processing.
+    """
+    if not acquire_queue_lease(queue_name, message_id):
+        logger.info("%s file remains queued, as all of the leases for queue %s are held", file_key, queue_name)
+        return False
+
+    return set_queued_file_to_processing(message_id, file_key, created_at_formatted_str)
+
+
+def set_queued_file_to_processing(message_id: str, file_key: str, created_at_formatted_str: str) -> bool:
+    """
+    Updates the status of the file, which holds a lease, to processing. Returns a bool indicating whether the file is
+    ready to be sent for row level processing. The status is only updated from queued, so a file which is invoked more
+    than once is only processed once.
+    """
+    try:
+        update_audit_table_status(message_id, FileStatus.PROCESSING, created_at_formatted_str, FileStatus.QUEUED)
+    except ClientError as error:
+        if error.response["Error"]["Code"] != "ConditionalCheckFailedException":
+            raise
+        logger.info("%s file is no longer queued, so is not set for processing", file_key)
+        return False
+
+    logger.info("%s file set for processing, and the status successfully updated in audit table", file_key)
+    return True
@@ -0,0 +1,67 @@
+"""Writes the status_timestamp of each file in the audit table which was added before the queue name status index"""
+
+import argparse
+import logging
+
+import boto3
+import botocore.exceptions
+from boto3.dynamodb.conditions import Attr
+
+from common.audit_table_client import get_status_timestamp
+from constants import AuditTableKeys
+
+logging.basicConfig(level="INFO")
+logger = logging.getLogger()
+
+
+def backfill_status_timestamps(table) -> int:
+    """
+    Scans the audit table for files without a status_timestamp, and sets it from each file's status and timestamp, so
+    that the file is in the queue name status index. Returns the number of files updated. This is safe to re-run, and
+    to run while the lambdas are processing files, as a file is only updated if its status is unchanged since the scan.
+    """
+    files_updated = 0
+    scan_kwargs = {
+        "FilterExpression": Attr(AuditTableKeys.QUEUE_NAME).exists()
+        & Attr(AuditTableKeys.STATUS).exists()
+        & Attr(AuditTableKeys.TIMESTAMP).exists()
+        & Attr(AuditTableKeys.STATUS_TIMESTAMP).not_exists(),
+        "ProjectionExpression": "#message_id, #status, #timestamp",
+        "ExpressionAttributeNames": {
+            "#message_id": AuditTableKeys.MESSAGE_ID,
+            "#status": AuditTableKeys.STATUS,
+            "#timestamp": AuditTableKeys.TIMESTAMP,
+        },
+    }
+    while True:
+        response = table.scan(**scan_kwargs)
+        for item in response["Items"]:
+            file_status = item[AuditTableKeys.STATUS]
+            try:
+                table.update_item(
+                    Key={AuditTableKeys.MESSAGE_ID: item[AuditTableKeys.MESSAGE_ID]},
+                    UpdateExpression="SET #status_timestamp = :status_timestamp",
+                    ExpressionAttributeNames={"#status_timestamp": AuditTableKeys.STATUS_TIMESTAMP},
+                    ExpressionAttributeValues={
+                        ":status_timestamp": get_status_timestamp(file_status, item[AuditTableKeys.TIMESTAMP])
+                    },
+                    ConditionExpression=Attr(AuditTableKeys.STATUS).eq(file_status)
+                    & Attr(AuditTableKeys.STATUS_TIMESTAMP).not_exists(),
+                )
+                files_updated += 1
+            except botocore.exceptions.ClientError as error:
+                if error.response["Error"]["Code"] != "ConditionalCheckFailedException":
+                    raise
+
+        if "LastEvaluatedKey" not in response:
+            return files_updated
+        scan_kwargs["ExclusiveStartKey"] = response["LastEvaluatedKey"]
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser("backfill_status_timestamps")
+    parser.add_argument("table_name", help="Name of the audit table.", type=str)
+    args = parser.parse_args()
+
+    count = backfill_status_timestamps(boto3.resource("dynamodb", region_name="eu-west-2").Table(args.table_name))
+    logger.info("Wrote the status_timestamp of %d files", count)
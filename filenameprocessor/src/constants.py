@@ -13,7 +13,7 @@ from errors import (
 SOURCE_BUCKET_NAME = os.getenv("SOURCE_BUCKET_NAME")
 FILE_NAME_PROC_LAMBDA_NAME = os.getenv("FILE_NAME_PROC_LAMBDA_NAME")
 AUDIT_TABLE_NAME = os.getenv("AUDIT_TABLE_NAME")
-AUDIT_TABLE_QUEUE_NAME_GSI = "queue_name_index"
+AUDIT_TABLE_QUEUE_NAME_GSI = "queue_name_status_index"
 AUDIT_TABLE_FILENAME_GSI = "filename_index"
 
 SUPPLIER_PERMISSIONS_HASH_KEY = "supplier_permissions"
@@ -47,7 +47,10 @@ class AuditTableKeys:
     MESSAGE_ID = "message_id"
     QUEUE_NAME = "queue_name"
     STATUS = "status"
+    STATUS_TIMESTAMP = "status_timestamp"
     TIMESTAMP = "timestamp"
+    LEASES = "leases"
+    LEASE_VERSION = "lease_version"
 
 
 class Constants:
@@ -13,6 +13,16 @@ def get_supplier_permissions_from_cache(supplier_system: str) -> list[str]:
     return json.loads(permissions_str) if permissions_str else []
 
 
+def get_queue_names_from_cache() -> list[str]:
+    """Returns the name of the queue of each vaccine type which each supplier has permissions for"""
+    queue_names = set()
+    for supplier_system, permissions_str in redis_client.hgetall(SUPPLIER_PERMISSIONS_HASH_KEY).items():
+        queue_names.update(
+            f"{supplier_system}_{permission.split('.')[0]}" for permission in json.loads(permissions_str)
+        )
+    return sorted(queue_names)
+
+
 def get_valid_vaccine_types_from_cache() -> list[str]:
     return redis_client.hkeys(VACCINE_TYPE_TO_DISEASES_HASH_KEY)
 
@@ -7,14 +7,24 @@ NOTE: The expected file format for incoming files from the data sources bucket i
 """
 
 import argparse
+import time
 from uuid import uuid4
 from utils_for_filenameprocessor import get_created_at_formatted_string, move_file, invoke_filename_lambda
 from file_key_validation import validate_file_key
 from send_sqs_message import make_and_send_sqs_message
 from make_and_upload_ack_file import make_and_upload_the_ack_file
-from audit_table import upsert_audit_table, get_next_queued_file_details, ensure_file_is_not_a_duplicate
+from audit_table import upsert_audit_table, ensure_file_is_not_a_duplicate, get_file_created_at_formatted_string
+from common.audit_table_client import (
+    acquire_queue_lease,
+    get_files_in_queue,
+    get_next_queued_file_details,
+    get_queue_leases,
+    release_queue_lease,
+    requeue_file,
+)
 from clients import logger
-from logging_decorator import logging_decorator
+from elasticache import get_queue_names_from_cache
+from logging_decorator import logging_decorator, firehose_logger
 from supplier_permissions import validate_vaccine_type_permissions
 from errors import (
     VaccineTypePermissionsError,
@@ -24,7 +34,49 @@ from errors import (
     DuplicateFileError,
     UnhandledSqsError,
 )
-from constants import FileStatus, ERROR_TYPE_TO_STATUS_CODE_MAP
+from constants import AuditTableKeys, FileStatus, ERROR_TYPE_TO_STATUS_CODE_MAP
+
+
+def start_next_queued_file(queue_name: str, message_id: str = None) -> None:
+    """
+    Invokes the filename lambda with the oldest file in the queue, if a lease can be acquired for it. A lease is only
+    free if a slot of the queue is unused, for example if the lease of a file which stalled has expired, so this
+    restarts a queue which would otherwise wait for a file which will never complete.
+    """
+    next_queued_file_details = get_next_queued_file_details(queue_name)
+    if (
+        next_queued_file_details
+        and next_queued_file_details["message_id"] != message_id
+        and acquire_queue_lease(queue_name, next_queued_file_details["message_id"])
+    ):
+        logger.info("Starting the oldest queued file %s in queue %s", next_queued_file_details["filename"], queue_name)
+        invoke_filename_lambda(next_queued_file_details["filename"], next_queued_file_details["message_id"])
+
+
+def recover_stalled_files() -> None:
+    """
+    Puts each processing file whose lease of its queue has expired, or been taken, back in its queue, and frees its
+    expired lease, so that it is resumed from its checkpoint once it is started again. Then starts the oldest queued
+    file of each queue which has a free slot. This is run on a schedule, so that the queue of a file which stalled is
+    restarted even if no new file arrives.
+    """
+    for queue_name in get_queue_names_from_cache():
+        now = int(time.time())
+        leases = get_queue_leases(queue_name)
+        for file_details in get_files_in_queue(queue_name, FileStatus.PROCESSING):
+            message_id = file_details[AuditTableKeys.MESSAGE_ID]
+            expires_at = leases.get(message_id)
+            if expires_at is not None and expires_at > now:
+                continue
+
+            if requeue_file(message_id, file_details[AuditTableKeys.TIMESTAMP]):
+                logger.warning(
+                    "%s file stalled, so was put back in queue %s", file_details[AuditTableKeys.FILENAME], queue_name
+                )
+            if expires_at is not None:
+                release_queue_lease(queue_name, message_id, expires_at)
+
+        start_next_queued_file(queue_name)
 
 
 # NOTE: logging_decorator is applied to handle_record function, rather than lambda_handler, because
@@ -67,7 +119,12 @@ def handle_record(record) -> dict:
             # Get message_id if the file is not new, else assign one
             message_id = record.get("message_id", str(uuid4()))
 
-            created_at_formatted_string = get_created_at_formatted_string(bucket_name, file_key)
+            # A file already in the queue may be being resumed, in which case it has been moved to the processing
+            # folder, so its created_at_formatted_string is the one recorded when it was added to the audit table
+            if is_existing_file:
+                created_at_formatted_string = get_file_created_at_formatted_string(message_id)
+            else:
+                created_at_formatted_string = get_created_at_formatted_string(bucket_name, file_key)
 
             vaccine_type, supplier = validate_file_key(file_key)
             permissions = validate_vaccine_type_permissions(vaccine_type=vaccine_type, supplier=supplier)
@@ -80,6 +137,7 @@ def handle_record(record) -> dict:
             )
 
             if file_status_is_queued:
+                start_next_queued_file(queue_name, message_id)
                 message_for_logs = "File is successfully queued for processing"
             else:
                 make_and_send_sqs_message(
@@ -120,11 +178,12 @@ def handle_record(record) -> dict:
             message_delivered = False
             make_and_upload_the_ack_file(message_id, file_key, message_delivered, created_at_formatted_string)
 
-            # Move file to archive
+            # Move file to archive, and free the lease held by the file (if it holds one) for the next file
             move_file(bucket_name, file_key, f"archive/{file_key}")
+            release_queue_lease(queue_name, message_id)
 
             # If there is another file waiting in the queue, invoke the filename lambda with the next file
-            next_queued_file_details = get_next_queued_file_details(queue_name=f"{supplier}_{vaccine_type}")
+            next_queued_file_details = get_next_queued_file_details(queue_name)
             if next_queued_file_details:
                 invoke_filename_lambda(next_queued_file_details["filename"], next_queued_file_details["message_id"])
 
@@ -158,11 +217,21 @@ def handle_record(record) -> dict:
 
 
 def lambda_handler(event: dict, context) -> None:  # pylint: disable=unused-argument
-    """Lambda handler for filenameprocessor lambda. Processes each record in event records."""
+    """
+    Lambda handler for filenameprocessor lambda. Processes each record in event records. When invoked on its schedule,
+    recovers the files which have stalled instead.
+    """
 
     logger.info("Filename processor lambda task started")
-    for record in event["Records"]:
-        handle_record(record)
+    try:
+        if event.get("detail-type") == "Scheduled Event":
+            recover_stalled_files()
+        else:
+            for record in event["Records"]:
+                handle_record(record)
+    finally:
+        # The logs are sent in batches, so any remaining logs must be sent before the lambda is frozen
+        firehose_logger.flush()
 
     logger.info("Filename processor lambda task completed")
 
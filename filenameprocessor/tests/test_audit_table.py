@@ -12,12 +12,22 @@ from tests.utils_for_tests.utils_for_filenameprocessor_tests import (
     deserialize_dynamodb_types,
     add_entry_to_table,
     assert_audit_table_entry,
+    generate_audit_table_status,
 )
 
 # Ensure environment variables are mocked before importing from src files
 with patch.dict("os.environ", MOCK_ENVIRONMENT_DICT):
     from constants import AUDIT_TABLE_NAME, AuditTableKeys, FileStatus
-    from audit_table import upsert_audit_table, ensure_file_is_not_a_duplicate, get_next_queued_file_details
+    from audit_table import upsert_audit_table, ensure_file_is_not_a_duplicate
+    from common.audit_table_client import (
+        acquire_queue_lease,
+        get_files_in_queue,
+        get_next_queued_file_details,
+        get_queue_leases,
+        release_queue_lease,
+        renew_queue_lease,
+        requeue_file,
+    )
     from errors import UnhandledAuditTableError, DuplicateFileError
     from clients import REGION_NAME
 
@@ -61,7 +71,10 @@ class TestAuditTable(TestCase):
 
         # Test case 3: one queued file in the ravs_rsv queue
         add_entry_to_table(MockFileDetails.ravs_rsv_2, file_status=FileStatus.QUEUED)
-        expected_table_entry = {**MockFileDetails.ravs_rsv_2.audit_table_entry, "status": {"S": FileStatus.QUEUED}}
+        expected_table_entry = {
+            **MockFileDetails.ravs_rsv_2.audit_table_entry,
+            **generate_audit_table_status(MockFileDetails.ravs_rsv_2, FileStatus.QUEUED),
+        }
         self.assertEqual(get_next_queued_file_details(queue_to_check), deserialize_dynamodb_types(expected_table_entry))
 
         # Test case 4: multiple queued files in the RAVS_RSV queue
@@ -70,6 +83,122 @@ class TestAuditTable(TestCase):
         add_entry_to_table(MockFileDetails.ravs_rsv_4, file_status=FileStatus.QUEUED)
         self.assertEqual(get_next_queued_file_details(queue_to_check), deserialize_dynamodb_types(expected_table_entry))
 
+        # Test case 5: the oldest queued file is no longer queued, so the next oldest is the first in the queue
+        add_entry_to_table(MockFileDetails.ravs_rsv_2, file_status=FileStatus.PROCESSING)
+        expected_table_entry = {
+            **MockFileDetails.ravs_rsv_3.audit_table_entry,
+            **generate_audit_table_status(MockFileDetails.ravs_rsv_3, FileStatus.QUEUED),
+        }
+        self.assertEqual(get_next_queued_file_details(queue_to_check), deserialize_dynamodb_types(expected_table_entry))
+
+    def get_queue_leases(self, queue_name: str) -> dict:
+        """Returns the leases of the queue, as a dictionary of message ids to expiry times"""
+        lease_item = dynamodb_client.get_item(
+            TableName=AUDIT_TABLE_NAME, Key={AuditTableKeys.MESSAGE_ID: {"S": f"queue_lease#{queue_name}"}}
+        ).get("Item", {})
+        return deserialize_dynamodb_types(lease_item).get(AuditTableKeys.LEASES, {})
+
+    def test_acquire_queue_lease(self):
+        """
+        Tests that acquire_queue_lease acquires a lease if and only if one of the slots of the queue is free, or the
+        file already holds a lease, and that expired leases are freed
+        """
+        queue_name = "RAVS_RSV"
+
+        with patch("common.audit_table_client.time.time", return_value=1000):
+            # Test case 1: the queue has no leases, so the lease is acquired
+            self.assertTrue(acquire_queue_lease(queue_name, "test_id_1"))
+            self.assertEqual(self.get_queue_leases(queue_name), {"test_id_1": 1900})
+
+            # Test case 2: the only slot is held by another file, so the lease is not acquired
+            self.assertFalse(acquire_queue_lease(queue_name, "test_id_2"))
+
+            # Test case 3: the file already holds the lease, so the lease is acquired again
+            self.assertTrue(acquire_queue_lease(queue_name, "test_id_1"))
+
+            # Test case 4: the queue has a second slot, so the lease is acquired
+            with patch.dict("common.audit_table_client.QUEUE_LEASE_SLOTS", {queue_name: 2}):
+                self.assertTrue(acquire_queue_lease(queue_name, "test_id_2"))
+            self.assertEqual(self.get_queue_leases(queue_name), {"test_id_1": 1900, "test_id_2": 1900})
+
+            # Test case 5: other queues are unaffected
+            self.assertTrue(acquire_queue_lease("EMIS_FLU", "test_id_3"))
+
+        # Test case 6: the leases held have expired, so they are freed and the lease is acquired
+        with patch("common.audit_table_client.time.time", return_value=2000):
+            self.assertTrue(acquire_queue_lease(queue_name, "test_id_4"))
+        self.assertEqual(self.get_queue_leases(queue_name), {"test_id_4": 2900})
+
+    def test_renew_and_release_queue_lease(self):
+        """
+        Tests that renew_queue_lease extends the lease held by the file, and release_queue_lease frees it, without
+        affecting the leases of other files
+        """
+        queue_name = "RAVS_RSV"
+
+        with patch.dict("common.audit_table_client.QUEUE_LEASE_SLOTS", {queue_name: 2}):
+            with patch("common.audit_table_client.time.time", return_value=1000):
+                acquire_queue_lease(queue_name, "test_id_1")
+                acquire_queue_lease(queue_name, "test_id_2")
+
+            with patch("common.audit_table_client.time.time", return_value=1500):
+                self.assertTrue(renew_queue_lease(queue_name, "test_id_1"))
+            self.assertEqual(self.get_queue_leases(queue_name), {"test_id_1": 2400, "test_id_2": 1900})
+
+            release_queue_lease(queue_name, "test_id_1")
+            self.assertEqual(self.get_queue_leases(queue_name), {"test_id_2": 1900})
+
+            # Renewing or releasing a lease which is not held doesn't give a lease to the file, or raise an error
+            with patch("common.audit_table_client.logger") as mock_logger:
+                self.assertFalse(renew_queue_lease(queue_name, "test_id_1"))
+            mock_logger.warning.assert_called_once()
+            release_queue_lease(queue_name, "test_id_1")
+            self.assertEqual(self.get_queue_leases(queue_name), {"test_id_2": 1900})
+
+    def test_release_queue_lease_only_if_not_renewed(self):
+        """
+        Tests that release_queue_lease, given the time at which the lease was read to expire, only frees the lease if it
+        hasn't been renewed since
+        """
+        queue_name = "RAVS_RSV"
+
+        with patch("common.audit_table_client.time.time", return_value=1000):
+            acquire_queue_lease(queue_name, "test_id_1")
+        self.assertEqual(get_queue_leases(queue_name), {"test_id_1": 1900})
+
+        with patch("common.audit_table_client.time.time", return_value=1500):
+            renew_queue_lease(queue_name, "test_id_1")
+        release_queue_lease(queue_name, "test_id_1", expires_at=1900)
+        self.assertEqual(get_queue_leases(queue_name), {"test_id_1": 2400})
+
+        release_queue_lease(queue_name, "test_id_1", expires_at=2400)
+        self.assertEqual(get_queue_leases(queue_name), {})
+        self.assertEqual(get_queue_leases("EMIS_FLU"), {})
+
+    def test_requeue_file(self):
+        """
+        Tests that requeue_file puts a processing file back in its queue, keeping its place, and leaves a file which is
+        no longer processing unchanged
+        """
+        add_entry_to_table(MockFileDetails.ravs_rsv_1, FileStatus.PROCESSING)
+        add_entry_to_table(MockFileDetails.ravs_rsv_2, FileStatus.QUEUED)
+        add_entry_to_table(MockFileDetails.ravs_rsv_3, FileStatus.PROCESSED)
+
+        self.assertTrue(
+            requeue_file(MockFileDetails.ravs_rsv_1.message_id, MockFileDetails.ravs_rsv_1.created_at_formatted_string)
+        )
+        self.assertFalse(
+            requeue_file(MockFileDetails.ravs_rsv_3.message_id, MockFileDetails.ravs_rsv_3.created_at_formatted_string)
+        )
+
+        assert_audit_table_entry(MockFileDetails.ravs_rsv_1, FileStatus.QUEUED)
+        assert_audit_table_entry(MockFileDetails.ravs_rsv_3, FileStatus.PROCESSED)
+        self.assertEqual(
+            [file_details["message_id"] for file_details in get_files_in_queue("RAVS_RSV", FileStatus.QUEUED)],
+            [MockFileDetails.ravs_rsv_1.message_id, MockFileDetails.ravs_rsv_2.message_id],
+        )
+        self.assertEqual(get_files_in_queue("RAVS_RSV", FileStatus.PROCESSING), [])
+
     def test_ensure_file_is_not_a_duplicate(self):
         """
         Tests that ensure_file_is_not_a_duplicate raises a DuplicateFile Error if and only if the file is a
@@ -103,7 +232,7 @@ class TestAuditTable(TestCase):
         2. Duplicate file with status of 'Duplicate'.
         3. New file with status of 'Processing', and no files ahead in the queue.
         4. New file with status of 'Processing', and files ahead in the queue.
-        5. Existing file with status of 'Processing'.
+        5. Existing file with status of 'Processing', once the file ahead in the queue has released its lease.
         6. Existing file with status of 'Processed'.
         7. New file but with duplicated message_id.
         """
@@ -178,8 +307,10 @@ class TestAuditTable(TestCase):
         self.assertTrue(result)
         assert_audit_table_entry(rsv_ravs_test_file_4, FileStatus.QUEUED)
 
-        # Test case 5: existing file with status of 'Processing'.
+        # Test case 5: existing file with status of 'Processing', once the file ahead in the queue has released its
+        # lease.
         # Audit table status should be updated to 'Processing'. Return value should be False.
+        release_queue_lease(ravs_rsv_test_file_3.queue_name, ravs_rsv_test_file_3.message_id)
         result = upsert_audit_table(
             message_id=rsv_ravs_test_file_4.message_id,
             file_key=rsv_ravs_test_file_4.file_key,
@@ -224,7 +355,7 @@ class TestAuditTable(TestCase):
 
         # Final reconciliation: ensure that all of the correct items are in the audit table
         table_items = self.get_table_items()
-        assert len(table_items) == 7
+        assert len(table_items) == 8  # The seven files, and the lease item of the RAVS_RSV queue
         assert_audit_table_entry(MockFileDetails.emis_flu, FileStatus.QUEUED)
         assert_audit_table_entry(MockFileDetails.emis_rsv, FileStatus.QUEUED)
         assert_audit_table_entry(MockFileDetails.ravs_flu, FileStatus.QUEUED)
@@ -232,3 +363,35 @@ class TestAuditTable(TestCase):
         assert_audit_table_entry(ravs_rsv_test_file_2, FileStatus.DUPLICATE)
         assert_audit_table_entry(ravs_rsv_test_file_3, FileStatus.PROCESSING)
         assert_audit_table_entry(rsv_ravs_test_file_4, FileStatus.PROCESSED)
+
+    def test_upsert_audit_table_starts_new_file_from_its_lease(self):
+        """
+        Tests that a new file is started if it acquires a lease, even if it is not yet in the queue name index, and
+        that it gives way to an older queued file by freeing the lease
+        """
+        older_queued_file = FileDetails("RAVS", "RSV", "YGM41", file_number=1)
+        new_file = FileDetails("RAVS", "RSV", "YGM41", file_number=2)
+        newer_file = FileDetails("RAVS", "RSV", "YGM41", file_number=3)
+
+        def upsert_new_file(file_details: FileDetails) -> bool:
+            return upsert_audit_table(
+                message_id=file_details.message_id,
+                file_key=file_details.file_key,
+                created_at_formatted_str=file_details.created_at_formatted_string,
+                queue_name=file_details.queue_name,
+                file_status=FileStatus.PROCESSING,
+                is_existing_file=False,
+            )
+
+        # Test case 1: the older queued file is in the queue, so the new file is queued and doesn't keep the lease
+        add_entry_to_table(older_queued_file, FileStatus.QUEUED)
+
+        self.assertTrue(upsert_new_file(new_file))
+        assert_audit_table_entry(new_file, FileStatus.QUEUED)
+        self.assertEqual(self.get_queue_leases(new_file.queue_name), {})
+
+        # Test case 2: the queue name index hasn't caught up with the queued files, so the file holding the lease starts
+        with patch("audit_table.get_oldest_file_in_queue", return_value=None):
+            self.assertFalse(upsert_new_file(newer_file))
+        assert_audit_table_entry(newer_file, FileStatus.PROCESSING)
+        self.assertEqual(list(self.get_queue_leases(newer_file.queue_name)), [newer_file.message_id])
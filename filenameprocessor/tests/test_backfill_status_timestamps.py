@@ -0,0 +1,70 @@
+"""Tests for backfill_status_timestamps"""
+
+from unittest import TestCase
+from unittest.mock import patch
+from boto3 import client as boto3_client, resource as boto3_resource
+from moto import mock_dynamodb
+
+from tests.utils_for_tests.mock_environment_variables import MOCK_ENVIRONMENT_DICT
+from tests.utils_for_tests.generic_setup_and_teardown import GenericSetUp, GenericTearDown
+
+# Ensure environment variables are mocked before importing from src files
+with patch.dict("os.environ", MOCK_ENVIRONMENT_DICT):
+    from backfill_status_timestamps import backfill_status_timestamps
+    from common.audit_table_client import get_next_queued_file_details, get_queue_lease_key
+    from constants import AUDIT_TABLE_NAME, FileStatus
+    from clients import REGION_NAME
+
+dynamodb_client = boto3_client("dynamodb", region_name=REGION_NAME)
+
+
+@mock_dynamodb
+@patch.dict("os.environ", MOCK_ENVIRONMENT_DICT)
+class TestBackfillStatusTimestamps(TestCase):
+    """Tests for backfill_status_timestamps"""
+
+    def setUp(self):
+        """Set up the audit table"""
+        GenericSetUp(dynamodb_client=dynamodb_client)
+        self.table = boto3_resource("dynamodb", region_name=REGION_NAME).Table(AUDIT_TABLE_NAME)
+
+    def tearDown(self):
+        """Tear down the audit table"""
+        GenericTearDown(dynamodb_client=dynamodb_client)
+
+    def add_file_without_status_timestamp(self, message_id: str, file_status: str, timestamp: str) -> None:
+        """Adds a file to the audit table as it was written before the queue name status index existed"""
+        self.table.put_item(
+            Item={
+                "message_id": message_id,
+                "filename": f"{message_id}.csv",
+                "queue_name": "RAVS_RSV",
+                "status": file_status,
+                "timestamp": timestamp,
+            }
+        )
+
+    def test_backfill_writes_missing_status_timestamps(self):
+        """it should set the status_timestamp of each file without one, so that queued files are found in the queue"""
+        self.add_file_without_status_timestamp("file-1", FileStatus.QUEUED, "20240708T12130100")
+        self.add_file_without_status_timestamp("file-2", FileStatus.PROCESSED, "20240708T12120100")
+        lease_message_id = get_queue_lease_key("RAVS_RSV")["message_id"]["S"]
+        self.table.put_item(Item={"message_id": lease_message_id, "leases": {}, "lease_version": 1})
+        self.assertIsNone(get_next_queued_file_details("RAVS_RSV"))
+
+        files_updated = backfill_status_timestamps(self.table)
+
+        self.assertEqual(files_updated, 2)
+        self.assertEqual(
+            self.table.get_item(Key={"message_id": "file-2"})["Item"]["status_timestamp"],
+            f"{FileStatus.PROCESSED}#20240708T12120100",
+        )
+        self.assertEqual(get_next_queued_file_details("RAVS_RSV")["message_id"], "file-1")
+        self.assertNotIn("status_timestamp", self.table.get_item(Key={"message_id": lease_message_id})["Item"])
+
+    def test_backfill_is_idempotent(self):
+        """it should not update any files when it is re-run"""
+        self.add_file_without_status_timestamp("file-1", FileStatus.QUEUED, "20240708T12130100")
+        backfill_status_timestamps(self.table)
+
+        self.assertEqual(backfill_status_timestamps(self.table), 0)
@@ -12,6 +12,7 @@ from tests.utils_for_tests.utils_for_filenameprocessor_tests import create_mock_
 # Ensure environment variables are mocked before importing from src files
 with patch.dict("os.environ", MOCK_ENVIRONMENT_DICT):
     from elasticache import (
+        get_queue_names_from_cache,
         get_supplier_permissions_from_cache,
         get_valid_vaccine_types_from_cache,
         get_supplier_system_from_cache
@@ -63,3 +64,12 @@ class TestElasticache(TestCase):
         result = get_valid_vaccine_types_from_cache()
         self.assertEqual(result, ["COVID19", "RSV", "FLU"])
         mock_hkeys.assert_called_once_with("vacc_to_diseases")
+
+    @patch("elasticache.redis_client.hgetall", return_value={
+        "RAVS": json.dumps(["RSV.CRUDS"]),
+        "EMIS": json.dumps(["FLU.CRUDS", "RSV.C", "RSV.U"]),
+    })
+    def test_get_queue_names_from_cache(self, mock_hgetall):
+        result = get_queue_names_from_cache()
+        self.assertEqual(result, ["EMIS_FLU", "EMIS_RSV", "RAVS_RSV"])
+        mock_hgetall.assert_called_once_with("supplier_permissions")
@@ -18,11 +18,12 @@ from tests.utils_for_tests.utils_for_filenameprocessor_tests import (
     MOCK_ODS_CODE_TO_SUPPLIER
 )
 from tests.utils_for_tests.mock_environment_variables import MOCK_ENVIRONMENT_DICT, BucketNames, Sqs
-from tests.utils_for_tests.values_for_tests import MOCK_CREATED_AT_FORMATTED_STRING, MockFileDetails
+from tests.utils_for_tests.values_for_tests import MOCK_CREATED_AT_FORMATTED_STRING, MockFileDetails, FileDetails
 
 # Ensure environment variables are mocked before importing from src files
 with patch.dict("os.environ", MOCK_ENVIRONMENT_DICT):
     from file_name_processor import lambda_handler, handle_record
+    from common.audit_table_client import acquire_queue_lease
     from clients import REGION_NAME
     from constants import AUDIT_TABLE_NAME, FileStatus, AuditTableKeys
 
@@ -223,6 +224,34 @@ class TestLambdaHandlerDataSource(TestCase):
         self.assert_no_ack_file(file_details)
         mock_invoke_filename_lambda.assert_not_called()
 
+    def test_lambda_handler_new_file_success_and_stalled_queue(self):
+        """
+        Tests that for a new file, where there is an older file queued but no file holds a lease of the queue (e.g.
+        because the lease of a file which stalled has expired):
+        * The file is added to the audit table with a status of 'queued'
+        * The message is not sent to SQS
+        * The invoke_filename_lambda method is called with the older queued file, which now holds the lease
+        """
+        file_details = MockFileDetails.ravs_rsv_1
+        older_queued_file_details = FileDetails("RAVS", "RSV", "X8E5B", file_number=0)
+
+        s3_client.put_object(Bucket=BucketNames.SOURCE, Key=file_details.file_key)
+
+        add_entry_to_table(older_queued_file_details, FileStatus.QUEUED)
+
+        with (  # noqa: E999
+            patch("file_name_processor.uuid4", return_value=file_details.message_id),  # noqa: E999
+            patch("file_name_processor.invoke_filename_lambda") as mock_invoke_filename_lambda,  # noqa: E999
+        ):  # noqa: E999
+            lambda_handler(self.make_event([self.make_record(file_details.file_key)]), None)
+
+        assert_audit_table_entry(file_details, FileStatus.QUEUED)
+        self.assert_no_sqs_message()
+        mock_invoke_filename_lambda.assert_called_once_with(
+            older_queued_file_details.file_key, older_queued_file_details.message_id
+        )
+        self.assertFalse(acquire_queue_lease(file_details.queue_name, file_details.message_id))
+
     def test_lambda_handler_existing_file(self):
         """
         Tests that for an existing file, which is the only file processing for the supplier_vaccineType queue:
@@ -248,6 +277,65 @@ class TestLambdaHandlerDataSource(TestCase):
         self.assert_no_ack_file(file_details)
         mock_invoke_filename_lambda.assert_not_called()
 
+    def test_lambda_handler_existing_file_being_resumed(self):
+        """
+        Tests that for an existing file which is being resumed, and so has been moved to the processing folder, the
+        created_at_formatted_string is the one recorded in the audit table, and the message is sent to SQS
+        """
+        file_details = MockFileDetails.ravs_rsv_1
+        s3_client.put_object(Bucket=BucketNames.SOURCE, Key=f"processing/{file_details.file_key}")
+        add_entry_to_table(file_details, FileStatus.QUEUED)
+
+        with (  # noqa: E999
+            patch("file_name_processor.get_created_at_formatted_string") as mock_get_created_at,  # noqa: E999
+            patch("file_name_processor.invoke_filename_lambda"),  # noqa: E999
+        ):  # noqa: E999
+            lambda_handler(
+                self.make_event([self.make_record_with_message_id(file_details.file_key, file_details.message_id)]),
+                None,
+            )
+
+        mock_get_created_at.assert_not_called()
+        assert_audit_table_entry(file_details, FileStatus.PROCESSING)
+        self.assert_sqs_message(file_details)
+        self.assert_no_ack_file(file_details)
+
+    def test_lambda_handler_scheduled_event_recovers_stalled_files(self):
+        """
+        Tests that when the lambda is invoked on its schedule:
+        * A processing file whose lease has expired is put back in its queue, and its lease is freed
+        * The oldest queued file of the queue, which is the stalled file, is started
+        * A processing file whose lease has not expired is unaffected
+        """
+        stalled_file_details = MockFileDetails.ravs_rsv_1
+        queued_file_details = MockFileDetails.ravs_rsv_2
+        processing_file_details = MockFileDetails.emis_flu
+
+        with patch("common.audit_table_client.time.time", return_value=1000):
+            add_entry_to_table(stalled_file_details, FileStatus.PROCESSING)
+        add_entry_to_table(queued_file_details, FileStatus.QUEUED)
+        add_entry_to_table(processing_file_details, FileStatus.PROCESSING)
+
+        with (  # noqa: E999
+            patch(  # noqa: E999
+                "elasticache.redis_client.hgetall",  # noqa: E999
+                return_value={"RAVS": json.dumps(["RSV.CRUDS"]), "EMIS": json.dumps(["FLU.CRUDS", "RSV.CRUDS"])},
+            ),  # noqa: E999
+            patch("file_name_processor.invoke_filename_lambda") as mock_invoke_filename_lambda,  # noqa: E999
+        ):  # noqa: E999
+            lambda_handler({"source": "aws.events", "detail-type": "Scheduled Event"}, None)
+
+        assert_audit_table_entry(stalled_file_details, FileStatus.QUEUED)
+        assert_audit_table_entry(queued_file_details, FileStatus.QUEUED)
+        assert_audit_table_entry(processing_file_details, FileStatus.PROCESSING)
+        mock_invoke_filename_lambda.assert_called_once_with(
+            stalled_file_details.file_key, stalled_file_details.message_id
+        )
+        # The stalled file now holds the lease of its queue, and the other file still holds its lease
+        self.assertFalse(acquire_queue_lease(stalled_file_details.queue_name, queued_file_details.message_id))
+        self.assertFalse(acquire_queue_lease(processing_file_details.queue_name, "other_test_id"))
+        self.assert_no_sqs_message()
+
     def test_lambda_handler_non_root_file(self):
         """
         Tests that when the file is not in the root of the source bucket, no action is taken:
@@ -333,6 +421,7 @@ class TestLambdaHandlerDataSource(TestCase):
                 "filename": {"S": file_details.file_key},
                 "queue_name": {"S": "unknown_unknown"},
                 "status": {"S": "Processed"},
+                "status_timestamp": {"S": f"Processed#{file_details.created_at_formatted_string}"},
                 "timestamp": {"S": file_details.created_at_formatted_string},
             }
         ]
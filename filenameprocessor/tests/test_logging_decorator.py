@@ -9,7 +9,7 @@ from botocore.exceptions import ClientError
 from moto import mock_s3, mock_firehose, mock_sqs, mock_dynamodb
 
 from tests.utils_for_tests.generic_setup_and_teardown import GenericSetUp, GenericTearDown
-from tests.utils_for_tests.mock_environment_variables import MOCK_ENVIRONMENT_DICT, BucketNames, Firehose
+from tests.utils_for_tests.mock_environment_variables import MOCK_ENVIRONMENT_DICT, BucketNames
 from tests.utils_for_tests.values_for_tests import MockFileDetails, fixed_datetime
 from tests.utils_for_tests.utils_for_filenameprocessor_tests import create_mock_hget
 
@@ -61,6 +61,7 @@ class TestLoggingDecorator(unittest.TestCase):
             # The logging_decorator.logger is patched individually in each test to allow for assertions to be made.
             # Any uses of the logger in other files will confound the tests and should be patched here.
             patch("audit_table.logger"),
+            patch("common.audit_table_client.logger"),
             patch("file_name_processor.logger"),
             patch("send_sqs_message.logger"),
             patch("supplier_permissions.logger"),
@@ -68,6 +69,8 @@ class TestLoggingDecorator(unittest.TestCase):
             # Time is incremented by 1.0 for each call to time.time for ease of testing.
             # Range is set to a large number (100) due to many calls being made to time.time for some tests.
             patch("logging_decorator.time.time", side_effect=[0.0 + i for i in range(100)]),
+            # The expiry times of the queue leases are given by time.time, so are fixed here
+            patch("common.audit_table_client.time", **{"time.return_value": 1672531200.0}),
             patch("clients.redis_client.hkeys", return_value=["FLU"])
         ]
 
@@ -87,19 +90,14 @@ class TestLoggingDecorator(unittest.TestCase):
 
     def test_send_log_to_firehose(self):
         """
-        Tests that the send_log_to_firehose function calls firehose_client.put_record with the correct arguments.
-        NOTE: mock_firehose does not persist the data, so at this level it is only possible to test what the call args
-        were, not that the data reached the destination.
+        Tests that the send_log_to_firehose function adds the log to the logs to be sent to Firehose, as an event.
         """
         log_data = {"test_key": "test_value"}
 
-        with patch("logging_decorator.firehose_client") as mock_firehose_client:
+        with patch("logging_decorator.firehose_logger") as mock_firehose_logger:
             send_log_to_firehose(log_data)
 
-        expected_firehose_record = {"Data": json.dumps({"event": log_data}).encode("utf-8")}
-        mock_firehose_client.put_record.assert_called_once_with(
-            DeliveryStreamName=Firehose.STREAM_NAME, Record=expected_firehose_record
-        )
+        mock_firehose_logger.send_log.assert_called_once_with({"event": log_data})
 
     def test_generate_and_send_logs(self):
         """
@@ -207,7 +205,7 @@ class TestLoggingDecorator(unittest.TestCase):
         """Tests that exception is caught when failing to send message to Firehose"""
         firehose_exception = ClientError(
             error_response={"Error": {"Code": "ServiceUnavailable", "Message": "Service down"}},
-            operation_name="PutRecord"
+            operation_name="PutRecordBatch"
         )
 
         mock_hget = create_mock_hget(
@@ -217,8 +215,8 @@ class TestLoggingDecorator(unittest.TestCase):
         with (
             patch("file_name_processor.uuid4", return_value=FILE_DETAILS.message_id),
             patch("elasticache.redis_client.hget", side_effect=mock_hget),
-            patch("logging_decorator.firehose_client.put_record", side_effect=firehose_exception),
-            patch("logging_decorator.logger") as mock_logger,
+            patch("logging_decorator.firehose_logger.firehose_client.put_record_batch", side_effect=firehose_exception),
+            patch("common.log_firehose.logger") as mock_logger,
         ):
             lambda_handler(MOCK_VACCINATION_EVENT, context=None)
 
@@ -227,8 +225,8 @@ class TestLoggingDecorator(unittest.TestCase):
 
         # Extract the call arguments
         exception_message = mock_logger.exception.call_args[0][0]
-        exception_obj = mock_logger.exception.call_args[0][1]
+        exception_obj = mock_logger.exception.call_args[0][2]
 
         # Check that the message format is correct
-        self.assertIn("Error sending log to Firehose", exception_message)
+        self.assertIn("Error sending %s logs to Firehose", exception_message)
         self.assertEqual(exception_obj, firehose_exception)
@@ -55,7 +55,7 @@ class GenericSetUp:
                     {"AttributeName": AuditTableKeys.MESSAGE_ID, "AttributeType": "S"},
                     {"AttributeName": AuditTableKeys.FILENAME, "AttributeType": "S"},
                     {"AttributeName": AuditTableKeys.QUEUE_NAME, "AttributeType": "S"},
-                    {"AttributeName": AuditTableKeys.STATUS, "AttributeType": "S"},
+                    {"AttributeName": AuditTableKeys.STATUS_TIMESTAMP, "AttributeType": "S"},
                 ],
                 ProvisionedThroughput={"ReadCapacityUnits": 5, "WriteCapacityUnits": 5},
                 GlobalSecondaryIndexes=[
@@ -69,7 +69,7 @@ class GenericSetUp:
                         "IndexName": AUDIT_TABLE_QUEUE_NAME_GSI,
                         "KeySchema": [
                             {"AttributeName": AuditTableKeys.QUEUE_NAME, "KeyType": "HASH"},
-                            {"AttributeName": AuditTableKeys.STATUS, "KeyType": "RANGE"},
+                            {"AttributeName": AuditTableKeys.STATUS_TIMESTAMP, "KeyType": "RANGE"},
                         ],
                         "Projection": {"ProjectionType": "ALL"},
                         "ProvisionedThroughput": {"ReadCapacityUnits": 5, "WriteCapacityUnits": 5},
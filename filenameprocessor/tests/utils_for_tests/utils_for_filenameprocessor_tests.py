@@ -11,6 +11,7 @@ from tests.utils_for_tests.mock_environment_variables import MOCK_ENVIRONMENT_DI
 with patch.dict("os.environ", MOCK_ENVIRONMENT_DICT):
     from clients import REGION_NAME
     from csv import DictReader
+    from common.audit_table_client import acquire_queue_lease
     from constants import (
         AuditTableKeys,
         AUDIT_TABLE_NAME,
@@ -42,10 +43,20 @@ def deserialize_dynamodb_types(dynamodb_table_entry_with_types):
     return {k: TypeDeserializer().deserialize(v) for k, v in dynamodb_table_entry_with_types.items()}
 
 
+def generate_audit_table_status(file_details: FileDetails, file_status: FileStatus) -> dict:
+    """Returns the status attributes of the audit table entry for the file with the given status"""
+    return {
+        AuditTableKeys.STATUS: {"S": file_status},
+        AuditTableKeys.STATUS_TIMESTAMP: {"S": f"{file_status}#{file_details.created_at_formatted_string}"},
+    }
+
+
 def add_entry_to_table(file_details: MockFileDetails, file_status: FileStatus) -> None:
-    """Add an entry to the audit table"""
-    audit_table_entry = {**file_details.audit_table_entry, "status": {"S": file_status}}
+    """Add an entry to the audit table. A file which is processing also holds a lease of its queue."""
+    audit_table_entry = {**file_details.audit_table_entry, **generate_audit_table_status(file_details, file_status)}
     dynamodb_client.put_item(TableName=AUDIT_TABLE_NAME, Item=audit_table_entry)
+    if file_status == FileStatus.PROCESSING:
+        acquire_queue_lease(file_details.queue_name, file_details.message_id)
 
 
 def assert_audit_table_entry(file_details: FileDetails, expected_status: FileStatus) -> None:
@@ -53,7 +64,8 @@ def assert_audit_table_entry(file_details: FileDetails, expected_status: FileSta
     table_entry = dynamodb_client.get_item(
         TableName=AUDIT_TABLE_NAME, Key={AuditTableKeys.MESSAGE_ID: {"S": file_details.message_id}}
     ).get("Item")
-    assert table_entry == {**file_details.audit_table_entry, "status": {"S": expected_status}}
+    expected_status_attributes = generate_audit_table_status(file_details, expected_status)
+    assert table_entry == {**file_details.audit_table_entry, **expected_status_attributes}
 
 
 def create_mock_hget(
@@ -0,0 +1,7 @@
+"""
+Code shared between the lambdas, which is copied into each lambda's package as the common package.
+A lambda which has its own modules in a common folder keeps them in the same package.
+"""
+from pkgutil import extend_path
+
+__path__ = extend_path(__path__, __name__)
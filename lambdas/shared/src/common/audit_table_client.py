@@ -0,0 +1,258 @@
+"""Functions for the queues of files in the audit table, and the leases by which the files in each queue are processed.
+    Shared by the filenameprocessor, recordprocessor and ack_backend.
+"""
+
+import json
+import os
+import time
+from typing import Union
+from boto3.dynamodb.conditions import Key
+from botocore.exceptions import ClientError
+from common.clients import dynamodb_client, dynamodb_resource, logger
+
+AUDIT_TABLE_NAME = os.getenv("AUDIT_TABLE_NAME")
+AUDIT_TABLE_QUEUE_NAME_GSI = "queue_name_status_index"
+QUEUED_STATUS = "Queued"
+PROCESSING_STATUS = "Processing"
+
+
+class AuditTableKeys:
+    """Audit table keys used by the queues and their leases"""
+
+    MESSAGE_ID = "message_id"
+    QUEUE_NAME = "queue_name"
+    STATUS = "status"
+    STATUS_TIMESTAMP = "status_timestamp"
+    LEASES = "leases"
+    LEASE_VERSION = "lease_version"
+
+
+# A lease expires if it is not renewed within this time, so that the queue of a file which stalls is not blocked
+QUEUE_LEASE_DURATION_SECONDS = int(os.getenv("QUEUE_LEASE_DURATION_SECONDS", 900))
+# The number of files which may be processed at once, for queues whose files are independent of each other. Given as a
+# JSON object of queue names to numbers of slots, e.g. {"RAVS_RSV": 2}. Other queues have one slot.
+QUEUE_LEASE_SLOTS: dict = json.loads(os.getenv("QUEUE_LEASE_SLOTS", "{}"))
+MAX_LEASE_ATTEMPTS = 3
+
+
+def get_status_timestamp(file_status: str, created_at_formatted_string: str) -> str:
+    """
+    Returns the sort key of the queue name index. The files in each queue sort by status, and then oldest first, as the
+    created_at_formatted_string sorts in time order.
+    """
+    return f"{file_status}#{created_at_formatted_string}"
+
+
+def get_oldest_file_in_queue(queue_name: str, file_status: str) -> Union[dict, None]:
+    """
+    Returns a dictionary containing the details of the oldest file in the queue with the given status, or returns None
+    if there is no file in the queue with the status.
+    """
+    files_in_queue_with_status: dict = dynamodb_resource.Table(AUDIT_TABLE_NAME).query(
+        IndexName=AUDIT_TABLE_QUEUE_NAME_GSI,
+        KeyConditionExpression=Key(AuditTableKeys.QUEUE_NAME).eq(queue_name)
+        & Key(AuditTableKeys.STATUS_TIMESTAMP).begins_with(f"{file_status}#"),
+        ScanIndexForward=True,
+        Limit=1,
+    )
+    return files_in_queue_with_status["Items"][0] if files_in_queue_with_status["Items"] else None
+
+
+def get_files_in_queue(queue_name: str, file_status: str) -> list[dict]:
+    """Returns the details of each file in the queue with the given status, oldest first"""
+    query_kwargs = {
+        "IndexName": AUDIT_TABLE_QUEUE_NAME_GSI,
+        "KeyConditionExpression": Key(AuditTableKeys.QUEUE_NAME).eq(queue_name)
+        & Key(AuditTableKeys.STATUS_TIMESTAMP).begins_with(f"{file_status}#"),
+        "ScanIndexForward": True,
+    }
+    files_in_queue_with_status = []
+    while True:
+        response = dynamodb_resource.Table(AUDIT_TABLE_NAME).query(**query_kwargs)
+        files_in_queue_with_status.extend(response["Items"])
+        if "LastEvaluatedKey" not in response:
+            return files_in_queue_with_status
+        query_kwargs["ExclusiveStartKey"] = response["LastEvaluatedKey"]
+
+
+def get_next_queued_file_details(queue_name: str) -> Union[dict, None]:
+    """
+    Checks for queued files.
+    Returns a dictionary containing the details of the oldest queued file, or returns None if no queued files are found.
+    """
+    return get_oldest_file_in_queue(queue_name, QUEUED_STATUS)
+
+
+def update_audit_table_status(
+    message_id: str, file_status: str, created_at_formatted_string: str, current_status: str = None
+) -> None:
+    """
+    Updates the status of the file in the audit table, along with the sort key of the queue name index.
+    If a current_status is given, then the status is only updated from that status.
+    """
+    expression_attribute_values = {
+        ":status": {"S": file_status},
+        ":status_timestamp": {"S": get_status_timestamp(file_status, created_at_formatted_string)},
+    }
+    condition_expression = "attribute_exists(message_id)"
+    if current_status is not None:
+        expression_attribute_values[":current_status"] = {"S": current_status}
+        condition_expression += " AND #status = :current_status"
+
+    dynamodb_client.update_item(
+        TableName=AUDIT_TABLE_NAME,
+        Key={AuditTableKeys.MESSAGE_ID: {"S": message_id}},
+        UpdateExpression="SET #status = :status, #status_timestamp = :status_timestamp",
+        ExpressionAttributeNames={
+            "#status": AuditTableKeys.STATUS,
+            "#status_timestamp": AuditTableKeys.STATUS_TIMESTAMP,
+        },
+        ExpressionAttributeValues=expression_attribute_values,
+        ConditionExpression=condition_expression,
+    )
+
+
+def requeue_file(message_id: str, created_at_formatted_string: str) -> bool:
+    """
+    Puts the file back in its queue, so that it is resumed from its checkpoint once it is started again, and returns
+    True. Returns False if the file is no longer processing. The file keeps its place in the queue, so it is the next
+    file of the queue to be started, unless an older file is queued.
+    """
+    try:
+        update_audit_table_status(message_id, QUEUED_STATUS, created_at_formatted_string, PROCESSING_STATUS)
+    except ClientError as error:
+        if error.response["Error"]["Code"] != "ConditionalCheckFailedException":
+            raise
+        return False
+
+    logger.info("File with message id %s put back in its queue", message_id)
+    return True
+
+
+def get_queue_lease_key(queue_name: str) -> dict:
+    """
+    Returns the key of the lease item for the queue. The lease item is kept in the audit table, and isn't in either of
+    its indexes. It maps the message id of each file holding one of the queue's slots to the time its lease expires.
+    """
+    return {AuditTableKeys.MESSAGE_ID: {"S": f"queue_lease#{queue_name}"}}
+
+
+def get_queue_leases(queue_name: str) -> dict[str, int]:
+    """Returns the time at which the lease of each file holding one of the queue's slots expires, by message id"""
+    lease_item = dynamodb_client.get_item(
+        TableName=AUDIT_TABLE_NAME, Key=get_queue_lease_key(queue_name), ConsistentRead=True
+    ).get("Item")
+    return {
+        holder: int(expires_at["N"])
+        for holder, expires_at in (lease_item or {}).get(AuditTableKeys.LEASES, {}).get("M", {}).items()
+    }
+
+
+def acquire_queue_lease(queue_name: str, message_id: str) -> bool:
+    """
+    Acquires a lease for the file to be processed, and returns True, if one of the queue's slots is free or the file
+    already holds a lease. Returns False if all of the slots are held.
+    Leases which have expired are freed. The lease item is only written if its version is unchanged since it was read,
+    so two files can't take the same slot. If the lease item is changed, the lease is attempted again.
+    """
+    for _ in range(MAX_LEASE_ATTEMPTS):
+        lease_item = dynamodb_client.get_item(
+            TableName=AUDIT_TABLE_NAME, Key=get_queue_lease_key(queue_name), ConsistentRead=True
+        ).get("Item")
+
+        now = int(time.time())
+        # A file's own lease is kept even if it has expired, as no other file has taken its slot since
+        leases = {
+            holder: int(expires_at["N"])
+            for holder, expires_at in (lease_item or {}).get(AuditTableKeys.LEASES, {}).get("M", {}).items()
+            if int(expires_at["N"]) > now or holder == message_id
+        }
+        if message_id not in leases and len(leases) >= QUEUE_LEASE_SLOTS.get(queue_name, 1):
+            return False
+
+        leases[message_id] = now + QUEUE_LEASE_DURATION_SECONDS
+        leases_map = {holder: {"N": str(expires_at)} for holder, expires_at in leases.items()}
+        version = int(lease_item[AuditTableKeys.LEASE_VERSION]["N"]) if lease_item else 0
+        try:
+            dynamodb_client.put_item(
+                TableName=AUDIT_TABLE_NAME,
+                Item={
+                    **get_queue_lease_key(queue_name),
+                    AuditTableKeys.LEASES: {"M": leases_map},
+                    AuditTableKeys.LEASE_VERSION: {"N": str(version + 1)},
+                },
+                ConditionExpression="attribute_not_exists(message_id) OR #lease_version = :lease_version",
+                ExpressionAttributeNames={"#lease_version": AuditTableKeys.LEASE_VERSION},
+                ExpressionAttributeValues={":lease_version": {"N": str(version)}},
+            )
+            logger.info("Lease acquired for file with message id %s in queue %s", message_id, queue_name)
+            return True
+
+        except ClientError as error:
+            if error.response["Error"]["Code"] != "ConditionalCheckFailedException":
+                raise
+
+    logger.warning("Lease not acquired for file with message id %s in queue %s", message_id, queue_name)
+    return False
+
+
+def renew_queue_lease(queue_name: str, message_id: str) -> bool:
+    """
+    Extends the lease held by the file, as a heartbeat while it is being processed. Returns False if the file no longer
+    holds a lease, as it expired and its slot may have been taken by another file, in which case the file should not
+    continue to be processed.
+    """
+    try:
+        dynamodb_client.update_item(
+            TableName=AUDIT_TABLE_NAME,
+            Key=get_queue_lease_key(queue_name),
+            UpdateExpression="SET #leases.#message_id = :expires_at, #lease_version = #lease_version + :one",
+            ExpressionAttributeNames={
+                "#leases": AuditTableKeys.LEASES,
+                "#message_id": message_id,
+                "#lease_version": AuditTableKeys.LEASE_VERSION,
+            },
+            ExpressionAttributeValues={
+                ":expires_at": {"N": str(int(time.time()) + QUEUE_LEASE_DURATION_SECONDS)},
+                ":one": {"N": "1"},
+            },
+            ConditionExpression="attribute_exists(#leases.#message_id)",
+        )
+        return True
+
+    except ClientError as error:
+        if error.response["Error"]["Code"] != "ConditionalCheckFailedException":
+            raise
+        logger.warning("The lease for file with message id %s in queue %s has been lost", message_id, queue_name)
+        return False
+
+
+def release_queue_lease(queue_name: str, message_id: str, expires_at: int = None) -> None:
+    """
+    Frees the slot held by the file, if it holds one. If expires_at is given, then the slot is only freed if the lease
+    hasn't been renewed since it was read to expire then.
+    """
+    expression_attribute_values = {":one": {"N": "1"}}
+    condition_expression = "attribute_exists(#leases.#message_id)"
+    if expires_at is not None:
+        expression_attribute_values[":expires_at"] = {"N": str(expires_at)}
+        condition_expression = "#leases.#message_id = :expires_at"
+
+    try:
+        dynamodb_client.update_item(
+            TableName=AUDIT_TABLE_NAME,
+            Key=get_queue_lease_key(queue_name),
+            UpdateExpression="SET #lease_version = #lease_version + :one REMOVE #leases.#message_id",
+            ExpressionAttributeNames={
+                "#leases": AuditTableKeys.LEASES,
+                "#message_id": message_id,
+                "#lease_version": AuditTableKeys.LEASE_VERSION,
+            },
+            ExpressionAttributeValues=expression_attribute_values,
+            ConditionExpression=condition_expression,
+        )
+        logger.info("Lease released for file with message id %s in queue %s", message_id, queue_name)
+
+    except ClientError as error:
+        if error.response["Error"]["Code"] != "ConditionalCheckFailedException":
+            raise
@@ -0,0 +1,48 @@
+"""Compact encoding of the messages sent by the recordprocessor to the forwarder through Kinesis"""
+
+import zlib
+import simplejson as json
+
+# Prefixes every compact message. Plain JSON messages can never start with a NUL byte.
+COMPACT_MESSAGE_MARKER = b"\x00\x01"
+
+# The preset dictionary for zlib. The start of every message, and the keys and constant values of the FHIR
+# Immunization built by the recordprocessor, so that only the row's own values need to be compressed.
+# IMPORTANT: The recordprocessor and the forwarder are deployed separately, so change COMPACT_MESSAGE_MARKER, and
+# deploy the forwarder first, if it is ever changed.
+COMPACT_MESSAGE_DICTIONARY = (
+    '{"row_id":"","file_key":"","supplier":"","vax_type":"","created_at_formatted_string":"",'
+    '"diagnostics":{"error_type":"","statusCode":,"error_message":""},'
+    '{"resourceType":"Immunization","contained":[{"resourceType":"Patient","id":"Patient1","identifier":'
+    '[{"system":"https://fhir.nhs.uk/Id/nhs-number","value":""}],"name":[{"family":"","given":[""]}],"gender":"",'
+    '"birthDate":"","address":[{"postalCode":""}]},{"resourceType":"Practitioner","id":"Practitioner1","name":'
+    '[{"family":"","given":[""]}]}],"extension":[{"url":'
+    '"https://fhir.hl7.org.uk/StructureDefinition/Extension-UKCore-VaccinationProcedure","valueCodeableConcept":'
+    '{"coding":[{"system":"http://snomed.info/sct","code":"","display":""}]}}],"identifier":[{"system":"",'
+    '"value":""}],"status":"completed","vaccineCode":{"coding":[{"system":"http://snomed.info/sct","code":"",'
+    '"display":""}]},"patient":{"reference":"#Patient1"},"occurrenceDateTime":"","recorded":"","primarySource":true,'
+    '"manufacturer":{"display":""},"location":{"identifier":{"value":"",'
+    '"system":"https://fhir.nhs.uk/Id/ods-organization-code"}},"lotNumber":"","expirationDate":"","site":{"coding":'
+    '[{"system":"http://snomed.info/sct","code":"","display":""}]},"route":{"coding":[{"system":'
+    '"http://snomed.info/sct","code":"","display":""}]},"doseQuantity":{"value":,"unit":"",'
+    '"system":"http://unitsofmeasure.org","code":""},"performer":[{"actor":{"type":"Organization","identifier":'
+    '{"system":"https://fhir.nhs.uk/Id/ods-organization-code","value":""}}},{"actor":{"reference":"#Practitioner1"}}],'
+    '"reasonCode":[{"coding":[{"code":"","system":"http://snomed.info/sct"}]}],"protocolApplied":[{"targetDisease":'
+    '[{"coding":[{"system":"http://snomed.info/sct","code":"","display":""}]}],"doseNumberPositiveInt":}]},'
+    '"operation_requested":"CREATE","local_id":""}'
+).encode("utf-8")
+
+
+def encode_compact_message(message_body: dict) -> bytes:
+    """Returns the message body as compact JSON, compressed with zlib using COMPACT_MESSAGE_DICTIONARY"""
+    compressor = zlib.compressobj(level=9, zdict=COMPACT_MESSAGE_DICTIONARY)
+    data = json.dumps(message_body, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+    return COMPACT_MESSAGE_MARKER + compressor.compress(data) + compressor.flush()
+
+
+def decode_message(data: bytes) -> dict:
+    """Returns the message body from a Kinesis record's data, which is either compact or plain JSON"""
+    if data.startswith(COMPACT_MESSAGE_MARKER):
+        decompressor = zlib.decompressobj(zdict=COMPACT_MESSAGE_DICTIONARY)
+        data = decompressor.decompress(data[len(COMPACT_MESSAGE_MARKER):]) + decompressor.flush()
+    return json.loads(data.decode("utf-8"), use_decimal=True)
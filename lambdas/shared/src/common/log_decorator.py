@@ -8,16 +8,23 @@ import time
 from datetime import datetime
 from functools import wraps
 from common.clients import logger, firehose_client
+from common.log_firehose import FirehoseLogger
+
+# The logs for each stream are buffered, and sent in batches, by a FirehoseLogger
+firehose_loggers: dict[str, FirehoseLogger] = {}
 
 
 def send_log_to_firehose(stream_name, log_data: dict) -> None:
-    """Sends the log_message to Firehose"""
-    try:
-        record = {"Data": json.dumps({"event": log_data}).encode("utf-8")}
-        response = firehose_client.put_record(DeliveryStreamName=stream_name, Record=record)
-        logger.info("Log sent to Firehose: %s", response)
-    except Exception as error:  # pylint:disable = broad-exception-caught
-        logger.exception("Error sending log to Firehose: %s", error)
+    """Adds the log_message to the logs to be sent to Firehose"""
+    if stream_name not in firehose_loggers:
+        firehose_loggers[stream_name] = FirehoseLogger(stream_name, firehose_client)
+    firehose_loggers[stream_name].send_log({"event": log_data})
+
+
+def flush_logs_to_firehose() -> None:
+    """Sends all of the logs which are waiting to be sent to Firehose"""
+    for firehose_logger in firehose_loggers.values():
+        firehose_logger.flush()
 
 
 def generate_and_send_logs(stream_name,
@@ -51,5 +58,7 @@ def logging_decorator(prefix: str, stream_name):
                 generate_and_send_logs(stream_name,
                                        start_time, base_log_data, additional_log_data, is_error_log=True)
                 raise
+            finally:
+                flush_logs_to_firehose()
         return wrapper
     return decorator
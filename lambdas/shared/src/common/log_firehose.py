@@ -0,0 +1,99 @@
+"""Class for sending logs to Firehose in batches"""
+import json
+import os
+import threading
+import time
+from collections import deque
+from common.clients import logger
+
+# PutRecordBatch limits
+MAX_RECORDS_PER_BATCH = 500
+MAX_BYTES_PER_BATCH = 4 * 1024 * 1024
+
+FLUSH_INTERVAL_SECONDS = float(os.getenv("FIREHOSE_FLUSH_INTERVAL_SECONDS", 5))
+MAX_PUT_ATTEMPTS = 3
+RETRY_BASE_DELAY_SECONDS = 0.1
+
+
+class FirehoseLogger:
+    """
+    Buffers logs and sends them to the Firehose delivery stream with PutRecordBatch, up to MAX_RECORDS_PER_BATCH
+    records or MAX_BYTES_PER_BATCH bytes at a time. Only the records which fail are retried, with backoff.
+    The logs are sent by a background thread once a full batch is buffered, and at least every FLUSH_INTERVAL_SECONDS.
+    A lambda is frozen between invocations, so flush must be called before the handler returns.
+    Logs which can't be sent are logged to Cloudwatch rather than raised, so that logging never fails the caller.
+    """
+
+    def __init__(self, stream_name: str, boto_client):
+        self.firehose_client = boto_client
+        self.delivery_stream_name = stream_name
+        self.records = deque()
+        self.records_size = 0
+        self.buffer_condition = threading.Condition()
+        self.sending_lock = threading.Lock()
+        self.sender: threading.Thread = None
+
+    def send_log(self, log_message: dict) -> None:
+        """Adds the log message to the buffer, to be sent by the background thread"""
+        record = {"Data": json.dumps(log_message).encode("utf-8")}
+        with self.buffer_condition:
+            self.records.append(record)
+            self.records_size += len(record["Data"])
+            if self.sender is None or not self.sender.is_alive():
+                self.sender = threading.Thread(target=self._send_in_background, daemon=True)
+                self.sender.start()
+            if self._is_full_batch_buffered():
+                self.buffer_condition.notify()
+
+    def flush(self) -> None:
+        """Sends all of the buffered logs, once any batch being sent by the background thread has been sent"""
+        with self.sending_lock:
+            while records := self._take_batch():
+                self._put_record_batch(records)
+
+    def _send_in_background(self) -> None:
+        while True:
+            with self.buffer_condition:
+                self.buffer_condition.wait_for(self._is_full_batch_buffered, timeout=FLUSH_INTERVAL_SECONDS)
+            self.flush()
+
+    def _is_full_batch_buffered(self) -> bool:
+        return len(self.records) >= MAX_RECORDS_PER_BATCH or self.records_size >= MAX_BYTES_PER_BATCH
+
+    def _take_batch(self) -> list[dict]:
+        """Removes and returns as many of the oldest buffered records as fit within the PutRecordBatch limits"""
+        records = []
+        batch_size = 0
+        with self.buffer_condition:
+            while self.records and len(records) < MAX_RECORDS_PER_BATCH:
+                record_size = len(self.records[0]["Data"])
+                if records and batch_size + record_size > MAX_BYTES_PER_BATCH:
+                    break
+                records.append(self.records.popleft())
+                batch_size += record_size
+            self.records_size -= batch_size
+        return records
+
+    def _put_record_batch(self, records: list[dict]) -> None:
+        """Sends the records, retrying those which fail"""
+        attempt = 1
+        while True:
+            try:
+                response = self.firehose_client.put_record_batch(
+                    DeliveryStreamName=self.delivery_stream_name, Records=records
+                )
+            except Exception as error:  # pylint:disable = broad-exception-caught
+                logger.exception("Error sending %s logs to Firehose: %s", len(records), error)
+                return
+
+            if not response.get("FailedPutCount"):
+                return
+
+            records = [
+                record for record, result in zip(records, response["RequestResponses"]) if result.get("ErrorCode")
+            ]
+            if attempt >= MAX_PUT_ATTEMPTS:
+                logger.error("%s logs could not be sent to Firehose", len(records))
+                return
+            time.sleep(RETRY_BASE_DELAY_SECONDS * 2 ** (attempt - 1))
+            attempt += 1
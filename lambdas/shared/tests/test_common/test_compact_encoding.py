@@ -0,0 +1,45 @@
+import base64
+import unittest
+import zlib
+from decimal import Decimal
+
+import simplejson as json
+
+from common.compact_encoding import (
+    COMPACT_MESSAGE_DICTIONARY,
+    COMPACT_MESSAGE_MARKER,
+    decode_message,
+    encode_compact_message,
+)
+
+
+class TestCompactEncoding(unittest.TestCase):
+    message_body = {
+        "row_id": "row-1",
+        "operation_requested": "CREATE",
+        "fhir_json": {"resourceType": "Immunization", "doseQuantity": {"value": Decimal("0.5")}},
+    }
+
+    def test_decode_plain_message(self):
+        """it should decode a plain JSON message, keeping decimals"""
+        data = json.dumps(self.message_body).encode("utf-8")
+
+        self.assertEqual(decode_message(data), self.message_body)
+
+    def test_decode_compact_message(self):
+        """it should decompress a compact message with the preset dictionary, keeping decimals"""
+        compressor = zlib.compressobj(level=9, zdict=COMPACT_MESSAGE_DICTIONARY)
+        data = json.dumps(self.message_body, separators=(",", ":")).encode("utf-8")
+        data = COMPACT_MESSAGE_MARKER + compressor.compress(data) + compressor.flush()
+
+        decoded = decode_message(base64.b64decode(base64.b64encode(data)))
+
+        self.assertEqual(decoded, self.message_body)
+        self.assertIsInstance(decoded["fhir_json"]["doseQuantity"]["value"], Decimal)
+
+    def test_encode_and_decode_compact_message(self):
+        """it should decode the compact message sent by the recordprocessor to the message body"""
+        data = encode_compact_message(self.message_body)
+
+        self.assertTrue(data.startswith(COMPACT_MESSAGE_MARKER))
+        self.assertEqual(decode_message(data), self.message_body)
@@ -3,7 +3,13 @@ from unittest.mock import patch
 import json
 from datetime import datetime
 
-from common.log_decorator import logging_decorator, generate_and_send_logs, send_log_to_firehose
+from common.log_decorator import (
+    logging_decorator,
+    generate_and_send_logs,
+    send_log_to_firehose,
+    flush_logs_to_firehose,
+    firehose_loggers,
+)
 
 
 class TestLogDecorator(unittest.TestCase):
@@ -19,6 +25,8 @@ class TestLogDecorator(unittest.TestCase):
         self.mock_logger_error = self.logger_error_patcher.start()
         self.firehose_client_patcher = patch("common.log_decorator.firehose_client")
         self.mock_firehose_client = self.firehose_client_patcher.start()
+        self.mock_firehose_client.put_record_batch.return_value = {"FailedPutCount": 0}
+        firehose_loggers.clear()
         # patch common.log_decorator.time
         self.mock_generate_send = patch("common.log_decorator.generate_and_send_logs").start()
 
@@ -29,33 +37,34 @@ class TestLogDecorator(unittest.TestCase):
         """Test send_log_to_firehose with successful firehose response"""
         # Arrange
         test_log_data = {"function_name": "test_func", "result": "success"}
-        mock_response = {"ResponseMetadata": {"HTTPStatusCode": 200}}
-        self.mock_firehose_client.put_record.return_value = mock_response
 
         # Act
         send_log_to_firehose(self.test_stream, test_log_data)
+        flush_logs_to_firehose()
 
         # Assert
         expected_record = {"Data": json.dumps({"event": test_log_data}).encode("utf-8")}
-        self.mock_firehose_client.put_record.assert_called_once_with(
+        self.mock_firehose_client.put_record_batch.assert_called_once_with(
             DeliveryStreamName=self.test_stream,
-            Record=expected_record
+            Records=[expected_record]
         )
 
     def test_send_log_to_firehose_exception(self):
         """Test send_log_to_firehose with firehose exception"""
         # Arrange
         test_log_data = {"function_name": "test_func", "result": "error"}
-        self.mock_firehose_client.put_record.side_effect = Exception("Firehose error")
+        self.mock_firehose_client.put_record_batch.side_effect = Exception("Firehose error")
 
         # Act
         send_log_to_firehose(self.test_stream, test_log_data)
+        flush_logs_to_firehose()
 
         # Assert
-        self.mock_firehose_client.put_record.assert_called_once()
+        self.mock_firehose_client.put_record_batch.assert_called_once()
         self.mock_logger_exception.assert_called_once_with(
-            "Error sending log to Firehose: %s",
-            self.mock_firehose_client.put_record.side_effect
+            "Error sending %s logs to Firehose: %s",
+            1,
+            self.mock_firehose_client.put_record_batch.side_effect
         )
 
     @patch("time.time")
@@ -177,26 +186,44 @@ class TestLogDecorator(unittest.TestCase):
         self.assertEqual(documented_function.__name__, "documented_function")
         self.assertEqual(documented_function.__doc__, "This is a test function with documentation")
 
+    @patch("common.log_decorator.flush_logs_to_firehose")
+    def test_logging_decorator_flushes_logs(self, mock_flush_logs_to_firehose):
+        """Test that logging_decorator sends the buffered logs to Firehose before returning or raising"""
+        @logging_decorator(self.test_prefix, self.test_stream)
+        def test_function(should_raise):
+            if should_raise:
+                raise ValueError("Test error")
+            return {"statusCode": 200}
+
+        test_function(False)
+        mock_flush_logs_to_firehose.assert_called_once()
+
+        with self.assertRaises(ValueError):
+            test_function(True)
+        self.assertEqual(mock_flush_logs_to_firehose.call_count, 2)
+
     def test_send_log_to_firehose_exception_logging(self):
-        """Test that logger.exception is called when firehose_client.put_record throws an error"""
+        """Test that logger.exception is called when firehose_client.put_record_batch throws an error"""
         # Arrange
         test_log_data = {"function_name": "test_func", "result": "error"}
         test_error = Exception("Firehose connection failed")
-        self.mock_firehose_client.put_record.side_effect = test_error
+        self.mock_firehose_client.put_record_batch.side_effect = test_error
 
         # Act
         send_log_to_firehose(self.test_stream, test_log_data)
+        flush_logs_to_firehose()
 
         # Assert
-        # Verify firehose_client.put_record was called
+        # Verify firehose_client.put_record_batch was called
         expected_record = {"Data": json.dumps({"event": test_log_data}).encode("utf-8")}
-        self.mock_firehose_client.put_record.assert_called_once_with(
+        self.mock_firehose_client.put_record_batch.assert_called_once_with(
             DeliveryStreamName=self.test_stream,
-            Record=expected_record
+            Records=[expected_record]
         )
 
         # Verify logger.exception was called with the correct message and error
         self.mock_logger_exception.assert_called_once_with(
-            "Error sending log to Firehose: %s",
+            "Error sending %s logs to Firehose: %s",
+            1,
             test_error
         )
@@ -0,0 +1,101 @@
+import json
+import threading
+import unittest
+from unittest.mock import MagicMock, patch
+
+from common.log_firehose import FirehoseLogger
+
+
+class TestFirehoseLogger(unittest.TestCase):
+
+    def setUp(self):
+        self.stream_name = "test-stream"
+        self.mock_firehose_client = MagicMock()
+        self.mock_firehose_client.put_record_batch.return_value = {"FailedPutCount": 0}
+        self.firehose_logger = FirehoseLogger(self.stream_name, self.mock_firehose_client)
+
+    def tearDown(self):
+        patch.stopall()
+
+    def sent_records(self) -> list:
+        """Returns the records of each put_record_batch call"""
+        return [call.kwargs["Records"] for call in self.mock_firehose_client.put_record_batch.call_args_list]
+
+    def test_flush(self):
+        """it should send the buffered logs in a single batch when flushed"""
+        log_messages = [{"event": {"id": i}} for i in range(3)]
+
+        for log_message in log_messages:
+            self.firehose_logger.send_log(log_message)
+        self.mock_firehose_client.put_record_batch.assert_not_called()
+
+        self.firehose_logger.flush()
+
+        self.mock_firehose_client.put_record_batch.assert_called_once_with(
+            DeliveryStreamName=self.stream_name,
+            Records=[{"Data": json.dumps(log_message).encode("utf-8")} for log_message in log_messages],
+        )
+
+        # Once sent, the logs are not sent again
+        self.firehose_logger.flush()
+        self.mock_firehose_client.put_record_batch.assert_called_once()
+
+    @patch("common.log_firehose.MAX_RECORDS_PER_BATCH", 2)
+    def test_flush_splits_batches_by_record_count(self):
+        """it should send no more than MAX_RECORDS_PER_BATCH records in each batch"""
+        for i in range(5):
+            self.firehose_logger.send_log({"id": i})
+        self.firehose_logger.flush()
+
+        self.assertEqual([len(records) for records in self.sent_records()], [2, 2, 1])
+
+    @patch("common.log_firehose.MAX_BYTES_PER_BATCH", 25)
+    def test_flush_splits_batches_by_size(self):
+        """it should send no more than MAX_BYTES_PER_BATCH bytes in each batch"""
+        for i in range(3):
+            self.firehose_logger.send_log({"id": f"{i}" * 5})  # 15 bytes each once encoded
+        self.firehose_logger.flush()
+
+        self.assertEqual([len(records) for records in self.sent_records()], [1, 1, 1])
+
+    @patch("common.log_firehose.time.sleep")
+    def test_flush_retries_failed_records(self, mock_sleep):
+        """it should send again only the records which failed"""
+        self.mock_firehose_client.put_record_batch.side_effect = [
+            {"FailedPutCount": 1, "RequestResponses": [{"RecordId": "1"}, {"ErrorCode": "ServiceUnavailable"}]},
+            {"FailedPutCount": 0, "RequestResponses": [{"RecordId": "2"}]},
+        ]
+
+        self.firehose_logger.send_log({"id": 1})
+        self.firehose_logger.send_log({"id": 2})
+        self.firehose_logger.flush()
+
+        self.assertEqual(self.sent_records()[1], [{"Data": json.dumps({"id": 2}).encode("utf-8")}])
+        mock_sleep.assert_called_once()
+
+    @patch("common.log_firehose.time.sleep")
+    @patch("common.log_firehose.logger")
+    def test_flush_gives_up_on_failed_records(self, mock_logger, _):
+        """it should log, rather than raise, the records which can't be sent after MAX_PUT_ATTEMPTS"""
+        self.mock_firehose_client.put_record_batch.return_value = {
+            "FailedPutCount": 1,
+            "RequestResponses": [{"ErrorCode": "ServiceUnavailable"}],
+        }
+
+        self.firehose_logger.send_log({"id": 1})
+        self.firehose_logger.flush()
+
+        self.assertEqual(self.mock_firehose_client.put_record_batch.call_count, 3)
+        mock_logger.error.assert_called_once_with("%s logs could not be sent to Firehose", 1)
+
+    @patch("common.log_firehose.MAX_RECORDS_PER_BATCH", 2)
+    def test_full_batch_sent_in_background(self):
+        """it should send a full batch from the background thread, without waiting to be flushed"""
+        batch_sent = threading.Event()
+        self.mock_firehose_client.put_record_batch.side_effect = lambda **kwargs: batch_sent.set()
+
+        self.firehose_logger.send_log({"id": 1})
+        self.firehose_logger.send_log({"id": 2})
+
+        self.assertTrue(batch_sent.wait(timeout=5))
+        self.assertEqual(len(self.sent_records()[0]), 2)
@@ -1,24 +1,17 @@
 """Add the filename to the audit table and check for duplicates."""
 
 from typing import Union
-from boto3.dynamodb.conditions import Key
-from clients import dynamodb_client, dynamodb_resource, logger
+from clients import dynamodb_client, logger
 from errors import UnhandledAuditTableError
-from constants import AUDIT_TABLE_NAME, AUDIT_TABLE_QUEUE_NAME_GSI, AuditTableKeys, FileStatus
+from constants import AUDIT_TABLE_NAME, AuditTableKeys, FileStatus
+from common.audit_table_client import update_audit_table_status
 
 
-def change_audit_table_status_to_processed(file_key: str, message_id: str) -> None:
+def change_audit_table_status_to_processed(file_key: str, message_id: str, created_at_formatted_string: str) -> None:
     """Updates the status in the audit table to 'Processed' and returns the queue name."""
     try:
         # Update the status in the audit table to "Processed"
-        dynamodb_client.update_item(
-            TableName=AUDIT_TABLE_NAME,
-            Key={AuditTableKeys.MESSAGE_ID: {"S": message_id}},
-            UpdateExpression="SET #status = :status",
-            ExpressionAttributeNames={"#status": "status"},
-            ExpressionAttributeValues={":status": {"S": FileStatus.PROCESSED}},
-            ConditionExpression="attribute_exists(message_id)",
-        )
+        update_audit_table_status(message_id, FileStatus.PROCESSED, created_at_formatted_string)
 
         logger.info(
             "The status of %s file, with message id %s, was successfully updated to %s in the audit table",
@@ -32,18 +25,119 @@ def change_audit_table_status_to_processed(file_key: str, message_id: str) -> No
         raise UnhandledAuditTableError(error) from error
 
 
-def get_next_queued_file_details(queue_name: str) -> Union[dict, None]:
+def get_shard_message_id(message_id: str, shard_index: int) -> str:
+    """Returns the message id of the audit table entry which holds the checkpoint of the shard of the file"""
+    return f"{message_id}#shard_{shard_index}"
+
+
+def get_file_checkpoint(message_id: str) -> Union[dict, None]:
+    """
+    Returns a dictionary containing the row count and byte offset last checkpointed for the file, or returns None if
+    no checkpoint has been written for it. The dictionary also contains the end offset of a shard, or the row counts
+    at which the shards start for a file which was split into shards.
+    """
+    try:
+        audit_table_entry = dynamodb_client.get_item(
+            TableName=AUDIT_TABLE_NAME,
+            Key={AuditTableKeys.MESSAGE_ID: {"S": message_id}},
+            ConsistentRead=True,
+        ).get("Item", {})
+
+    except Exception as error:  # pylint: disable = broad-exception-caught
+        logger.error(error)
+        raise UnhandledAuditTableError(error) from error
+
+    if AuditTableKeys.CHECKPOINT_ROW_COUNT not in audit_table_entry:
+        return None
+
+    checkpoint = {
+        "row_count": int(audit_table_entry[AuditTableKeys.CHECKPOINT_ROW_COUNT]["N"]),
+        "byte_offset": int(audit_table_entry[AuditTableKeys.CHECKPOINT_BYTE_OFFSET]["N"]),
+    }
+    if AuditTableKeys.SHARD_END_OFFSET in audit_table_entry:
+        checkpoint["end_offset"] = int(audit_table_entry[AuditTableKeys.SHARD_END_OFFSET]["N"])
+    if AuditTableKeys.SHARD_START_ROWS in audit_table_entry:
+        checkpoint["shard_start_rows"] = [
+            int(start_row["N"]) for start_row in audit_table_entry[AuditTableKeys.SHARD_START_ROWS]["L"]
+        ]
+    return checkpoint
+
+
+def update_file_checkpoint(message_id: str, row_count: int, byte_offset: int) -> None:
     """
-    Checks for queued files.
-    Returns a dictionary containing the details of the oldest queued file, or returns None if no queued files are found.
+    Records in the audit table that the first row_count rows of the file, which end at byte_offset, have been sent.
+    A checkpoint which can't be written is logged rather than raised, as processing can continue without it.
     """
-    queued_files_found_in_audit_table: dict = dynamodb_resource.Table(AUDIT_TABLE_NAME).query(
-        IndexName=AUDIT_TABLE_QUEUE_NAME_GSI,
-        KeyConditionExpression=Key(AuditTableKeys.QUEUE_NAME).eq(queue_name)
-        & Key(AuditTableKeys.STATUS).eq(FileStatus.QUEUED),
-    )
+    try:
+        dynamodb_client.update_item(
+            TableName=AUDIT_TABLE_NAME,
+            Key={AuditTableKeys.MESSAGE_ID: {"S": message_id}},
+            UpdateExpression="SET #row_count = :row_count, #byte_offset = :byte_offset",
+            ExpressionAttributeNames={
+                "#row_count": AuditTableKeys.CHECKPOINT_ROW_COUNT,
+                "#byte_offset": AuditTableKeys.CHECKPOINT_BYTE_OFFSET,
+            },
+            ExpressionAttributeValues={":row_count": {"N": str(row_count)}, ":byte_offset": {"N": str(byte_offset)}},
+            ConditionExpression="attribute_exists(message_id)",
+        )
+
+    except Exception as error:  # pylint: disable = broad-exception-caught
+        logger.error("Unable to checkpoint file with message id %s: %s", message_id, error)
 
-    queued_files_details: list = queued_files_found_in_audit_table["Items"]
 
-    # Return the oldest queued file
-    return sorted(queued_files_details, key=lambda x: x["timestamp"])[0] if queued_files_details else None
+def set_file_expected_row_count(message_id: str, row_count: int) -> None:
+    """
+    Records in the audit table the number of rows in the file, which the ack lambda counts the acknowledged rows up
+    to in order to determine when the file is complete.
+    """
+    try:
+        dynamodb_client.update_item(
+            TableName=AUDIT_TABLE_NAME,
+            Key={AuditTableKeys.MESSAGE_ID: {"S": message_id}},
+            UpdateExpression="SET #expected_row_count = :row_count",
+            ExpressionAttributeNames={"#expected_row_count": AuditTableKeys.EXPECTED_ROW_COUNT},
+            ExpressionAttributeValues={":row_count": {"N": str(row_count)}},
+            ConditionExpression="attribute_exists(message_id)",
+        )
+
+    except Exception as error:  # pylint: disable = broad-exception-caught
+        logger.error(error)
+        raise UnhandledAuditTableError(error) from error
+
+
+def create_file_shards(message_id: str, shards: list[dict], row_count: int) -> None:
+    """
+    Records in the audit table the shards which the file is split into, each with a checkpoint at its start, and the
+    number of rows in the file. The file entry is only updated once the checkpoints of all of the shards are written,
+    so a file which is recorded as split into shards can always be resumed.
+    """
+    try:
+        for shard_index, shard in enumerate(shards):
+            dynamodb_client.put_item(
+                TableName=AUDIT_TABLE_NAME,
+                Item={
+                    AuditTableKeys.MESSAGE_ID: {"S": get_shard_message_id(message_id, shard_index)},
+                    AuditTableKeys.CHECKPOINT_ROW_COUNT: {"N": str(shard["start_row"])},
+                    AuditTableKeys.CHECKPOINT_BYTE_OFFSET: {"N": str(shard["start_offset"])},
+                    AuditTableKeys.SHARD_END_OFFSET: {"N": str(shard["end_offset"])},
+                },
+            )
+
+        dynamodb_client.update_item(
+            TableName=AUDIT_TABLE_NAME,
+            Key={AuditTableKeys.MESSAGE_ID: {"S": message_id}},
+            UpdateExpression="SET #shard_start_rows = :shard_start_rows, #expected_row_count = :row_count",
+            ExpressionAttributeNames={
+                "#shard_start_rows": AuditTableKeys.SHARD_START_ROWS,
+                "#expected_row_count": AuditTableKeys.EXPECTED_ROW_COUNT,
+            },
+            ExpressionAttributeValues={
+                ":shard_start_rows": {"L": [{"N": str(shard["start_row"])} for shard in shards]},
+                ":row_count": {"N": str(row_count)},
+            },
+            ConditionExpression="attribute_exists(message_id)",
+        )
+
+    except Exception as error:  # pylint: disable = broad-exception-caught
+        logger.error(error)
+        raise UnhandledAuditTableError(error) from error
@@ -3,57 +3,172 @@
 import json
 import os
 import time
-from process_row import process_row
+from collections import deque
+from row_conversion import convert_rows
 from mappings import map_target_disease
-from send_to_kinesis import send_to_kinesis
+from send_to_kinesis import KinesisBatchWriter
 from clients import logger
-from file_level_validation import file_level_validation
-from errors import NoOperationPermissions, InvalidHeaders
+from file_level_validation import file_level_validation, resume_from_checkpoint
+from audit_table import (
+    create_file_shards,
+    get_file_checkpoint,
+    get_shard_message_id,
+    set_file_expected_row_count,
+    update_file_checkpoint,
+)
+from common.audit_table_client import renew_queue_lease, requeue_file
+from errors import NoOperationPermissions, InvalidHeaders, QueueLeaseLostError
+from file_sharding import plan_file_shards, start_shard_tasks
+from logging_decorator import firehose_logger
+
+# Rows sent between checkpoints, which are sent again if processing is resumed after a failure
+CHECKPOINT_INTERVAL_ROWS = int(os.getenv("CHECKPOINT_INTERVAL_ROWS", 5000))
 
 
 def process_csv_to_fhir(incoming_message_body: dict) -> None:
     """
     For each row of the csv, attempts to transform into FHIR format, sends a message to kinesis,
     and documents the outcome for each row in the ack file.
+    The rows sent are periodically checkpointed in the audit table, and the file's lease of the queue is renewed.
+    Processing stops if the lease has been lost. If the file has a checkpoint then it was partly processed before, and
+    processing resumes from the row after the checkpoint.
+    A large file may be split into shards, of which this task processes the first, and a task is started for each of
+    the others. A task started for a shard is given the index of its shard in the incoming message body. A file split
+    into shards is resumed by processing again each of its shards which hasn't been fully sent.
     """
-    try:
-        interim_message_body = file_level_validation(incoming_message_body=incoming_message_body)
-    except (InvalidHeaders, NoOperationPermissions, Exception):  # pylint: disable=broad-exception-caught
-        # If the file is invalid, processing should cease immediately
+    message_id = incoming_message_body.get("message_id")
+    if (shard_index := incoming_message_body.get("shard_index")) is not None:
+        process_file_shard(incoming_message_body, shard_index)
+        return
+
+    checkpoint = get_file_checkpoint(message_id)
+    if checkpoint and checkpoint.get("shard_start_rows"):
+        # The file was split into shards before. A shard may not have been fully sent because its task was never
+        # started or stopped part way through, so a task is started again for each such shard.
+        process_file_shards(
+            incoming_message_body, get_unfinished_shard_indexes(message_id, len(checkpoint["shard_start_rows"]))
+        )
         return
 
+    if checkpoint:
+        interim_message_body = resume_from_checkpoint(incoming_message_body, checkpoint)
+    else:
+        try:
+            interim_message_body = file_level_validation(incoming_message_body=incoming_message_body)
+        except (InvalidHeaders, NoOperationPermissions, Exception):  # pylint: disable=broad-exception-caught
+            # If the file is invalid, processing should cease immediately
+            return
+
+        # Once the file has been moved to the processing folder, it can only be processed by resuming
+        line_reader = interim_message_body.get("line_reader")
+        update_file_checkpoint(message_id, interim_message_body.get("row_count"), line_reader.offset)
+
+        if shards := plan_file_shards(line_reader.key, line_reader.offset):
+            create_file_shards(message_id, shards, sum(shard["row_count"] for shard in shards))
+            process_file_shards(incoming_message_body, list(range(len(shards))))
+            return
+
+    process_rows(interim_message_body, checkpoint_message_id=message_id, is_shard=False)
+
+
+def get_unfinished_shard_indexes(message_id: str, shard_count: int) -> list[int]:
+    """Returns the indexes of the shards of the file which have rows after their checkpoints"""
+    unfinished_shard_indexes = []
+    for shard_index in range(shard_count):
+        shard_checkpoint = get_file_checkpoint(get_shard_message_id(message_id, shard_index))
+        if shard_checkpoint["byte_offset"] < shard_checkpoint["end_offset"]:
+            unfinished_shard_indexes.append(shard_index)
+    return unfinished_shard_indexes
+
+
+def process_file_shards(incoming_message_body: dict, shard_indexes: list[int]) -> None:
+    """
+    Starts a task for each of the given shards of the file other than the first. The first shard, if it is given, is
+    processed by this task, followed by the shards for which a task could not be started.
+    """
+    other_shard_indexes = [shard_index for shard_index in shard_indexes if shard_index != 0]
+    unstarted_shard_indexes = start_shard_tasks(incoming_message_body, other_shard_indexes)
+    first_shard_indexes = [0] if 0 in shard_indexes else []
+    for shard_index in [*first_shard_indexes, *unstarted_shard_indexes]:
+        process_file_shard(incoming_message_body, shard_index)
+
+
+def process_file_shard(incoming_message_body: dict, shard_index: int) -> None:
+    """Processes the rows of the shard of the file, from the row after the shard's checkpoint to the end of the shard"""
+    shard_message_id = get_shard_message_id(incoming_message_body.get("message_id"), shard_index)
+    interim_message_body = resume_from_checkpoint(incoming_message_body, get_file_checkpoint(shard_message_id))
+    process_rows(interim_message_body, checkpoint_message_id=shard_message_id, is_shard=True)
+
+
+def process_rows(interim_message_body: dict, checkpoint_message_id: str, is_shard: bool) -> None:
+    """
+    Sends each of the rows read by the interim message body's csv reader, checkpointing the rows sent to the audit
+    table entry with the checkpoint_message_id.
+    Once all rows of a file have been read, the number of rows is recorded in the audit table for the ack lambda, before
+    the last row is sent, so that the ack lambda can't have acknowledged every row before it knows how many there are.
+    The number of rows of a file split into shards is recorded when the file is split.
+    """
     file_id = interim_message_body.get("message_id")
     vaccine = interim_message_body.get("vaccine")
     supplier = interim_message_body.get("supplier")
     file_key = interim_message_body.get("file_key")
     allowed_operations = interim_message_body.get("allowed_operations")
     created_at_formatted_string = interim_message_body.get("created_at_formatted_string")
+    queue_name = f"{supplier}_{vaccine}"
     csv_reader = interim_message_body.get("csv_dict_reader")
+    line_reader = interim_message_body.get("line_reader")
+    row_count = interim_message_body.get("row_count")  # Initialize a counter for rows
 
     target_disease = map_target_disease(vaccine)
 
-    row_count = 0  # Initialize a counter for rows
-    for row in csv_reader:
-        row_count += 1
-        row_id = f"{file_id}^{row_count}"
-        logger.info("MESSAGE ID : %s", row_id)
+    # The rows are read ahead of being sent, so the byte offset of the end of each row is kept until it is sent
+    row_end_offsets = deque()
+
+    def read_rows():
+        for row in csv_reader:
+            row_end_offsets.append(line_reader.offset)
+            yield row
+
+    checkpointed_row_count = row_count
+    row_end_offset = line_reader.offset
+
+    # Rows are converted in worker processes, and sent to Kinesis in the background, while the file is being read
+    with KinesisBatchWriter(file_key=file_key) as kinesis_writer:
+        for details_from_processing in convert_rows(target_disease, allowed_operations, read_rows()):
+            # The rows sent so far are checkpointed before the next row is sent, so that the writer always has at
+            # least one row buffered, which is only sent once the expected row count has been recorded
+            if row_count % CHECKPOINT_INTERVAL_ROWS == 0 and row_count != checkpointed_row_count:
+                kinesis_writer.flush()
+                kinesis_writer.wait_for_sending()
+                update_file_checkpoint(checkpoint_message_id, row_count, row_end_offset)
+                # Another file may have taken the slot of a lease which expired, so the file stops being processed
+                if not renew_queue_lease(queue_name, file_id):
+                    raise QueueLeaseLostError(f"The lease of file {file_key} in queue {queue_name} has been lost")
+                checkpointed_row_count = row_count
+
+            row_count += 1
+            row_end_offset = row_end_offsets.popleft()
+            row_id = f"{file_id}^{row_count}"
+            logger.info("MESSAGE ID : %s", row_id)
+
+            # Create the message body for sending
+            outgoing_message_body = {
+                "row_id": row_id,
+                "file_key": file_key,
+                "supplier": supplier,
+                "vax_type": vaccine,
+                "created_at_formatted_string": created_at_formatted_string,
+                **details_from_processing,
+            }
 
-        # Process the row to obtain the details needed for the message_body and ack file
-        details_from_processing = process_row(target_disease, allowed_operations, row)
+            kinesis_writer.send(supplier, outgoing_message_body, vaccine)
 
-        # Create the message body for sending
-        outgoing_message_body = {
-            "row_id": row_id,
-            "file_key": file_key,
-            "supplier": supplier,
-            "vax_type": vaccine,
-            "created_at_formatted_string": created_at_formatted_string,
-            **details_from_processing,
-        }
+            logger.info("Total rows processed: %s", row_count)
 
-        send_to_kinesis(supplier, outgoing_message_body, vaccine)
+        if not is_shard:
+            set_file_expected_row_count(file_id, row_count)
 
-        logger.info("Total rows processed: %s", row_count)
+    update_file_checkpoint(checkpoint_message_id, row_count, line_reader.offset)
 
 
 def main(event: str) -> None:
@@ -61,9 +176,18 @@ def main(event: str) -> None:
     logger.info("task started")
     start = time.time()
     try:
-        process_csv_to_fhir(incoming_message_body=json.loads(event))
+        incoming_message_body = json.loads(event)
+        process_csv_to_fhir(incoming_message_body=incoming_message_body)
+    except QueueLeaseLostError as error:
+        # The file is put back in its queue, so that it is resumed from its checkpoint once it holds a lease again
+        logger.warning("Stopped processing file: %s", error)
+        requeue_file(
+            incoming_message_body.get("message_id"), incoming_message_body.get("created_at_formatted_string")
+        )
     except Exception as error:  # pylint: disable=broad-exception-caught
         logger.error("Error processing message: %s", error)
+    finally:
+        firehose_logger.flush()
     end = time.time()
     logger.info("Total time for completion: %ss", round(end - start, 5))
 
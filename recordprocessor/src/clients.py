@@ -19,6 +19,7 @@ sqs_client = boto3_client("sqs", region_name=REGION_NAME)
 firehose_client = boto3_client("firehose", region_name=REGION_NAME)
 dynamodb_client = boto3_client("dynamodb", region_name=REGION_NAME)
 lambda_client = boto3_client("lambda", region_name=REGION_NAME)
+ecs_client = boto3_client("ecs", region_name=REGION_NAME)
 redis_client = redis.StrictRedis(host=REDIS_HOST, port=REDIS_PORT, decode_responses=True)
 
 dynamodb_resource = boto3_resource("dynamodb", region_name=REGION_NAME)
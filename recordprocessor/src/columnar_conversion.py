@@ -0,0 +1,45 @@
+"""Functions for converting the values of a chunk of rows column by column, ahead of converting each row to FHIR"""
+
+from utils_for_fhir_conversion import Convert
+
+# The columns whose values are converted when the row is converted to FHIR, with the function used to convert them
+COLUMN_CONVERSIONS = {
+    "PERSON_DOB": Convert.date,
+    "PERSON_GENDER_CODE": Convert.gender_code,
+    "DATE_AND_TIME": Convert.date_time,
+    "PRIMARY_SOURCE": Convert.boolean,
+    "RECORDED_DATE": Convert.date,
+    "EXPIRY_DATE": Convert.date,
+    "DOSE_SEQUENCE": Convert.integer,
+    "DOSE_AMOUNT": Convert.integer_or_decimal,
+}
+
+
+def _no_conversion(value: any) -> any:
+    return value
+
+
+class PreConverted:
+    """Stands in for Convert when converting rows whose values have already been converted by convert_columns"""
+
+    date = date_time = gender_code = boolean = integer_or_decimal = integer = staticmethod(_no_conversion)
+
+
+def convert_columns(rows: list[dict]) -> list[dict]:
+    """
+    Returns a copy of each of the rows, with the values in each of the COLUMN_CONVERSIONS columns converted.
+    The values are read into a column for each of the COLUMN_CONVERSIONS, and each distinct value in the column is
+    converted only once. The rows should then be converted to FHIR using the PreConverted class in place of Convert.
+    """
+    converted_columns = []
+    for column_name, conversion_fn in COLUMN_CONVERSIONS.items():
+        column = [row.get(column_name) for row in rows]
+        converted_values = {value: conversion_fn(value) for value in set(column)}
+        converted_columns.append((column_name, [converted_values[value] for value in column]))
+
+    converted_rows = [dict(row) for row in rows]
+    for column_name, converted_column in converted_columns:
+        for converted_row, converted_value in zip(converted_rows, converted_column):
+            if column_name in converted_row:
+                converted_row[column_name] = converted_value
+    return converted_rows
@@ -7,7 +7,7 @@ SOURCE_BUCKET_NAME = os.getenv("SOURCE_BUCKET_NAME")
 ACK_BUCKET_NAME = os.getenv("ACK_BUCKET_NAME")
 AUDIT_TABLE_NAME = os.getenv("AUDIT_TABLE_NAME")
 AUDIT_TABLE_FILENAME_GSI = "filename_index"
-AUDIT_TABLE_QUEUE_NAME_GSI = "queue_name_index"
+AUDIT_TABLE_QUEUE_NAME_GSI = "queue_name_status_index"
 FILE_NAME_PROC_LAMBDA_NAME = os.getenv("FILE_NAME_PROC_LAMBDA_NAME")
 
 EXPECTED_CSV_HEADERS = [
@@ -64,7 +64,15 @@ class AuditTableKeys:
     MESSAGE_ID = "message_id"
     QUEUE_NAME = "queue_name"
     STATUS = "status"
+    STATUS_TIMESTAMP = "status_timestamp"
     TIMESTAMP = "timestamp"
+    LEASES = "leases"
+    LEASE_VERSION = "lease_version"
+    CHECKPOINT_ROW_COUNT = "checkpoint_row_count"
+    CHECKPOINT_BYTE_OFFSET = "checkpoint_byte_offset"
+    EXPECTED_ROW_COUNT = "expected_row_count"
+    SHARD_START_ROWS = "shard_start_rows"
+    SHARD_END_OFFSET = "shard_end_offset"
 
 
 class Diagnostics:
@@ -0,0 +1,242 @@
+"""Template for converting the rows of a file to FHIR Immunization Resources"""
+
+from typing import Callable
+from utils_for_fhir_conversion import Convert
+from constants import Urls
+
+PATIENT_ID = "Patient1"
+PRACTITIONER_ID = "Practitioner1"
+DOSE_SEQUENCE_NOT_RECORDED = "Dose sequence not recorded"
+
+
+def _has_value(value: any) -> bool:
+    """Equivalent to _is_not_empty for the values of a row, which are strings, None or converted values"""
+    return value is not None and value != ""
+
+
+def _coding(system: str, code: any, display: any) -> dict:
+    """Returns a coding with the system and only the non-empty code and display, as Generate.dictionary would"""
+    coding = {"system": system}
+    if _has_value(code):
+        coding["code"] = code
+    if _has_value(display):
+        coding["display"] = display
+    return coding
+
+
+class ConversionTemplate:
+    """
+    Converts rows to FHIR Immunization Resources for the given target disease, giving the same resources as
+    convert_to_fhir_imms_resource.
+    The template is compiled once for the target disease. The parts of the resource which are the same for every row
+    are built at that point, and each row is then converted by a precomputed list of steps. The fields which are copied
+    from a single column are filled through (key, column, conversion function) slots.
+    NOTE: The constant parts of the resource are shared by the resources converted, so must not be modified.
+    """
+
+    def __init__(self, target_disease: list, convert: type = Convert):
+        self.target_disease = target_disease
+        self.convert = convert
+
+        self.patient_reference = {"reference": f"#{PATIENT_ID}"}
+        self.practitioner_performer = {"actor": {"reference": f"#{PRACTITIONER_ID}"}}
+        self.null_flavour_vaccine_code = {
+            "coding": [{"system": Urls.NULL_FLAVOUR_CODES, "code": "NAVU", "display": "Not available"}]
+        }
+
+        # The steps follow the order of the decorators, so that the fields are added to the resource in the same order
+        self.steps: list[Callable[[dict, dict], None]] = [
+            self._add_reason_code,
+            self._slots(("recorded", "RECORDED_DATE", convert.date)),
+            self._add_identifier,
+            self._add_patient,
+            self._add_vaccine_code,
+            self._add_manufacturer,
+            self._slots(("expirationDate", "EXPIRY_DATE", convert.date), ("lotNumber", "BATCH_NUMBER", None)),
+            self._add_extension,
+            self._slots(
+                ("occurrenceDateTime", "DATE_AND_TIME", convert.date_time),
+                ("primarySource", "PRIMARY_SOURCE", convert.boolean),
+            ),
+            self._add_site_and_route,
+            self._add_dose,
+            self._add_performer,
+            self._add_location,
+        ]
+
+    def convert_row(self, row: dict) -> dict:
+        """Converts a row of data to a FHIR Immunization Resource"""
+        imms = {
+            "resourceType": "Immunization",
+            "status": "completed",
+            "protocolApplied": [{"targetDisease": self.target_disease}],
+        }
+        for step in self.steps:
+            step(imms, row)
+        return imms
+
+    @staticmethod
+    def _slots(*slots: tuple) -> Callable[[dict, dict], None]:
+        """Returns a step which adds each (key, column, conversion function) slot, where the column is non-empty"""
+
+        def fill_slots(imms: dict, row: dict) -> None:
+            for key, column, conversion_fn in slots:
+                if _has_value(value := row.get(column)):
+                    imms[key] = value if conversion_fn is None else conversion_fn(value)
+
+        return fill_slots
+
+    @staticmethod
+    def _add_reason_code(imms: dict, row: dict) -> None:
+        if _has_value(indication_code := row.get("INDICATION_CODE")):
+            imms["reasonCode"] = [{"coding": [{"system": Urls.SNOMED, "code": indication_code}]}]
+
+    @staticmethod
+    def _add_identifier(imms: dict, row: dict) -> None:
+        identifier = {}
+        if _has_value(unique_id := row.get("UNIQUE_ID")):
+            identifier["value"] = unique_id
+        if _has_value(unique_id_uri := row.get("UNIQUE_ID_URI")):
+            identifier["system"] = unique_id_uri
+        if identifier:
+            imms["identifier"] = [identifier]
+
+    def _add_patient(self, imms: dict, row: dict) -> None:
+        person_surname = row.get("PERSON_SURNAME")
+        person_forename = row.get("PERSON_FORENAME")
+        person_gender_code = row.get("PERSON_GENDER_CODE")
+        person_dob = row.get("PERSON_DOB")
+        person_postcode = row.get("PERSON_POSTCODE")
+        nhs_number = row.get("NHS_NUMBER")
+
+        has_name = _has_value(person_surname) or _has_value(person_forename)
+        if not (
+            has_name
+            or _has_value(person_gender_code)
+            or _has_value(person_dob)
+            or _has_value(person_postcode)
+            or _has_value(nhs_number)
+        ):
+            return
+
+        imms["patient"] = self.patient_reference
+        patient = {"id": PATIENT_ID, "resourceType": "Patient"}
+        if _has_value(person_dob):
+            patient["birthDate"] = self.convert.date(person_dob)
+        if _has_value(person_gender_code):
+            patient["gender"] = self.convert.gender_code(person_gender_code)
+        if _has_value(person_postcode):
+            patient["address"] = [{"postalCode": person_postcode}]
+        if _has_value(nhs_number):
+            patient["identifier"] = [{"system": Urls.NHS_NUMBER, "value": nhs_number}]
+        if has_name:
+            patient["name"] = [self._name(person_surname, person_forename)]
+        imms["contained"] = [patient]
+
+    @staticmethod
+    def _name(surname: str, forename: str) -> dict:
+        name = {}
+        if _has_value(surname):
+            name["family"] = surname
+        if _has_value(forename):
+            name["given"] = [forename]
+        return name
+
+    def _add_vaccine_code(self, imms: dict, row: dict) -> None:
+        vax_prod_code = row.get("VACCINE_PRODUCT_CODE")
+        vax_prod_term = row.get("VACCINE_PRODUCT_TERM")
+        if not (vax_prod_code or vax_prod_term):
+            imms["vaccineCode"] = self.null_flavour_vaccine_code
+        else:
+            imms["vaccineCode"] = {"coding": [_coding(Urls.SNOMED, vax_prod_code, vax_prod_term)]}
+
+    @staticmethod
+    def _add_manufacturer(imms: dict, row: dict) -> None:
+        if _has_value(vaccine_manufacturer := row.get("VACCINE_MANUFACTURER")):
+            imms["manufacturer"] = {"display": vaccine_manufacturer}
+
+    @staticmethod
+    def _add_extension(imms: dict, row: dict) -> None:
+        vaccination_procedure_code = row.get("VACCINATION_PROCEDURE_CODE")
+        vaccination_procedure_term = row.get("VACCINATION_PROCEDURE_TERM")
+        if _has_value(vaccination_procedure_code) or _has_value(vaccination_procedure_term):
+            imms["extension"] = [
+                {
+                    "url": Urls.VACCINATION_PROCEDURE,
+                    "valueCodeableConcept": {
+                        "coding": [_coding(Urls.SNOMED, vaccination_procedure_code, vaccination_procedure_term)]
+                    },
+                }
+            ]
+
+    @staticmethod
+    def _add_site_and_route(imms: dict, row: dict) -> None:
+        for key, code_column, term_column in (
+            ("site", "SITE_OF_VACCINATION_CODE", "SITE_OF_VACCINATION_TERM"),
+            ("route", "ROUTE_OF_VACCINATION_CODE", "ROUTE_OF_VACCINATION_TERM"),
+        ):
+            code = row.get(code_column)
+            term = row.get(term_column)
+            if _has_value(code) or _has_value(term):
+                imms[key] = {"coding": [_coding(Urls.SNOMED, code, term)]}
+
+    def _add_dose(self, imms: dict, row: dict) -> None:
+        dose_amount = row.get("DOSE_AMOUNT")
+        dose_unit_term = row.get("DOSE_UNIT_TERM")
+        dose_unit_code = row.get("DOSE_UNIT_CODE")
+        if _has_value(dose_amount) or _has_value(dose_unit_term) or _has_value(dose_unit_code):
+            dose_quantity = {}
+            if _has_value(dose_value := self.convert.integer_or_decimal(dose_amount)):
+                dose_quantity["value"] = dose_value
+            if _has_value(dose_unit_term):
+                dose_quantity["unit"] = dose_unit_term
+            if _has_value(dose_unit_code):
+                dose_quantity["system"] = Urls.SNOMED
+                dose_quantity["code"] = dose_unit_code
+            imms["doseQuantity"] = dose_quantity
+
+        if _has_value(dose_sequence := row.get("DOSE_SEQUENCE")):
+            imms["protocolApplied"][0]["doseNumberPositiveInt"] = self.convert.integer(dose_sequence)
+        else:
+            imms["protocolApplied"][0]["doseNumberString"] = DOSE_SEQUENCE_NOT_RECORDED
+
+    def _add_performer(self, imms: dict, row: dict) -> None:
+        site_code_type_uri = row.get("SITE_CODE_TYPE_URI")
+        site_code = row.get("SITE_CODE")
+        performing_prof_surname = row.get("PERFORMING_PROFESSIONAL_SURNAME")
+        performing_prof_forename = row.get("PERFORMING_PROFESSIONAL_FORENAME")
+
+        has_organization = _has_value(site_code_type_uri) or _has_value(site_code)
+        has_practitioner = _has_value(performing_prof_surname) or _has_value(performing_prof_forename)
+        if not (has_organization or has_practitioner):
+            return
+
+        imms["performer"] = []
+        if has_organization:
+            identifier = {}
+            if _has_value(site_code_type_uri):
+                identifier["system"] = site_code_type_uri
+            if _has_value(site_code):
+                identifier["value"] = site_code
+            imms["performer"].append({"actor": {"type": "Organization", "identifier": identifier}})
+
+        if has_practitioner:
+            imms["performer"].append(self.practitioner_performer)
+            practitioner = {
+                "resourceType": "Practitioner",
+                "id": PRACTITIONER_ID,
+                "name": [self._name(performing_prof_surname, performing_prof_forename)],
+            }
+            imms.setdefault("contained", []).append(practitioner)
+
+    @staticmethod
+    def _add_location(imms: dict, row: dict) -> None:
+        location_code = row.get("LOCATION_CODE")
+        location_code_type_uri = row.get("LOCATION_CODE_TYPE_URI")
+        if _has_value(location_code) or _has_value(location_code_type_uri):
+            identifier = {}
+            if _has_value(location_code):
+                identifier["value"] = location_code
+            if _has_value(location_code_type_uri):
+                identifier["system"] = location_code_type_uri
+            imms["location"] = {"identifier": identifier}
@@ -5,27 +5,28 @@ from utils_for_fhir_conversion import _is_not_empty, Generate, Add, Convert
 from constants import Urls
 
 
-ImmunizationDecorator = Callable[[Dict, Dict[str, str]], None]
+ImmunizationDecorator = Callable[[Dict, Dict[str, str], type], None]
 """
 A decorator function (Callable) takes the current immunization resource and adds appropriate fields to it.
+Values are converted using the given convert class, which is Convert unless the row has already been converted.
 NOTE: NO VALIDATION should be performed. Validation is left to the Imms API validator.
 NOTE: An overarching data rule is that where data is not present the field should not be added to the FHIR Immunization
 resource. Therefore before adding an element it is necessary to check that at least one of its values is non-empty.
 """
 
 
-def _decorate_immunization(imms: dict, row: Dict[str, str]) -> None:
+def _decorate_immunization(imms: dict, row: Dict[str, str], convert: type = Convert) -> None:
     """Adds the reasonCode, recorded and identifier elements (where non-empty data is provided)"""
     indication_code = row.get("INDICATION_CODE")
     reason_code_value = [{"coding": [{"system": Urls.SNOMED, "code": indication_code}]}]
     Add.custom_item(imms, "reasonCode", [indication_code], reason_code_value)
 
-    Add.item(imms, "recorded", row.get("RECORDED_DATE"), Convert.date)
+    Add.item(imms, "recorded", row.get("RECORDED_DATE"), convert.date)
 
     Add.list_of_dict(imms, "identifier", {"value": row.get("UNIQUE_ID"), "system": row.get("UNIQUE_ID_URI")})
 
 
-def _decorate_patient(imms: dict, row: Dict[str, str]) -> None:
+def _decorate_patient(imms: dict, row: Dict[str, str], convert: type = Convert) -> None:
     """Creates the patient resource and appends it the to 'contained' list"""
     patient_values = [
         person_surname := row.get("PERSON_SURNAME"),
@@ -44,9 +45,9 @@ def _decorate_patient(imms: dict, row: Dict[str, str]) -> None:
         imms["patient"] = {"reference": f"#{internal_patient_id}"}
         patient = {"id": internal_patient_id, "resourceType": "Patient"}
 
-        Add.item(patient, "birthDate", person_dob, Convert.date)
+        Add.item(patient, "birthDate", person_dob, convert.date)
 
-        Add.item(patient, "gender", person_gender_code, Convert.gender_code)
+        Add.item(patient, "gender", person_gender_code, convert.gender_code)
 
         Add.list_of_dict(patient, "address", {"postalCode": person_postcode})
 
@@ -62,7 +63,7 @@ def _decorate_patient(imms: dict, row: Dict[str, str]) -> None:
         imms.setdefault("contained", []).append(patient)
 
 
-def _decorate_vaccine(imms: dict, row: Dict[str, str]) -> None:
+def _decorate_vaccine(imms: dict, row: Dict[str, str], convert: type = Convert) -> None:
     """Adds fields relating to the physical product"""
 
     vax_prod_code = row.get("VACCINE_PRODUCT_CODE")
@@ -77,12 +78,12 @@ def _decorate_vaccine(imms: dict, row: Dict[str, str]) -> None:
 
     Add.dictionary(imms, "manufacturer", {"display": row.get("VACCINE_MANUFACTURER")})
 
-    Add.item(imms, "expirationDate", row.get("EXPIRY_DATE"), Convert.date)
+    Add.item(imms, "expirationDate", row.get("EXPIRY_DATE"), convert.date)
 
     Add.item(imms, "lotNumber", row.get("BATCH_NUMBER"))
 
 
-def _decorate_vaccination(imms: dict, row: Dict[str, str]) -> None:
+def _decorate_vaccination(imms: dict, row: Dict[str, str], convert: type = Convert) -> None:
     """Adds fields relating to the administration of the vaccine"""
     vaccination_extension_values = [
         vaccination_procedure_code := row.get("VACCINATION_PROCEDURE_CODE"),
@@ -102,9 +103,9 @@ def _decorate_vaccination(imms: dict, row: Dict[str, str]) -> None:
             )
         )
 
-    Add.item(imms, "occurrenceDateTime", row.get("DATE_AND_TIME"), Convert.date_time)
+    Add.item(imms, "occurrenceDateTime", row.get("DATE_AND_TIME"), convert.date_time)
 
-    Add.item(imms, "primarySource", row.get("PRIMARY_SOURCE"), Convert.boolean)
+    Add.item(imms, "primarySource", row.get("PRIMARY_SOURCE"), convert.boolean)
 
     Add.snomed(imms, "site", row.get("SITE_OF_VACCINATION_CODE"), row.get("SITE_OF_VACCINATION_TERM"))
 
@@ -116,7 +117,7 @@ def _decorate_vaccination(imms: dict, row: Dict[str, str]) -> None:
         dose_unit_code := row.get("DOSE_UNIT_CODE"),
     ]
     dose_quantity_dict = {
-        "value": Convert.integer_or_decimal(dose_amount),
+        "value": convert.integer_or_decimal(dose_amount),
         "unit": dose_unit_term,
         # Only include system if dose unit code is  non-empty
         **({"system": Urls.SNOMED} if _is_not_empty(dose_unit_code) else {}),
@@ -127,12 +128,12 @@ def _decorate_vaccination(imms: dict, row: Dict[str, str]) -> None:
     # If DOSE_SEQUENCE is empty, default FHIR "doseNumberString" to "Dose sequence not recorded",
     # otherwise assume the sender's intentiion is to supply a positive integer
     if _is_not_empty(dose_sequence := row.get("DOSE_SEQUENCE")):
-        Add.item(imms["protocolApplied"][0], "doseNumberPositiveInt", dose_sequence, Convert.integer)
+        Add.item(imms["protocolApplied"][0], "doseNumberPositiveInt", dose_sequence, convert.integer)
     else:
         Add.item(imms["protocolApplied"][0], "doseNumberString", "Dose sequence not recorded")
 
 
-def _decorate_performer(imms: dict, row: Dict[str, str]) -> None:
+def _decorate_performer(imms: dict, row: Dict[str, str], convert: type = Convert) -> None:
     """
     Adds the performer field, including organization, and where relevant creates the practitioner resource
     and adds it to the 'contained' list
@@ -195,8 +196,11 @@ all_decorators: List[ImmunizationDecorator] = [
 ]
 
 
-def convert_to_fhir_imms_resource(row: dict, target_disease: list) -> dict:
-    """Converts a row of data to a FHIR Immunization Resource"""
+def convert_to_fhir_imms_resource(row: dict, target_disease: list, convert: type = Convert) -> dict:
+    """
+    Converts a row of data to a FHIR Immunization Resource. If the values of the row have already been converted, then
+    the convert class should be given as PreConverted.
+    """
     # Prepare the imms_resource. Note that all data sent via this service is assumed to be for completed vaccinations.
     imms_resource = {
         "resourceType": "Immunization",
@@ -206,6 +210,6 @@ def convert_to_fhir_imms_resource(row: dict, target_disease: list) -> dict:
 
     # Apply all decorators to add the relevant fields to the imms_resource
     for decorator in all_decorators:
-        decorator(imms_resource, row)
+        decorator(imms_resource, row, convert)
 
     return imms_resource
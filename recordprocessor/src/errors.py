@@ -11,3 +11,11 @@ class InvalidHeaders(Exception):
 
 class UnhandledAuditTableError(Exception):
     """A custom exception for when an unexpected error occurs whilst adding the file to the audit table."""
+
+
+class KinesisSendError(Exception):
+    """A custom exception for when messages can't be sent to Kinesis after retrying."""
+
+
+class QueueLeaseLostError(Exception):
+    """A custom exception for when the file's lease of its queue has been lost, so it must stop being processed."""
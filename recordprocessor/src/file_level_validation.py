@@ -7,7 +7,8 @@ from make_and_upload_ack_file import make_and_upload_ack_file
 from utils_for_recordprocessor import get_csv_content_dict_reader, invoke_filename_lambda
 from errors import InvalidHeaders, NoOperationPermissions
 from logging_decorator import file_level_validation_logging_decorator
-from audit_table import change_audit_table_status_to_processed, get_next_queued_file_details
+from audit_table import change_audit_table_status_to_processed
+from common.audit_table_client import get_next_queued_file_details, release_queue_lease
 from constants import SOURCE_BUCKET_NAME, EXPECTED_CSV_HEADERS, permission_to_operation_map, Permission
 
 
@@ -60,6 +61,40 @@ def move_file(bucket_name: str, source_file_key: str, destination_file_key: str)
     logger.info("File moved from %s to %s", source_file_key, destination_file_key)
 
 
+def resume_from_checkpoint(incoming_message_body: dict, checkpoint: dict) -> dict:
+    """
+    Returns the interim message body for row level processing of a file which was partly processed before, reading the
+    file from the processing folder from the row after the checkpoint. The checkpoint of a shard of the file also gives
+    the end of the shard, which the file is read up to.
+    NOTE: File level validation was passed, the inf ack file uploaded and the file moved to the processing folder when
+    the file was first processed, so these steps are not repeated.
+    """
+    message_id = incoming_message_body.get("message_id")
+    vaccine = incoming_message_body.get("vaccine_type").upper()
+    supplier = incoming_message_body.get("supplier").upper()
+    file_key = incoming_message_body.get("filename")
+
+    logger.info("Resuming processing of %s from row %s", file_key, checkpoint["row_count"])
+    csv_reader, line_reader = get_csv_content_dict_reader(
+        f"processing/{file_key}",
+        start_offset=checkpoint["byte_offset"],
+        fieldnames=EXPECTED_CSV_HEADERS,
+        end_offset=checkpoint.get("end_offset"),
+    )
+
+    return {
+        "message_id": message_id,
+        "vaccine": vaccine,
+        "supplier": supplier,
+        "file_key": file_key,
+        "allowed_operations": get_permitted_operations(supplier, vaccine, incoming_message_body.get("permission")),
+        "created_at_formatted_string": incoming_message_body.get("created_at_formatted_string"),
+        "csv_dict_reader": csv_reader,
+        "line_reader": line_reader,
+        "row_count": checkpoint["row_count"],
+    }
+
+
 @file_level_validation_logging_decorator
 def file_level_validation(incoming_message_body: dict) -> dict:
     """
@@ -78,7 +113,7 @@ def file_level_validation(incoming_message_body: dict) -> dict:
         created_at_formatted_string = incoming_message_body.get("created_at_formatted_string")
 
         # Fetch the data
-        csv_reader = get_csv_content_dict_reader(file_key)
+        csv_reader, line_reader = get_csv_content_dict_reader(file_key)
 
         validate_content_headers(csv_reader)
 
@@ -88,6 +123,8 @@ def file_level_validation(incoming_message_body: dict) -> dict:
         make_and_upload_ack_file(message_id, file_key, True, True, created_at_formatted_string)
 
         move_file(SOURCE_BUCKET_NAME, file_key, f"processing/{file_key}")
+        # The rest of the file is read from its new location
+        line_reader.key = f"processing/{file_key}"
 
         return {
             "message_id": message_id,
@@ -97,6 +134,8 @@ def file_level_validation(incoming_message_body: dict) -> dict:
             "allowed_operations": allowed_operations_set,
             "created_at_formatted_string": created_at_formatted_string,
             "csv_dict_reader": csv_reader,
+            "line_reader": line_reader,
+            "row_count": 0,
         }
 
     except (InvalidHeaders, NoOperationPermissions, Exception) as error:
@@ -113,9 +152,11 @@ def file_level_validation(incoming_message_body: dict) -> dict:
         except Exception as move_file_error:
             logger.error("Failed to move file to archive: %s", move_file_error)
 
-        # Update the audit table and invoke the filename lambda with next file in the queue (if one exists)
-        change_audit_table_status_to_processed(file_key, message_id)
+        # Update the audit table, free the file's lease, and invoke the filename lambda with next file in the queue
+        # (if one exists)
+        change_audit_table_status_to_processed(file_key, message_id, created_at_formatted_string)
         queue_name = f"{supplier}_{vaccine}"
+        release_queue_lease(queue_name, message_id)
         next_queued_file_details = get_next_queued_file_details(queue_name)
         if next_queued_file_details:
             invoke_filename_lambda(next_queued_file_details["filename"], next_queued_file_details["message_id"])
@@ -0,0 +1,126 @@
+"""Functions for splitting a large file into shards, which are processed in parallel by separate ECS tasks"""
+
+import json
+import os
+from array import array
+from clients import ecs_client, logger
+from constants import EXPECTED_CSV_HEADERS
+from utils_for_recordprocessor import get_csv_content_dict_reader
+
+# Files are only split into shards if MAX_FILE_SHARDS is more than 1, and into no more shards than have at least
+# MIN_SHARD_SIZE_BYTES of rows each
+MAX_FILE_SHARDS = int(os.getenv("MAX_FILE_SHARDS", 1))
+MIN_SHARD_SIZE_BYTES = int(os.getenv("MIN_SHARD_SIZE_BYTES", 256 * 1024 * 1024))
+
+# The ECS task which processes each shard, other than the first, is run with the same task definition as this task
+ECS_CLUSTER_NAME = os.getenv("ECS_CLUSTER_NAME")
+ECS_TASK_DEFINITION = os.getenv("ECS_TASK_DEFINITION")
+ECS_CONTAINER_NAME = os.getenv("ECS_CONTAINER_NAME")
+ECS_SUBNET_IDS = [subnet_id for subnet_id in os.getenv("ECS_SUBNET_IDS", "").split(",") if subnet_id]
+
+
+def plan_file_shards(file_key: str, start_offset: int) -> list[dict]:
+    """
+    Splits the rows of the file, from the start offset, into up to MAX_FILE_SHARDS shards of similar sizes. Returns the
+    shards, each with its start and end byte offsets, the number of rows before it and the number of rows in it, or
+    returns an empty list if the file is not split.
+    The shards end at row boundaries, and all of the rows with the same UNIQUE_ID and UNIQUE_ID_URI are in the same
+    shard, so that the rows for each vaccination record are still sent in the order of the file.
+    """
+    if MAX_FILE_SHARDS <= 1:
+        return []
+
+    csv_reader, line_reader = get_csv_content_dict_reader(file_key, start_offset, EXPECTED_CSV_HEADERS)
+    data_size = line_reader.size - start_offset
+    shard_count = min(MAX_FILE_SHARDS, data_size // MIN_SHARD_SIZE_BYTES)
+    if shard_count <= 1:
+        return []
+
+    # For each row, the byte offset of the end of the row and the index of the first row with the same identifier.
+    # Identifiers are kept as hashes, as a collision can only keep together rows which could have been split.
+    row_end_offsets = array("q")
+    first_row_indexes = array("q")
+    first_row_index_by_identifier = {}
+    for row_index, row in enumerate(csv_reader):
+        row_end_offsets.append(line_reader.offset)
+        if row.get("UNIQUE_ID") and row.get("UNIQUE_ID_URI"):
+            identifier = hash((row["UNIQUE_ID_URI"], row["UNIQUE_ID"]))
+            first_row_indexes.append(first_row_index_by_identifier.setdefault(identifier, row_index))
+        else:
+            first_row_indexes.append(row_index)
+    del first_row_index_by_identifier
+
+    # A shard can only end after a row if no later row has an identifier which first occurs at or before that row
+    row_count = len(row_end_offsets)
+    can_end_after_row = bytearray(row_count)
+    earliest_first_row_index_after = row_count
+    for row_index in range(row_count - 1, -1, -1):
+        can_end_after_row[row_index] = earliest_first_row_index_after > row_index
+        earliest_first_row_index_after = min(earliest_first_row_index_after, first_row_indexes[row_index])
+
+    shards = []
+    shard_start_row, shard_start_offset = 0, start_offset
+    target_shard_size = data_size / shard_count
+    for row_index in range(row_count - 1):
+        if (
+            len(shards) < shard_count - 1
+            and can_end_after_row[row_index]
+            and row_end_offsets[row_index] - start_offset >= target_shard_size * (len(shards) + 1)
+        ):
+            shards.append(
+                {
+                    "start_offset": shard_start_offset,
+                    "end_offset": row_end_offsets[row_index],
+                    "start_row": shard_start_row,
+                    "row_count": row_index + 1 - shard_start_row,
+                }
+            )
+            shard_start_row, shard_start_offset = row_index + 1, row_end_offsets[row_index]
+
+    if not shards:
+        logger.info("%s could not be split into shards", file_key)
+        return []
+
+    shards.append(
+        {
+            "start_offset": shard_start_offset,
+            "end_offset": line_reader.size,
+            "start_row": shard_start_row,
+            "row_count": row_count - shard_start_row,
+        }
+    )
+    logger.info("%s split into %s shards of %s rows", file_key, len(shards), [shard["row_count"] for shard in shards])
+    return shards
+
+
+def start_shard_tasks(incoming_message_body: dict, shard_indexes: list[int]) -> list[int]:
+    """
+    Starts an ECS task to process each of the given shards of the file. The task is given the incoming message body,
+    along with the index of its shard. Returns the indexes of the shards for which a task could not be started.
+    """
+    unstarted_shard_indexes = []
+    for shard_index in shard_indexes:
+        event_details = json.dumps({**incoming_message_body, "shard_index": shard_index})
+        try:
+            response = ecs_client.run_task(
+                cluster=ECS_CLUSTER_NAME,
+                taskDefinition=ECS_TASK_DEFINITION,
+                launchType="FARGATE",
+                networkConfiguration={"awsvpcConfiguration": {"subnets": ECS_SUBNET_IDS, "assignPublicIp": "ENABLED"}},
+                overrides={
+                    "containerOverrides": [
+                        {"name": ECS_CONTAINER_NAME, "environment": [{"name": "EVENT_DETAILS", "value": event_details}]}
+                    ]
+                },
+            )
+            if not response.get("tasks"):
+                raise RuntimeError(response.get("failures"))
+            logger.info("Task started for shard %s of %s", shard_index, incoming_message_body.get("filename"))
+
+        except Exception as error:  # pylint: disable = broad-exception-caught
+            logger.error(
+                "Unable to start task for shard %s of %s: %s", shard_index, incoming_message_body.get("filename"), error
+            )
+            unstarted_shard_indexes.append(shard_index)
+
+    return unstarted_shard_indexes
@@ -6,19 +6,18 @@ import time
 from datetime import datetime
 from functools import wraps
 from clients import firehose_client, logger
+from common.log_firehose import FirehoseLogger
 from errors import NoOperationPermissions, InvalidHeaders
 
 STREAM_NAME = os.getenv("SPLUNK_FIREHOSE_NAME", "immunisation-fhir-api-internal-dev-splunk-firehose")
 
+# The logs are buffered, and sent in batches, so must be flushed before the process ends
+firehose_logger = FirehoseLogger(STREAM_NAME, firehose_client)
+
 
 def send_log_to_firehose(log_data: dict) -> None:
-    """Sends the log_message to Firehose"""
-    try:
-        record = {"Data": json.dumps({"event": log_data}).encode("utf-8")}
-        response = firehose_client.put_record(DeliveryStreamName=STREAM_NAME, Record=record)
-        logger.info("Log sent to Firehose: %s", response)  # TODO: Should we be logging full response?
-    except Exception as error:  # pylint:disable = broad-exception-caught
-        logger.exception("Error sending log to Firehose: %s", error)
+    """Adds the log_message to the logs to be sent to Firehose"""
+    firehose_logger.send_log({"event": log_data})
 
 
 def generate_and_send_logs(
@@ -1,16 +1,20 @@
 """Function to process a single row of a csv file"""
 
 from convert_to_fhir_imms_resource import convert_to_fhir_imms_resource
+from conversion_template import ConversionTemplate
 from constants import Diagnostics
 from clients import logger
 from utils_for_recordprocessor import create_diagnostics_dictionary
 
 
-def process_row(target_disease: list, allowed_operations: set, row: dict) -> dict:
+def process_row(
+    target_disease: list, allowed_operations: set, row: dict, template: ConversionTemplate = None
+) -> dict:
     """
     Processes a row of the file and returns a dictionary containing the fhir_json, action_flag, imms_id, local_id
     (where applicable), version(where applicable) and any diagnostics.
-    The local_id is combination of unique_id and unique_id_uri combined by "^"
+    The local_id is combination of unique_id and unique_id_uri combined by "^".
+    If a template is given, then the row is converted to FHIR using the template.
     """
     action_flag = (row.get("ACTION_FLAG") or "").upper()
     unique_id_uri = row.get("UNIQUE_ID_URI")
@@ -50,7 +54,7 @@ def process_row(target_disease: list, allowed_operations: set, row: dict) -> dic
 
     # Handle success
     return {
-        "fhir_json": convert_to_fhir_imms_resource(row, target_disease),
+        "fhir_json": template.convert_row(row) if template else convert_to_fhir_imms_resource(row, target_disease),
         "operation_requested": operation_requested,
         "local_id": local_id,
     }
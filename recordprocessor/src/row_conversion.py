@@ -0,0 +1,61 @@
+"""Functions for converting the rows of a file in parallel, across worker processes"""
+
+import multiprocessing
+import os
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from itertools import islice
+from typing import Iterable, Iterator
+from process_row import process_row
+from columnar_conversion import convert_columns, PreConverted
+from conversion_template import ConversionTemplate
+
+CONVERSION_WORKERS = int(os.getenv("CONVERSION_WORKERS", os.cpu_count() or 1))
+CONVERSION_CHUNK_SIZE = int(os.getenv("CONVERSION_CHUNK_SIZE", 250))
+
+# Chunks which may be read ahead of the rows being sent, for each worker. This caps the rows held in memory.
+MAX_PENDING_CHUNKS_PER_WORKER = 2
+
+# The workers are started from a fork server rather than forked from this process, as this process has other threads
+# running (reading the file, and sending to Kinesis and Firehose) whose locks a forked worker could inherit while held
+WORKER_START_METHOD = "forkserver"
+
+
+def process_rows(target_disease: list, allowed_operations: set, rows: list[dict]) -> list[dict]:
+    """
+    Processes each of the rows, returning the details from processing each one.
+    The values which need converting are converted column by column, and the rows are then converted to FHIR using a
+    template compiled for the target disease.
+    """
+    template = ConversionTemplate(target_disease, PreConverted)
+    return [process_row(target_disease, allowed_operations, row, template) for row in convert_columns(rows)]
+
+
+def convert_rows(target_disease: list, allowed_operations: set, rows: Iterable[dict]) -> Iterator[dict]:
+    """
+    Yields the details from processing each row, in order.
+    The rows are read in chunks of CONVERSION_CHUNK_SIZE, which are converted by a pool of CONVERSION_WORKERS
+    processes while the rows already converted are being sent. Files of a single chunk are converted in this process.
+    """
+    rows = iter(rows)
+    first_chunk = list(islice(rows, CONVERSION_CHUNK_SIZE))
+    if CONVERSION_WORKERS <= 1 or len(first_chunk) < CONVERSION_CHUNK_SIZE:
+        chunk = first_chunk
+        while chunk:
+            yield from process_rows(target_disease, allowed_operations, chunk)
+            chunk = list(islice(rows, CONVERSION_CHUNK_SIZE))
+        return
+
+    pending_chunks = deque()
+    with ProcessPoolExecutor(
+        max_workers=CONVERSION_WORKERS, mp_context=multiprocessing.get_context(WORKER_START_METHOD)
+    ) as executor:
+        chunk = first_chunk
+        while chunk:
+            pending_chunks.append(executor.submit(process_rows, target_disease, allowed_operations, chunk))
+            if len(pending_chunks) >= CONVERSION_WORKERS * MAX_PENDING_CHUNKS_PER_WORKER:
+                yield from pending_chunks.popleft().result()
+            chunk = list(islice(rows, CONVERSION_CHUNK_SIZE))
+
+        while pending_chunks:
+            yield from pending_chunks.popleft().result()
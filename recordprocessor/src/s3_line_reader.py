@@ -0,0 +1,85 @@
+"""Class for reading the lines of a file from S3, fetching byte ranges of the file in parallel ahead of the reader"""
+
+import os
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from typing import Iterator
+from botocore.exceptions import BotoCoreError, ClientError
+from clients import s3_client, logger
+
+S3_RANGE_SIZE = int(os.getenv("S3_RANGE_SIZE", 8 * 1024 * 1024))
+S3_READ_AHEAD_RANGES = int(os.getenv("S3_READ_AHEAD_RANGES", 4))
+
+MAX_RANGE_ATTEMPTS = 5
+RETRY_BASE_DELAY_SECONDS = 0.5
+
+
+class S3LineReader:
+    """
+    Iterates over the lines of the file, decoded as utf-8 with their line endings kept (as for a file opened with
+    newline=""), so that it can be read by a csv reader.
+    The file is fetched in ranges of S3_RANGE_SIZE bytes, up to S3_READ_AHEAD_RANGES at a time, ahead of the lines
+    being read. A range which fails, or stalls until the read times out, is fetched again, rather than the whole file.
+    `offset` is the byte offset of the end of the last line read, which can be given as the start_offset to resume
+    reading from the following line. `key` may be changed while reading, if the file is moved.
+    If an end_offset is given, which must be the end of a line, then the lines are only read up to that offset.
+    """
+
+    def __init__(self, bucket_name: str, key: str, start_offset: int = 0, end_offset: int = None):
+        self.bucket_name = bucket_name
+        self.key = key
+        self.offset = start_offset
+        self.size = (
+            end_offset if end_offset is not None else s3_client.head_object(Bucket=bucket_name, Key=key)["ContentLength"]
+        )
+        self.lines = self._read_lines()
+
+    def __iter__(self):
+        return self
+
+    def __next__(self) -> str:
+        line = next(self.lines)
+        self.offset += len(line)
+        return line.decode("utf-8")
+
+    def _read_lines(self) -> Iterator[bytes]:
+        """Yields the lines in the ranges, joining those which are split across ranges"""
+        incomplete_line = b""
+        for data in self._read_ranges():
+            lines = (incomplete_line + data).splitlines(keepends=True)
+            # A line ending in "\r" may be completed by a "\n" at the start of the next range
+            incomplete_line = lines.pop() if lines and not lines[-1].endswith(b"\n") else b""
+            yield from lines
+        if incomplete_line:
+            yield incomplete_line
+
+    def _read_ranges(self) -> Iterator[bytes]:
+        """Yields the ranges from the start offset to the end of the file, in order, fetching them in parallel"""
+        next_range_start = self.offset
+        pending_ranges = deque()
+        fetcher = ThreadPoolExecutor(max_workers=S3_READ_AHEAD_RANGES)
+        try:
+            while next_range_start < self.size or pending_ranges:
+                while next_range_start < self.size and len(pending_ranges) < S3_READ_AHEAD_RANGES:
+                    range_end = min(next_range_start + S3_RANGE_SIZE, self.size) - 1
+                    pending_ranges.append(fetcher.submit(self._get_range, next_range_start, range_end))
+                    next_range_start = range_end + 1
+                yield pending_ranges.popleft().result()
+        finally:
+            fetcher.shutdown(wait=False, cancel_futures=True)
+
+    def _get_range(self, start: int, end: int) -> bytes:
+        """Returns the bytes from start to end (inclusive) of the file, retrying with backoff if the fetch fails"""
+        attempt = 1
+        while True:
+            try:
+                response = s3_client.get_object(Bucket=self.bucket_name, Key=self.key, Range=f"bytes={start}-{end}")
+                return response["Body"].read()
+            except (BotoCoreError, ClientError) as error:
+                if attempt >= MAX_RANGE_ATTEMPTS:
+                    logger.error("Error reading bytes %s-%s of %s: %s", start, end, self.key, error)
+                    raise
+                logger.warning("Retrying bytes %s-%s of %s after error: %s", start, end, self.key, error)
+                time.sleep(RETRY_BASE_DELAY_SECONDS * 2 ** (attempt - 1))
+                attempt += 1
@@ -1,21 +1,146 @@
-"""Function to send the message to kinesis"""
+"""Class to send messages to kinesis"""
 
 import os
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from datetime import datetime
 import simplejson as json
 from botocore.exceptions import ClientError
 from clients import kinesis_client, logger
+from common.compact_encoding import encode_compact_message
+from logging_decorator import generate_and_send_logs
+from errors import KinesisSendError
 
+# PutRecords limits
+MAX_RECORDS_PER_PUT = 500
+MAX_BYTES_PER_PUT = 5 * 1024 * 1024
 
-def send_to_kinesis(supplier: str, message_body: dict, vaccine_type: str) -> bool:
-    """Send a message to the specified Kinesis stream. Returns a boolean indicating whether the send was successful."""
-    try:
-        kinesis_client.put_record(
-            StreamName=os.getenv("KINESIS_STREAM_NAME"),
-            StreamARN=os.getenv("KINESIS_STREAM_ARN"),
-            Data=json.dumps(message_body, ensure_ascii=False),
-            PartitionKey=f"{supplier}_{vaccine_type}",
-        )
-        return True
-    except ClientError as error:
-        logger.error("Error sending message to Kinesis: %s", error)
-        raise
+MAX_PUT_ATTEMPTS = 5
+RETRY_BASE_DELAY_SECONDS = 0.1
+
+
+def _encode_message(message_body: dict) -> bytes:
+    if os.getenv("KINESIS_COMPACT_ENCODING", "false").lower() == "true":
+        return encode_compact_message(message_body)
+    return json.dumps(message_body, ensure_ascii=False).encode("utf-8")
+
+
+class KinesisBatchWriter:
+    """
+    Buffers messages and sends them to the Kinesis stream with PutRecords, up to MAX_RECORDS_PER_PUT records or
+    MAX_BYTES_PER_PUT bytes at a time. Only the records which fail are retried, with backoff.
+    Kinesis only keeps the order of the records within one PutRecords call if none of them fail, so the buffer is sent
+    before adding a message with the same local_id as one already in it. That way the rows for each unique id are
+    still received by the forwarder in file order.
+    Each batch is sent by a background thread, so that more rows can be converted meanwhile. Only one batch is sent at
+    a time, keeping them in order, and at most one more is buffered, capping the memory used.
+    Use as a context manager, so that the remaining messages are sent, and the throughput is logged, at the end.
+    """
+
+    def __init__(self, file_key: str = None):
+        self.file_key = file_key
+        self.entries = []
+        self.entries_size = 0
+        self.buffered_local_ids = set()
+        self.records_sent = 0
+        self.records_retried = 0
+        self.put_records_calls = 0
+        self.start_time = time.time()
+        self.sender = ThreadPoolExecutor(max_workers=1)
+        self.sending: Future = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        # The rows read before any error are still sent, as they would have been when sent one at a time
+        try:
+            self.flush()
+            self.wait_for_sending()
+        finally:
+            self.sender.shutdown()
+        if exc_type is None:
+            self.log_throughput()
+
+    def send(self, supplier: str, message_body: dict, vaccine_type: str) -> None:
+        """Adds the message to the buffer, sending the buffer first if the message can't be added to it"""
+        entry = {"Data": _encode_message(message_body), "PartitionKey": f"{supplier}_{vaccine_type}"}
+        entry_size = len(entry["Data"]) + len(entry["PartitionKey"])
+        local_id = message_body.get("local_id")
+
+        if (
+            len(self.entries) >= MAX_RECORDS_PER_PUT
+            or self.entries_size + entry_size > MAX_BYTES_PER_PUT
+            or local_id in self.buffered_local_ids
+        ):
+            self.flush()
+
+        self.entries.append(entry)
+        self.entries_size += entry_size
+        self.buffered_local_ids.add(local_id)
+
+    def flush(self) -> None:
+        """
+        Starts sending the buffered messages, once the previous batch has been sent.
+        Raises an error if any messages in the previous batch couldn't be sent.
+        """
+        if not self.entries:
+            return
+        self.wait_for_sending()
+        self.sending = self.sender.submit(self._put_records, self.entries)
+        self.entries = []
+        self.entries_size = 0
+        self.buffered_local_ids = set()
+
+    def wait_for_sending(self) -> None:
+        """Waits for the batch being sent, raising an error if any of its messages couldn't be sent"""
+        if self.sending is not None:
+            sending, self.sending = self.sending, None
+            sending.result()
+
+    def _put_records(self, entries: list[dict]) -> None:
+        """Sends the entries, retrying those which fail. Raises an error if any can't be sent."""
+        attempt = 0
+        while entries:
+            try:
+                self.put_records_calls += 1
+                response = kinesis_client.put_records(
+                    StreamName=os.getenv("KINESIS_STREAM_NAME"),
+                    StreamARN=os.getenv("KINESIS_STREAM_ARN"),
+                    Records=entries,
+                )
+            except ClientError as error:
+                logger.error("Error sending messages to Kinesis: %s", error)
+                raise
+
+            failed_entries = [
+                entry for entry, result in zip(entries, response["Records"]) if result.get("ErrorCode")
+            ]
+            self.records_sent += len(entries) - len(failed_entries)
+            if not failed_entries:
+                return
+
+            attempt += 1
+            if attempt >= MAX_PUT_ATTEMPTS:
+                error_codes = {result["ErrorCode"] for result in response["Records"] if result.get("ErrorCode")}
+                raise KinesisSendError(f"{len(failed_entries)} messages could not be sent to Kinesis: {error_codes}")
+            logger.info("Retrying %s messages which could not be sent to Kinesis", len(failed_entries))
+            self.records_retried += len(failed_entries)
+            time.sleep(RETRY_BASE_DELAY_SECONDS * 2 ** (attempt - 1))
+            entries = failed_entries
+
+    def log_throughput(self) -> None:
+        """Sends the throughput of the writer to Cloudwatch and Firehose"""
+        time_taken = time.time() - self.start_time
+        base_log_data = {
+            "function_name": "record_processor_send_to_kinesis",
+            "date_time": str(datetime.now()),
+            "file_key": self.file_key,
+        }
+        additional_log_data = {
+            "records_sent": self.records_sent,
+            "records_retried": self.records_retried,
+            "put_records_calls": self.put_records_calls,
+            "records_per_second": round(self.records_sent / time_taken, 2) if time_taken else self.records_sent,
+        }
+        generate_and_send_logs(self.start_time, base_log_data, additional_log_data)
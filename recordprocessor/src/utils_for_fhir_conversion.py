@@ -5,6 +5,11 @@ from datetime import datetime
 from decimal import Decimal, InvalidOperation
 from constants import Urls
 
+DATE_PATTERN = re.compile(r"\d{8}")
+DATE_TIME_WITHOUT_TIMEZONE_PATTERN = re.compile(r"\d{8}T\d{6}")
+DATE_TIME_UTC_PATTERN = re.compile(r"\d{8}T\d{6}00")
+DATE_TIME_BST_PATTERN = re.compile(r"\d{8}T\d{6}01")
+
 
 def _is_not_empty(value: any) -> bool:
     """
@@ -31,9 +36,9 @@ class Convert:
         if not isinstance(date_time, str):
             return date_time
 
-        is_date_time_without_timezone = re.compile(r"\d{8}T\d{6}").fullmatch(date_time)
-        is_date_time_utc = re.compile(r"\d{8}T\d{6}00").fullmatch(date_time)
-        is_date_time_bst = re.compile(r"\d{8}T\d{6}01").fullmatch(date_time)
+        is_date_time_without_timezone = DATE_TIME_WITHOUT_TIMEZONE_PATTERN.fullmatch(date_time)
+        is_date_time_utc = DATE_TIME_UTC_PATTERN.fullmatch(date_time)
+        is_date_time_bst = DATE_TIME_BST_PATTERN.fullmatch(date_time)
 
         if not (is_date_time_without_timezone or is_date_time_utc or is_date_time_bst):
             return date_time
@@ -57,7 +62,7 @@ class Convert:
         in the specified format of "YYYYMMDD". Otherwise returns the original value.
         """
         # Date cannot be converted if it is not a string of eight digits
-        if not isinstance(date, str) or not re.compile(r"\d{8}").fullmatch(date):
+        if not isinstance(date, str) or not DATE_PATTERN.fullmatch(date):
             return date
 
         try:
@@ -3,8 +3,8 @@
 import os
 import json
 from csv import DictReader
-from io import TextIOWrapper
-from clients import s3_client, lambda_client, logger
+from clients import lambda_client, logger
+from s3_line_reader import S3LineReader
 from constants import SOURCE_BUCKET_NAME, FILE_NAME_PROC_LAMBDA_NAME
 
 
@@ -15,12 +15,17 @@ def get_environment() -> str:
     return _env if _env in ["internal-dev", "int", "ref", "sandbox", "prod"] else "internal-dev"
 
 
-def get_csv_content_dict_reader(file_key: str) -> DictReader:
-    """Returns the requested file contents from the source bucket in the form of a DictReader"""
-    response = s3_client.get_object(Bucket=os.getenv("SOURCE_BUCKET_NAME"), Key=file_key)
-    binary_io = response["Body"]
-    text_io = TextIOWrapper(binary_io, encoding="utf-8", newline="")
-    return DictReader(text_io, delimiter="|")
+def get_csv_content_dict_reader(
+    file_key: str, start_offset: int = 0, fieldnames: list = None, end_offset: int = None
+) -> tuple[DictReader, S3LineReader]:
+    """
+    Returns the requested file contents from the source bucket in the form of a DictReader, along with the
+    S3LineReader which it reads the lines from. If a start_offset is given then the file is read from that byte
+    offset, and the fieldnames must be given as the headers will not be read. If an end_offset is given then the file
+    is only read up to that byte offset.
+    """
+    line_reader = S3LineReader(os.getenv("SOURCE_BUCKET_NAME"), file_key, start_offset, end_offset)
+    return DictReader(line_reader, fieldnames=fieldnames, delimiter="|"), line_reader
 
 
 def create_diagnostics_dictionary(error_type, status_code, error_message) -> dict:
@@ -12,16 +12,26 @@ from tests.utils_for_recordprocessor_tests.values_for_recordprocessor_tests impo
 from tests.utils_for_recordprocessor_tests.utils_for_recordprocessor_tests import (
     deserialize_dynamodb_types,
     add_entry_to_table,
+    generate_audit_table_status,
 )
 
 # Ensure environment variables are mocked before importing from src files
 with patch.dict("os.environ", MOCK_ENVIRONMENT_DICT):
     from constants import (
         AUDIT_TABLE_NAME,
+        AuditTableKeys,
         FileStatus,
     )
 
-    from audit_table import get_next_queued_file_details, change_audit_table_status_to_processed
+    from common.audit_table_client import get_next_queued_file_details
+    from audit_table import (
+        change_audit_table_status_to_processed,
+        create_file_shards,
+        get_file_checkpoint,
+        get_shard_message_id,
+        update_file_checkpoint,
+        set_file_expected_row_count,
+    )
     from clients import REGION_NAME
 
 
@@ -66,7 +76,10 @@ class TestAuditTable(TestCase):
 
         # Test case 3: one queued file in the ravs_rsv queue
         add_entry_to_table(MockFileDetails.ravs_rsv_2, file_status=FileStatus.QUEUED)
-        expected_table_entry = {**MockFileDetails.ravs_rsv_2.audit_table_entry, "status": {"S": FileStatus.QUEUED}}
+        expected_table_entry = {
+            **MockFileDetails.ravs_rsv_2.audit_table_entry,
+            **generate_audit_table_status(MockFileDetails.ravs_rsv_2, FileStatus.QUEUED),
+        }
         self.assertEqual(get_next_queued_file_details(queue_to_check), deserialize_dynamodb_types(expected_table_entry))
 
         # # Test case 4: multiple queued files in the RAVS_RSV queue
@@ -75,6 +88,14 @@ class TestAuditTable(TestCase):
         add_entry_to_table(MockFileDetails.ravs_rsv_4, file_status=FileStatus.QUEUED)
         self.assertEqual(get_next_queued_file_details(queue_to_check), deserialize_dynamodb_types(expected_table_entry))
 
+        # Test case 5: the oldest queued file is no longer queued, so the next oldest is the first in the queue
+        add_entry_to_table(MockFileDetails.ravs_rsv_2, file_status=FileStatus.PROCESSING)
+        expected_table_entry = {
+            **MockFileDetails.ravs_rsv_3.audit_table_entry,
+            **generate_audit_table_status(MockFileDetails.ravs_rsv_3, FileStatus.QUEUED),
+        }
+        self.assertEqual(get_next_queued_file_details(queue_to_check), deserialize_dynamodb_types(expected_table_entry))
+
     def test_change_audit_table_status_to_processed(self):
         """Checks audit table correctly updates a record as processed"""
         # Test case 1: file should be updated with status of 'Processed'.
@@ -83,12 +104,16 @@ class TestAuditTable(TestCase):
         add_entry_to_table(MockFileDetails.flu_emis, file_status=FileStatus.QUEUED)
         table_items = dynamodb_client.scan(TableName=AUDIT_TABLE_NAME).get("Items", [])
 
-        expected_table_entry = {**MockFileDetails.rsv_ravs.audit_table_entry, "status": {"S": FileStatus.PROCESSED}}
+        expected_table_entry = {
+            **MockFileDetails.rsv_ravs.audit_table_entry,
+            **generate_audit_table_status(MockFileDetails.rsv_ravs, FileStatus.PROCESSED),
+        }
         ravs_rsv_test_file = FileDetails("RSV", "RAVS", "X26")
         file_key = ravs_rsv_test_file.file_key
         message_id = ravs_rsv_test_file.message_id_order
+        created_at_formatted_string = ravs_rsv_test_file.created_at_formatted_string
 
-        change_audit_table_status_to_processed(file_key, message_id)
+        change_audit_table_status_to_processed(file_key, message_id, created_at_formatted_string)
         table_items = dynamodb_client.scan(TableName=AUDIT_TABLE_NAME).get("Items", [])
 
         self.assertIn(expected_table_entry, table_items)
@@ -99,10 +124,79 @@ class TestAuditTable(TestCase):
         message_id = emis_flu_test_file_2.message_id
         file_key = (emis_flu_test_file_2.file_key,)
         with self.assertRaises(UnhandledAuditTableError):
-            change_audit_table_status_to_processed(file_key, message_id)
+            change_audit_table_status_to_processed(file_key, message_id, created_at_formatted_string)
 
         # Test case 3: # Audit table status should updated to processed for all values.
         message_id = emis_flu_test_file_2.message_id_order
         file_key = emis_flu_test_file_2.file_key
-        change_audit_table_status_to_processed(file_key, message_id)
+        change_audit_table_status_to_processed(file_key, message_id, emis_flu_test_file_2.created_at_formatted_string)
         table_items = dynamodb_client.scan(TableName=AUDIT_TABLE_NAME).get("Items", [])
+
+    def test_get_and_update_file_checkpoint(self):
+        """Checks that the checkpoint written for a file is returned, and that no checkpoint is returned before then"""
+        add_entry_to_table(FILE_DETAILS, file_status=FileStatus.PROCESSING)
+        message_id = FILE_DETAILS.message_id_order
+
+        self.assertIsNone(get_file_checkpoint(message_id))
+
+        update_file_checkpoint(message_id, 5000, 1234567)
+        self.assertEqual(get_file_checkpoint(message_id), {"row_count": 5000, "byte_offset": 1234567})
+
+        # The audit table entry is otherwise unchanged
+        table_entry = dynamodb_client.get_item(
+            TableName=AUDIT_TABLE_NAME, Key={AuditTableKeys.MESSAGE_ID: {"S": message_id}}
+        )["Item"]
+        self.assertEqual(table_entry[AuditTableKeys.STATUS], {"S": FileStatus.PROCESSING})
+
+    def test_create_file_shards(self):
+        """
+        Checks that a checkpoint is written for the start of each shard of the file, and that the checkpoint of the
+        file gives the rows at which the shards start
+        """
+        add_entry_to_table(FILE_DETAILS, file_status=FileStatus.PROCESSING)
+        message_id = FILE_DETAILS.message_id_order
+        update_file_checkpoint(message_id, 0, 100)
+        shards = [
+            {"start_offset": 100, "end_offset": 5000, "start_row": 0, "row_count": 40},
+            {"start_offset": 5000, "end_offset": 9000, "start_row": 40, "row_count": 35},
+        ]
+
+        create_file_shards(message_id, shards, 75)
+
+        self.assertEqual(
+            get_file_checkpoint(message_id), {"row_count": 0, "byte_offset": 100, "shard_start_rows": [0, 40]}
+        )
+        self.assertEqual(
+            get_file_checkpoint(get_shard_message_id(message_id, 1)),
+            {"row_count": 40, "byte_offset": 5000, "end_offset": 9000},
+        )
+        table_entry = dynamodb_client.get_item(
+            TableName=AUDIT_TABLE_NAME, Key={AuditTableKeys.MESSAGE_ID: {"S": message_id}}
+        )["Item"]
+        self.assertEqual(table_entry[AuditTableKeys.EXPECTED_ROW_COUNT], {"N": "75"})
+
+    def test_update_file_checkpoint_without_audit_table_entry(self):
+        """Checks that a checkpoint for a file which is not in the audit table is not written, nor raised"""
+        update_file_checkpoint("unknown_message_id", 5000, 1234567)
+
+        self.assertEqual(self.get_table_items(), [])
+
+    def test_set_file_expected_row_count(self):
+        """Checks that the expected row count is recorded in the audit table entry for the file"""
+        add_entry_to_table(FILE_DETAILS, file_status=FileStatus.PROCESSING)
+        message_id = FILE_DETAILS.message_id_order
+
+        set_file_expected_row_count(message_id, 12345)
+
+        table_entry = dynamodb_client.get_item(
+            TableName=AUDIT_TABLE_NAME, Key={AuditTableKeys.MESSAGE_ID: {"S": message_id}}
+        )["Item"]
+        self.assertEqual(table_entry[AuditTableKeys.EXPECTED_ROW_COUNT], {"N": "12345"})
+        self.assertEqual(table_entry[AuditTableKeys.STATUS], {"S": FileStatus.PROCESSING})
+
+    def test_set_file_expected_row_count_without_audit_table_entry(self):
+        """Checks that an UnhandledAuditTableError is raised if the file is not in the audit table"""
+        with self.assertRaises(UnhandledAuditTableError):
+            set_file_expected_row_count("unknown_message_id", 12345)
+
+        self.assertEqual(self.get_table_items(), [])
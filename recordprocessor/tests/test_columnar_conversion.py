@@ -0,0 +1,69 @@
+"""Tests for the columnar_conversion module"""
+
+import unittest
+from unittest.mock import patch
+import simplejson as json
+
+from tests.utils_for_recordprocessor_tests.values_for_recordprocessor_tests import (
+    MockFieldDictionaries,
+    TargetDiseaseElements,
+)
+from tests.utils_for_recordprocessor_tests.mock_environment_variables import MOCK_ENVIRONMENT_DICT
+
+with patch("os.environ", MOCK_ENVIRONMENT_DICT):
+    from columnar_conversion import convert_columns, PreConverted
+    from convert_to_fhir_imms_resource import convert_to_fhir_imms_resource
+
+# Values for the converted columns, including values which can't be converted and empty values
+COLUMN_VALUES = {
+    "PERSON_DOB": ["20080217", "20080217", "2008-02-17", "20081317", ""],
+    "PERSON_GENDER_CODE": ["1", "2", "9", "0", "X"],
+    "DATE_AND_TIME": ["20240904T183325", "20240904T18332500", "20240904T18332501", "20240904T183399", ""],
+    "PRIMARY_SOURCE": ["TRUE", "false", "True", "maybe", ""],
+    "RECORDED_DATE": ["20240904", "20240904", "20240231", "not a date", ""],
+    "EXPIRY_DATE": ["20241231", "", "20241231", "2024123", "20250101"],
+    "DOSE_SEQUENCE": ["1", "0", "one", "", "1.5"],
+    "DOSE_AMOUNT": ["0.5", "1", "1.0", "", "abc"],
+}
+
+
+class TestConvertColumns(unittest.TestCase):
+    """Tests for convert_columns"""
+
+    def setUp(self) -> None:
+        self.rows = [
+            {
+                **MockFieldDictionaries.all_fields,
+                **{column_name: values[index] for column_name, values in COLUMN_VALUES.items()},
+            }
+            for index in range(5)
+        ]
+        self.rows.append(MockFieldDictionaries.mandatory_fields_only)
+        self.rows.append(MockFieldDictionaries.critical_fields_only)
+
+    def test_convert_columns_gives_the_same_resources(self):
+        """it should give the same FHIR resources, to the byte, as converting each row separately"""
+        target_disease = TargetDiseaseElements.RSV
+
+        expected_resources = [convert_to_fhir_imms_resource(row, target_disease) for row in self.rows]
+        resources = [
+            convert_to_fhir_imms_resource(row, target_disease, PreConverted) for row in convert_columns(self.rows)
+        ]
+
+        self.assertEqual(
+            [json.dumps(resource) for resource in resources],
+            [json.dumps(resource) for resource in expected_resources],
+        )
+
+    def test_convert_columns_does_not_change_rows(self):
+        """it should return converted copies of the rows, leaving the rows and the unconverted columns unchanged"""
+        rows = [{"PERSON_DOB": "20080217", "PERSON_FORENAME": "PHYLIS"}]
+
+        converted_rows = convert_columns(rows)
+
+        self.assertEqual(converted_rows, [{"PERSON_DOB": "2008-02-17", "PERSON_FORENAME": "PHYLIS"}])
+        self.assertEqual(rows, [{"PERSON_DOB": "20080217", "PERSON_FORENAME": "PHYLIS"}])
+
+
+if __name__ == "__main__":
+    unittest.main()
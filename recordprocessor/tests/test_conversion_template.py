@@ -0,0 +1,58 @@
+"""Tests for the conversion_template module"""
+
+import random
+import unittest
+from unittest.mock import patch
+import simplejson as json
+
+from tests.utils_for_recordprocessor_tests.values_for_recordprocessor_tests import (
+    MockFieldDictionaries,
+    TargetDiseaseElements,
+)
+from tests.utils_for_recordprocessor_tests.mock_environment_variables import MOCK_ENVIRONMENT_DICT
+
+with patch("os.environ", MOCK_ENVIRONMENT_DICT):
+    from conversion_template import ConversionTemplate
+    from columnar_conversion import convert_columns, PreConverted
+    from convert_to_fhir_imms_resource import convert_to_fhir_imms_resource
+
+
+class TestConversionTemplate(unittest.TestCase):
+    """Tests for ConversionTemplate"""
+
+    def setUp(self) -> None:
+        all_fields = MockFieldDictionaries.all_fields
+        random_generator = random.Random(0)
+
+        # Rows with each field empty in turn, and rows with random combinations of fields empty or missing
+        self.rows = [MockFieldDictionaries.mandatory_fields_only, MockFieldDictionaries.critical_fields_only]
+        self.rows += [{**all_fields, field: ""} for field in all_fields]
+        for _ in range(500):
+            row = {field: value for field, value in all_fields.items() if random_generator.random() > 0.1}
+            self.rows.append({field: value if random_generator.random() > 0.5 else "" for field, value in row.items()})
+
+    def test_convert_row_gives_the_same_resources(self):
+        """it should give the same FHIR resources, to the byte, as convert_to_fhir_imms_resource"""
+        template = ConversionTemplate(TargetDiseaseElements.RSV)
+
+        for row in self.rows:
+            with self.subTest(row=row):
+                self.assertEqual(
+                    json.dumps(template.convert_row(row)),
+                    json.dumps(convert_to_fhir_imms_resource(row, TargetDiseaseElements.RSV)),
+                )
+
+    def test_convert_row_for_converted_columns(self):
+        """it should give the same FHIR resources for rows whose columns have already been converted"""
+        template = ConversionTemplate(TargetDiseaseElements.RSV, PreConverted)
+
+        resources = [template.convert_row(row) for row in convert_columns(self.rows)]
+
+        self.assertEqual(
+            [json.dumps(resource) for resource in resources],
+            [json.dumps(convert_to_fhir_imms_resource(row, TargetDiseaseElements.RSV)) for row in self.rows],
+        )
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,114 @@
+"""Tests for the file_sharding module"""
+
+import json
+import unittest
+from unittest.mock import patch
+import boto3
+from moto import mock_s3
+from tests.utils_for_recordprocessor_tests.utils_for_recordprocessor_tests import GenericSetUp, GenericTearDown
+from tests.utils_for_recordprocessor_tests.values_for_recordprocessor_tests import (
+    MockFileDetails,
+    MockUniqueIdUris,
+    ValidMockFileContent,
+    REGION_NAME,
+)
+from tests.utils_for_recordprocessor_tests.mock_environment_variables import MOCK_ENVIRONMENT_DICT, BucketNames
+
+with patch("os.environ", MOCK_ENVIRONMENT_DICT):
+    from constants import EXPECTED_CSV_HEADERS
+    from file_sharding import plan_file_shards, start_shard_tasks
+
+s3_client = boto3.client("s3", region_name=REGION_NAME)
+
+FILE_KEY = "processing/test_file_key.csv"
+HEADERS_LENGTH = len(ValidMockFileContent.headers) + 1
+
+
+def make_row(unique_id: str) -> str:
+    """Returns a row with only the UNIQUE_ID and UNIQUE_ID_URI given"""
+    values = {"UNIQUE_ID": unique_id, "UNIQUE_ID_URI": MockUniqueIdUris.RAVS}
+    return "|".join(values.get(header, "") for header in EXPECTED_CSV_HEADERS)
+
+
+@patch.dict("os.environ", MOCK_ENVIRONMENT_DICT)
+@patch("file_sharding.MIN_SHARD_SIZE_BYTES", 1)
+@mock_s3
+class TestPlanFileShards(unittest.TestCase):
+    """Tests for plan_file_shards"""
+
+    def setUp(self) -> None:
+        GenericSetUp(s3_client)
+
+    def tearDown(self) -> None:
+        GenericTearDown(s3_client)
+
+    @staticmethod
+    def upload_file(unique_ids: list[str]) -> int:
+        """Uploads a file with a row for each of the unique ids, and returns the length of each row"""
+        rows = [make_row(unique_id) for unique_id in unique_ids]
+        file_content = "\n".join([ValidMockFileContent.headers, *rows])
+        s3_client.put_object(Bucket=BucketNames.SOURCE, Key=FILE_KEY, Body=file_content)
+        return len(rows[0]) + 1
+
+    @patch("file_sharding.MAX_FILE_SHARDS", 3)
+    def test_plan_file_shards(self):
+        """it should split the file into shards of similar sizes, keeping the rows with the same identifier together"""
+        row_length = self.upload_file(["A", "B", "A", "C", "D", "D"])
+
+        shards = plan_file_shards(FILE_KEY, HEADERS_LENGTH)
+
+        # The first shard can't end after the second row, as the third row has the same identifier as the first
+        row_end_offsets = [HEADERS_LENGTH + row_count * row_length for row_count in range(7)]
+        file_size = row_end_offsets[6] - 1  # The last row has no line ending
+        self.assertEqual(
+            shards,
+            [
+                {"start_offset": HEADERS_LENGTH, "end_offset": row_end_offsets[3], "start_row": 0, "row_count": 3},
+                {"start_offset": row_end_offsets[3], "end_offset": row_end_offsets[4], "start_row": 3, "row_count": 1},
+                {"start_offset": row_end_offsets[4], "end_offset": file_size, "start_row": 4, "row_count": 2},
+            ],
+        )
+
+    @patch("file_sharding.MAX_FILE_SHARDS", 3)
+    def test_plan_file_shards_not_split(self):
+        """it should not split the file if the rows with the same identifier span the whole file"""
+        self.upload_file(["A", "B", "C", "A"])
+
+        self.assertEqual(plan_file_shards(FILE_KEY, HEADERS_LENGTH), [])
+
+    def test_plan_file_shards_disabled(self):
+        """it should not split the file, or read it, if MAX_FILE_SHARDS is 1"""
+        with patch("file_sharding.get_csv_content_dict_reader") as mock_get_csv_content_dict_reader:
+            self.assertEqual(plan_file_shards(FILE_KEY, HEADERS_LENGTH), [])
+
+        mock_get_csv_content_dict_reader.assert_not_called()
+
+
+@patch.dict("os.environ", MOCK_ENVIRONMENT_DICT)
+class TestStartShardTasks(unittest.TestCase):
+    """Tests for start_shard_tasks"""
+
+    @patch("file_sharding.ecs_client")
+    def test_start_shard_tasks(self, mock_ecs_client):
+        """
+        it should run a task for each shard, with the event details for its shard, and return the shards for which a
+        task could not be started
+        """
+        event = MockFileDetails.rsv_emis.event_full_permissions_dict
+        mock_ecs_client.run_task.side_effect = [
+            {"tasks": [{"taskArn": "task_1"}], "failures": []},
+            {"tasks": [], "failures": [{"reason": "RESOURCE:CPU"}]},
+            Exception("Unable to run task"),
+        ]
+
+        self.assertEqual(start_shard_tasks(event, [1, 2, 3]), [2, 3])
+
+        container_override = mock_ecs_client.run_task.call_args_list[0].kwargs["overrides"]["containerOverrides"][0]
+        self.assertEqual(
+            container_override["environment"],
+            [{"name": "EVENT_DETAILS", "value": json.dumps({**event, "shard_index": 1})}],
+        )
+
+
+if __name__ == "__main__":
+    unittest.main()
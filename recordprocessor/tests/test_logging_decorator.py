@@ -13,7 +13,6 @@ from tests.utils_for_recordprocessor_tests.values_for_recordprocessor_tests impo
 from tests.utils_for_recordprocessor_tests.mock_environment_variables import (
     MOCK_ENVIRONMENT_DICT,
     BucketNames,
-    Firehose,
 )
 
 with patch.dict("os.environ", MOCK_ENVIRONMENT_DICT):
@@ -63,6 +62,7 @@ class TestLoggingDecorator(unittest.TestCase):
         common_patches = [
             patch("file_level_validation.change_audit_table_status_to_processed"),
             patch("file_level_validation.get_next_queued_file_details", return_value=None),
+            patch("file_level_validation.release_queue_lease"),
         ]
 
         with ExitStack() as stack:
@@ -72,19 +72,14 @@ class TestLoggingDecorator(unittest.TestCase):
 
     def test_send_log_to_firehose(self):
         """
-        Tests that the send_log_to_firehose function calls firehose_client.put_record with the correct arguments.
-        NOTE: mock_firehose does not persist the data, so at this level it is only possible to test what the call args
-        were, not that the data reached the destination.
+        Tests that the send_log_to_firehose function adds the log to the logs to be sent to Firehose, as an event.
         """
         log_data = {"test_key": "test_value"}
 
-        with patch("logging_decorator.firehose_client") as mock_firehose_client:
+        with patch("logging_decorator.firehose_logger") as mock_firehose_logger:
             send_log_to_firehose(log_data)
 
-        expected_firehose_record = {"Data": json.dumps({"event": log_data}).encode("utf-8")}
-        mock_firehose_client.put_record.assert_called_once_with(
-            DeliveryStreamName=Firehose.STREAM_NAME, Record=expected_firehose_record
-        )
+        mock_firehose_logger.send_log.assert_called_once_with({"event": log_data})
 
     def test_generate_and_send_logs(self):
         """
@@ -136,7 +131,7 @@ class TestLoggingDecorator(unittest.TestCase):
             patch("logging_decorator.datetime") as mock_datetime,  # noqa: E999
             patch("logging_decorator.time") as mock_time,  # noqa: E999
             patch("logging_decorator.logger") as mock_logger,  # noqa: E999
-            patch("logging_decorator.firehose_client") as mock_firehose_client,  # noqa: E999
+            patch("logging_decorator.firehose_logger") as mock_firehose_logger,  # noqa: E999
         ):  # noqa: E999
             mock_time.time.side_effect = [1672531200, 1672531200.123456]
             mock_datetime.now.return_value = datetime(2024, 1, 1, 12, 0, 0)
@@ -149,10 +144,7 @@ class TestLoggingDecorator(unittest.TestCase):
         log_data = json.loads(mock_logger.info.call_args_list[0][0][0])
         self.assertEqual(log_data, expected_log_data)
 
-        expected_firehose_record = {"Data": json.dumps({"event": log_data}).encode("utf-8")}
-        mock_firehose_client.put_record.assert_called_once_with(
-            DeliveryStreamName=Firehose.STREAM_NAME, Record=expected_firehose_record
-        )
+        mock_firehose_logger.send_log.assert_called_once_with({"event": log_data})
 
     def test_splunk_logger_handled_failure(self):
         """Tests the splunk logger is called when file-level validation fails for a known reason"""
@@ -193,7 +185,7 @@ class TestLoggingDecorator(unittest.TestCase):
                     patch("logging_decorator.datetime") as mock_datetime,  # noqa: E999
                     patch("logging_decorator.time") as mock_time,  # noqa: E999
                     patch("logging_decorator.logger") as mock_logger,  # noqa: E999
-                    patch("logging_decorator.firehose_client") as mock_firehose_client,  # noqa: E999
+                    patch("logging_decorator.firehose_logger") as mock_firehose_logger,  # noqa: E999
                 ):  # noqa: E999
                     mock_datetime.now.return_value = datetime(2024, 1, 1, 12, 0, 0)
                     mock_time.time.side_effect = [1672531200, 1672531200.123456]
@@ -211,10 +203,7 @@ class TestLoggingDecorator(unittest.TestCase):
                 log_data = json.loads(mock_logger.error.call_args_list[0][0][0])
                 self.assertEqual(log_data, expected_log_data)
 
-                expected_firehose_record = {"Data": json.dumps({"event": log_data}).encode("utf-8")}
-                mock_firehose_client.put_record.assert_called_once_with(
-                    DeliveryStreamName=Firehose.STREAM_NAME, Record=expected_firehose_record
-                )
+                mock_firehose_logger.send_log.assert_called_once_with({"event": log_data})
 
     def test_splunk_logger_unhandled_failure(self):
         """Tests the splunk logger is called when file-level validation fails for an unknown reason"""
@@ -228,7 +217,7 @@ class TestLoggingDecorator(unittest.TestCase):
             patch("logging_decorator.datetime") as mock_datetime,  # noqa: E999
             patch("logging_decorator.time") as mock_time,  # noqa: E999
             patch("logging_decorator.logger") as mock_logger,  # noqa: E999
-            patch("logging_decorator.firehose_client") as mock_firehose_client,  # noqa: E999
+            patch("logging_decorator.firehose_logger") as mock_firehose_logger,  # noqa: E999
             patch(
                 "file_level_validation.validate_content_headers", side_effect=Exception("Test exception")
             ),  # noqa: E999
@@ -249,7 +238,4 @@ class TestLoggingDecorator(unittest.TestCase):
         log_data = json.loads(mock_logger.error.call_args_list[0][0][0])
         self.assertEqual(log_data, expected_log_data)
 
-        expected_firehose_record = {"Data": json.dumps({"event": log_data}).encode("utf-8")}
-        mock_firehose_client.put_record.assert_called_once_with(
-            DeliveryStreamName=Firehose.STREAM_NAME, Record=expected_firehose_record
-        )
+        mock_firehose_logger.send_log.assert_called_once_with({"event": log_data})
@@ -1,16 +1,18 @@
 """Tests for process_csv_to_fhir function"""
 import json
 import unittest
-from unittest.mock import patch
+from unittest.mock import patch, call
 from copy import deepcopy
 import boto3
-from moto import mock_s3, mock_firehose
+from moto import mock_s3, mock_firehose, mock_dynamodb
 from tests.utils_for_recordprocessor_tests.utils_for_recordprocessor_tests import (
     GenericSetUp,
     GenericTearDown,
 )
+from tests.utils_for_recordprocessor_tests import generic_setup_and_teardown
 from tests.utils_for_recordprocessor_tests.values_for_recordprocessor_tests import (
     MockFileDetails,
+    MockFileRows,
     ValidMockFileContent,
     REGION_NAME,
 )
@@ -18,21 +20,34 @@ from tests.utils_for_recordprocessor_tests.mock_environment_variables import MOC
 
 with patch("os.environ", MOCK_ENVIRONMENT_DICT):
     from batch_processing import process_csv_to_fhir
+    from common.audit_table_client import acquire_queue_lease, release_queue_lease
+    from errors import QueueLeaseLostError
+    from constants import AUDIT_TABLE_NAME, AuditTableKeys, FileStatus
 
 
 s3_client = boto3.client("s3", region_name=REGION_NAME)
 firehose_client = boto3.client("firehose", region_name=REGION_NAME)
+dynamodb_client = boto3.client("dynamodb", region_name=REGION_NAME)
 test_file = MockFileDetails.rsv_emis
 
 
 @patch.dict("os.environ", MOCK_ENVIRONMENT_DICT)
 @mock_s3
 @mock_firehose
+@mock_dynamodb
 class TestProcessCsvToFhir(unittest.TestCase):
     """Tests for process_csv_to_fhir function"""
 
     def setUp(self) -> None:
         GenericSetUp(s3_client, firehose_client)
+        generic_setup_and_teardown.GenericSetUp(dynamodb_client=dynamodb_client)
+        dynamodb_client.put_item(
+            TableName=AUDIT_TABLE_NAME,
+            Item={
+                AuditTableKeys.MESSAGE_ID: {"S": test_file.message_id},
+                AuditTableKeys.STATUS: {"S": FileStatus.PROCESSING},
+            },
+        )
 
         redis_patcher = patch("mappings.redis_client")
         self.addCleanup(redis_patcher.stop)
@@ -44,6 +59,7 @@ class TestProcessCsvToFhir(unittest.TestCase):
 
     def tearDown(self) -> None:
         GenericTearDown(s3_client, firehose_client)
+        generic_setup_and_teardown.GenericTearDown(dynamodb_client=dynamodb_client)
 
     @staticmethod
     def upload_source_file(file_key, file_content):
@@ -52,6 +68,23 @@ class TestProcessCsvToFhir(unittest.TestCase):
         """
         s3_client.put_object(Bucket=BucketNames.SOURCE, Key=file_key, Body=file_content)
 
+    @staticmethod
+    def get_checkpoint() -> dict:
+        """Returns the checkpoint attributes of the audit table entry for the test file"""
+        audit_table_entry = dynamodb_client.get_item(
+            TableName=AUDIT_TABLE_NAME, Key={AuditTableKeys.MESSAGE_ID: {"S": test_file.message_id}}
+        )["Item"]
+        return {
+            "row_count": int(audit_table_entry[AuditTableKeys.CHECKPOINT_ROW_COUNT]["N"]),
+            "byte_offset": int(audit_table_entry[AuditTableKeys.CHECKPOINT_BYTE_OFFSET]["N"]),
+        }
+
+    @staticmethod
+    def get_sent_row_ids(mock_kinesis_batch_writer) -> list[str]:
+        """Returns the row ids of the messages sent to kinesis"""
+        mock_send_to_kinesis = mock_kinesis_batch_writer.return_value.__enter__.return_value.send
+        return [call.args[1]["row_id"] for call in mock_send_to_kinesis.call_args_list]
+
     def test_process_csv_to_fhir_full_permissions(self):
         """
         Tests that process_csv_to_fhir sends a message to kinesis for each row in the csv when the supplier has full
@@ -61,9 +94,10 @@ class TestProcessCsvToFhir(unittest.TestCase):
             file_key=test_file.file_key, file_content=ValidMockFileContent.with_new_and_update_and_delete
         )
 
-        with patch("batch_processing.send_to_kinesis") as mock_send_to_kinesis:
+        with patch("batch_processing.KinesisBatchWriter") as mock_kinesis_batch_writer:
             process_csv_to_fhir(deepcopy(test_file.event_full_permissions_dict))
 
+        mock_send_to_kinesis = mock_kinesis_batch_writer.return_value.__enter__.return_value.send
         self.assertEqual(mock_send_to_kinesis.call_count, 3)
 
     def test_process_csv_to_fhir_partial_permissions(self):
@@ -75,18 +109,20 @@ class TestProcessCsvToFhir(unittest.TestCase):
             file_key=test_file.file_key, file_content=ValidMockFileContent.with_new_and_update_and_delete
         )
 
-        with patch("batch_processing.send_to_kinesis") as mock_send_to_kinesis:
+        with patch("batch_processing.KinesisBatchWriter") as mock_kinesis_batch_writer:
             process_csv_to_fhir(deepcopy(test_file.event_create_permissions_only_dict))
 
+        mock_send_to_kinesis = mock_kinesis_batch_writer.return_value.__enter__.return_value.send
         self.assertEqual(mock_send_to_kinesis.call_count, 3)
 
     def test_process_csv_to_fhir_no_permissions(self):
         """Tests that process_csv_to_fhir does not send fhir_json to kinesis when the supplier has no permissions"""
         self.upload_source_file(file_key=test_file.file_key, file_content=ValidMockFileContent.with_update_and_delete)
 
-        with patch("batch_processing.send_to_kinesis") as mock_send_to_kinesis:
+        with patch("batch_processing.KinesisBatchWriter") as mock_kinesis_batch_writer:
             process_csv_to_fhir(deepcopy(test_file.event_create_permissions_only_dict))
 
+        mock_send_to_kinesis = mock_kinesis_batch_writer.return_value.__enter__.return_value.send
         self.assertEqual(mock_send_to_kinesis.call_count, 2)
         for (_supplier, message_body, _vaccine), _kwargs in mock_send_to_kinesis.call_args_list:
             self.assertIn("diagnostics", message_body)
@@ -99,11 +135,222 @@ class TestProcessCsvToFhir(unittest.TestCase):
             file_content=ValidMockFileContent.with_new_and_update.replace("NHS_NUMBER", "NHS_NUMBERS"),
         )
 
-        with patch("batch_processing.send_to_kinesis") as mock_send_to_kinesis:
+        with patch("batch_processing.KinesisBatchWriter") as mock_kinesis_batch_writer:
             process_csv_to_fhir(deepcopy(test_file.event_full_permissions_dict))
 
+        mock_send_to_kinesis = mock_kinesis_batch_writer.return_value.__enter__.return_value.send
         self.assertEqual(mock_send_to_kinesis.call_count, 0)
 
+    @patch("batch_processing.CHECKPOINT_INTERVAL_ROWS", 2)
+    def test_process_csv_to_fhir_checkpoints(self):
+        """
+        Tests that process_csv_to_fhir checkpoints the rows sent after every CHECKPOINT_INTERVAL_ROWS rows, and at the
+        end of the file
+        """
+        file_content = ValidMockFileContent.with_new_and_update_and_delete
+        self.upload_source_file(file_key=test_file.file_key, file_content=file_content)
+        acquire_queue_lease(test_file.queue_name, test_file.message_id)
+
+        with (
+            patch("batch_processing.KinesisBatchWriter") as mock_kinesis_batch_writer,
+            patch("batch_processing.update_file_checkpoint") as mock_update_file_checkpoint,
+        ):
+            process_csv_to_fhir(deepcopy(test_file.event_full_permissions_dict))
+
+        mock_kinesis_writer = mock_kinesis_batch_writer.return_value.__enter__.return_value
+        mock_kinesis_writer.wait_for_sending.assert_called_once()
+        lines = [len(line.encode("utf-8")) + 1 for line in file_content.split("\n")]
+        self.assertEqual(
+            [call.args for call in mock_update_file_checkpoint.call_args_list],
+            [
+                (test_file.message_id, 0, lines[0]),
+                (test_file.message_id, 2, sum(lines[:3])),
+                (test_file.message_id, 3, len(file_content.encode("utf-8"))),
+            ],
+        )
+
+    @patch("batch_processing.CHECKPOINT_INTERVAL_ROWS", 2)
+    def test_process_csv_to_fhir_stops_when_lease_is_lost(self):
+        """
+        Tests that process_csv_to_fhir stops processing the file at a checkpoint, once the rows before it have been
+        sent, if the file's lease of the queue has been lost
+        """
+        file_content = ValidMockFileContent.with_new_and_update_and_delete
+        self.upload_source_file(file_key=test_file.file_key, file_content=file_content)
+        acquire_queue_lease(test_file.queue_name, test_file.message_id)
+        release_queue_lease(test_file.queue_name, test_file.message_id)
+
+        with patch("batch_processing.KinesisBatchWriter") as mock_kinesis_batch_writer:
+            with self.assertRaises(QueueLeaseLostError):
+                process_csv_to_fhir(deepcopy(test_file.event_full_permissions_dict))
+
+        mock_kinesis_writer = mock_kinesis_batch_writer.return_value.__enter__.return_value
+        self.assertEqual(mock_kinesis_writer.send.call_count, 2)
+        mock_kinesis_writer.wait_for_sending.assert_called_once()
+        lines = [len(line.encode("utf-8")) + 1 for line in file_content.split("\n")]
+        self.assertEqual(self.get_checkpoint(), {"row_count": 2, "byte_offset": sum(lines[:3])})
+
+    def test_process_csv_to_fhir_writes_checkpoint(self):
+        """Tests that process_csv_to_fhir checkpoints the file in the audit table once all rows are sent"""
+        file_content = ValidMockFileContent.with_new_and_update_and_delete
+        self.upload_source_file(file_key=test_file.file_key, file_content=file_content)
+
+        with patch("batch_processing.KinesisBatchWriter"):
+            process_csv_to_fhir(deepcopy(test_file.event_full_permissions_dict))
+
+        self.assertEqual(self.get_checkpoint(), {"row_count": 3, "byte_offset": len(file_content.encode("utf-8"))})
+
+    def test_process_csv_to_fhir_sets_expected_row_count(self):
+        """
+        Tests that process_csv_to_fhir records the number of rows in the audit table before the last row is sent to
+        kinesis, so that the rows can't all be acknowledged before the expected row count is known
+        """
+        self.upload_source_file(
+            file_key=test_file.file_key, file_content=ValidMockFileContent.with_new_and_update_and_delete
+        )
+
+        with (
+            patch("batch_processing.KinesisBatchWriter") as mock_kinesis_batch_writer,
+            patch("batch_processing.set_file_expected_row_count") as mock_set_file_expected_row_count,
+        ):
+            mock_kinesis_writer = mock_kinesis_batch_writer.return_value.__enter__.return_value
+            mock_kinesis_writer.attach_mock(mock_set_file_expected_row_count, "set_file_expected_row_count")
+            process_csv_to_fhir(deepcopy(test_file.event_full_permissions_dict))
+
+        mock_set_file_expected_row_count.assert_called_once_with(test_file.message_id, 3)
+        # The expected row count is set while the last row is still buffered, before the writer is exited
+        self.assertEqual(
+            mock_kinesis_writer.mock_calls[-1], call.set_file_expected_row_count(test_file.message_id, 3)
+        )
+        mock_kinesis_writer.flush.assert_not_called()
+
+        audit_table_entry = dynamodb_client.get_item(
+            TableName=AUDIT_TABLE_NAME, Key={AuditTableKeys.MESSAGE_ID: {"S": test_file.message_id}}
+        )["Item"]
+        self.assertNotIn(AuditTableKeys.EXPECTED_ROW_COUNT, audit_table_entry)
+
+    def test_process_csv_to_fhir_resumes_from_checkpoint(self):
+        """
+        Tests that process_csv_to_fhir resumes a partly processed file from the row after the checkpoint, reading it
+        from the processing folder
+        """
+        file_content = ValidMockFileContent.with_new_and_update_and_delete
+        self.upload_source_file(file_key=f"processing/{test_file.file_key}", file_content=file_content)
+        first_row_end = len("\n".join(file_content.split("\n")[:2]).encode("utf-8")) + 1
+        dynamodb_client.update_item(
+            TableName=AUDIT_TABLE_NAME,
+            Key={AuditTableKeys.MESSAGE_ID: {"S": test_file.message_id}},
+            UpdateExpression="SET checkpoint_row_count = :row_count, checkpoint_byte_offset = :byte_offset",
+            ExpressionAttributeValues={":row_count": {"N": "1"}, ":byte_offset": {"N": str(first_row_end)}},
+        )
+
+        with patch("batch_processing.KinesisBatchWriter") as mock_kinesis_batch_writer:
+            process_csv_to_fhir(deepcopy(test_file.event_full_permissions_dict))
+
+        mock_send_to_kinesis = mock_kinesis_batch_writer.return_value.__enter__.return_value.send
+        sent_message_bodies = [call.args[1] for call in mock_send_to_kinesis.call_args_list]
+        self.assertEqual(
+            [message_body["row_id"] for message_body in sent_message_bodies],
+            [f"{test_file.message_id}^2", f"{test_file.message_id}^3"],
+        )
+        self.assertEqual(
+            [message_body["operation_requested"] for message_body in sent_message_bodies], ["UPDATE", "DELETE"]
+        )
+        self.assertEqual(self.get_checkpoint(), {"row_count": 3, "byte_offset": len(file_content.encode("utf-8"))})
+
+    @patch("file_sharding.MAX_FILE_SHARDS", 2)
+    @patch("file_sharding.MIN_SHARD_SIZE_BYTES", 1)
+    def test_process_csv_to_fhir_splits_file_into_shards(self):
+        """
+        Tests that process_csv_to_fhir splits a large file into shards, keeping the rows with the same UNIQUE_ID in
+        the same shard, processes the first shard and starts a task for the other, and that the task for the other
+        shard processes only its rows, numbering them from the end of the first shard
+        """
+        file_content = "\n".join(
+            [ValidMockFileContent.headers, MockFileRows.UPDATE, MockFileRows.DELETE, MockFileRows.NEW]
+        )
+        self.upload_source_file(file_key=test_file.file_key, file_content=file_content)
+        event = test_file.event_full_permissions_dict
+
+        with (
+            patch("batch_processing.KinesisBatchWriter") as mock_kinesis_batch_writer,
+            patch("batch_processing.start_shard_tasks", return_value=[]) as mock_start_shard_tasks,
+        ):
+            process_csv_to_fhir(deepcopy(event))
+
+        mock_start_shard_tasks.assert_called_once_with(event, [1])
+        self.assertEqual(
+            self.get_sent_row_ids(mock_kinesis_batch_writer), [f"{test_file.message_id}^{i}" for i in (1, 2)]
+        )
+        audit_table_entry = dynamodb_client.get_item(
+            TableName=AUDIT_TABLE_NAME, Key={AuditTableKeys.MESSAGE_ID: {"S": test_file.message_id}}
+        )["Item"]
+        self.assertEqual(audit_table_entry[AuditTableKeys.EXPECTED_ROW_COUNT], {"N": "3"})
+        self.assertEqual(audit_table_entry[AuditTableKeys.SHARD_START_ROWS], {"L": [{"N": "0"}, {"N": "2"}]})
+
+        with patch("batch_processing.KinesisBatchWriter") as mock_kinesis_batch_writer:
+            process_csv_to_fhir({**deepcopy(event), "shard_index": 1})
+
+        self.assertEqual(self.get_sent_row_ids(mock_kinesis_batch_writer), [f"{test_file.message_id}^3"])
+
+    @patch("file_sharding.MAX_FILE_SHARDS", 2)
+    @patch("file_sharding.MIN_SHARD_SIZE_BYTES", 1)
+    def test_process_csv_to_fhir_processes_shards_without_task(self):
+        """Tests that process_csv_to_fhir processes the shards for which a task could not be started itself"""
+        file_content = "\n".join(
+            [ValidMockFileContent.headers, MockFileRows.UPDATE, MockFileRows.DELETE, MockFileRows.NEW]
+        )
+        self.upload_source_file(file_key=test_file.file_key, file_content=file_content)
+
+        with (
+            patch("batch_processing.KinesisBatchWriter") as mock_kinesis_batch_writer,
+            patch("batch_processing.start_shard_tasks", return_value=[1]),
+        ):
+            process_csv_to_fhir(deepcopy(test_file.event_full_permissions_dict))
+
+        self.assertEqual(
+            self.get_sent_row_ids(mock_kinesis_batch_writer), [f"{test_file.message_id}^{i}" for i in (1, 2, 3)]
+        )
+
+    @patch("file_sharding.MAX_FILE_SHARDS", 2)
+    @patch("file_sharding.MIN_SHARD_SIZE_BYTES", 1)
+    def test_process_csv_to_fhir_resumes_unfinished_shards(self):
+        """
+        Tests that process_csv_to_fhir resumes a file split into shards by starting a task again for each shard, other
+        than the first, which hasn't been fully sent, and processing any for which a task could not be started itself
+        """
+        file_content = "\n".join(
+            [ValidMockFileContent.headers, MockFileRows.UPDATE, MockFileRows.DELETE, MockFileRows.NEW]
+        )
+        self.upload_source_file(file_key=test_file.file_key, file_content=file_content)
+        event = test_file.event_full_permissions_dict
+
+        # The first shard is sent, and the task started for the other shard never processes it
+        with (
+            patch("batch_processing.KinesisBatchWriter"),
+            patch("batch_processing.start_shard_tasks", return_value=[]),
+        ):
+            process_csv_to_fhir(deepcopy(event))
+
+        with (
+            patch("batch_processing.KinesisBatchWriter") as mock_kinesis_batch_writer,
+            patch("batch_processing.start_shard_tasks", return_value=[1]) as mock_start_shard_tasks,
+        ):
+            process_csv_to_fhir(deepcopy(event))
+
+        mock_start_shard_tasks.assert_called_once_with(event, [1])
+        self.assertEqual(self.get_sent_row_ids(mock_kinesis_batch_writer), [f"{test_file.message_id}^3"])
+
+        # Once every shard has been sent, resuming the file sends no rows and starts no tasks
+        with (
+            patch("batch_processing.KinesisBatchWriter") as mock_kinesis_batch_writer,
+            patch("batch_processing.start_shard_tasks", return_value=[]) as mock_start_shard_tasks,
+        ):
+            process_csv_to_fhir(deepcopy(event))
+
+        mock_start_shard_tasks.assert_called_once_with(event, [])
+        mock_kinesis_batch_writer.assert_not_called()
+
 
 if __name__ == "__main__":
     unittest.main()
@@ -4,8 +4,8 @@ import unittest
 import json
 from decimal import Decimal
 from unittest.mock import patch
-from datetime import datetime, timedelta, timezone
-from moto import mock_s3, mock_kinesis, mock_firehose
+from datetime import datetime
+from moto import mock_s3, mock_kinesis, mock_firehose, mock_dynamodb
 from boto3 import client as boto3_client
 
 from tests.utils_for_recordprocessor_tests.utils_for_recordprocessor_tests import (
@@ -23,15 +23,17 @@ from tests.utils_for_recordprocessor_tests.values_for_recordprocessor_tests impo
     REGION_NAME,
 )
 from tests.utils_for_recordprocessor_tests.mock_environment_variables import MOCK_ENVIRONMENT_DICT, BucketNames, Kinesis
+from tests.utils_for_recordprocessor_tests import generic_setup_and_teardown
 
 with patch("os.environ", MOCK_ENVIRONMENT_DICT):
     from constants import Diagnostics
     from batch_processing import main
+    from constants import AUDIT_TABLE_NAME, AuditTableKeys, FileStatus
 
 s3_client = boto3_client("s3", region_name=REGION_NAME)
+dynamodb_client = boto3_client("dynamodb", region_name=REGION_NAME)
 kinesis_client = boto3_client("kinesis", region_name=REGION_NAME)
 firehose_client = boto3_client("firehose", region_name=REGION_NAME)
-yesterday = datetime.now(timezone.utc) - timedelta(days=1)
 mock_rsv_emis_file = MockFileDetails.rsv_emis
 
 
@@ -39,11 +41,20 @@ mock_rsv_emis_file = MockFileDetails.rsv_emis
 @mock_s3
 @mock_kinesis
 @mock_firehose
+@mock_dynamodb
 class TestRecordProcessor(unittest.TestCase):
     """Tests for main function for RecordProcessor"""
 
     def setUp(self) -> None:
         GenericSetUp(s3_client, firehose_client, kinesis_client)
+        generic_setup_and_teardown.GenericSetUp(dynamodb_client=dynamodb_client)
+        dynamodb_client.put_item(
+            TableName=AUDIT_TABLE_NAME,
+            Item={
+                AuditTableKeys.MESSAGE_ID: {"S": mock_rsv_emis_file.message_id},
+                AuditTableKeys.STATUS: {"S": FileStatus.PROCESSING},
+            },
+        )
 
         redis_patcher = patch("mappings.redis_client")
         self.addCleanup(redis_patcher.stop)
@@ -55,6 +66,7 @@ class TestRecordProcessor(unittest.TestCase):
 
     def tearDown(self) -> None:
         GenericTearDown(s3_client, firehose_client, kinesis_client)
+        generic_setup_and_teardown.GenericTearDown(dynamodb_client=dynamodb_client)
 
     @staticmethod
     def upload_source_files(source_file_content):  # pylint: disable=dangerous-default-value
@@ -104,7 +116,8 @@ class TestRecordProcessor(unittest.TestCase):
         Assertions made:
         * Kinesis PartitionKey is TEST_SUPPLIER
         * Kinesis SequenceNumber is index + 1
-        * Kinesis ApproximateArrivalTimestamp is later than the timestamp for the preceeding data row
+        * Kinesis SequenceNumber is greater than the sequence number of the preceeding data row (records sent in one
+            PutRecords call may share an ApproximateArrivalTimestamp, so the order is checked by sequence number)
         * Where expected_success is True:
             - "fhir_json" key is found in the Kinesis data
             - Kinesis Data is equal to the expected_kinesis_data when ignoring the "fhir_json"
@@ -113,7 +126,7 @@ class TestRecordProcessor(unittest.TestCase):
         """
 
         kinesis_records = kinesis_client.get_records(ShardIterator=self.get_shard_iterator(), Limit=10)["Records"]
-        previous_approximate_arrival_time_stamp = yesterday  # Initialise with a time prior to the running of the test
+        previous_sequence_number = -1  # Initialise with a sequence number prior to that of any record
 
         for test_name, index, expected_kinesis_data, expect_success in test_cases:
             with self.subTest(test_name):
@@ -122,10 +135,10 @@ class TestRecordProcessor(unittest.TestCase):
                 self.assertEqual(kinesis_record["PartitionKey"], mock_rsv_emis_file.queue_name)
                 self.assertEqual(kinesis_record["SequenceNumber"], f"{index+1}")
 
-                # Ensure that arrival times are sequential
-                approximate_arrival_timestamp = kinesis_record["ApproximateArrivalTimestamp"]
-                self.assertGreater(approximate_arrival_timestamp, previous_approximate_arrival_time_stamp)
-                previous_approximate_arrival_time_stamp = approximate_arrival_timestamp
+                # Ensure that the rows are in order
+                sequence_number = int(kinesis_record["SequenceNumber"])
+                self.assertGreater(sequence_number, previous_sequence_number)
+                previous_sequence_number = sequence_number
 
                 kinesis_data = json.loads(kinesis_record["Data"].decode("utf-8"), parse_float=Decimal)
                 expected_kinesis_data = {
@@ -358,6 +371,26 @@ class TestRecordProcessor(unittest.TestCase):
         }
         mock_send_log_to_firehose.assert_called_with(expected_log_data)
 
+    @patch("batch_processing.CHECKPOINT_INTERVAL_ROWS", 2)
+    def test_e2e_lease_lost(self):
+        """
+        Tests that, when the file's lease of the queue has been lost, processing stops and the file is put back in the
+        queue, keeping its place, so that it is resumed once it holds a lease again
+        """
+        self.upload_source_files(ValidMockFileContent.with_new_and_update_and_delete)
+
+        main(mock_rsv_emis_file.event_full_permissions)
+
+        audit_table_entry = dynamodb_client.get_item(
+            TableName=AUDIT_TABLE_NAME, Key={AuditTableKeys.MESSAGE_ID: {"S": mock_rsv_emis_file.message_id}}
+        )["Item"]
+        self.assertEqual(audit_table_entry[AuditTableKeys.STATUS], {"S": FileStatus.QUEUED})
+        self.assertEqual(
+            audit_table_entry[AuditTableKeys.STATUS_TIMESTAMP],
+            {"S": f"{FileStatus.QUEUED}#{mock_rsv_emis_file.created_at_formatted_string}"},
+        )
+        self.assertEqual(audit_table_entry[AuditTableKeys.CHECKPOINT_ROW_COUNT], {"N": "2"})
+
 
 if __name__ == "__main__":
     unittest.main()
@@ -0,0 +1,54 @@
+"""Tests for the row_conversion module"""
+
+import unittest
+from concurrent.futures import ProcessPoolExecutor
+from unittest.mock import ANY, patch
+
+from tests.utils_for_recordprocessor_tests.values_for_recordprocessor_tests import (
+    MockFieldDictionaries,
+    TargetDiseaseElements,
+)
+from tests.utils_for_recordprocessor_tests.mock_environment_variables import MOCK_ENVIRONMENT_DICT
+
+with patch("os.environ", MOCK_ENVIRONMENT_DICT):
+    from process_row import process_row
+    from row_conversion import convert_rows
+
+ALLOWED_OPERATIONS = {"CREATE", "UPDATE", "DELETE"}
+
+
+class TestConvertRows(unittest.TestCase):
+    """Tests for convert_rows"""
+
+    def setUp(self) -> None:
+        self.target_disease = TargetDiseaseElements.RSV
+        self.rows = [
+            {**MockFieldDictionaries.all_fields, "UNIQUE_ID": f"UNIQUE_ID_{i}", "ACTION_FLAG": action_flag}
+            for i, action_flag in enumerate(["NEW", "UPDATE", "DELETE", "INVALID", "NEW", "NEW", "UPDATE"])
+        ]
+        self.expected_details = [process_row(self.target_disease, ALLOWED_OPERATIONS, row) for row in self.rows]
+
+    @patch("row_conversion.CONVERSION_CHUNK_SIZE", 2)
+    @patch("row_conversion.CONVERSION_WORKERS", 2)
+    def test_convert_rows_in_worker_processes(self):
+        """it should convert the rows in worker processes, keeping the order of the rows"""
+        with patch("row_conversion.ProcessPoolExecutor", wraps=ProcessPoolExecutor) as pool:
+            details = list(convert_rows(self.target_disease, ALLOWED_OPERATIONS, iter(self.rows)))
+
+        self.assertEqual(details, self.expected_details)
+        pool.assert_called_once_with(max_workers=2, mp_context=ANY)
+        self.assertEqual(pool.call_args.kwargs["mp_context"].get_start_method(), "forkserver")
+
+    @patch("row_conversion.CONVERSION_CHUNK_SIZE", 10)
+    @patch("row_conversion.CONVERSION_WORKERS", 2)
+    def test_convert_rows_single_chunk(self):
+        """it should convert a file of a single chunk in this process"""
+        with patch("row_conversion.ProcessPoolExecutor") as pool:
+            details = list(convert_rows(self.target_disease, ALLOWED_OPERATIONS, iter(self.rows)))
+
+        self.assertEqual(details, self.expected_details)
+        pool.assert_not_called()
+
+
+if __name__ == "__main__":
+    unittest.main()
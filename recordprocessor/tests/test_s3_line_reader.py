@@ -0,0 +1,105 @@
+"""Tests for the s3_line_reader module"""
+
+import unittest
+from unittest.mock import patch
+from io import StringIO
+import boto3
+from botocore.exceptions import ClientError
+from moto import mock_s3
+from tests.utils_for_recordprocessor_tests.utils_for_recordprocessor_tests import GenericSetUp, GenericTearDown
+from tests.utils_for_recordprocessor_tests.values_for_recordprocessor_tests import REGION_NAME
+from tests.utils_for_recordprocessor_tests.mock_environment_variables import MOCK_ENVIRONMENT_DICT, BucketNames
+
+with patch("os.environ", MOCK_ENVIRONMENT_DICT):
+    from s3_line_reader import S3LineReader
+
+s3_client = boto3.client("s3", region_name=REGION_NAME)
+
+FILE_KEY = "test_file_key.csv"
+FILE_CONTENT = "HEADER_1|HEADER_2\r\nvalue_1|välue_2\r\n\"multi\nline\"|value_4\r\nlast|line"
+
+
+@patch.dict("os.environ", MOCK_ENVIRONMENT_DICT)
+@patch("s3_line_reader.S3_RANGE_SIZE", 5)
+@mock_s3
+class TestS3LineReader(unittest.TestCase):
+    """Tests for S3LineReader"""
+
+    def setUp(self) -> None:
+        GenericSetUp(s3_client)
+        s3_client.put_object(Bucket=BucketNames.SOURCE, Key=FILE_KEY, Body=FILE_CONTENT.encode("utf-8"))
+
+    def tearDown(self) -> None:
+        GenericTearDown(s3_client)
+
+    def test_read_lines(self):
+        """it should return the lines of the file, joining those split across ranges, and track the byte offset"""
+        line_reader = S3LineReader(BucketNames.SOURCE, FILE_KEY)
+
+        offsets = []
+        lines = []
+        for line in line_reader:
+            lines.append(line)
+            offsets.append(line_reader.offset)
+
+        self.assertEqual(lines, StringIO(FILE_CONTENT, newline="").readlines())
+        self.assertEqual(offsets[-1], len(FILE_CONTENT.encode("utf-8")))
+        self.assertEqual(offsets[0], len(lines[0].encode("utf-8")))
+
+    def test_read_lines_from_start_offset(self):
+        """it should resume reading from the line after the given offset"""
+        first_line_length = len(b"HEADER_1|HEADER_2\r\n")
+
+        line_reader = S3LineReader(BucketNames.SOURCE, FILE_KEY, start_offset=first_line_length)
+
+        self.assertEqual(list(line_reader), StringIO(FILE_CONTENT, newline="").readlines()[1:])
+
+    def test_read_lines_to_end_offset(self):
+        """it should stop reading at the given end offset"""
+        lines = StringIO(FILE_CONTENT, newline="").readlines()
+        end_offset = len("".join(lines[:2]).encode("utf-8"))
+
+        line_reader = S3LineReader(BucketNames.SOURCE, FILE_KEY, start_offset=len(lines[0]), end_offset=end_offset)
+
+        self.assertEqual(list(line_reader), lines[1:2])
+        self.assertEqual(line_reader.offset, end_offset)
+
+    @patch("s3_line_reader.time.sleep")
+    def test_read_lines_retries_failed_range(self, mock_sleep):
+        """it should fetch a range again if it fails, using the current key if the file has been moved"""
+        line_reader = S3LineReader(BucketNames.SOURCE, FILE_KEY)
+        s3_client.copy_object(
+            Bucket=BucketNames.SOURCE, CopySource={"Bucket": BucketNames.SOURCE, "Key": FILE_KEY}, Key="moved.csv"
+        )
+        s3_client.delete_object(Bucket=BucketNames.SOURCE, Key=FILE_KEY)
+
+        def get_object_from_new_location(**kwargs):
+            """Moves the reader on to the new key once the old key has been tried"""
+            line_reader.key = "moved.csv"
+            raise ClientError({"Error": {"Code": "NoSuchKey"}}, "GetObject")
+
+        original_get_object = s3_client.get_object
+        with patch("s3_line_reader.s3_client") as mock_s3_client:
+            mock_s3_client.get_object.side_effect = self.make_side_effect(
+                get_object_from_new_location, original_get_object
+            )
+            self.assertEqual(list(line_reader), StringIO(FILE_CONTENT, newline="").readlines())
+
+        mock_sleep.assert_called()
+
+    @staticmethod
+    def make_side_effect(first_call, later_calls):
+        """Returns a side effect which calls first_call on the first call, and later_calls afterwards"""
+        calls = []
+
+        def side_effect(**kwargs):
+            calls.append(kwargs)
+            if len(calls) == 1:
+                return first_call(**kwargs)
+            return later_calls(**kwargs)
+
+        return side_effect
+
+
+if __name__ == "__main__":
+    unittest.main()
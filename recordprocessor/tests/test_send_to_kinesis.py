@@ -1,4 +1,6 @@
+import json
 import unittest
+import zlib
 from unittest.mock import patch
 from moto import mock_kinesis
 from boto3 import client as boto3_client
@@ -13,12 +15,15 @@ from tests.utils_for_recordprocessor_tests.values_for_recordprocessor_tests impo
 from tests.utils_for_recordprocessor_tests.mock_environment_variables import MOCK_ENVIRONMENT_DICT
 
 with patch("os.environ", MOCK_ENVIRONMENT_DICT):
-    from send_to_kinesis import send_to_kinesis
+    from send_to_kinesis import KinesisBatchWriter
+    from common.compact_encoding import COMPACT_MESSAGE_MARKER, COMPACT_MESSAGE_DICTIONARY
+    from errors import KinesisSendError
 
 kinesis_client = boto3_client("kinesis", region_name=REGION_NAME)
 
 
 @mock_kinesis
+@patch("send_to_kinesis.generate_and_send_logs")
 class TestSendToKinesis(unittest.TestCase):
 
     def setUp(self) -> None:
@@ -27,18 +32,94 @@ class TestSendToKinesis(unittest.TestCase):
     def tearDown(self) -> None:
         GenericTearDown(None, None, kinesis_client)
 
+    @staticmethod
+    def make_message_body(row_number: int, local_id: str = None) -> dict:
+        return {"row_id": f"row^{row_number}", "local_id": local_id or f"local^{row_number}"}
+
+    @patch.dict("os.environ", MOCK_ENVIRONMENT_DICT)
+    def test_send_to_kinesis_success(self, mock_generate_and_send_logs):
+        """it should send the buffered messages to the stream at the end, and log the throughput"""
+        stream_name = MOCK_ENVIRONMENT_DICT["KINESIS_STREAM_NAME"]
+
+        with KinesisBatchWriter(file_key="test_file_key") as kinesis_writer:
+            for row_number in range(3):
+                kinesis_writer.send("test_supplier", self.make_message_body(row_number), "test_vaccine")
+
+        shard_id = kinesis_client.describe_stream(StreamName=stream_name)["StreamDescription"]["Shards"][0]["ShardId"]
+        shard_iterator = kinesis_client.get_shard_iterator(
+            StreamName=stream_name, ShardId=shard_id, ShardIteratorType="TRIM_HORIZON"
+        )["ShardIterator"]
+        records = kinesis_client.get_records(ShardIterator=shard_iterator)["Records"]
+        self.assertEqual(
+            [json.loads(record["Data"]) for record in records], [self.make_message_body(i) for i in range(3)]
+        )
+        self.assertEqual(mock_generate_and_send_logs.call_args.args[2]["records_sent"], 3)
+        self.assertEqual(mock_generate_and_send_logs.call_args.args[2]["put_records_calls"], 1)
+
+    @patch.dict("os.environ", MOCK_ENVIRONMENT_DICT)
+    @patch("send_to_kinesis.MAX_RECORDS_PER_PUT", 2)
+    def test_send_to_kinesis_splits_puts(self, _):
+        """it should send the buffer when it is full, or before adding a message for a local_id already in it"""
+        with patch("send_to_kinesis.kinesis_client") as mock_kinesis_client:
+            mock_kinesis_client.put_records.side_effect = lambda **kwargs: {"Records": [{}] * len(kwargs["Records"])}
+
+            with KinesisBatchWriter() as kinesis_writer:
+                for message_body in [
+                    self.make_message_body(1),
+                    self.make_message_body(2),
+                    self.make_message_body(3),
+                    self.make_message_body(4, local_id="local^3"),
+                ]:
+                    kinesis_writer.send("test_supplier", message_body, "test_vaccine")
+
+        self.assertEqual(
+            [len(call.kwargs["Records"]) for call in mock_kinesis_client.put_records.call_args_list], [2, 1, 1]
+        )
+
     @patch.dict("os.environ", MOCK_ENVIRONMENT_DICT)
-    def test_send_to_kinesis_success(self):
+    @patch("send_to_kinesis.time.sleep")
+    def test_send_to_kinesis_retries_failed_records(self, mock_sleep, _):
+        """it should retry only the records which failed"""
+        with patch("send_to_kinesis.kinesis_client") as mock_kinesis_client:
+            mock_kinesis_client.put_records.side_effect = [
+                {"Records": [{}, {"ErrorCode": "ProvisionedThroughputExceededException"}, {}]},
+                {"Records": [{}]},
+            ]
+
+            with KinesisBatchWriter() as kinesis_writer:
+                for row_number in range(3):
+                    kinesis_writer.send("test_supplier", self.make_message_body(row_number), "test_vaccine")
+
+        retried_records = mock_kinesis_client.put_records.call_args_list[1].kwargs["Records"]
+        self.assertEqual([json.loads(record["Data"]) for record in retried_records], [self.make_message_body(1)])
+        mock_sleep.assert_called_once()
+
+    @patch.dict("os.environ", MOCK_ENVIRONMENT_DICT)
+    @patch("send_to_kinesis.time.sleep")
+    def test_send_to_kinesis_failure(self, _mock_sleep, _):
+        """it should raise an error if records still fail after retrying"""
+        with patch("send_to_kinesis.kinesis_client") as mock_kinesis_client:
+            mock_kinesis_client.put_records.return_value = {"Records": [{"ErrorCode": "InternalFailure"}]}
+
+            with self.assertRaises(KinesisSendError):
+                with KinesisBatchWriter() as kinesis_writer:
+                    kinesis_writer.send("test_supplier", self.make_message_body(1), "test_vaccine")
 
-        kinesis_client.return_value = {"ResponseMetadata": {"HTTPStatusCode": 200}}
+    @patch.dict("os.environ", {**MOCK_ENVIRONMENT_DICT, "KINESIS_COMPACT_ENCODING": "true"})
+    def test_send_to_kinesis_compact_encoding(self, _):
+        """it should send the message compressed with the preset dictionary when compact encoding is enabled"""
+        message_body = {"row_id": "row-1", "fhir_json": {"resourceType": "Immunization", "status": "completed"}}
 
-        # arrange required parameters
-        supplier = "test_supplier"
-        message_body = {"key": "value"}
-        vaccine_type = "test_vaccine"
+        with patch("send_to_kinesis.kinesis_client") as mock_kinesis_client:
+            mock_kinesis_client.put_records.return_value = {"Records": [{}]}
+            with KinesisBatchWriter() as kinesis_writer:
+                kinesis_writer.send("test_supplier", message_body, "test_vaccine")
 
-        result = send_to_kinesis(supplier, message_body, vaccine_type)
-        self.assertTrue(result)
+        data = mock_kinesis_client.put_records.call_args.kwargs["Records"][0]["Data"]
+        self.assertTrue(data.startswith(COMPACT_MESSAGE_MARKER))
+        decompressor = zlib.decompressobj(zdict=COMPACT_MESSAGE_DICTIONARY)
+        decompressed = decompressor.decompress(data[len(COMPACT_MESSAGE_MARKER):]) + decompressor.flush()
+        self.assertEqual(json.loads(decompressed), message_body)
 
 
 if __name__ == "__main__":
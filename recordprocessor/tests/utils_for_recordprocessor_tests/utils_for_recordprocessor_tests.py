@@ -82,9 +82,17 @@ class GenericTearDown:
                 pass
 
 
+def generate_audit_table_status(file_details: FileDetails, file_status: FileStatus) -> dict:
+    """Returns the status attributes of the audit table entry for the file with the given status"""
+    return {
+        AuditTableKeys.STATUS: {"S": file_status},
+        AuditTableKeys.STATUS_TIMESTAMP: {"S": f"{file_status}#{file_details.created_at_formatted_string}"},
+    }
+
+
 def add_entry_to_table(file_details: MockFileDetails, file_status: FileStatus) -> None:
     """Add an entry to the audit table"""
-    audit_table_entry = {**file_details.audit_table_entry, "status": {"S": file_status}}
+    audit_table_entry = {**file_details.audit_table_entry, **generate_audit_table_status(file_details, file_status)}
     dynamodb_client.put_item(TableName=AUDIT_TABLE_NAME, Item=audit_table_entry)
 
 
@@ -101,4 +109,5 @@ def assert_audit_table_entry(file_details: FileDetails, expected_status: FileSta
     table_entry = dynamodb_client.get_item(
         TableName=AUDIT_TABLE_NAME, Key={AuditTableKeys.MESSAGE_ID: {"S": file_details.message_id}}
     ).get("Item")
-    assert table_entry == {**file_details.audit_table_entry, "status": {"S": expected_status}}
+    expected_status_attributes = generate_audit_table_status(file_details, expected_status)
+    assert table_entry == {**file_details.audit_table_entry, **expected_status_attributes}
@@ -1,3 +1,7 @@
 class RedisCacheKey:
     PERMISSIONS_CONFIG_FILE_KEY = "permissions_config.json"
     DISEASE_MAPPING_FILE_KEY = "disease_mapping.json"
+
+
+# Incremented after every config upload, so that services caching config read from Redis know to refresh it
+CONFIG_VERSION_KEY = "config_version"
@@ -9,16 +9,15 @@ import time
 from datetime import datetime
 from functools import wraps
 from clients import firehose_client, logger, STREAM_NAME
+from common.log_firehose import FirehoseLogger
+
+# The logs are buffered, and sent in batches, so are flushed before the handler returns
+firehose_logger = FirehoseLogger(STREAM_NAME, firehose_client)
 
 
 def send_log_to_firehose(log_data: dict) -> None:
-    """Sends the log_message to Firehose"""
-    try:
-        record = {"Data": json.dumps({"event": log_data}).encode("utf-8")}
-        response = firehose_client.put_record(DeliveryStreamName=STREAM_NAME, Record=record)
-        logger.info("Log sent to Firehose: %s", response)
-    except Exception as error:  # pylint:disable = broad-exception-caught
-        logger.exception("Error sending log to Firehose: %s", error)
+    """Adds the log_message to the logs to be sent to Firehose"""
+    firehose_logger.send_log({"event": log_data})
 
 
 def generate_and_send_logs(
@@ -49,5 +48,7 @@ def logging_decorator(prefix="redis_sync"):
                 additional_log_data = {"statusCode": 500, "error": str(e)}
                 generate_and_send_logs(start_time, base_log_data, additional_log_data, is_error_log=True)
                 raise
+            finally:
+                firehose_logger.flush()
         return wrapper
     return decorator
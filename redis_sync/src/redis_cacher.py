@@ -3,6 +3,7 @@
 import json
 from clients import redis_client
 from clients import logger
+from constants import CONFIG_VERSION_KEY
 from transform_map import transform_map
 from s3_reader import S3Reader
 
@@ -39,6 +40,9 @@ class RedisCacher:
                     redis_client.hdel(key, *fields_to_delete)
                     logger.info("Deleted mapping fields for %s: %s", key, fields_to_delete)
 
+            config_version = redis_client.incr(CONFIG_VERSION_KEY)
+            logger.info("Config version is now %s", config_version)
+
             return {"status": "success", "message": f"File {file_key} uploaded to Redis cache."}
         except Exception:
             msg = f"Error uploading file '{file_key}' to Redis cache"
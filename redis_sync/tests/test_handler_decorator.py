@@ -37,9 +37,9 @@ class TestHandlerDecorator(unittest.TestCase):
         self.mock_get_s3_records = self.get_s3_records_patcher.start()
         self.record_processor_patcher = patch("redis_sync.process_record")
         self.mock_record_processor = self.record_processor_patcher.start()
-        self.firehose_patcher = patch("log_decorator.firehose_client")
+        self.firehose_patcher = patch("log_decorator.firehose_logger.firehose_client")
         self.mock_firehose_client = self.firehose_patcher.start()
-        self.mock_firehose_client.put_record.return_value = True
+        self.mock_firehose_client.put_record_batch.return_value = {"FailedPutCount": 0}
 
     def tearDown(self):
         patch.stopall()
@@ -56,9 +56,9 @@ class TestHandlerDecorator(unittest.TestCase):
 
         handler(mock_event, None)
 
-        # Get put_record arguments
-        args, kwargs = self.mock_firehose_client.put_record.call_args
-        record = kwargs.get("Record") or args[1]
+        # Get put_record_batch arguments
+        args, kwargs = self.mock_firehose_client.put_record_batch.call_args
+        record = kwargs["Records"][-1]
         data_bytes = record["Data"]
         log_json = data_bytes.decode("utf-8")
         log_dict = json.loads(log_json)
@@ -85,9 +85,9 @@ class TestHandlerDecorator(unittest.TestCase):
 
             handler(mock_event, None)
 
-            # Get put_record arguments
-            args, kwargs = self.mock_firehose_client.put_record.call_args
-            record = kwargs.get("Record") or args[1]
+            # Get put_record_batch arguments
+            args, kwargs = self.mock_firehose_client.put_record_batch.call_args
+            record = kwargs["Records"][-1]
             data_bytes = record["Data"]
             log_json = data_bytes.decode("utf-8")
             log_dict = json.loads(log_json)
@@ -107,9 +107,9 @@ class TestHandlerDecorator(unittest.TestCase):
 
         handler(mock_event, None)
 
-        # Get put_record arguments
-        args, kwargs = self.mock_firehose_client.put_record.call_args
-        record = kwargs.get("Record") or args[1]
+        # Get put_record_batch arguments
+        args, kwargs = self.mock_firehose_client.put_record_batch.call_args
+        record = kwargs["Records"][-1]
         data_bytes = record["Data"]
         log_json = data_bytes.decode("utf-8")
         log_dict = json.loads(log_json)
@@ -128,9 +128,9 @@ class TestHandlerDecorator(unittest.TestCase):
 
         handler(mock_event, None)
 
-        # check put_record arguments
-        args, kwargs = self.mock_firehose_client.put_record.call_args
-        record = kwargs.get("Record") or args[1]
+        # check put_record_batch arguments
+        args, kwargs = self.mock_firehose_client.put_record_batch.call_args
+        record = kwargs["Records"][-1]
         data_bytes = record["Data"]
         log_json = data_bytes.decode("utf-8")
         log_dict = json.loads(log_json)
@@ -145,9 +145,9 @@ class TestHandlerDecorator(unittest.TestCase):
 
         handler({}, None)
 
-        # get put_record arguments
-        args, kwargs = self.mock_firehose_client.put_record.call_args
-        record = kwargs.get("Record") or args[1]
+        # get put_record_batch arguments
+        args, kwargs = self.mock_firehose_client.put_record_batch.call_args
+        record = kwargs["Records"][-1]
         data_bytes = record["Data"]
         log_json = data_bytes.decode("utf-8")
         log_dict = json.loads(log_json)
@@ -174,9 +174,9 @@ class TestHandlerDecorator(unittest.TestCase):
 
         handler(mock_event, None)
 
-        # Get put_record arguments
-        args, kwargs = self.mock_firehose_client.put_record.call_args
-        record = kwargs.get("Record") or args[1]
+        # Get put_record_batch arguments
+        args, kwargs = self.mock_firehose_client.put_record_batch.call_args
+        record = kwargs["Records"][-1]
         data_bytes = record["Data"]
         log_json = data_bytes.decode("utf-8")
         log_dict = json.loads(log_json)
@@ -197,9 +197,9 @@ class TestHandlerDecorator(unittest.TestCase):
             mock_read_event.return_value = mock_read_event_response
             handler(mock_event, None)
 
-            # get put_record arguments
-            args, kwargs = self.mock_firehose_client.put_record.call_args
-            record = kwargs.get("Record") or args[1]
+            # get put_record_batch arguments
+            args, kwargs = self.mock_firehose_client.put_record_batch.call_args
+            record = kwargs["Records"][-1]
             data_bytes = record["Data"]
             log_json = data_bytes.decode("utf-8")
             log_dict = json.loads(log_json)
@@ -19,8 +19,9 @@ module "ack_processor_docker_image" {
   source  = "terraform-aws-modules/lambda/aws//modules/docker-build"
   version = "8.0.1"
 
-  create_ecr_repo = false
-  ecr_repo        = aws_ecr_repository.ack_lambda_repository.name
+  docker_file_path = "ack_backend/Dockerfile"
+  create_ecr_repo  = false
+  ecr_repo         = aws_ecr_repository.ack_lambda_repository.name
   ecr_repo_lifecycle_policy = jsonencode({
     "rules" : [
       {
@@ -40,9 +41,10 @@ module "ack_processor_docker_image" {
 
   platform      = "linux/amd64"
   use_image_tag = false
-  source_path   = local.ack_lambda_dir
+  source_path   = local.repository_root_dir
   triggers = {
-    dir_sha = local.ack_lambda_dir_sha
+    dir_sha        = local.ack_lambda_dir_sha
+    shared_dir_sha = local.shared_lambda_code_dir_sha
   }
 }
 
@@ -114,7 +116,8 @@ resource "aws_iam_policy" "ack_lambda_exec_policy" {
           "s3:PutObject",
           "s3:ListBucket",
           "s3:CopyObject",
-          "s3:DeleteObject"
+          "s3:DeleteObject",
+          "s3:AbortMultipartUpload"
         ]
         Resource = [
           aws_s3_bucket.batch_data_source_bucket.arn,
@@ -133,6 +136,7 @@ resource "aws_iam_policy" "ack_lambda_exec_policy" {
       {
         Effect = "Allow"
         Action = [
+          "dynamodb:GetItem",
           "dynamodb:Query",
           "dynamodb:UpdateItem"
         ]
@@ -219,6 +223,7 @@ resource "aws_lambda_function" "ack_processor_lambda" {
       ENVIRONMENT                = var.sub_environment
       AUDIT_TABLE_NAME           = aws_dynamodb_table.audit-table.name
       FILE_NAME_PROC_LAMBDA_NAME = aws_lambda_function.file_processor_lambda.function_name
+      ACK_ROW_LOGGING_MODE       = "aggregate"
     }
   }
 
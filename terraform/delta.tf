@@ -19,8 +19,9 @@ module "delta_docker_image" {
   source  = "terraform-aws-modules/lambda/aws//modules/docker-build"
   version = "8.0.1"
 
-  create_ecr_repo = false
-  ecr_repo        = "${local.prefix}-delta-lambda-repo"
+  docker_file_path = "delta_backend/Dockerfile"
+  create_ecr_repo  = false
+  ecr_repo         = "${local.prefix}-delta-lambda-repo"
   ecr_repo_lifecycle_policy = jsonencode({
     "rules" : [
       {
@@ -40,9 +41,10 @@ module "delta_docker_image" {
 
   platform      = "linux/amd64"
   use_image_tag = false
-  source_path   = local.delta_lambda_dir
+  source_path   = local.repository_root_dir
   triggers = {
-    dir_sha = local.delta_dir_sha
+    dir_sha        = local.delta_dir_sha
+    shared_dir_sha = local.shared_lambda_code_dir_sha
   }
 
 }
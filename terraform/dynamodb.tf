@@ -19,7 +19,7 @@ resource "aws_dynamodb_table" "audit-table" {
   }
 
   attribute {
-    name = "status"
+    name = "status_timestamp"
     type = "S"
   }
 
@@ -29,13 +29,22 @@ resource "aws_dynamodb_table" "audit-table" {
     projection_type = "ALL"
   }
 
+  # The files in each queue sort by status and then by timestamp, so that the oldest file with a status is found first
+  # Files added before this index existed have no status_timestamp. Once it has been created, run
+  # filenameprocessor/src/backfill_status_timestamps.py so that any files which were queued then are found and processed
   global_secondary_index {
-    name            = "queue_name_index"
+    name            = "queue_name_status_index"
     hash_key        = "queue_name"
-    range_key       = "status"
+    range_key       = "status_timestamp"
     projection_type = "ALL"
   }
 
+  # Only the items recording the processed rows of a file have an expiry, as they are not needed once it is processed
+  ttl {
+    attribute_name = "expires_at"
+    enabled        = true
+  }
+
   point_in_time_recovery {
     enabled = var.environment == "prod"
   }
@@ -29,7 +29,7 @@ module "processing_docker_image" {
   source  = "terraform-aws-modules/lambda/aws//modules/docker-build"
   version = "8.0.1"
 
-  docker_file_path = "Dockerfile"
+  docker_file_path = "recordprocessor/Dockerfile"
   create_ecr_repo  = false
   ecr_repo         = aws_ecr_repository.processing_repository.name
   ecr_repo_lifecycle_policy = jsonencode({
@@ -51,9 +51,10 @@ module "processing_docker_image" {
 
   platform      = "linux/amd64"
   use_image_tag = false
-  source_path   = local.processing_lambda_dir
+  source_path   = local.repository_root_dir
   triggers = {
-    dir_sha = local.processing_lambda_dir_sha
+    dir_sha        = local.processing_lambda_dir_sha
+    shared_dir_sha = local.shared_lambda_code_dir_sha
   }
 }
 
@@ -114,6 +115,8 @@ resource "aws_iam_policy" "ecs_task_exec_policy" {
       {
         Effect = "Allow"
         Action = [
+          "dynamodb:GetItem",
+          "dynamodb:PutItem",
           "dynamodb:Query",
           "dynamodb:UpdateItem"
         ]
@@ -164,6 +167,16 @@ resource "aws_iam_policy" "ecs_task_exec_policy" {
           "firehose:PutRecordBatch"
         ],
         "Resource" : "arn:aws:firehose:*:*:deliverystream/${module.splunk.firehose_stream_name}"
+      },
+      {
+        Effect = "Allow"
+        Action = "ecs:RunTask"
+        Resource = "arn:aws:ecs:${var.aws_region}:${var.immunisation_account_id}:task-definition/${local.short_prefix}-processor-task:*"
+      },
+      {
+        Effect   = "Allow"
+        Action   = "iam:PassRole"
+        Resource = aws_iam_role.ecs_task_exec_role.arn
       }
     ]
   })
@@ -233,6 +246,26 @@ resource "aws_ecs_task_definition" "ecs_task" {
       {
         name  = "REDIS_PORT"
         value = tostring(data.aws_elasticache_cluster.existing_redis.cache_nodes[0].port)
+      },
+      {
+        name  = "MAX_FILE_SHARDS"
+        value = "8"
+      },
+      {
+        name  = "ECS_CLUSTER_NAME"
+        value = "${local.short_prefix}-ecs-cluster"
+      },
+      {
+        name  = "ECS_TASK_DEFINITION"
+        value = "${local.short_prefix}-processor-task"
+      },
+      {
+        name  = "ECS_CONTAINER_NAME"
+        value = "${local.short_prefix}-process-records-container"
+      },
+      {
+        name  = "ECS_SUBNET_IDS"
+        value = join(",", local.private_subnet_ids)
       }
     ]
     logConfiguration = {
@@ -19,8 +19,9 @@ module "file_processor_docker_image" {
   source  = "terraform-aws-modules/lambda/aws//modules/docker-build"
   version = "8.0.1"
 
-  create_ecr_repo = false
-  ecr_repo        = aws_ecr_repository.file_name_processor_lambda_repository.name
+  docker_file_path = "filenameprocessor/Dockerfile"
+  create_ecr_repo  = false
+  ecr_repo         = aws_ecr_repository.file_name_processor_lambda_repository.name
   ecr_repo_lifecycle_policy = jsonencode({
     "rules" : [
       {
@@ -40,9 +41,10 @@ module "file_processor_docker_image" {
 
   platform      = "linux/amd64"
   use_image_tag = false
-  source_path   = local.filename_lambda_dir
+  source_path   = local.repository_root_dir
   triggers = {
-    dir_sha = local.filename_lambda_dir_sha
+    dir_sha        = local.filename_lambda_dir_sha
+    shared_dir_sha = local.shared_lambda_code_dir_sha
   }
 }
 
@@ -228,6 +230,7 @@ resource "aws_iam_policy" "filenameprocessor_dynamo_access_policy" {
     Statement = [
       {
         Action = [
+          "dynamodb:GetItem",
           "dynamodb:PutItem",
           "dynamodb:Query",
           "dynamodb:UpdateItem"
@@ -324,6 +327,27 @@ resource "aws_s3_bucket_notification" "datasources_lambda_notification" {
   }
 }
 
+# The lambda is invoked on a schedule to put the files whose lease of their queue has expired back in their queues, so
+# that the queue of a file which stalled is restarted even if no new file arrives
+resource "aws_cloudwatch_event_rule" "file_name_processor_recover_stalled_files_schedule" {
+  name                = "${local.short_prefix}-filenameproc-recover-stalled-files"
+  description         = "Recovers the files whose processing has stalled"
+  schedule_expression = "rate(5 minutes)"
+}
+
+resource "aws_cloudwatch_event_target" "file_name_processor_recover_stalled_files_target" {
+  rule = aws_cloudwatch_event_rule.file_name_processor_recover_stalled_files_schedule.name
+  arn  = aws_lambda_function.file_processor_lambda.arn
+}
+
+resource "aws_lambda_permission" "events_invoke_permission" {
+  statement_id  = "AllowExecutionFromEventBridgeSchedule"
+  action        = "lambda:InvokeFunction"
+  function_name = aws_lambda_function.file_processor_lambda.function_name
+  principal     = "events.amazonaws.com"
+  source_arn    = aws_cloudwatch_event_rule.file_name_processor_recover_stalled_files_schedule.arn
+}
+
 resource "aws_cloudwatch_log_group" "file_name_processor_log_group" {
   name              = "/aws/lambda/${local.short_prefix}-filenameproc_lambda"
   retention_in_days = 30
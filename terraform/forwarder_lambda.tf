@@ -24,7 +24,7 @@ module "forwarding_docker_image" {
 
   create_ecr_repo  = false
   ecr_repo         = aws_ecr_repository.forwarder_lambda_repository.name
-  docker_file_path = "batch.Dockerfile"
+  docker_file_path = "backend/batch.Dockerfile"
   ecr_repo_lifecycle_policy = jsonencode({
     rules = [
       {
@@ -44,9 +44,10 @@ module "forwarding_docker_image" {
 
   platform      = "linux/amd64"
   use_image_tag = false
-  source_path   = local.forwarder_lambda_dir
+  source_path   = local.repository_root_dir
   triggers = {
-    dir_sha = local.forwarder_dir_sha
+    dir_sha        = local.forwarder_dir_sha
+    shared_dir_sha = local.shared_lambda_code_dir_sha
   }
 }
 
@@ -170,6 +171,7 @@ resource "aws_iam_policy" "forwarding_lambda_exec_policy" {
         Effect = "Allow"
         Action = [
           "dynamodb:GetItem",
+          "dynamodb:BatchGetItem",
           "dynamodb:PutItem",
           "dynamodb:UpdateItem",
           "dynamodb:Query"
@@ -231,6 +233,7 @@ resource "aws_lambda_function" "forwarding_lambda" {
       SQS_QUEUE_URL       = aws_sqs_queue.fifo_queue.url
       REDIS_HOST          = data.aws_elasticache_cluster.existing_redis.cache_nodes[0].address
       REDIS_PORT          = data.aws_elasticache_cluster.existing_redis.cache_nodes[0].port
+      MAX_FORWARDER_WORKERS = 10
     }
   }
   kms_key_arn = data.aws_kms_key.existing_lambda_encryption_key.arn
@@ -25,7 +25,7 @@ module "docker_image" {
 
   create_ecr_repo  = false
   ecr_repo         = "${local.prefix}-operation-lambda-repo"
-  docker_file_path = "lambda.Dockerfile"
+  docker_file_path = "backend/lambda.Dockerfile"
   ecr_repo_lifecycle_policy = jsonencode({
     "rules" : [
       {
@@ -45,9 +45,10 @@ module "docker_image" {
 
   platform      = "linux/amd64"
   use_image_tag = false
-  source_path   = local.lambda_dir
+  source_path   = local.repository_root_dir
   triggers = {
-    dir_sha = local.dir_sha
+    dir_sha        = local.dir_sha
+    shared_dir_sha = local.shared_lambda_code_dir_sha
   }
 }
 
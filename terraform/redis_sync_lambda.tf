@@ -18,8 +18,9 @@ module "redis_sync_docker_image" {
   source  = "terraform-aws-modules/lambda/aws//modules/docker-build"
   version = "8.0.1"
 
-  create_ecr_repo = false
-  ecr_repo        = aws_ecr_repository.redis_sync_lambda_repository.name
+  docker_file_path = "redis_sync/Dockerfile"
+  create_ecr_repo  = false
+  ecr_repo         = aws_ecr_repository.redis_sync_lambda_repository.name
   ecr_repo_lifecycle_policy = jsonencode({
     "rules" : [
       {
@@ -39,9 +40,10 @@ module "redis_sync_docker_image" {
 
   platform      = "linux/amd64"
   use_image_tag = false
-  source_path   = local.redis_sync_lambda_dir
+  source_path   = local.repository_root_dir
   triggers = {
-    dir_sha = local.redis_sync_lambda_dir_sha
+    dir_sha        = local.redis_sync_lambda_dir_sha
+    shared_dir_sha = local.shared_lambda_code_dir_sha
   }
 }
 
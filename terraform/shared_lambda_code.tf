@@ -0,0 +1,8 @@
+# The code shared between the lambdas, which is copied into the images of the lambdas which use it. Those images are
+# built from the repository root, and are rebuilt when the shared code changes.
+locals {
+  repository_root_dir        = abspath("${path.root}/..")
+  shared_lambda_code_dir     = abspath("${path.root}/../lambdas/shared/src/common")
+  shared_lambda_code_files   = fileset(local.shared_lambda_code_dir, "**")
+  shared_lambda_code_dir_sha = sha1(join("", [for f in local.shared_lambda_code_files : filesha1("${local.shared_lambda_code_dir}/${f}")]))
+}